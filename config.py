@@ -1,73 +1,212 @@
-import os
 import sys
-from cryptography.fernet import Fernet
-from dotenv import load_dotenv
-from src import db
+import threading
+import time
+from src import db, metrics
+from src.settings import get_settings
 
-# Load environment variables
-load_dotenv()
+# .env is read once per process; cryptography is imported on first encrypt/decrypt
+settings = get_settings()
 
 # -------------------------------
 # Encryption Key Management
 # -------------------------------
 
-def get_encryption_key(key_id: int = None) -> str:
+class EncryptionKeyring:
     """
-    Fetch encryption key.
-    Priority:
-    1. Specific KEY_ID from SEC01_ENCRYPTION_KEY (if provided)
-    2. Active key ID from .env (ENCRYPTION_KEY_ID)
-    3. Latest key from SEC01_ENCRYPTION_KEY
-    4. .env fallback (ENCRYPTION_KEY)
+    In-process cache of SEC01_ENCRYPTION_KEY.
+    All keys are loaded with one query and indexed by KEY_ID. Fernet and
+    MultiFernet objects are built once and reused until the TTL expires or
+    invalidate() is called (e.g. after gen_encryption_key.py adds a key).
+    fetch_keys replaces the SEC01 query (tests pass a stub).
     """
-    try:
-        if key_id:
-            row = db.fetch_one("SELECT ENCRYPTION_KEY FROM SEC01_ENCRYPTION_KEY WHERE KEY_ID=%s", (key_id,))
-            if row and row.get("ENCRYPTION_KEY"):
-                return row["ENCRYPTION_KEY"]
-
-        env_key_id = os.getenv("ENCRYPTION_KEY_ID")
-        if env_key_id:
-            row = db.fetch_one("SELECT ENCRYPTION_KEY FROM SEC01_ENCRYPTION_KEY WHERE KEY_ID=%s", (env_key_id,))
-            if row and row.get("ENCRYPTION_KEY"):
-                return row["ENCRYPTION_KEY"]
-
-        row = db.fetch_one("SELECT ENCRYPTION_KEY FROM SEC01_ENCRYPTION_KEY ORDER BY KEY_ID DESC LIMIT 1")
-        if row and row.get("ENCRYPTION_KEY"):
-            return row["ENCRYPTION_KEY"]
-    except Exception:
-        pass
-
-    key = os.getenv("ENCRYPTION_KEY")
-    if not key:
-        raise RuntimeError("ENCRYPTION_KEY is missing. Set it in DB or .env")
-    return key
+
+    def __init__(self, ttl: float = 300.0, reload_cooldown: float = 5.0, fetch_keys=None):
+        self.ttl = ttl
+        self.reload_cooldown = reload_cooldown
+        self._fetch_keys = fetch_keys or self._fetch_from_db
+        self._lock = threading.RLock()
+        self._keys = {}        # KEY_ID -> key string, newest first
+        self._fernets = {}     # key string -> Fernet
+        self._multi = None
+        self._loaded_at = None
+        self._stats = {"hits": 0, "misses": 0, "loads": 0, "load_errors": 0, "fallbacks": 0}
+
+    # -------------------------------
+    # Loading
+    # -------------------------------
+
+    @staticmethod
+    def _fetch_from_db():
+        return db.fetch_all(
+            "SELECT KEY_ID, ENCRYPTION_KEY FROM SEC01_ENCRYPTION_KEY ORDER BY KEY_ID DESC"
+        )
+
+    def _load(self):
+        try:
+            rows = self._fetch_keys()
+        except Exception as e:
+            # Keep serving the keys we already have; never cache an empty keyring
+            # because of a transient DB error
+            self._stats["load_errors"] += 1
+            print(f"⚠️ Encryption keys not reloaded, keeping {len(self._keys)} cached key(s): {e}")
+            if self._loaded_at is not None:
+                # Retry after reload_cooldown instead of waiting out the full TTL
+                self._loaded_at = time.monotonic() - self.ttl + self.reload_cooldown
+            return
+        self._keys = {
+            int(row["KEY_ID"]): row["ENCRYPTION_KEY"]
+            for row in rows if row.get("ENCRYPTION_KEY")
+        }
+        # Forget Fernets of keys that were removed from the table
+        self._fernets = {k: f for k, f in self._fernets.items() if k in self._keys.values()}
+        self._multi = None
+        self._loaded_at = time.monotonic()
+        self._stats["loads"] += 1
+
+    def _ensure_loaded(self):
+        """Count a hit when served from memory, a miss when the DB had to be read"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self._stats["misses"] += 1
+            self._load()
+        else:
+            self._stats["hits"] += 1
+
+    def invalidate(self):
+        """Drop cached keys; the next lookup reloads from the DB"""
+        with self._lock:
+            self._loaded_at = None
+
+    # -------------------------------
+    # Lookups
+    # -------------------------------
+
+    @staticmethod
+    def _normalize_id(key_id):
+        try:
+            return int(key_id) if key_id not in (None, "") else None
+        except (TypeError, ValueError):
+            return None
+
+    def active_key_id(self):
+        """
+        KEY_ID used for new encryptions:
+        ENCRYPTION_KEY_ID from .env if it exists in the DB, else the latest key.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            return self._active_id()
+
+    def _active_id(self):
+        env_key_id = self._normalize_id(settings.get("ENCRYPTION_KEY_ID"))
+        if env_key_id in self._keys:
+            return env_key_id
+        return next(iter(self._keys), None)
+
+    def get_key(self, key_id=None) -> str:
+        """
+        Fetch encryption key.
+        Priority:
+        1. Specific KEY_ID (if provided)
+        2. Active key ID from .env (ENCRYPTION_KEY_ID)
+        3. Latest key from SEC01_ENCRYPTION_KEY
+        4. .env fallback (ENCRYPTION_KEY)
+        """
+        with self._lock:
+            self._ensure_loaded()
+            wanted = self._normalize_id(key_id)
+            if wanted is not None and wanted not in self._keys:
+                # The key may have been added by another process since our last load
+                if self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_cooldown:
+                    self._stats["misses"] += 1
+                    self._load()
+            if wanted in self._keys:
+                return self._keys[wanted]
+
+            active_id = self._active_id()
+            if active_id is not None:
+                return self._keys[active_id]
+
+        key = settings.get("ENCRYPTION_KEY")
+        if not key:
+            raise RuntimeError("ENCRYPTION_KEY is missing. Set it in DB or .env")
+        return key
+
+    def _fernet_for(self, key: str) -> "Fernet":
+        from cryptography.fernet import Fernet
+        fernet = self._fernets.get(key)
+        if fernet is None:
+            fernet = self._fernets[key] = Fernet(key.encode())
+        return fernet
+
+    def fernet(self, key_id=None) -> "Fernet":
+        key = self.get_key(key_id)
+        with self._lock:
+            return self._fernet_for(key)
+
+    def multi_fernet(self) -> "MultiFernet":
+        """All known keys, active key first; used for fallback decryption and rotation"""
+        from cryptography.fernet import MultiFernet
+        with self._lock:
+            self._ensure_loaded()
+            if self._multi is None:
+                active_id = self._active_id()
+                ordered = sorted(self._keys, key=lambda k: (k != active_id, -k))
+                keys = [self._keys[k] for k in ordered]
+                env_key = settings.get("ENCRYPTION_KEY")
+                if env_key and env_key not in keys:
+                    keys.append(env_key)
+                if not keys:
+                    raise RuntimeError("ENCRYPTION_KEY is missing. Set it in DB or .env")
+                self._multi = MultiFernet([self._fernet_for(k) for k in keys])
+            return self._multi
+
+    def record_fallback(self):
+        with self._lock:
+            self._stats["fallbacks"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["keys"] = len(self._keys)
+        return snapshot
+
+
+keyring = EncryptionKeyring(ttl=settings.get("ENCRYPTION_KEYRING_TTL", 300.0, float))
+
+DECRYPTS = metrics.counter("mstock_crypto_decrypts_total",
+                           "Password decryptions by outcome (ok, fallback = had to try every key, failed)",
+                           ("result",))
+DECRYPT_SECONDS = metrics.histogram("mstock_crypto_decrypt_seconds", "decrypt_str latency")
+
+def get_encryption_key(key_id: int = None) -> str:
+    """Fetch encryption key (see EncryptionKeyring.get_key for priority)"""
+    return keyring.get_key(key_id)
 
 def encrypt_str(plain: str) -> str:
     """Encrypt using the active key"""
-    key = get_encryption_key()
-    fernet = Fernet(key.encode())
-    return fernet.encrypt(plain.encode()).decode()
+    return keyring.fernet().encrypt(plain.encode()).decode()
 
 def decrypt_str(cipher: str, key_id: int = None) -> str:
     """
     Decrypt using the provided key_id.
-    If key_id is missing or fails, try all known keys.
+    If key_id is missing or fails, try all known keys (from memory, no DB round trip).
     """
-    try:
-        key = get_encryption_key(key_id)
-        fernet = Fernet(key.encode())
-        return fernet.decrypt(cipher.encode()).decode()
-    except Exception:
-        # fallback: try all keys
-        rows = db.fetch_all("SELECT ENCRYPTION_KEY FROM SEC01_ENCRYPTION_KEY ORDER BY KEY_ID DESC")
-        for row in rows:
+    from cryptography.fernet import InvalidToken
+    token = cipher.encode()
+    with DECRYPT_SECONDS.time():
+        try:
+            plain = keyring.fernet(key_id).decrypt(token).decode()
+            DECRYPTS.inc(result="ok")
+            return plain
+        except Exception:
+            keyring.record_fallback()
             try:
-                fernet = Fernet(row["ENCRYPTION_KEY"].encode())
-                return fernet.decrypt(cipher.encode()).decode()
-            except Exception:
-                continue
-        raise ValueError("Unable to decrypt with any known key")
+                plain = keyring.multi_fernet().decrypt(token).decode()
+                DECRYPTS.inc(result="fallback")
+                return plain
+            except InvalidToken:
+                DECRYPTS.inc(result="failed")
+                raise ValueError("Unable to decrypt with any known key")
 
 # -------------------------------
 # Login / Logout Flow (unchanged)
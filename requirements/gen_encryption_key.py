@@ -5,73 +5,89 @@ Utility script to generate a Fernet encryption key and save it into:
 """
 
 import os
-import mysql.connector
+import sys
 from cryptography.fernet import Fernet
-from dotenv import load_dotenv
 
-# Load environment variables from root .env
-ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 env_path = os.path.join(ROOT_DIR, ".env")
-load_dotenv(env_path)
+
+# Allow `python requirements/gen_encryption_key.py` to import src.db
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from src import db   # loads root .env via src.settings
 
 def get_connection():
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        user=os.getenv("DB_USER", "root"),
-        password=os.getenv("DB_PASSWORD", "root"),
-        database=os.getenv("DB_NAME", "mstock"),
-        port=int(os.getenv("DB_PORT", 3306))
+    """Connection on the configured backend (DB_BACKEND=mysql|sqlite)"""
+    return db.get_connection()
+
+def create_key():
+    """
+    Generate a new Fernet key and insert it into SEC01_ENCRYPTION_KEY.
+    Returns (key_id, key).
+    """
+    key = Fernet.generate_key().decode()
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO SEC01_ENCRYPTION_KEY (ENCRYPTION_KEY) VALUES (%s)",
+        (key,)
     )
+    conn.commit()
 
-def main():
-    try:
-        # Generate new Fernet key
-        key = Fernet.generate_key().decode()
-
-        # Insert into DB
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO SEC01_ENCRYPTION_KEY (ENCRYPTION_KEY) VALUES (%s)",
-            (key,)
-        )
-        conn.commit()
-
-        # Get the auto-incremented KEY_ID
-        key_id = cursor.lastrowid
-
-        cursor.close()
-        conn.close()
-        print(f"✅ ENCRYPTION_KEY inserted into SEC01_ENCRYPTION_KEY with KEY_ID={key_id}")
+    # Get the auto-incremented KEY_ID
+    key_id = cursor.lastrowid
+
+    cursor.close()
+    conn.close()
+
+    # Drop the in-process keyring cache if config is loaded (e.g. rotation job)
+    config = sys.modules.get("config")
+    if config is not None and hasattr(config, "keyring"):
+        config.keyring.invalidate()
+
+    return key_id, key
+
+def write_env(key, key_id):
+    """Update .env with both ENCRYPTION_KEY and ENCRYPTION_KEY_ID"""
+    if not os.path.exists(env_path):
+        with open(env_path, "w") as f:
+            f.write("")
+
+    with open(env_path, "r") as f:
+        lines = f.readlines()
 
-        # Update .env with both ENCRYPTION_KEY and ENCRYPTION_KEY_ID
-        if not os.path.exists(env_path):
-            with open(env_path, "w") as f:
-                f.write("")
-
-        with open(env_path, "r") as f:
-            lines = f.readlines()
-
-        new_lines = []
-        found_key = False
-        found_id = False
-        for line in lines:
-            if line.startswith("ENCRYPTION_KEY="):
-                new_lines.append(f"ENCRYPTION_KEY={key}\n")
-                found_key = True
-            elif line.startswith("ENCRYPTION_KEY_ID="):
-                new_lines.append(f"ENCRYPTION_KEY_ID={key_id}\n")
-                found_id = True
-            else:
-                new_lines.append(line)
-
-        if not found_key:
+    new_lines = []
+    found_key = False
+    found_id = False
+    for line in lines:
+        if line.startswith("ENCRYPTION_KEY="):
             new_lines.append(f"ENCRYPTION_KEY={key}\n")
-        if not found_id:
+            found_key = True
+        elif line.startswith("ENCRYPTION_KEY_ID="):
             new_lines.append(f"ENCRYPTION_KEY_ID={key_id}\n")
+            found_id = True
+        else:
+            new_lines.append(line)
 
-        with open(env_path, "w") as f:
-            f.writelines(new_lines)
+    if not found_key:
+        new_lines.append(f"ENCRYPTION_KEY={key}\n")
+    if not found_id:
+        new_lines.append(f"ENCRYPTION_KEY_ID={key_id}\n")
+
+    with open(env_path, "w") as f:
+        f.writelines(new_lines)
+
+    # Keep this process in sync with the file we just wrote
+    os.environ["ENCRYPTION_KEY"] = key
+    os.environ["ENCRYPTION_KEY_ID"] = str(key_id)
+
+def main():
+    try:
+        key_id, key = create_key()
+        print(f"✅ ENCRYPTION_KEY inserted into SEC01_ENCRYPTION_KEY with KEY_ID={key_id}")
+
+        write_env(key, key_id)
 
         print(f"✅ ENCRYPTION_KEY and ENCRYPTION_KEY_ID written to {env_path}")
         print(f"🔑 Key value: {key}")
@@ -82,4 +98,4 @@ def main():
         print("❌ Failed to generate or save ENCRYPTION_KEY:", str(e))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
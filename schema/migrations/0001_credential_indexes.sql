@@ -0,0 +1,9 @@
+-- 0001 — Indexes for MS01_API_Authentication_Credential
+-- Every lookup/update/delete in src/db.py filters on M_STOCK_USER_ID;
+-- get_latest_credential orders by SYS_UPDATE_DATE_TIME.
+-- NOTE: remove duplicate M_STOCK_USER_ID rows before applying the unique index.
+
+ALTER TABLE MS01_API_Authentication_Credential
+    ADD UNIQUE INDEX UQ_MS01_AAC_USER_ID (M_STOCK_USER_ID);
+
+CREATE INDEX IDX_MS01_AAC_UPDATED ON MS01_API_Authentication_Credential (SYS_UPDATE_DATE_TIME);
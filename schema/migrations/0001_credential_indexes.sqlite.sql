@@ -0,0 +1,5 @@
+-- 0001 — Indexes for MS01_API_Authentication_Credential (SQLite variant)
+
+CREATE UNIQUE INDEX IF NOT EXISTS UQ_MS01_AAC_USER_ID ON MS01_API_Authentication_Credential (M_STOCK_USER_ID);
+
+CREATE INDEX IF NOT EXISTS IDX_MS01_AAC_UPDATED ON MS01_API_Authentication_Credential (SYS_UPDATE_DATE_TIME);
@@ -0,0 +1,7 @@
+-- 0002 — Indexes for MS01_REQUEST_RESPONSE_LOG
+-- LOGIN_SEQ_ID groups the rows of one login flow (not unique);
+-- SYS_CREATE_DATE_TIME drives retention and time-range queries.
+
+CREATE INDEX IDX_MS01_RRL_LOGIN_SEQ_ID ON MS01_REQUEST_RESPONSE_LOG (LOGIN_SEQ_ID);
+
+CREATE INDEX IDX_MS01_RRL_CREATED ON MS01_REQUEST_RESPONSE_LOG (SYS_CREATE_DATE_TIME);
@@ -0,0 +1,5 @@
+-- 0002 — Indexes for MS01_REQUEST_RESPONSE_LOG (SQLite variant)
+
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_LOGIN_SEQ_ID ON MS01_REQUEST_RESPONSE_LOG (LOGIN_SEQ_ID);
+
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_CREATED ON MS01_REQUEST_RESPONSE_LOG (SYS_CREATE_DATE_TIME);
@@ -0,0 +1,4 @@
+-- 0003 — Indexes for logs
+-- SYS_CREATE_DATE_TIME drives retention (log_cleanup) and "latest logs" views.
+
+CREATE INDEX IDX_LOGS_CREATED ON logs (SYS_CREATE_DATE_TIME);
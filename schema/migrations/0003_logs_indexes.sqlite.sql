@@ -0,0 +1,3 @@
+-- 0003 — Indexes for logs (SQLite variant)
+
+CREATE INDEX IF NOT EXISTS IDX_LOGS_CREATED ON logs (SYS_CREATE_DATE_TIME);
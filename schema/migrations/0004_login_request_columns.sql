@@ -0,0 +1,7 @@
+-- 0004 — Columns written by auth.login / user_login.select_and_login
+-- Both store the OTP and request_token returned by /connect/login, but the
+-- columns were never part of the schema, so the UPDATE failed.
+
+ALTER TABLE MS01_API_Authentication_Credential ADD COLUMN M_STOCK_OTP VARCHAR(20);
+
+ALTER TABLE MS01_API_Authentication_Credential ADD COLUMN M_STOCK_REQUEST_TOKEN VARCHAR(255);
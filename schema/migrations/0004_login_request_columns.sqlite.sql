@@ -0,0 +1,5 @@
+-- 0004 — Columns written by auth.login / user_login.select_and_login (SQLite variant)
+
+ALTER TABLE MS01_API_Authentication_Credential ADD COLUMN M_STOCK_OTP TEXT;
+
+ALTER TABLE MS01_API_Authentication_Credential ADD COLUMN M_STOCK_REQUEST_TOKEN TEXT;
@@ -0,0 +1,21 @@
+-- 0005 — Structured MS01_REQUEST_RESPONSE_LOG rows
+-- request/response now hold JSON text. Above LOG_COMPRESS_THRESHOLD bytes
+-- both go into PAYLOAD as one compressed JSON document (PAYLOAD_CODEC =
+-- zlib or zstd) and request/response stay NULL. STATUS / USER_ID /
+-- HTTP_STATUS are pulled out of the payload so they can be indexed.
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN STATUS VARCHAR(20);
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN USER_ID VARCHAR(100);
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN HTTP_STATUS SMALLINT;
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN PAYLOAD_CODEC VARCHAR(10);
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN PAYLOAD MEDIUMBLOB;
+
+CREATE INDEX IDX_MS01_RRL_STATUS_CREATED ON MS01_REQUEST_RESPONSE_LOG (STATUS, SYS_CREATE_DATE_TIME);
+
+CREATE INDEX IDX_MS01_RRL_USER_CREATED ON MS01_REQUEST_RESPONSE_LOG (USER_ID, SYS_CREATE_DATE_TIME);
+
+CREATE INDEX IDX_MS01_RRL_HTTP_STATUS_CREATED ON MS01_REQUEST_RESPONSE_LOG (HTTP_STATUS, SYS_CREATE_DATE_TIME);
@@ -0,0 +1,17 @@
+-- 0005 — Structured MS01_REQUEST_RESPONSE_LOG rows (SQLite variant)
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN STATUS TEXT;
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN USER_ID TEXT;
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN HTTP_STATUS INTEGER;
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN PAYLOAD_CODEC TEXT;
+
+ALTER TABLE MS01_REQUEST_RESPONSE_LOG ADD COLUMN PAYLOAD BLOB;
+
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_STATUS_CREATED ON MS01_REQUEST_RESPONSE_LOG (STATUS, SYS_CREATE_DATE_TIME);
+
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_USER_CREATED ON MS01_REQUEST_RESPONSE_LOG (USER_ID, SYS_CREATE_DATE_TIME);
+
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_HTTP_STATUS_CREATED ON MS01_REQUEST_RESPONSE_LOG (HTTP_STATUS, SYS_CREATE_DATE_TIME);
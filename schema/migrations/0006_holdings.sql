@@ -0,0 +1,29 @@
+-- 0006 — Holdings per account (written by src/holdings.py)
+-- One row per (account, exchange, symbol). ROW_HASH lets a sync skip rows that
+-- did not change; holdings_sync keeps one hash per account so an unchanged
+-- account is not touched at all.
+
+CREATE TABLE holdings (
+    HOLDING_ID              BIGINT AUTO_INCREMENT PRIMARY KEY,
+    SYS_CREATE_DATE_TIME    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    SYS_UPDATE_DATE_TIME    TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    M_STOCK_USER_ID         VARCHAR(100) NOT NULL,
+    EXCHANGE                VARCHAR(10) NOT NULL,
+    SYMBOL                  VARCHAR(50) NOT NULL,
+    ISIN                    VARCHAR(20),
+    PRODUCT                 VARCHAR(10),
+    QUANTITY                DECIMAL(18,4) NOT NULL,
+    AVERAGE_PRICE           DECIMAL(18,4),
+    LAST_PRICE              DECIMAL(18,4),
+    CLOSE_PRICE             DECIMAL(18,4),
+    ROW_HASH                CHAR(16) NOT NULL,
+    UNIQUE INDEX UQ_HOLDINGS_USER_SYMBOL (M_STOCK_USER_ID, EXCHANGE, SYMBOL),
+    INDEX IDX_HOLDINGS_SYMBOL (SYMBOL)
+);
+
+CREATE TABLE holdings_sync (
+    M_STOCK_USER_ID         VARCHAR(100) PRIMARY KEY,
+    HOLDINGS_HASH           CHAR(32) NOT NULL,
+    ROW_COUNT               INT NOT NULL,
+    LAST_CHANGE_DATE        TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,28 @@
+-- 0006 — Holdings per account (SQLite variant)
+
+CREATE TABLE IF NOT EXISTS holdings (
+    HOLDING_ID              INTEGER PRIMARY KEY AUTOINCREMENT,
+    SYS_CREATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    SYS_UPDATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    M_STOCK_USER_ID         TEXT NOT NULL,
+    EXCHANGE                TEXT NOT NULL,
+    SYMBOL                  TEXT NOT NULL,
+    ISIN                    TEXT,
+    PRODUCT                 TEXT,
+    QUANTITY                REAL NOT NULL,
+    AVERAGE_PRICE           REAL,
+    LAST_PRICE              REAL,
+    CLOSE_PRICE             REAL,
+    ROW_HASH                TEXT NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS UQ_HOLDINGS_USER_SYMBOL ON holdings (M_STOCK_USER_ID, EXCHANGE, SYMBOL);
+
+CREATE INDEX IF NOT EXISTS IDX_HOLDINGS_SYMBOL ON holdings (SYMBOL);
+
+CREATE TABLE IF NOT EXISTS holdings_sync (
+    M_STOCK_USER_ID         TEXT PRIMARY KEY,
+    HOLDINGS_HASH           TEXT NOT NULL,
+    ROW_COUNT               INTEGER NOT NULL,
+    LAST_CHANGE_DATE        TEXT DEFAULT (datetime('now','localtime'))
+);
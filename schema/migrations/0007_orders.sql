@@ -0,0 +1,32 @@
+-- 0007 — Orders replicated from the local order journal (src/orders.py)
+-- The journal is the write-ahead record; this table is filled from it
+-- asynchronously, so it may trail the journal by a moment. IDEMPOTENCY_KEY
+-- is the client's key for the order: replaying the journal upserts on it.
+
+CREATE TABLE orders (
+    ORDER_SEQ_ID            BIGINT AUTO_INCREMENT PRIMARY KEY,
+    SYS_CREATE_DATE_TIME    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    SYS_UPDATE_DATE_TIME    TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    IDEMPOTENCY_KEY         VARCHAR(64) NOT NULL,
+    M_STOCK_USER_ID         VARCHAR(100) NOT NULL,
+    EXCHANGE                VARCHAR(10) NOT NULL,
+    SYMBOL                  VARCHAR(50) NOT NULL,
+    TRANSACTION_TYPE        VARCHAR(4) NOT NULL,
+    ORDER_TYPE              VARCHAR(10) NOT NULL,
+    PRODUCT                 VARCHAR(10) NOT NULL,
+    VALIDITY                VARCHAR(10) NOT NULL,
+    QUANTITY                INT NOT NULL,
+    PRICE                   DECIMAL(18,4),
+    TRIGGER_PRICE           DECIMAL(18,4),
+    STATUS                  VARCHAR(20) NOT NULL,
+    BROKER_ORDER_ID         VARCHAR(50),
+    MESSAGE                 VARCHAR(255),
+    HTTP_STATUS             SMALLINT,
+    SUBMITTED_AT            DATETIME(3),
+    RESPONDED_AT            DATETIME(3),
+    WIRE_MS                 DECIMAL(10,3),
+    LATENCY_MS              DECIMAL(10,3),
+    UNIQUE INDEX UQ_ORDERS_IDEMPOTENCY_KEY (IDEMPOTENCY_KEY),
+    INDEX IDX_ORDERS_USER_SUBMITTED (M_STOCK_USER_ID, SUBMITTED_AT),
+    INDEX IDX_ORDERS_BROKER_ORDER_ID (BROKER_ORDER_ID)
+);
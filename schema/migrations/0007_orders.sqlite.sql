@@ -0,0 +1,32 @@
+-- 0007 — Orders replicated from the local order journal (SQLite variant)
+
+CREATE TABLE IF NOT EXISTS orders (
+    ORDER_SEQ_ID            INTEGER PRIMARY KEY AUTOINCREMENT,
+    SYS_CREATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    SYS_UPDATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    IDEMPOTENCY_KEY         TEXT NOT NULL,
+    M_STOCK_USER_ID         TEXT NOT NULL,
+    EXCHANGE                TEXT NOT NULL,
+    SYMBOL                  TEXT NOT NULL,
+    TRANSACTION_TYPE        TEXT NOT NULL,
+    ORDER_TYPE              TEXT NOT NULL,
+    PRODUCT                 TEXT NOT NULL,
+    VALIDITY                TEXT NOT NULL,
+    QUANTITY                INTEGER NOT NULL,
+    PRICE                   REAL,
+    TRIGGER_PRICE           REAL,
+    STATUS                  TEXT NOT NULL,
+    BROKER_ORDER_ID         TEXT,
+    MESSAGE                 TEXT,
+    HTTP_STATUS             INTEGER,
+    SUBMITTED_AT            TEXT,
+    RESPONDED_AT            TEXT,
+    WIRE_MS                 REAL,
+    LATENCY_MS              REAL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS UQ_ORDERS_IDEMPOTENCY_KEY ON orders (IDEMPOTENCY_KEY);
+
+CREATE INDEX IF NOT EXISTS IDX_ORDERS_USER_SUBMITTED ON orders (M_STOCK_USER_ID, SUBMITTED_AT);
+
+CREATE INDEX IF NOT EXISTS IDX_ORDERS_BROKER_ORDER_ID ON orders (BROKER_ORDER_ID);
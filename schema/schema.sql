@@ -33,7 +33,11 @@ CREATE TABLE MS01_API_Authentication_Credential (
     M_ENC_TOKEN TEXT,
     LAST_LOGIN_DATE TIMESTAMP,
     LAST_LOGOUT_DATE TIMESTAMP,
-    ENCRYPTION_KEY_ID TEXT
+    ENCRYPTION_KEY_ID TEXT,
+    M_STOCK_OTP VARCHAR(20),
+    M_STOCK_REQUEST_TOKEN VARCHAR(255),
+    UNIQUE INDEX UQ_MS01_AAC_USER_ID (M_STOCK_USER_ID),
+    INDEX IDX_MS01_AAC_UPDATED (SYS_UPDATE_DATE_TIME)
 );
 -- -------------------------------
 -- Logs Table
@@ -47,7 +51,8 @@ CREATE TABLE logs (
     SYS_UPDATE_DATE_TIME TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     LOG_LEVEL           ENUM('INFO','WARN','ERROR') NOT NULL,
     LOG_MESSAGE         TEXT NOT NULL,
-    SOURCE_MODULE       VARCHAR(100) NULL
+    SOURCE_MODULE       VARCHAR(100) NULL,
+    INDEX IDX_LOGS_CREATED (SYS_CREATE_DATE_TIME)
 );
 
 CREATE TABLE MS01_REQUEST_RESPONSE_LOG (
@@ -55,11 +60,90 @@ CREATE TABLE MS01_REQUEST_RESPONSE_LOG (
     log_level VARCHAR(20) NOT NULL,         -- e.g. INFO, ERROR
     message VARCHAR(255) NOT NULL,          -- short description
     module VARCHAR(100) NOT NULL,           -- e.g. 'mstock_auth_api_cli'
-    request TEXT,                           -- request payload (JSON/string)
-    response TEXT,                          -- response payload (JSON/string)
+    request TEXT,                           -- request payload (JSON), NULL when compressed
+    response TEXT,                          -- response payload (JSON), NULL when compressed
     api_name VARCHAR(100),
     SYS_CREATE_DATE_TIME TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    LOGIN_SEQ_ID VARCHAR(20)
+    LOGIN_SEQ_ID VARCHAR(20),
+    STATUS VARCHAR(20),                     -- success / failure, from the payload or log level
+    USER_ID VARCHAR(100),
+    HTTP_STATUS SMALLINT,
+    PAYLOAD_CODEC VARCHAR(10),              -- zlib / zstd when PAYLOAD is used
+    PAYLOAD MEDIUMBLOB,                     -- compressed {"request": ..., "response": ...}
+    INDEX IDX_MS01_RRL_LOGIN_SEQ_ID (LOGIN_SEQ_ID),  -- all rows of one login flow share an ID
+    INDEX IDX_MS01_RRL_CREATED (SYS_CREATE_DATE_TIME),
+    INDEX IDX_MS01_RRL_STATUS_CREATED (STATUS, SYS_CREATE_DATE_TIME),
+    INDEX IDX_MS01_RRL_USER_CREATED (USER_ID, SYS_CREATE_DATE_TIME),
+    INDEX IDX_MS01_RRL_HTTP_STATUS_CREATED (HTTP_STATUS, SYS_CREATE_DATE_TIME)
+);
+
+
+-- -------------------------------
+-- Holdings Tables (migration 0006)
+-- -------------------------------
+-- Written by src/holdings.py: one row per (account, exchange, symbol), plus one
+-- hash per account so an unchanged account is skipped by the next sync.
+
+CREATE TABLE holdings (
+    HOLDING_ID              BIGINT AUTO_INCREMENT PRIMARY KEY,
+    SYS_CREATE_DATE_TIME    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    SYS_UPDATE_DATE_TIME    TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    M_STOCK_USER_ID         VARCHAR(100) NOT NULL,
+    EXCHANGE                VARCHAR(10) NOT NULL,
+    SYMBOL                  VARCHAR(50) NOT NULL,
+    ISIN                    VARCHAR(20),
+    PRODUCT                 VARCHAR(10),
+    QUANTITY                DECIMAL(18,4) NOT NULL,
+    AVERAGE_PRICE           DECIMAL(18,4),
+    LAST_PRICE              DECIMAL(18,4),
+    CLOSE_PRICE             DECIMAL(18,4),
+    ROW_HASH                CHAR(16) NOT NULL,                 -- hash of the broker row, skips unchanged rows
+    UNIQUE INDEX UQ_HOLDINGS_USER_SYMBOL (M_STOCK_USER_ID, EXCHANGE, SYMBOL),
+    INDEX IDX_HOLDINGS_SYMBOL (SYMBOL)
+);
+
+DROP TABLE IF EXISTS holdings_sync;
+
+CREATE TABLE holdings_sync (
+    M_STOCK_USER_ID         VARCHAR(100) PRIMARY KEY,
+    HOLDINGS_HASH           CHAR(32) NOT NULL,                 -- hash of the account's whole holdings list
+    ROW_COUNT               INT NOT NULL,
+    LAST_CHANGE_DATE        TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+
+-- -------------------------------
+-- Orders Table (migration 0007)
+-- -------------------------------
+-- Filled asynchronously from the local order journal (src/orders.py);
+-- IDEMPOTENCY_KEY is the client's key for the order.
+
+CREATE TABLE orders (
+    ORDER_SEQ_ID            BIGINT AUTO_INCREMENT PRIMARY KEY,
+    SYS_CREATE_DATE_TIME    TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    SYS_UPDATE_DATE_TIME    TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    IDEMPOTENCY_KEY         VARCHAR(64) NOT NULL,
+    M_STOCK_USER_ID         VARCHAR(100) NOT NULL,
+    EXCHANGE                VARCHAR(10) NOT NULL,
+    SYMBOL                  VARCHAR(50) NOT NULL,
+    TRANSACTION_TYPE        VARCHAR(4) NOT NULL,                -- BUY / SELL
+    ORDER_TYPE              VARCHAR(10) NOT NULL,               -- MARKET / LIMIT / SL / SL-M
+    PRODUCT                 VARCHAR(10) NOT NULL,
+    VALIDITY                VARCHAR(10) NOT NULL,
+    QUANTITY                INT NOT NULL,
+    PRICE                   DECIMAL(18,4),
+    TRIGGER_PRICE           DECIMAL(18,4),
+    STATUS                  VARCHAR(20) NOT NULL,               -- pending / accepted / rejected / unknown
+    BROKER_ORDER_ID         VARCHAR(50),
+    MESSAGE                 VARCHAR(255),
+    HTTP_STATUS             SMALLINT,
+    SUBMITTED_AT            DATETIME(3),
+    RESPONDED_AT            DATETIME(3),
+    WIRE_MS                 DECIMAL(10,3),                      -- submit() to request sent
+    LATENCY_MS              DECIMAL(10,3),                      -- submit() to broker response
+    UNIQUE INDEX UQ_ORDERS_IDEMPOTENCY_KEY (IDEMPOTENCY_KEY),
+    INDEX IDX_ORDERS_USER_SUBMITTED (M_STOCK_USER_ID, SUBMITTED_AT),
+    INDEX IDX_ORDERS_BROKER_ORDER_ID (BROKER_ORDER_ID)
 );
 
 
@@ -71,3 +155,14 @@ CREATE TABLE SEC01_ENCRYPTION_KEY (
     SYS_CREATE_DATE_TIME TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- -------------------------------
+-- Schema Version Table
+-- -------------------------------
+-- Tracks numbered migrations in schema/migrations (applied by src/db_migrate.py).
+-- Fresh installs already contain the indexes; running the migrator once simply records them.
+
+CREATE TABLE IF NOT EXISTS SCHEMA_MIGRATIONS (
+    VERSION     INT PRIMARY KEY,
+    NAME        VARCHAR(255) NOT NULL,
+    APPLIED_AT  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
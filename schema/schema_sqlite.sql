@@ -0,0 +1,161 @@
+-- schema_sqlite.sql — SQLite port of schema.sql (DB_BACKEND=sqlite)
+-- Applied automatically by src/db_backend.py when the database file is new.
+-- Timestamps are stored as local-time text ('YYYY-MM-DD HH:MM:SS'), like MySQL TIMESTAMP output.
+
+-- -------------------------------
+-- Authentication Credential Table
+-- -------------------------------
+CREATE TABLE IF NOT EXISTS MS01_API_Authentication_Credential (
+    CUST_SEQ_ID             INTEGER PRIMARY KEY AUTOINCREMENT,
+    SYS_CREATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    SYS_UPDATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+
+    M_STOCK_USER_ID         TEXT NOT NULL,
+    M_STOCK_PASSWORD        TEXT NOT NULL,
+    M_STOCK_API_KEY         TEXT NOT NULL,
+    M_STOCK_API_KEY_TYPE    TEXT NOT NULL CHECK (M_STOCK_API_KEY_TYPE IN ('A','B')),
+    M_CLIENT_CODE           TEXT,
+    M_RESPONSE_USER_ID      TEXT,
+    M_RESPONSE_USER_NAME    TEXT,
+    M_ACCESS_TOKEN          TEXT,
+    M_PUBLIC_TOKEN          TEXT,
+    M_REFRESH_TOKEN         TEXT,
+    M_ENC_TOKEN             TEXT,
+    LAST_LOGIN_DATE         TEXT,
+    LAST_LOGOUT_DATE        TEXT,
+    ENCRYPTION_KEY_ID       TEXT,
+    M_STOCK_OTP             TEXT,
+    M_STOCK_REQUEST_TOKEN   TEXT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS UQ_MS01_AAC_USER_ID ON MS01_API_Authentication_Credential (M_STOCK_USER_ID);
+CREATE INDEX IF NOT EXISTS IDX_MS01_AAC_UPDATED ON MS01_API_Authentication_Credential (SYS_UPDATE_DATE_TIME);
+
+-- Emulates MySQL's ON UPDATE CURRENT_TIMESTAMP when the statement doesn't set the column itself
+CREATE TRIGGER IF NOT EXISTS TRG_MS01_AAC_UPDATED
+AFTER UPDATE ON MS01_API_Authentication_Credential
+FOR EACH ROW WHEN NEW.SYS_UPDATE_DATE_TIME IS OLD.SYS_UPDATE_DATE_TIME
+BEGIN
+    UPDATE MS01_API_Authentication_Credential
+    SET SYS_UPDATE_DATE_TIME = datetime('now','localtime')
+    WHERE CUST_SEQ_ID = NEW.CUST_SEQ_ID;
+END;
+
+-- -------------------------------
+-- Logs Table
+-- -------------------------------
+CREATE TABLE IF NOT EXISTS logs (
+    LOG_ID                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    SYS_CREATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    SYS_UPDATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    LOG_LEVEL               TEXT NOT NULL CHECK (LOG_LEVEL IN ('INFO','WARN','ERROR')),
+    LOG_MESSAGE             TEXT NOT NULL,
+    SOURCE_MODULE           TEXT
+);
+
+CREATE INDEX IF NOT EXISTS IDX_LOGS_CREATED ON logs (SYS_CREATE_DATE_TIME);
+
+-- -------------------------------
+-- Request / Response Log Table
+-- -------------------------------
+CREATE TABLE IF NOT EXISTS MS01_REQUEST_RESPONSE_LOG (
+    id                      INTEGER PRIMARY KEY AUTOINCREMENT,
+    log_level               TEXT NOT NULL,
+    message                 TEXT NOT NULL,
+    module                  TEXT NOT NULL,
+    request                 TEXT,
+    response                TEXT,
+    api_name                TEXT,
+    SYS_CREATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    LOGIN_SEQ_ID            TEXT,
+    STATUS                  TEXT,
+    USER_ID                 TEXT,
+    HTTP_STATUS             INTEGER,
+    PAYLOAD_CODEC           TEXT,
+    PAYLOAD                 BLOB
+);
+
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_LOGIN_SEQ_ID ON MS01_REQUEST_RESPONSE_LOG (LOGIN_SEQ_ID);
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_CREATED ON MS01_REQUEST_RESPONSE_LOG (SYS_CREATE_DATE_TIME);
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_STATUS_CREATED ON MS01_REQUEST_RESPONSE_LOG (STATUS, SYS_CREATE_DATE_TIME);
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_USER_CREATED ON MS01_REQUEST_RESPONSE_LOG (USER_ID, SYS_CREATE_DATE_TIME);
+CREATE INDEX IF NOT EXISTS IDX_MS01_RRL_HTTP_STATUS_CREATED ON MS01_REQUEST_RESPONSE_LOG (HTTP_STATUS, SYS_CREATE_DATE_TIME);
+
+-- -------------------------------
+-- Holdings Tables (migration 0006)
+-- -------------------------------
+CREATE TABLE IF NOT EXISTS holdings (
+    HOLDING_ID              INTEGER PRIMARY KEY AUTOINCREMENT,
+    SYS_CREATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    SYS_UPDATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    M_STOCK_USER_ID         TEXT NOT NULL,
+    EXCHANGE                TEXT NOT NULL,
+    SYMBOL                  TEXT NOT NULL,
+    ISIN                    TEXT,
+    PRODUCT                 TEXT,
+    QUANTITY                REAL NOT NULL,
+    AVERAGE_PRICE           REAL,
+    LAST_PRICE              REAL,
+    CLOSE_PRICE             REAL,
+    ROW_HASH                TEXT NOT NULL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS UQ_HOLDINGS_USER_SYMBOL ON holdings (M_STOCK_USER_ID, EXCHANGE, SYMBOL);
+CREATE INDEX IF NOT EXISTS IDX_HOLDINGS_SYMBOL ON holdings (SYMBOL);
+
+CREATE TABLE IF NOT EXISTS holdings_sync (
+    M_STOCK_USER_ID         TEXT PRIMARY KEY,
+    HOLDINGS_HASH           TEXT NOT NULL,
+    ROW_COUNT               INTEGER NOT NULL,
+    LAST_CHANGE_DATE        TEXT DEFAULT (datetime('now','localtime'))
+);
+
+-- -------------------------------
+-- Orders Table (migration 0007)
+-- -------------------------------
+CREATE TABLE IF NOT EXISTS orders (
+    ORDER_SEQ_ID            INTEGER PRIMARY KEY AUTOINCREMENT,
+    SYS_CREATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    SYS_UPDATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime')),
+    IDEMPOTENCY_KEY         TEXT NOT NULL,
+    M_STOCK_USER_ID         TEXT NOT NULL,
+    EXCHANGE                TEXT NOT NULL,
+    SYMBOL                  TEXT NOT NULL,
+    TRANSACTION_TYPE        TEXT NOT NULL,
+    ORDER_TYPE              TEXT NOT NULL,
+    PRODUCT                 TEXT NOT NULL,
+    VALIDITY                TEXT NOT NULL,
+    QUANTITY                INTEGER NOT NULL,
+    PRICE                   REAL,
+    TRIGGER_PRICE           REAL,
+    STATUS                  TEXT NOT NULL,
+    BROKER_ORDER_ID         TEXT,
+    MESSAGE                 TEXT,
+    HTTP_STATUS             INTEGER,
+    SUBMITTED_AT            TEXT,
+    RESPONDED_AT            TEXT,
+    WIRE_MS                 REAL,
+    LATENCY_MS              REAL
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS UQ_ORDERS_IDEMPOTENCY_KEY ON orders (IDEMPOTENCY_KEY);
+CREATE INDEX IF NOT EXISTS IDX_ORDERS_USER_SUBMITTED ON orders (M_STOCK_USER_ID, SUBMITTED_AT);
+CREATE INDEX IF NOT EXISTS IDX_ORDERS_BROKER_ORDER_ID ON orders (BROKER_ORDER_ID);
+
+-- -------------------------------
+-- Encryption Key Table
+-- -------------------------------
+CREATE TABLE IF NOT EXISTS SEC01_ENCRYPTION_KEY (
+    KEY_ID                  INTEGER PRIMARY KEY AUTOINCREMENT,
+    ENCRYPTION_KEY          TEXT NOT NULL,
+    SYS_CREATE_DATE_TIME    TEXT DEFAULT (datetime('now','localtime'))
+);
+
+-- -------------------------------
+-- Schema Version Table
+-- -------------------------------
+CREATE TABLE IF NOT EXISTS SCHEMA_MIGRATIONS (
+    VERSION     INTEGER PRIMARY KEY,
+    NAME        TEXT NOT NULL,
+    APPLIED_AT  TEXT DEFAULT (datetime('now','localtime'))
+);
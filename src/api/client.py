@@ -0,0 +1,135 @@
+"""
+Thin client for the resident service (src/api/service.py).
+Standard library only, so a CLI that hands its work to the service does not
+import requests, the DB driver or the mStock SDK.
+
+    service = client.connect()          # None when the service is not running (or SERVICE_ENABLED=0)
+    if service:
+        result = service.login(user_id)
+        if result["status"] == "otp_required":
+            result = service.submit_otp(result["login_seq_id"], otp)
+
+Settings (.env): SERVICE_URL (default http://127.0.0.1:8765), SERVICE_TOKEN,
+SERVICE_ENABLED (default on; 0 makes every CLI run in-process).
+"""
+
+import json
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from src.settings import get_settings
+
+DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class ServiceError(Exception):
+    """The service answered with an HTTP error; detail is its message"""
+
+    def __init__(self, status, detail):
+        super().__init__(f"{status}: {detail}")
+        self.status = status
+        self.detail = detail
+
+
+class ServiceClient:
+    def __init__(self, base_url=None, token=None, timeout=30.0):
+        settings = get_settings()
+        self.base_url = (base_url or settings.get("SERVICE_URL", DEFAULT_URL)).rstrip("/")
+        self.token = token or settings.get("SERVICE_TOKEN")
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, timeout=None, text=False):
+        """Parsed JSON response (or the raw body with text=True); ServiceError on HTTP errors"""
+        data = None if body is None else json.dumps(body).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        req.add_header("Accept", "application/json")
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        if self.token:
+            req.add_header("X-Service-Token", self.token)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout or self.timeout) as response:
+                payload = response.read()
+                return payload.decode() if text else json.loads(payload or b"null")
+        except urllib.error.HTTPError as e:
+            try:
+                detail = json.loads(e.read()).get("detail", e.reason)
+            except ValueError:
+                detail = e.reason
+            raise ServiceError(e.code, detail) from None
+
+    def available(self):
+        try:
+            return self.request("GET", "/health", timeout=0.5).get("status") == "ok"
+        except (OSError, ValueError, ServiceError):
+            return False
+
+    # -------------------------------
+    # Operations
+    # -------------------------------
+
+    def login(self, user_id, force=False):
+        return self.request("POST", "/login", {"user_id": user_id, "force": force})
+
+    def submit_otp(self, login_seq_id, otp):
+        return self.request("POST", f"/login/{urllib.parse.quote(login_seq_id)}/otp", {"otp": otp})
+
+    def logout(self, user_id):
+        return self.request("POST", "/logout", {"user_id": user_id})
+
+    def session(self, user_id):
+        """Valid session dict, or None when a full login is needed"""
+        try:
+            return self.request("GET", f"/sessions/{urllib.parse.quote(user_id)}")
+        except ServiceError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    def users(self):
+        return self.request("GET", "/users")["users"]
+
+    def add_user(self, user_id, password, api_key, api_key_type="A"):
+        return self.request("POST", "/users", {"user_id": user_id, "password": password,
+                                               "api_key": api_key, "api_key_type": api_key_type})
+
+    def update_user(self, user_id, password=None, api_key=None, api_key_type=None):
+        return self.request("PATCH", f"/users/{urllib.parse.quote(user_id)}",
+                            {"password": password, "api_key": api_key, "api_key_type": api_key_type})
+
+    def delete_user(self, user_id):
+        return self.request("DELETE", f"/users/{urllib.parse.quote(user_id)}")
+
+    def fund_summary(self, user_id):
+        return self.request("GET", f"/users/{urllib.parse.quote(user_id)}/funds")
+
+    def sync_holdings(self, user_ids=None, force=False):
+        return self.request("POST", "/holdings/sync", {"user_ids": user_ids, "force": force})
+
+    def portfolio(self, by="sector", top=20):
+        """{"summary", "by", "exposure": [[label, exposure], ...]} from the service's in-memory view"""
+        return self.request("GET", f"/portfolio?by={urllib.parse.quote(by)}&top={int(top)}")
+
+    def place_order(self, user_id, symbol, side, quantity, **options):
+        """options: order_type, price, trigger_price, product, exchange, validity, idempotency_key"""
+        return self.request("POST", "/orders", dict(options, user_id=user_id, symbol=symbol, side=side,
+                                                    quantity=quantity))
+
+    def order(self, idempotency_key):
+        return self.request("GET", f"/orders/{urllib.parse.quote(idempotency_key)}")
+
+    def metrics(self):
+        """Prometheus text from the service's registry"""
+        return self.request("GET", "/metrics", text=True)
+
+    def metrics_snapshot(self):
+        return self.request("GET", "/metrics?format=json")
+
+
+def connect(base_url=None):
+    """A client for the running service, or None (the caller then works in-process)"""
+    if not get_settings().flag("SERVICE_ENABLED", True):
+        return None
+    service = ServiceClient(base_url)
+    return service if service.available() else None
@@ -0,0 +1,365 @@
+"""
+Resident auth/session service.
+One long-running process keeps the DB pool, the encryption keyring, the
+keep-alive mStock HTTP session and the session cache warm, and serves login,
+logout, session lookup, user CRUD and fund summary over local HTTP. The CLIs
+talk to it through src/api/client.py when it is running, so an operation costs
+a local round trip instead of a process cold start.
+
+    python -m src.api.service            # uvicorn on SERVICE_HOST:SERVICE_PORT
+
+    GET    /health
+    POST   /login                          {"user_id", "force"}  -> reused session or "otp_required"
+    POST   /login/{login_seq_id}/otp       {"otp"}               -> completes the login
+    POST   /logout                         {"user_id"}
+    GET    /sessions/{user_id}
+    GET    /users                          POST /users
+    PATCH  /users/{user_id}                DELETE /users/{user_id}
+    GET    /users/{user_id}/funds
+    POST   /holdings/sync                  {"user_ids", "force"} -> sync report
+    GET    /portfolio                      ?by=sector|symbol|account&top=20 exposure
+    POST   /orders                         {"user_id", "symbol", "side", "quantity", ...} -> order record
+    GET    /orders/{idempotency_key}
+    GET    /metrics                        Prometheus text (?format=json for a snapshot)
+
+Settings (.env): SERVICE_HOST (default 127.0.0.1), SERVICE_PORT (8765),
+SERVICE_TOKEN (when set, every request needs the X-Service-Token header),
+SERVICE_ORDERS_ENABLED (default: on when SERVICE_TOKEN is set; the order
+routes are never served without a token),
+SERVICE_OTP_TIMEOUT (seconds a started login waits for its OTP, default 300),
+TOKEN_REFRESH_ENABLED (default on: stored sessions are renewed in the
+background before they expire, see src/token_refresher.py). Orders go
+through the local journal and are replicated to the orders table (see
+src/orders.py for the ORDER_* settings).
+"""
+
+import secrets
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+
+import config
+from src import auth, db, holdings, metrics, orders
+from src import mstock_auth_api_cli as cli
+from src import token_refresher
+from src.session_manager import sessions
+from src.settings import get_settings
+
+settings = get_settings()
+
+MODULE = "api_service"
+
+
+# -------------------------------
+# Request Bodies
+# -------------------------------
+
+class LoginBody(BaseModel):
+    user_id: str
+    force: bool = False
+
+class OrderBody(BaseModel):
+    user_id: str
+    symbol: str
+    side: str
+    quantity: int
+    order_type: str = "MARKET"
+    price: Optional[float] = None
+    trigger_price: Optional[float] = None
+    product: str = "CNC"
+    exchange: str = "NSE"
+    validity: str = "DAY"
+    idempotency_key: Optional[str] = None
+
+class OtpBody(BaseModel):
+    otp: str
+
+class LogoutBody(BaseModel):
+    user_id: str
+
+class UserCreate(BaseModel):
+    user_id: str
+    password: str
+    api_key: str
+    api_key_type: str = "A"
+
+class UserUpdate(BaseModel):
+    password: Optional[str] = None
+    api_key: Optional[str] = None
+    api_key_type: Optional[str] = None
+
+class HoldingsSyncBody(BaseModel):
+    user_ids: Optional[List[str]] = None
+    force: bool = False
+
+
+# -------------------------------
+# Pending Logins
+# -------------------------------
+
+class PendingLogins:
+    """
+    Logins waiting for their OTP, keyed by login_seq_id. The CLI context
+    (credentials, MConnect object, unit of work) stays in memory between the
+    two requests; logins whose OTP never arrives are recorded as abandoned.
+    """
+
+    def __init__(self, timeout=300.0):
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._pending = {}    # login_seq_id -> (deadline, context)
+
+    def add(self, context):
+        with self._lock:
+            self._pending[context["login_seq_id"]] = (time.monotonic() + self.timeout, context)
+
+    def pop(self, login_seq_id):
+        with self._lock:
+            entry = self._pending.pop(login_seq_id, None)
+        return entry[1] if entry else None
+
+    def expire(self, now=None):
+        """Abandon logins past their deadline; returns how many were dropped"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expired = [seq_id for seq_id, (deadline, _) in self._pending.items() if deadline <= now]
+            contexts = [self._pending.pop(seq_id)[1] for seq_id in expired]
+        for context in contexts:
+            cli.abandon_login(context, f"No OTP within {self.timeout:.0f}s")
+        return len(contexts)
+
+    def abandon_all(self, reason):
+        with self._lock:
+            contexts = [context for _, context in self._pending.values()]
+            self._pending.clear()
+        for context in contexts:
+            cli.abandon_login(context, reason)
+
+    def __len__(self):
+        return len(self._pending)
+
+
+# -------------------------------
+# Helpers
+# -------------------------------
+
+def warm_up():
+    """Open a pooled DB connection, load the active key and the HTTP session before the first request"""
+    started = time.perf_counter()
+    try:
+        conn = db.get_connection()
+        conn.close()
+        config.keyring.active_key_id()
+        auth.api_client()._get_session()
+    except Exception as e:
+        print(f"⚠️ Warm-up incomplete: {e}")
+    return time.perf_counter() - started
+
+def _check_token(x_service_token: Optional[str] = Header(default=None)):
+    expected = settings.get("SERVICE_TOKEN")
+    if expected and not secrets.compare_digest(x_service_token or "", expected):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Service-Token")
+
+def _orders_enabled():
+    """Order routes place real orders, so they are only served behind SERVICE_TOKEN"""
+    token = settings.get("SERVICE_TOKEN")
+    enabled = settings.flag("SERVICE_ORDERS_ENABLED", bool(token))
+    if enabled and not token:
+        raise RuntimeError("SERVICE_ORDERS_ENABLED needs SERVICE_TOKEN: order routes are not served without it")
+    return enabled
+
+def _public_session(session):
+    """Session dict without the refresh token"""
+    return {key: session.get(key) for key in ("user_id", "api_key", "access_token", "login_time",
+                                              "expires_at", "source")}
+
+
+# -------------------------------
+# App
+# -------------------------------
+
+def create_app(pending: PendingLogins = None) -> FastAPI:
+    pending = pending or PendingLogins(settings.get("SERVICE_OTP_TIMEOUT", 300.0, float))
+    serve_orders = _orders_enabled()
+
+    @asynccontextmanager
+    async def lifespan(app):
+        app.state.warm_up_seconds = warm_up()
+        try:
+            app.state.holdings.load()
+        except Exception as e:
+            print(f"⚠️ Stored holdings not loaded (run python -m src.db_migrate): {e}")
+        app.state.refresher = None
+        if settings.flag("TOKEN_REFRESH_ENABLED", True):
+            app.state.refresher = token_refresher.from_settings().start()
+        app.state.orders = orders.from_settings() if serve_orders else None
+        yield
+        if app.state.orders is not None:
+            app.state.orders.close()
+        if app.state.refresher is not None:
+            app.state.refresher.stop()
+        pending.abandon_all("Service stopped before the OTP arrived")
+        db.flush_logs()
+
+    app = FastAPI(title="mStock auth service", lifespan=lifespan, dependencies=[Depends(_check_token)])
+    app.state.pending = pending
+    app.state.holdings = holdings.from_settings()
+    app.state.started_at = time.time()
+
+    # Plain `def` endpoints: FastAPI runs them in its worker threads, which
+    # suits the blocking DB / broker calls underneath.
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", "uptime_seconds": round(time.time() - app.state.started_at, 1),
+                "pending_logins": len(pending), "db_pool": db.pool_stats(), "sessions": sessions.stats(),
+                "http_client": {k: v for k, v in auth.api_client().stats().items() if k != "endpoints"},
+                "token_refresher": app.state.refresher.stats() if app.state.refresher else None,
+                "orders": app.state.orders.stats() if app.state.orders else None}
+
+    @app.get("/metrics")
+    def scrape(format: str = "prometheus"):
+        if format == "json":
+            return metrics.snapshot()
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+    # ---- Login / Logout ----
+
+    @app.post("/login")
+    def login(body: LoginBody):
+        pending.expire()
+        if not body.force:
+            reused = cli.reuse_session(body.user_id)
+            if reused:
+                return reused
+        context, failure = cli.start_login(body.user_id)
+        if failure:
+            if failure["reason"] == "User not found in DB":
+                raise HTTPException(status_code=404, detail=failure["reason"])
+            return failure
+        pending.add(context)
+        return {"status": "otp_required", "message": "OTP sent; POST it to /login/{login_seq_id}/otp",
+                "login_seq_id": context["login_seq_id"]}
+
+    @app.post("/login/{login_seq_id}/otp")
+    def submit_otp(login_seq_id: str, body: OtpBody):
+        pending.expire()
+        context = pending.pop(login_seq_id)
+        if context is None:
+            raise HTTPException(status_code=404, detail=f"No pending login {login_seq_id} (expired or completed)")
+        return cli.complete_login(context, body.otp.strip())
+
+    @app.post("/logout")
+    def logout(body: LogoutBody):
+        return cli.logout(body.user_id)
+
+    @app.get("/sessions/{user_id}")
+    def session(user_id: str):
+        found = sessions.get_session(user_id)
+        if not found:
+            raise HTTPException(status_code=404, detail="No valid session; log in first")
+        return _public_session(found)
+
+    # ---- Users ----
+
+    @app.get("/users")
+    def list_users():
+        return {"users": db.get_all_users()}
+
+    @app.post("/users", status_code=201)
+    def add_user(body: UserCreate):
+        if db.fetch_one("SELECT 1 AS FOUND FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID = %s",
+                        (body.user_id,)):
+            raise HTTPException(status_code=409, detail=f"User {body.user_id} already exists")
+        db.insert_credential(body.user_id, body.password, body.api_key, body.api_key_type.upper())
+        db.insert_log("INFO", f"User {body.user_id} added", MODULE)
+        return {"status": "success", "message": f"User {body.user_id} added"}
+
+    @app.patch("/users/{user_id}")
+    def update_user(user_id: str, body: UserUpdate):
+        if not db.get_user_credentials(user_id):
+            raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+        db.update_credential(user_id, password=body.password, api_key=body.api_key,
+                             api_key_type=body.api_key_type.upper() if body.api_key_type else None)
+        db.insert_log("INFO", f"User {user_id} updated", MODULE)
+        return {"status": "success", "message": f"User {user_id} updated"}
+
+    @app.delete("/users/{user_id}")
+    def delete_user(user_id: str):
+        if not db.get_user_credentials(user_id):
+            raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+        sessions.invalidate(user_id, persist=False)
+        db.delete_credential(user_id)
+        app.state.holdings.forget(user_id)
+        db.insert_log("INFO", f"User {user_id} deleted", MODULE)
+        return {"status": "success", "message": f"User {user_id} deleted"}
+
+    @app.get("/users/{user_id}/funds")
+    def fund_summary(user_id: str):
+        found = sessions.get_session(user_id)
+        if not found:
+            raise HTTPException(status_code=401, detail="No valid session; log in first")
+        try:
+            return auth.get_fund_summary(found["api_key"], found["access_token"])
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+    # ---- Holdings ----
+
+    @app.post("/holdings/sync")
+    def sync_holdings(body: HoldingsSyncBody):
+        return app.state.holdings.sync(body.user_ids, force=body.force)
+
+    @app.get("/portfolio")
+    def portfolio(by: str = "sector", top: int = 20):
+        if by not in holdings.PortfolioView.KEYS:
+            raise HTTPException(status_code=400, detail=f"by must be one of {', '.join(holdings.PortfolioView.KEYS)}")
+        view = app.state.holdings.view
+        return {"summary": view.summary(), "by": by, "exposure": view.top(by, top)}
+
+    if not serve_orders:
+        return app
+
+    # ---- Orders ----
+
+    @app.post("/orders", status_code=201)
+    def place_order(body: OrderBody):
+        router = app.state.orders
+        try:
+            return router.submit(router.prepare(
+                body.user_id, body.symbol, body.side, body.quantity, order_type=body.order_type, price=body.price,
+                trigger_price=body.trigger_price, product=body.product, exchange=body.exchange,
+                validity=body.validity, idempotency_key=body.idempotency_key))
+        except orders.OrderError as e:
+            raise HTTPException(status_code=e.status, detail=str(e))
+
+    @app.get("/orders/{idempotency_key}")
+    def order(idempotency_key: str):
+        found = app.state.orders.get(idempotency_key)
+        if found is None:
+            raise HTTPException(status_code=404, detail=f"No order with idempotency key {idempotency_key}")
+        return found
+
+    return app
+
+
+def serve(host=None, port=None):
+    import uvicorn
+    uvicorn.run(create_app(),
+                host=host or settings.get("SERVICE_HOST", "127.0.0.1"),
+                port=port or settings.get("SERVICE_PORT", 8765, int),
+                log_level="warning")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Resident mStock auth/session service")
+    parser.add_argument("--host", help="default SERVICE_HOST or 127.0.0.1")
+    parser.add_argument("--port", type=int, help="default SERVICE_PORT or 8765")
+    args = parser.parse_args()
+    serve(args.host, args.port)
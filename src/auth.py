@@ -1,32 +1,37 @@
-import os
-import requests
 import hashlib
-from dotenv import load_dotenv
 from src import db
+from src.http_client import get_client
+from src.response_cache import cache
+from src.settings import get_settings
 
-load_dotenv()
+settings = get_settings()
+
+DEFAULT_BASE_URL = "https://api.mstock.trade/openapi/typea"
+
+
+def api_client():
+    """
+    Shared client for MSTOCK_BASE_URL (e.g. src/loadtest/fake_server.py), looked
+    up on every call so a changed URL takes effect; get_client() keeps one per URL.
+    """
+    return get_client(settings.get("MSTOCK_BASE_URL", DEFAULT_BASE_URL))
 
-BASE_URL = "https://api.mstock.trade/openapi/typea"
 
 # -------------------------------
 # Step 1: Login
 # -------------------------------
-def login(user_id):
+def login(user_id, password=None, uow=None):
     """
     Login to mStock API using username/password.
-    Stores OTP + request_token in DB.
+    Stores OTP + request_token in DB; pass a db.LoginUnitOfWork to defer the
+    write to the caller's single commit.
     """
-    url = f"{BASE_URL}/connect/login"
-    headers = {
-        'X-Mirae-Version': '1',
-        'Content-Type': 'application/x-www-form-urlencoded',
-    }
     data = {
-        'username': os.getenv("M_STOCK_USER_ID"),
-        'password': os.getenv("M_STOCK_PASSWORD"),
+        'username': user_id or settings.get("M_STOCK_USER_ID"),
+        'password': password or settings.get("M_STOCK_PASSWORD"),
     }
 
-    response = requests.post(url, headers=headers, data=data)
+    response = api_client().post("/connect/login", data=data)
     if response.status_code != 200:
         raise Exception(f"Login failed: {response.status_code} {response.text}")
 
@@ -35,82 +40,85 @@ def login(user_id):
     request_token = result.get("request_token")
 
     # Save OTP + request_token in DB
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE MS01_API_Authentication_Credential
-        SET M_STOCK_OTP = %s,
-            M_STOCK_REQUEST_TOKEN = %s,
-            SYS_UPDATE_DATE_TIME = CURRENT_TIMESTAMP
-        WHERE M_STOCK_USER_ID = %s
-    """, (otp, request_token, user_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-    db.insert_log("INFO", f"Login successful for {user_id}", "auth_api")
+    work = uow or db.LoginUnitOfWork(user_id, "auth_api")
+    work.set_login_request(otp, request_token)
+    work.log("INFO", f"Login successful for {user_id}")
+    if uow is None:
+        _commit_or_raise(work)
     return otp, request_token
 
 # -------------------------------
 # Step 2: Generate Session
 # -------------------------------
-def generate_session(user_id, api_key, request_token, secret_key):
+def generate_session(user_id, api_key, request_token, secret_key, uow=None):
     """
     Generate session token using api_key + request_token + checksum.
-    Stores access_token in DB.
+    Stores access_token in DB (or in uow, committed by the caller).
     """
     checksum = hashlib.sha256((api_key + request_token + secret_key).encode()).hexdigest()
 
-    url = f"{BASE_URL}/session/token"
-    headers = {
-        'X-Mirae-Version': '1',
-        'Content-Type': 'application/x-www-form-urlencoded',
-    }
     data = {
         'api_key': api_key,
         'request_token': request_token,
         'checksum': checksum,
     }
 
-    response = requests.post(url, headers=headers, data=data)
+    response = api_client().post("/session/token", data=data)
     if response.status_code != 200:
         raise Exception(f"Session generation failed: {response.status_code} {response.text}")
 
     result = response.json()
-    access_token = result.get("access_token")
-
-    # Save access_token in DB
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        UPDATE MS01_API_Authentication_Credential
-        SET M_STOCK_ACCESS_TOKEN = %s,
-            SYS_UPDATE_DATE_TIME = CURRENT_TIMESTAMP
-        WHERE M_STOCK_USER_ID = %s
-    """, (access_token, user_id))
-    conn.commit()
-    cursor.close()
-    conn.close()
-
-    db.insert_log("INFO", f"Session generated for {user_id}", "auth_api")
+    session_data = dict(result.get("data") or {})
+    access_token = result.get("access_token") or session_data.get("access_token")
+    session_data["access_token"] = access_token
+
+    # Save access_token (and the other session fields) in DB
+    work = uow or db.LoginUnitOfWork(user_id, "auth_api")
+    work.set_session({}, {"data": session_data})
+    work.log("INFO", f"Session generated for {user_id}")
+    if uow is None:
+        _commit_or_raise(work)
     return access_token
 
+def _commit_or_raise(uow):
+    outcome = uow.commit()
+    if not outcome["committed"]:
+        raise Exception(f"Saving login state failed: {outcome['error']}")
+    return outcome
+
+# -------------------------------
+# Step 2b: Renew Session
+# -------------------------------
+def renew_session(api_key, refresh_token, secret_key=""):
+    """
+    Exchange a refresh_token for a new access_token without OTP.
+    Returns the session JSON ({"data": {"access_token", "refresh_token", ...}}).
+    """
+    checksum = hashlib.sha256((api_key + refresh_token + secret_key).encode()).hexdigest()
+
+    data = {
+        'api_key': api_key,
+        'refresh_token': refresh_token,
+        'checksum': checksum,
+    }
+
+    response = api_client().post("/session/refresh_token", data=data)
+    if response.status_code != 200:
+        raise Exception(f"Session renewal failed: {response.status_code} {response.text}")
+
+    return response.json()
+
 # -------------------------------
 # Step 3: Verify TOTP (if enabled)
 # -------------------------------
 def verify_totp(api_key, otp, access_token):
-    url = f"{BASE_URL}/session/verifytotp"
-    headers = {
-        'X-Mirae-Version': '1',
-        'Content-Type': 'application/x-www-form-urlencoded',
-    }
     data = {
         'api_key': api_key,
         'otp': otp,
         'access_token': access_token,
     }
 
-    response = requests.post(url, headers=headers, data=data)
+    response = api_client().post("/session/verifytotp", data=data)
     if response.status_code != 200:
         raise Exception(f"TOTP verification failed: {response.status_code} {response.text}")
 
@@ -120,31 +128,61 @@ def verify_totp(api_key, otp, access_token):
 # Step 4: Fund Summary
 # -------------------------------
 def get_fund_summary(api_key, access_token):
-    url = f"{BASE_URL}/user/fundsummary"
-    headers = {
-        'X-Mirae-Version': '1',
-        'Authorization': f"token {api_key}:{access_token}",
-    }
+    """Served from the read-through cache; concurrent callers share one request"""
+    def fetch():
+        response = api_client().get("/user/fundsummary", auth=(api_key, access_token))
+        if response.status_code != 200:
+            raise Exception(f"Fund summary failed: {response.status_code} {response.text}")
+        return response.json()
 
-    response = requests.get(url, headers=headers)
-    if response.status_code != 200:
-        raise Exception(f"Fund summary failed: {response.status_code} {response.text}")
+    return cache.get_or_load("/user/fundsummary", api_key, None, fetch)
 
-    return response.json()
+def get_holdings(api_key, access_token):
+    """Demat holdings ({"data": [{"tradingsymbol", "exchange", "quantity", ...}]}), read-through cached"""
+    def fetch():
+        response = api_client().get("/portfolio/holdings", auth=(api_key, access_token))
+        if response.status_code != 200:
+            raise Exception(f"Holdings fetch failed: {response.status_code} {response.text}")
+        return response.json()
+
+    return cache.get_or_load("/portfolio/holdings", api_key, None, fetch)
 
 # -------------------------------
 # Step 5: Logout
 # -------------------------------
 def logout(api_key, access_token):
-    url = f"{BASE_URL}/logout"
-    headers = {
-        'X-Mirae-Version': '1',
-        'Authorization': f"token {api_key}:{access_token}",
-    }
-
-    response = requests.get(url, headers=headers)
+    cache.invalidate(api_key=api_key)
+    response = api_client().get("/logout", auth=(api_key, access_token))
     if response.status_code != 200:
         raise Exception(f"Logout failed: {response.status_code} {response.text}")
 
     db.insert_log("INFO", "User logged out", "auth_api")
-    return response.json()
\ No newline at end of file
+    return response.json()
+
+
+# -------------------------------
+# MConnect-compatible adapter
+# -------------------------------
+class AuthApiConnect:
+    """
+    Drop-in for tradingapi_a's MConnect in mstock_auth_api_cli (MSTOCK_CONNECT=http).
+    Talks to MSTOCK_BASE_URL through the shared client, so the CLI flow can run
+    against a local server or without the SDK installed.
+    """
+
+    def login(self, user_id, password):
+        response = api_client().post("/connect/login", data={'username': user_id, 'password': password})
+        if response.status_code != 200:
+            raise Exception(f"Login failed: {response.status_code} {response.text}")
+        return response.json()
+
+    def generate_session(self, api_key, request_token, secret_key):
+        checksum = hashlib.sha256((api_key + request_token + secret_key).encode()).hexdigest()
+        response = api_client().post("/session/token", data={
+            'api_key': api_key,
+            'request_token': request_token,
+            'checksum': checksum,
+        })
+        if response.status_code != 200:
+            raise Exception(f"Session generation failed: {response.status_code} {response.text}")
+        return response.json()
@@ -1,22 +1,167 @@
-import mysql.connector
-import os
-from dotenv import load_dotenv
+import re
+import threading
 import config   # <-- import config to use encrypt_str / decrypt_str
 import secrets
 import string
+import time
+from functools import lru_cache
+from src.db_backend import create_backend
+from src.db_pool import ConnectionPool
+from src import log_payload, metrics, tracing
+from src.log_writer import LogWriter
+from src.settings import get_settings
 
-# Load environment variables from .env
-load_dotenv()
+# .env is read once per process
+settings = get_settings()
+
+_backend = None
+_pool = None
+_pool_lock = threading.Lock()
+
+DB_CONNECTIONS_OPENED = metrics.counter("mstock_db_connections_opened_total",
+                                        "New DB connections opened (pool misses)", ("backend",))
+DB_QUERY_SECONDS = metrics.histogram("mstock_db_query_seconds",
+                                     "DB statement latency (execute/executemany)", ("statement",))
+DB_QUERY_ERRORS = metrics.counter("mstock_db_query_errors_total", "DB statements that raised", ("statement",))
+DB_POOL_CONNECTIONS = metrics.gauge("mstock_db_pool_connections", "Pooled DB connections by state", ("state",))
+LOG_QUEUE_DEPTH = metrics.gauge("mstock_log_queue_depth", "Log rows waiting for the background writer")
+
+def get_backend():
+    """Return the storage backend selected by DB_BACKEND (mysql or sqlite)"""
+    global _backend
+    if _backend is None:
+        with _pool_lock:
+            if _backend is None:
+                _backend = create_backend()
+    return _backend
+
+@lru_cache(maxsize=512)
+def _statement_label(sql):
+    """'SELECT MS01_API_Authentication_Credential': verb + first table, so the label set stays small"""
+    verb = sql.split(None, 1)[0].upper() if sql.strip() else "?"
+    match = re.search(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", sql, re.IGNORECASE)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+class _MeteredCursor:
+    """Driver cursor whose execute/executemany feed mstock_db_query_seconds"""
+    __slots__ = ("_cursor",)
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _timed(self, method, sql, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(sql, *args, **kwargs)
+        except Exception:
+            DB_QUERY_ERRORS.inc(statement=_statement_label(sql))
+            raise
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - started, statement=_statement_label(sql))
+
+    def execute(self, sql, *args, **kwargs):
+        return self._timed(self._cursor.execute, sql, *args, **kwargs)
+
+    def executemany(self, sql, *args, **kwargs):
+        return self._timed(self._cursor.executemany, sql, *args, **kwargs)
+
+
+class _MeteredConnection:
+    """Driver connection handing out metered cursors; everything else is delegated"""
+    __slots__ = ("_raw",)
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        return _MeteredCursor(self._raw.cursor(*args, **kwargs))
+
+
+def _connect():
+    """Open a brand-new connection on the active backend"""
+    backend = get_backend()
+    conn = backend.connect()
+    DB_CONNECTIONS_OPENED.inc(backend=backend.name)
+    return _MeteredConnection(conn) if metrics.registry.enabled else conn
+
+def get_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    _connect,
+                    size=settings.get("DB_POOL_SIZE", 5, int),
+                    timeout=settings.get("DB_POOL_TIMEOUT", 30.0, float),
+                    ping_after=settings.get("DB_POOL_PING_AFTER", 5.0, float),
+                    recycle=settings.get("DB_POOL_RECYCLE", 3600.0, float),
+                )
+                for state in ("idle", "in_use", "open"):
+                    DB_POOL_CONNECTIONS.set_function(lambda state=state, pool=_pool: pool.stats()[state],
+                                                     state=state)
+    return _pool
 
 def get_connection():
-    """Establish a connection to the MySQL database using .env values"""
-    return mysql.connector.connect(
-        host=os.getenv("DB_HOST", "localhost"),
-        user=os.getenv("DB_USER", "root"),
-        password=os.getenv("DB_PASSWORD", "root"),
-        database=os.getenv("DB_NAME", "mstock"),
-        port=int(os.getenv("DB_PORT", 3306))
-    )
+    """
+    Check out a pooled connection to the database (MySQL or SQLite, see DB_BACKEND).
+    conn.close() returns it to the pool instead of disconnecting.
+    """
+    return get_pool().checkout()
+
+def transaction():
+    """Context manager yielding a pooled connection; commits on success, rolls back on error"""
+    return get_pool().transaction()
+
+def pool_stats():
+    """Pool counters: checkouts, waits, connects, health-check failures, idle/in-use"""
+    return get_pool().stats()
+
+def _span(operation, statement=None, **attributes):
+    """Tracing span for one DB call; free when tracing is off (see src/tracing.py)"""
+    if not tracing.enabled():
+        return tracing.NOOP_SPAN
+    if statement:
+        attributes["db.statement"] = " ".join(statement.split())[:500]
+    return tracing.span(f"db.{operation}", **{"db.system": get_backend().name}, **attributes)
+
+# -------------------------------
+# Generic Query Helpers
+# -------------------------------
+
+def fetch_one(query, params=None):
+    """Run a SELECT and return the first row as a dict (or None)"""
+    with _span("fetch_one", query) as span:
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        cursor.execute(query, params or ())
+        row = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        span.set_attribute("db.rows", 0 if row is None else 1)
+    return row
+
+def fetch_all(query, params=None):
+    """Run a SELECT and return all rows as dicts"""
+    with _span("fetch_all", query) as span:
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(query, params or ())
+        rows = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        span.set_attribute("db.rows", len(rows))
+    return rows
 
 # -------------------------------
 # Credential Operations
@@ -24,19 +169,14 @@ def get_connection():
 
 def insert_credential(user_id, password, api_key, api_key_type="A"):
     """Insert a new credential record with encryption key tracking"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
     # Encrypt password before storing
     encrypted_password = config.encrypt_str(password)
 
-    # Get active key ID from .env or fallback to latest DB key
-    active_key_id = os.getenv("ENCRYPTION_KEY_ID")
-    if not active_key_id:
-        cursor.execute("SELECT KEY_ID FROM SEC01_ENCRYPTION_KEY ORDER BY KEY_ID DESC LIMIT 1")
-        row = cursor.fetchone()
-        active_key_id = row[0] if row else None
+    # Active key ID (from .env or latest DB key), served from the in-memory keyring
+    active_key_id = config.keyring.active_key_id()
 
+    conn = get_connection()
+    cursor = conn.cursor()
     cursor.execute("""
         INSERT INTO MS01_API_Authentication_Credential
         (M_STOCK_USER_ID, M_STOCK_PASSWORD, M_STOCK_API_KEY, M_STOCK_API_KEY_TYPE, ENCRYPTION_KEY_ID)
@@ -49,21 +189,14 @@ def insert_credential(user_id, password, api_key, api_key_type="A"):
 
 def update_credential(user_id, password=None, api_key=None, api_key_type=None):
     """Update static credential details (tokens are no longer stored here)"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
     # Encrypt password if provided
     encrypted_password = config.encrypt_str(password) if password else None
 
     # Get active key ID if password is updated
-    active_key_id = None
-    if password:
-        active_key_id = os.getenv("ENCRYPTION_KEY_ID")
-        if not active_key_id:
-            cursor.execute("SELECT KEY_ID FROM SEC01_ENCRYPTION_KEY ORDER BY KEY_ID DESC LIMIT 1")
-            row = cursor.fetchone()
-            active_key_id = row[0] if row else None
+    active_key_id = config.keyring.active_key_id() if password else None
 
+    conn = get_connection()
+    cursor = conn.cursor()
     cursor.execute("""
         UPDATE MS01_API_Authentication_Credential
         SET M_STOCK_PASSWORD = COALESCE(%s, M_STOCK_PASSWORD),
@@ -112,25 +245,28 @@ def get_user_credentials(user_id):
     """Fetch credentials for a specific user by ID.
     Returns both ciphertext and decrypted password for testing/debugging.
     """
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True, buffered=True)
-    cursor.execute("""
-        SELECT M_STOCK_USER_ID, M_STOCK_PASSWORD, M_STOCK_API_KEY, M_STOCK_API_KEY_TYPE, ENCRYPTION_KEY_ID
-        FROM MS01_API_Authentication_Credential
-        WHERE M_STOCK_USER_ID = %s
-    """, (user_id,))
-    user = cursor.fetchone()
-    cursor.close()
-    conn.close()
+    with _span("get_user_credentials", user_id=user_id) as span:
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True, buffered=True)
+        cursor.execute("""
+            SELECT M_STOCK_USER_ID, M_STOCK_PASSWORD, M_STOCK_API_KEY, M_STOCK_API_KEY_TYPE, ENCRYPTION_KEY_ID
+            FROM MS01_API_Authentication_Credential
+            WHERE M_STOCK_USER_ID = %s
+        """, (user_id,))
+        user = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        span.set_attribute("db.rows", 0 if user is None else 1)
 
     if user and user.get("M_STOCK_PASSWORD"):
         # Preserve ciphertext separately
         user["M_STOCK_PASSWORD_CIPHERTEXT"] = user["M_STOCK_PASSWORD"]
         try:
             # Add decrypted value separately
-            user["M_STOCK_PASSWORD_DECRYPTED"] = config.decrypt_str(
-                user["M_STOCK_PASSWORD"], user.get("ENCRYPTION_KEY_ID")
-            )
+            with tracing.span("crypto.decrypt", user_id=user_id):
+                user["M_STOCK_PASSWORD_DECRYPTED"] = config.decrypt_str(
+                    user["M_STOCK_PASSWORD"], user.get("ENCRYPTION_KEY_ID")
+                )
         except Exception:
             user["M_STOCK_PASSWORD_DECRYPTED"] = None
     return user
@@ -149,17 +285,67 @@ def get_all_users():
 # Logging Operations
 # -------------------------------
 
+_LOG_INSERT_SQL = """
+    INSERT INTO logs (LOG_LEVEL, LOG_MESSAGE, SOURCE_MODULE)
+    VALUES (%s, %s, %s)
+"""
+
+_REQUEST_RESPONSE_INSERT_SQL = """
+    INSERT INTO MS01_REQUEST_RESPONSE_LOG
+    (log_level, message, module, request, response, api_name, login_seq_id,
+     STATUS, USER_ID, HTTP_STATUS, PAYLOAD_CODEC, PAYLOAD)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def _request_response_params(log_level, message, module, request, response, api_name, login_seq_id,
+                             user_id=None, http_status=None, status=None):
+    """Row for _REQUEST_RESPONSE_INSERT_SQL: JSON or compressed payload plus hot columns"""
+    columns = log_payload.encode(request, response, log_level, user_id, http_status, status)
+    return (log_level, message, module, columns["request"], columns["response"], api_name, login_seq_id,
+            columns["status"], columns["user_id"], columns["http_status"],
+            columns["payload_codec"], columns["payload"])
+
+_log_writer = None
+
+def get_log_writer():
+    """Return the process-wide background log writer, creating it on first use"""
+    global _log_writer
+    if _log_writer is None:
+        with _pool_lock:
+            if _log_writer is None:
+                _log_writer = LogWriter(
+                    get_connection,
+                    batch_size=settings.get("LOG_BATCH_SIZE", 100, int),
+                    flush_interval=settings.get("LOG_FLUSH_INTERVAL", 0.5, float),
+                    max_queue=settings.get("LOG_QUEUE_SIZE", 10000, int),
+                    full_policy=settings.get("LOG_QUEUE_FULL_POLICY", "drop"),
+                    block_timeout=settings.get("LOG_QUEUE_BLOCK_TIMEOUT", 1.0, float),
+                    async_mode=settings.flag("LOG_ASYNC", True),
+                )
+                LOG_QUEUE_DEPTH.set_function(lambda writer=_log_writer: writer.stats()["queued"])
+    return _log_writer
+
+def reset():
+    """
+    Close the pool and log writer and forget the backend, so the next call
+    builds them from the current settings (tests switch DB_SQLITE_PATH this way).
+    """
+    global _backend, _pool, _log_writer
+    with _pool_lock:
+        writer, pool = _log_writer, _pool
+        _backend = _pool = _log_writer = None
+    if writer is not None:
+        writer.close()
+    if pool is not None:
+        pool.close_all()
+
+def flush_logs(timeout=5.0):
+    """Block until queued log rows are written (or timeout); returns False on timeout"""
+    return get_log_writer().flush(timeout)
+
 def insert_log(level, message, source_module=None):
-    """Insert a simple log entry into generic logs table"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO logs (LOG_LEVEL, LOG_MESSAGE, SOURCE_MODULE)
-        VALUES (%s, %s, %s)
-    """, (level, message, source_module))
-    conn.commit()
-    cursor.close()
-    conn.close()
+    """Queue a simple log entry for the generic logs table (written in background batches)"""
+    get_log_writer().write(_LOG_INSERT_SQL, (level, message, source_module))
 
 def insert_request_response_log(
     log_level,
@@ -168,119 +354,277 @@ def insert_request_response_log(
     request=None,
     response=None,
     api_name=None,
-    login_seq_id=None
+    login_seq_id=None,
+    user_id=None,
+    http_status=None,
+    status=None
 ):
     """
-    Insert a detailed request/response log entry into MS01_REQUEST_RESPONSE_LOG.
+    Queue a detailed request/response log entry for MS01_REQUEST_RESPONSE_LOG.
+    request/response may be dicts, JSON strings or plain text; they are stored
+    as JSON (compressed when large, see src/log_payload.py). user_id,
+    http_status and status default to values found in the payload.
     If login_seq_id is not provided, generate a new one.
+    Returns immediately; rows are written in background batches.
     """
-    try:
-        if not login_seq_id:
-            login_seq_id = generate_login_seq_id()
+    if not login_seq_id:
+        login_seq_id = generate_login_seq_id()
 
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO MS01_REQUEST_RESPONSE_LOG 
-            (log_level, message, module, request, response, api_name, login_seq_id) 
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (log_level, message, module, request, response, api_name, login_seq_id))
-        conn.commit()
-    except Exception as e:
-        try:
-            cursor.execute("""
-                INSERT INTO MS01_REQUEST_RESPONSE_LOG 
-                (log_level, message, module, request, response, api_name, login_seq_id) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, ("ERROR", f"Logging failed: {message}", module, request, str(e), api_name, login_seq_id))
-            conn.commit()
-        except Exception as inner_e:
-            print("Critical DB Logging Error:", inner_e)
-    finally:
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+    get_log_writer().write(
+        _REQUEST_RESPONSE_INSERT_SQL,
+        _request_response_params(log_level, message, module, request, response, api_name, login_seq_id,
+                                 user_id, http_status, status)
+    )
+
+def fetch_request_response_logs(login_seq_id=None, user_id=None, status=None, api_name=None,
+                                since=None, limit=100):
+    """
+    Newest-first MS01_REQUEST_RESPONSE_LOG rows matching every given filter,
+    with request/response decoded (decompressed) back into Python objects.
+    status / user_id / since use the indexed columns, e.g. failed sessions in
+    the last hour: fetch_request_response_logs(status="failure", since=datetime.now() - timedelta(hours=1))
+    """
+    filters, params = [], []
+    for column, value in (("LOGIN_SEQ_ID", login_seq_id), ("USER_ID", user_id),
+                          ("STATUS", status), ("api_name", api_name)):
+        if value is not None:
+            filters.append(f"{column} = %s")
+            params.append(value)
+    if since is not None:
+        filters.append("SYS_CREATE_DATE_TIME >= %s")
+        params.append(since)
+    where = f"WHERE {' AND '.join(filters)}" if filters else ""
+    rows = fetch_all(f"""
+        SELECT id, log_level, message, module, request, response, api_name, LOGIN_SEQ_ID,
+               SYS_CREATE_DATE_TIME, STATUS, USER_ID, HTTP_STATUS, PAYLOAD_CODEC, PAYLOAD
+        FROM MS01_REQUEST_RESPONSE_LOG
+        {where}
+        ORDER BY SYS_CREATE_DATE_TIME DESC, id DESC
+        LIMIT %s
+    """, tuple(params) + (int(limit),))
+    for row in rows:
+        row["request"], row["response"] = log_payload.decode(row)
+        del row["PAYLOAD"], row["PAYLOAD_CODEC"]
+    return rows
 
 # -------------------------------
 # Response Data Update Helper
 # -------------------------------
 
+_AUTH_CREDENTIALS_UPDATE_SQL = """
+    UPDATE MS01_API_Authentication_Credential
+    SET
+        M_CLIENT_CODE        = COALESCE(%s, M_CLIENT_CODE),
+        M_RESPONSE_USER_ID   = COALESCE(%s, M_RESPONSE_USER_ID),
+        M_RESPONSE_USER_NAME = COALESCE(%s, M_RESPONSE_USER_NAME),
+        M_ACCESS_TOKEN       = COALESCE(%s, M_ACCESS_TOKEN),
+        M_PUBLIC_TOKEN       = COALESCE(%s, M_PUBLIC_TOKEN),
+        M_REFRESH_TOKEN      = COALESCE(%s, M_REFRESH_TOKEN),
+        M_ENC_TOKEN          = COALESCE(%s, M_ENC_TOKEN),
+        LAST_LOGIN_DATE      = COALESCE(%s, LAST_LOGIN_DATE),
+        LAST_LOGOUT_DATE     = COALESCE(%s, LAST_LOGOUT_DATE)
+    WHERE M_STOCK_USER_ID = %s
+"""
+
+_LOGIN_REQUEST_UPDATE_SQL = """
+    UPDATE MS01_API_Authentication_Credential
+    SET M_STOCK_OTP = %s,
+        M_STOCK_REQUEST_TOKEN = %s,
+        SYS_UPDATE_DATE_TIME = CURRENT_TIMESTAMP
+    WHERE M_STOCK_USER_ID = %s
+"""
+
+def _auth_credentials_params(user_id, login_json, session_json):
+    login_data = (login_json or {}).get("data") or {}
+    session_data = (session_json or {}).get("data") or {}
+    return (
+        login_data.get("cid"),
+        session_data.get("user_id"),
+        session_data.get("user_name"),
+        session_data.get("access_token"),
+        session_data.get("public_token"),
+        session_data.get("refresh_token"),
+        session_data.get("enctoken"),
+        session_data.get("login_time"),
+        session_data.get("logout_time"),
+        user_id
+    )
+
 def update_auth_credentials(user_id: str, login_json: dict, session_json: dict) -> bool:
     """Update MS01_API_Authentication_Credential with values from login/session JSON"""
     try:
-        login_data = login_json.get("data", {})
-        session_data = session_json.get("data", {})
-
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("""
-            UPDATE MS01_API_Authentication_Credential
-            SET
-                M_CLIENT_CODE        = COALESCE(%s, M_CLIENT_CODE),
-                M_RESPONSE_USER_ID   = COALESCE(%s, M_RESPONSE_USER_ID),
-                M_RESPONSE_USER_NAME = COALESCE(%s, M_RESPONSE_USER_NAME),
-                M_ACCESS_TOKEN       = COALESCE(%s, M_ACCESS_TOKEN),
-                M_PUBLIC_TOKEN       = COALESCE(%s, M_PUBLIC_TOKEN),
-                M_REFRESH_TOKEN      = COALESCE(%s, M_REFRESH_TOKEN),
-                M_ENC_TOKEN          = COALESCE(%s, M_ENC_TOKEN),
-                LAST_LOGIN_DATE      = COALESCE(%s, LAST_LOGIN_DATE),
-                LAST_LOGOUT_DATE     = COALESCE(%s, LAST_LOGOUT_DATE)
-            WHERE M_STOCK_USER_ID = %s
-        """, (
-            login_data.get("cid"),
-            session_data.get("user_id"),
-            session_data.get("user_name"),
-            session_data.get("access_token"),
-            session_data.get("public_token"),
-            session_data.get("refresh_token"),
-            session_data.get("enctoken"),
-            session_data.get("login_time"),
-            session_data.get("logout_time"),
-            user_id
-        ))
-        conn.commit()
-        cursor.close()
-        conn.close()
+        with _span("update_auth_credentials", user_id=user_id) as span, transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_AUTH_CREDENTIALS_UPDATE_SQL,
+                           _auth_credentials_params(user_id, login_json, session_json))
+            span.set_attribute("db.rows", cursor.rowcount)
+            cursor.close()
         return True
     except Exception as e:
         print(f"DB update failed: {e}")
         return False
-    
-    # -------------------------------
-# Helper: Generate Complex Login Sequence ID
+
+_RENEWED_SESSION_UPDATE_SQL = """
+    UPDATE MS01_API_Authentication_Credential
+    SET M_ACCESS_TOKEN  = %s,
+        M_REFRESH_TOKEN = %s,
+        M_PUBLIC_TOKEN  = COALESCE(%s, M_PUBLIC_TOKEN),
+        M_ENC_TOKEN     = COALESCE(%s, M_ENC_TOKEN),
+        LAST_LOGIN_DATE = %s
+    WHERE M_STOCK_USER_ID = %s AND M_REFRESH_TOKEN = %s
+"""
+
+def save_renewed_sessions(renewals, module="token_refresher"):
+    """
+    Store a batch of refresh-token renewals in one transaction.
+    renewals: [{"user_id", "refresh_token" (the one that was used), "data"
+    (renewal session data), "login_seq_id"}]. A row only applies while the
+    stored refresh token is still the one that was used, so a logout or a
+    newer login in between wins. Returns the user_ids that were applied.
+    """
+    applied = []
+    with _span("save_renewed_sessions", **{"db.batch": len(renewals)}) as span, transaction() as conn:
+        cursor = conn.cursor()
+        for renewal in renewals:
+            data = renewal["data"]
+            cursor.execute(_RENEWED_SESSION_UPDATE_SQL, (
+                data["access_token"], data.get("refresh_token"), data.get("public_token"),
+                data.get("enctoken"), data.get("login_time"), renewal["user_id"], renewal["refresh_token"]))
+            if cursor.rowcount > 0:
+                applied.append(renewal["user_id"])
+        done = set(applied)
+        cursor.executemany(_REQUEST_RESPONSE_INSERT_SQL, [
+            _request_response_params(
+                "INFO" if renewal["user_id"] in done else "WARN",
+                "Session renewed" if renewal["user_id"] in done else "Renewed session discarded (token changed)",
+                module, {"user_id": renewal["user_id"]}, {}, "renew_session", renewal["login_seq_id"],
+                user_id=renewal["user_id"], status="success" if renewal["user_id"] in done else "failure")
+            for renewal in renewals
+        ])
+        cursor.close()
+        span.set_attribute("db.rows", len(applied))
+    return applied
+
+# -------------------------------
+# Login Unit of Work
 # -------------------------------
 
-def generate_unique_seq_id(table: str, column: str, length: int = 20) -> str:
+class LoginUnitOfWork:
     """
-    Generate a unique, complex sequence ID with numbers, alphabets, and special characters.
-    Ensures uniqueness by checking the given table/column in DB.
+    Collects everything one login writes (credential/token updates plus all
+    log rows for its login_seq_id) and commits it in a single transaction on
+    a single pooled connection. The outcome row is part of that transaction,
+    so a login is either fully recorded or not at all.
+
+        uow = db.LoginUnitOfWork(user_id, "mstock_auth_api_cli")
+        uow.request_log("INFO", "Login call completed", request, response, api_name="login")
+        uow.set_session(login_json, session_json)
+        outcome = uow.commit("success", "Login flow completed successfully")
     """
-    alphabet = string.ascii_letters + string.digits + "!@#$%^&*()-_=+"
-    conn = get_connection()
-    cursor = conn.cursor()
 
-    while True:
-        candidate = ''.join(secrets.choice(alphabet) for _ in range(length))
-        cursor.execute(f"SELECT 1 FROM {table} WHERE {column} = %s LIMIT 1", (candidate,))
-        if not cursor.fetchone():
-            cursor.close()
-            conn.close()
-            return candidate
+    def __init__(self, user_id, module, login_seq_id=None, api_name="login"):
+        self.user_id = user_id
+        self.module = module
+        self.api_name = api_name
+        self.login_seq_id = login_seq_id or generate_login_seq_id()
+        self._statements = []    # (sql, params) in execution order
+        self._request_logs = []
+        self._logs = []
+        self.outcome = None
+
+    def set_login_request(self, otp, request_token):
+        """OTP + request_token from /connect/login"""
+        self._statements.append((_LOGIN_REQUEST_UPDATE_SQL, (otp, request_token, self.user_id)))
+
+    def set_session(self, login_json, session_json):
+        """Tokens and profile fields from the login / session JSON"""
+        self._statements.append((_AUTH_CREDENTIALS_UPDATE_SQL,
+                                 _auth_credentials_params(self.user_id, login_json, session_json)))
+
+    def request_log(self, log_level, message, request=None, response=None, api_name=None, **hot):
+        """hot: user_id / http_status / status overrides (see insert_request_response_log)"""
+        hot.setdefault("user_id", self.user_id)
+        self._request_logs.append(_request_response_params(
+            log_level, message, self.module, request, response,
+            api_name or self.api_name, self.login_seq_id, **hot))
+
+    def log(self, level, message):
+        self._logs.append((level, message, self.module))
+
+    def commit(self, status="success", message=None, response=None):
+        """
+        Write everything in one transaction and return the outcome:
+        {"status", "committed", "login_seq_id", "statements", "log_rows", "error"}.
+        status/message add a final outcome row; a failed commit leaves nothing
+        behind except one ERROR row queued through the log writer.
+        """
+        if self.outcome is not None:
+            return self.outcome
+        if message:
+            self.request_log("INFO" if status == "success" else "ERROR", message,
+                             {"user_id": self.user_id}, response, status=status)
+        outcome = {"status": status, "committed": False, "login_seq_id": self.login_seq_id,
+                   "statements": len(self._statements),
+                   "log_rows": len(self._request_logs) + len(self._logs), "error": None}
+        try:
+            with _span("login_commit", user_id=self.user_id, login_seq_id=self.login_seq_id,
+                       **{"login.status": status, "db.statements": outcome["statements"],
+                          "db.log_rows": outcome["log_rows"]}) as span, transaction() as conn:
+                cursor = conn.cursor()
+                updated = 0
+                for sql, params in self._statements:
+                    cursor.execute(sql, params)
+                    updated += max(cursor.rowcount, 0)
+                if self._request_logs:
+                    cursor.executemany(_REQUEST_RESPONSE_INSERT_SQL, self._request_logs)
+                if self._logs:
+                    cursor.executemany(_LOG_INSERT_SQL, self._logs)
+                cursor.close()
+                span.set_attribute("db.rows", updated)
+            outcome["committed"] = True
+        except Exception as e:
+            outcome.update(status="failure", error=str(e))
+            insert_request_response_log(
+                "ERROR", f"Login persistence failed ({status})", self.module,
+                {"user_id": self.user_id}, str(e),
+                api_name=self.api_name, login_seq_id=self.login_seq_id, status="failure"
+            )
+        self.outcome = outcome
+        return outcome
 
 # -------------------------------
-# Logging Operations
+# Helper: Generate Login Sequence ID
 # -------------------------------
 
-def insert_log(level, message, source_module=None):
-    """Insert a simple log entry into generic logs table"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        INSERT INTO logs (LOG_LEVEL, LOG_MESSAGE, SOURCE_MODULE)
-        VALUES (%s, %s, %s)
-    """, (level, message, source_module))
-    conn.commit()
-    cursor.close()
-    conn.close()
+# Base62 in ASCII order, so IDs compare the same way as their timestamps
+_SEQ_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+_SEQ_TIME_CHARS = 8   # 62**8 ms ~ 6,900 years from the epoch
 
+def generate_login_seq_id(length: int = 20) -> str:
+    """
+    Generate a time-ordered, collision-resistant sequence ID locally (no DB round trip).
+    Layout: 8 base62 chars of epoch milliseconds + random base62 suffix
+    (12 chars = ~71 bits by default), unique across processes without coordination.
+    """
+    if length <= _SEQ_TIME_CHARS + 8:
+        raise ValueError(f"length must be greater than {_SEQ_TIME_CHARS + 8}")
+
+    random_chars = length - _SEQ_TIME_CHARS
+    return (
+        _base62(time.time_ns() // 1_000_000, _SEQ_TIME_CHARS)
+        + _base62(secrets.randbelow(62 ** random_chars), random_chars)
+    )
+
+def _base62(value: int, width: int) -> str:
+    chars = []
+    for _ in range(width):
+        value, rem = divmod(value, 62)
+        chars.append(_SEQ_ALPHABET[rem])
+    return ''.join(reversed(chars))
+
+def generate_unique_seq_id(table: str, column: str, length: int = 20) -> str:
+    """
+    Kept for existing callers: returns generate_login_seq_id(length).
+    table/column are no longer probed; the random suffix makes collisions negligible.
+    """
+    return generate_login_seq_id(length)
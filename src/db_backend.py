@@ -0,0 +1,215 @@
+"""
+Storage backends behind src/db.py.
+
+- mysql  (default): mysql.connector, configured from DB_HOST/DB_USER/DB_PASSWORD/DB_NAME/DB_PORT
+- sqlite:           embedded file database for single-node deployments
+                    (WAL mode, cached prepared statements), path from DB_SQLITE_PATH
+
+Select with DB_BACKEND=mysql|sqlite. Both return DB-API connections that accept
+the same `%s`-style SQL and `cursor(dictionary=True, buffered=True)` calls that
+db.py already uses, so helpers are written once.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+
+from src.settings import get_settings
+
+settings = get_settings()
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SQLITE_SCHEMA = os.path.join(ROOT_DIR, "schema", "schema_sqlite.sql")
+
+
+# -------------------------------
+# MySQL
+# -------------------------------
+
+class MySQLBackend:
+    name = "mysql"
+
+    def connect(self):
+        """Open a brand-new MySQL connection using .env values"""
+        import mysql.connector
+        return mysql.connector.connect(
+            host=settings.get("DB_HOST", "localhost"),
+            user=settings.get("DB_USER", "root"),
+            password=settings.get("DB_PASSWORD", "root"),
+            database=settings.get("DB_NAME", "mstock"),
+            port=settings.get("DB_PORT", 3306, int)
+        )
+
+    def upsert_sql(self, table, columns, conflict_columns, extra_assignments=()):
+        """INSERT ... ON DUPLICATE KEY UPDATE for every non-key column"""
+        updates = [f"{c} = VALUES({c})" for c in columns if c not in conflict_columns]
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON DUPLICATE KEY UPDATE {', '.join(updates + list(extra_assignments))}"
+        )
+
+
+# -------------------------------
+# SQLite
+# -------------------------------
+
+@lru_cache(maxsize=512)
+def _translate(sql):
+    """MySQL-flavoured SQL -> SQLite: %s placeholders and server-side time functions"""
+    sql = sql.replace("%s", "?").replace("%%", "%")
+    sql = re.sub(r"\bDEFAULT\s+CURRENT_TIMESTAMP\b", "DEFAULT (datetime('now','localtime'))", sql)
+    sql = re.sub(r"\bNOW\(\)|\bCURRENT_TIMESTAMP\b", "datetime('now','localtime')", sql)
+    return sql
+
+def _adapt(params):
+    if params is None:
+        return ()
+    # Store timestamps in the same text format DEFAULT (datetime('now','localtime')) uses
+    return tuple(
+        p.strftime("%Y-%m-%d %H:%M:%S") if isinstance(p, datetime)
+        else p.isoformat() if isinstance(p, date)
+        else p
+        for p in params
+    )
+
+
+class SQLiteCursor:
+    """Cursor adapter exposing the mysql.connector calls db.py relies on"""
+
+    def __init__(self, cursor, dictionary=False):
+        self._cursor = cursor
+        self._dictionary = dictionary
+
+    def execute(self, sql, params=None):
+        self._cursor.execute(_translate(sql), _adapt(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cursor.executemany(_translate(sql), [_adapt(p) for p in seq_of_params])
+        return self
+
+    def _shape(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return {col[0]: value for col, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._shape(self._cursor.fetchone())
+
+    def fetchmany(self, size=None):
+        rows = self._cursor.fetchmany(size) if size else self._cursor.fetchmany()
+        return [self._shape(r) for r in rows]
+
+    def fetchall(self):
+        return [self._shape(r) for r in self._cursor.fetchall()]
+
+    def __iter__(self):
+        return (self._shape(r) for r in self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Connection adapter; one per pooled slot (used by one thread at a time)"""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self, dictionary=False, buffered=False, **_):
+        return SQLiteCursor(self._raw.cursor(), dictionary)
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+    def is_connected(self):
+        try:
+            self._raw.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def close(self):
+        self._raw.close()
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, path=None):
+        self.path = path or settings.get("DB_SQLITE_PATH", os.path.join(ROOT_DIR, "config", "mstock.db"))
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def connect(self):
+        raw = sqlite3.connect(
+            self.path,
+            timeout=settings.get("DB_SQLITE_BUSY_TIMEOUT", 5.0, float),
+            check_same_thread=False,       # the pool hands a connection to one thread at a time
+            cached_statements=512,         # prepared statements are reused per connection
+        )
+        raw.execute("PRAGMA journal_mode=WAL")
+        raw.execute("PRAGMA synchronous=NORMAL")
+        raw.execute("PRAGMA foreign_keys=ON")
+        self._ensure_schema(raw)
+        return SQLiteConnection(raw)
+
+    def _ensure_schema(self, raw):
+        """Create the tables on first use of a new database file"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            if self._initialized:
+                return
+            exists = raw.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='MS01_API_Authentication_Credential'"
+            ).fetchone()
+            if not exists:
+                with open(SQLITE_SCHEMA) as f:
+                    raw.executescript(f.read())
+                raw.commit()
+            self._initialized = True
+
+    def upsert_sql(self, table, columns, conflict_columns, extra_assignments=()):
+        """INSERT ... ON CONFLICT DO UPDATE for every non-key column"""
+        updates = [f"{c} = excluded.{c}" for c in columns if c not in conflict_columns]
+        return (
+            f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['%s'] * len(columns))}) "
+            f"ON CONFLICT({', '.join(conflict_columns)}) DO UPDATE SET "
+            f"{', '.join(updates + list(extra_assignments))}"
+        )
+
+
+# -------------------------------
+# Selection
+# -------------------------------
+
+_BACKENDS = {"mysql": MySQLBackend, "sqlite": SQLiteBackend}
+
+def create_backend(name=None):
+    """Build the backend named by `name` or DB_BACKEND (default mysql)"""
+    name = (name or settings.get("DB_BACKEND", "mysql")).lower()
+    if name not in _BACKENDS:
+        raise ValueError(f"Unknown DB_BACKEND '{name}' (expected one of {sorted(_BACKENDS)})")
+    return _BACKENDS[name]()
@@ -0,0 +1,220 @@
+"""
+Versioned schema migrations for the mStock database.
+Applies the numbered SQL files in schema/migrations (NNNN_description.sql,
+or NNNN_description.sqlite.sql on DB_BACKEND=sqlite) that are not yet recorded
+in SCHEMA_MIGRATIONS, in order. Re-running is safe:
+applied versions are skipped and "already exists" errors are tolerated, so a
+database created from schema.sql is simply recorded as up to date.
+
+Usage (from project root):
+    python -m src.db_migrate            # apply pending migrations
+    python -m src.db_migrate --status   # list applied / pending versions
+    python -m src.db_migrate --check    # EXPLAIN hot queries, fail on full scans
+"""
+
+import argparse
+import os
+import re
+import sys
+
+from src import db
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MIGRATIONS_DIR = os.path.join(ROOT_DIR, "schema", "migrations")
+
+# NNNN_description.sql, with an optional NNNN_description.sqlite.sql variant for DB_BACKEND=sqlite
+_MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+?)(\.sqlite)?\.sql$")
+
+# MySQL error numbers meaning the object is already in the desired state
+_ALREADY_APPLIED_ERRNOS = {
+    1050,  # table already exists
+    1060,  # duplicate column name
+    1061,  # duplicate key name
+    1091,  # can't DROP; check that column/key exists
+}
+
+# SQLite has no error numbers; match the message instead
+_ALREADY_APPLIED_MESSAGES = ("already exists", "duplicate column name")
+
+def _already_applied(error):
+    if getattr(error, "errno", None) in _ALREADY_APPLIED_ERRNOS:
+        return True
+    return db.get_backend().name == "sqlite" and any(m in str(error) for m in _ALREADY_APPLIED_MESSAGES)
+
+# Queries on the login/logging hot path; each must be served by an index
+HOT_QUERIES = [
+    ("credential by user id",
+     "SELECT M_STOCK_USER_ID, M_STOCK_PASSWORD, M_STOCK_API_KEY, M_STOCK_API_KEY_TYPE, ENCRYPTION_KEY_ID "
+     "FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID = %s", ("demo_user",)),
+    ("latest credential",
+     "SELECT M_STOCK_USER_ID FROM MS01_API_Authentication_Credential "
+     "ORDER BY SYS_UPDATE_DATE_TIME DESC LIMIT 1", ()),
+    ("request/response log by login_seq_id",
+     "SELECT id FROM MS01_REQUEST_RESPONSE_LOG WHERE LOGIN_SEQ_ID = %s", ("0000000000000000000",)),
+    ("failed request/response rows since",
+     "SELECT id FROM MS01_REQUEST_RESPONSE_LOG WHERE STATUS = %s AND SYS_CREATE_DATE_TIME >= NOW()",
+     ("failure",)),
+    ("request/response rows for a user",
+     "SELECT id FROM MS01_REQUEST_RESPONSE_LOG WHERE USER_ID = %s ORDER BY SYS_CREATE_DATE_TIME DESC LIMIT 50",
+     ("demo_user",)),
+    ("request/response log retention",
+     "SELECT MAX(id) FROM MS01_REQUEST_RESPONSE_LOG WHERE SYS_CREATE_DATE_TIME < NOW()", ()),
+    ("logs retention",
+     "SELECT MAX(LOG_ID) FROM logs WHERE SYS_CREATE_DATE_TIME < NOW()", ()),
+]
+
+
+# -------------------------------
+# Discovery
+# -------------------------------
+
+def discover_migrations(directory=MIGRATIONS_DIR, backend=None):
+    """Return [(version, name, path)] sorted by version, using backend-specific variants"""
+    backend = backend or db.get_backend().name
+    generic, variants = {}, {}
+    for filename in os.listdir(directory):
+        match = _MIGRATION_FILE.match(filename)
+        if not match:
+            continue
+        version, name, variant = int(match.group(1)), match.group(2), match.group(3)
+        target = variants if variant else generic
+        if version in target:
+            raise RuntimeError(f"Duplicate migration version {version:04d} in {directory}")
+        target[version] = (version, name, os.path.join(directory, filename))
+
+    migrations = dict(generic)
+    if backend == "sqlite":
+        migrations.update(variants)
+    return [migrations[v] for v in sorted(migrations)]
+
+def split_statements(sql_text):
+    """Split a migration file into statements (full-line `--` comments are dropped)"""
+    lines = [line for line in sql_text.splitlines() if not line.strip().startswith("--")]
+    return [stmt.strip() for stmt in "\n".join(lines).split(";") if stmt.strip()]
+
+
+# -------------------------------
+# Version Table
+# -------------------------------
+
+def ensure_version_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS SCHEMA_MIGRATIONS (
+            VERSION     INT PRIMARY KEY,
+            NAME        VARCHAR(255) NOT NULL,
+            APPLIED_AT  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+def applied_versions(cursor):
+    cursor.execute("SELECT VERSION FROM SCHEMA_MIGRATIONS")
+    return {row[0] for row in cursor.fetchall()}
+
+
+# -------------------------------
+# Apply
+# -------------------------------
+
+def apply_pending(directory=MIGRATIONS_DIR):
+    """Apply every pending migration in version order; returns the versions applied"""
+    applied_now = []
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        ensure_version_table(cursor)
+        done = applied_versions(cursor)
+        cursor.close()
+
+    for version, name, path in discover_migrations(directory):
+        if version in done:
+            continue
+        with open(path) as f:
+            statements = split_statements(f.read())
+
+        print(f"⏩ Applying {version:04d}_{name} ({len(statements)} statements)...")
+        # DDL auto-commits in MySQL; each statement is tolerant of being re-run
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            for statement in statements:
+                try:
+                    cursor.execute(statement)
+                except Exception as e:
+                    if _already_applied(e):
+                        print(f"   ↪ already in place: {e}")
+                        continue
+                    raise
+            cursor.execute(
+                "INSERT INTO SCHEMA_MIGRATIONS (VERSION, NAME) VALUES (%s, %s)", (version, name)
+            )
+            cursor.close()
+        applied_now.append(version)
+        print(f"✅ {version:04d}_{name} applied")
+
+    return applied_now
+
+def status(directory=MIGRATIONS_DIR):
+    """Return [(version, name, applied_bool)]"""
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        ensure_version_table(cursor)
+        done = applied_versions(cursor)
+        cursor.close()
+    return [(version, name, version in done) for version, name, _ in discover_migrations(directory)]
+
+
+# -------------------------------
+# Index Check
+# -------------------------------
+
+def _uses_index(plan_rows):
+    """A plan is fine if no table is read with a full scan (MySQL type=ALL, SQLite plain SCAN)"""
+    for row in plan_rows:
+        if "detail" in row:
+            detail = row["detail"]
+            if detail.startswith("SCAN") and "INDEX" not in detail:
+                return False
+            continue
+        extra = row.get("Extra") or ""
+        if "optimized away" in extra or "no matching" in extra.lower():
+            continue
+        if row.get("type") == "ALL" or (row.get("key") is None and row.get("table")):
+            return False
+    return True
+
+def check_indexes():
+    """EXPLAIN each hot query; returns [(label, ok, plan_rows)]"""
+    results = []
+    explain = "EXPLAIN QUERY PLAN" if db.get_backend().name == "sqlite" else "EXPLAIN"
+    conn = db.get_connection()
+    cursor = conn.cursor(dictionary=True)
+    for label, sql, params in HOT_QUERIES:
+        cursor.execute(f"{explain} {sql}", params)
+        plan = cursor.fetchall()
+        results.append((label, _uses_index(plan), plan))
+    cursor.close()
+    conn.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mStock schema migrations")
+    parser.add_argument("--status", action="store_true", help="show applied and pending migrations")
+    parser.add_argument("--check", action="store_true", help="EXPLAIN hot queries and verify index use")
+    args = parser.parse_args()
+
+    if args.status:
+        for version, name, is_applied in status():
+            print(f"{'✅' if is_applied else '⏳'} {version:04d}_{name}")
+    elif args.check:
+        failures = 0
+        for label, ok, plan in check_indexes():
+            keys = ", ".join(str(row.get("key", row.get("detail"))) for row in plan)
+            print(f"{'✅' if ok else '❌'} {label} (key: {keys})")
+            failures += 0 if ok else 1
+        sys.exit(1 if failures else 0)
+    else:
+        try:
+            applied = apply_pending()
+            print(f"✅ Schema up to date ({len(applied)} migration(s) applied)")
+        except Exception as e:
+            print(f"❌ Migration failed: {e}")
+            sys.exit(1)
@@ -0,0 +1,218 @@
+"""
+Bounded connection pool used behind db.get_connection().
+Connections are opened once and handed out again on checkout, so helpers pay
+a queue pop instead of a TCP connect + MySQL handshake on every call.
+"""
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class PoolExhaustedError(RuntimeError):
+    """Raised when no connection becomes free within the checkout timeout."""
+
+
+class ConnectionClosedError(RuntimeError):
+    """Raised when a PooledConnection is used after close() gave it back to the pool."""
+
+
+class PooledConnection:
+    """
+    Thin proxy around a driver connection checked out from a ConnectionPool.
+    Everything is delegated to the real connection except close(), which
+    returns it to the pool instead of tearing down the socket. After close()
+    the proxy refuses further use: the connection may already belong to
+    another thread.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._closed = False
+
+    def __getattr__(self, name):
+        raw = self.__dict__.get("_raw")
+        if raw is None:
+            raise ConnectionClosedError("Connection was returned to the pool; check out a new one")
+        return getattr(raw, name)
+
+    def close(self):
+        if not self.__dict__.get("_closed", True):
+            self._closed = True
+            raw, self._raw = self._raw, None
+            self._pool._release(raw)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        # Safety net for callers that bail out before conn.close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool with at most `size` live connections.
+
+    - connect:      zero-arg callable returning a new driver connection
+    - timeout:      seconds to wait for a free slot before PoolExhaustedError
+    - ping_after:   idle seconds after which a connection is health-checked on checkout
+    - recycle:      max age in seconds before a connection is replaced
+    """
+
+    def __init__(self, connect, size=5, timeout=30.0, ping_after=5.0, recycle=3600.0):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self.recycle = recycle
+
+        self._slots = threading.BoundedSemaphore(size)
+        # LIFO keeps the most recently used (warmest) connections in play
+        self._idle = queue.LifoQueue()
+        self._born = {}
+        self._lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "connects": 0,
+            "health_check_failures": 0,
+            "discarded": 0,
+        }
+
+    # -------------------------------
+    # Checkout / release
+    # -------------------------------
+
+    def checkout(self, timeout=None):
+        """Borrow a healthy connection; close() on the result gives it back."""
+        timeout = self.timeout if timeout is None else timeout
+        if not self._slots.acquire(blocking=False):
+            started = time.monotonic()
+            self._bump("waits")
+            acquired = self._slots.acquire(timeout=timeout)
+            self._bump("wait_time", time.monotonic() - started)
+            if not acquired:
+                self._bump("timeouts")
+                raise PoolExhaustedError(
+                    f"No DB connection free after {timeout}s (pool size {self.size})"
+                )
+
+        try:
+            raw = self._take_idle() or self._open()
+        except Exception:
+            self._slots.release()
+            raise
+
+        self._bump("checkouts")
+        return PooledConnection(self, raw)
+
+    @contextmanager
+    def transaction(self):
+        """Yield a pooled connection; commit on success, roll back on error."""
+        conn = self.checkout()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            conn.close()
+
+    def _release(self, raw):
+        try:
+            # Never hand a half-finished transaction to the next caller
+            if getattr(raw, "in_transaction", False):
+                raw.rollback()
+            self._idle.put((raw, time.monotonic()))
+        except Exception:
+            self._discard(raw)
+        finally:
+            self._slots.release()
+
+    # -------------------------------
+    # Internals
+    # -------------------------------
+
+    def _open(self):
+        raw = self._connect()
+        with self._lock:
+            self._stats["connects"] += 1
+            self._born[id(raw)] = time.monotonic()
+        return raw
+
+    def _take_idle(self):
+        while True:
+            try:
+                raw, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return None
+            if self._is_usable(raw, last_used):
+                return raw
+            self._discard(raw)
+
+    def _is_usable(self, raw, last_used):
+        now = time.monotonic()
+        if now - self._born.get(id(raw), now) > self.recycle:
+            return False
+        if now - last_used < self.ping_after:
+            return True
+        try:
+            if raw.is_connected():
+                return True
+        except Exception:
+            pass
+        self._bump("health_check_failures")
+        return False
+
+    def _discard(self, raw):
+        with self._lock:
+            self._stats["discarded"] += 1
+            self._born.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _bump(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    # -------------------------------
+    # Introspection
+    # -------------------------------
+
+    def stats(self) -> dict:
+        """Snapshot of pool counters plus current idle/open connection counts."""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["open"] = len(self._born)
+        snapshot["size"] = self.size
+        snapshot["idle"] = self._idle.qsize()
+        snapshot["in_use"] = snapshot["open"] - snapshot["idle"]
+        return snapshot
+
+    def close_all(self):
+        """Close every idle connection (checked-out ones close on release)."""
+        while True:
+            try:
+                raw, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(raw)
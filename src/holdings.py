@@ -0,0 +1,430 @@
+"""
+Holdings sync for every account in MS01_API_Authentication_Credential.
+Holdings are fetched in parallel for accounts with a valid session. Each
+account's positions are hashed (prices left out), and an account whose hash
+matches the last sync is not written. For the others only new/changed rows
+are upserted (and sold-out rows deleted), in batches of one transaction each,
+while the remaining fetches are still running. Price-only changes just update
+the in-memory view, so LAST_PRICE/CLOSE_PRICE in the table are as of the last
+position change.
+
+The synced positions are also kept as a columnar NumPy view (PortfolioView),
+so portfolio-wide aggregates are a bincount over a few arrays instead of a
+query per account:
+
+    sync = holdings.from_settings()
+    sync.load()                         # stored holdings -> memory (no broker calls)
+    report = sync.sync()                # fetch + incremental write
+    sync.view.by_sector()               # {"Banking": 1.2e6, ...} exposure at last price
+    sync.view.top("symbol", 5)
+
+    python -m src.holdings sync [--force] [--user ID]
+    python -m src.holdings exposure --by sector|symbol|account [--top 10]
+
+Sectors come from a CSV with symbol,sector columns (HOLDINGS_SECTOR_FILE,
+default config/sectors.csv); unknown symbols are grouped as UNCLASSIFIED.
+Settings (.env): HOLDINGS_SYNC_WORKERS (8), HOLDINGS_SYNC_BATCH (500 rows per
+transaction).
+"""
+
+import csv
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from src import auth, db, metrics, tracing
+from src.session_manager import _parse_time, sessions
+from src.settings import get_settings
+
+MODULE = "holdings"
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SECTOR_FILE = os.path.join(ROOT_DIR, "config", "sectors.csv")
+UNCLASSIFIED = "UNCLASSIFIED"
+
+# Stored columns, in the order of the row tuples kept in memory
+HOLDING_COLUMNS = ("M_STOCK_USER_ID", "EXCHANGE", "SYMBOL", "ISIN", "PRODUCT", "QUANTITY",
+                   "AVERAGE_PRICE", "LAST_PRICE", "CLOSE_PRICE", "ROW_HASH")
+
+_PRICES = HOLDING_COLUMNS.index("LAST_PRICE")      # values[_PRICES:] are last and close price
+
+_DELETE_SQL = "DELETE FROM holdings WHERE M_STOCK_USER_ID = %s AND EXCHANGE = %s AND SYMBOL = %s"
+
+SYNC_SECONDS = metrics.histogram("mstock_holdings_sync_seconds", "One holdings sync over all accounts")
+SYNC_ACCOUNTS = metrics.counter("mstock_holdings_accounts_total",
+                                "Accounts per sync by outcome (changed, unchanged, failed, skipped)", ("result",))
+SYNC_ROWS = metrics.counter("mstock_holdings_rows_total", "Holdings rows written", ("op",))
+
+
+def _upsert_sql():
+    return db.get_backend().upsert_sql("holdings", HOLDING_COLUMNS, ("M_STOCK_USER_ID", "EXCHANGE", "SYMBOL"),
+                                       extra_assignments=("SYS_UPDATE_DATE_TIME = CURRENT_TIMESTAMP",))
+
+def _sync_state_sql():
+    return db.get_backend().upsert_sql("holdings_sync", ("M_STOCK_USER_ID", "HOLDINGS_HASH", "ROW_COUNT"),
+                                       ("M_STOCK_USER_ID",),
+                                       extra_assignments=("LAST_CHANGE_DATE = CURRENT_TIMESTAMP",))
+
+def load_sectors(path=None):
+    """{symbol: sector} from a symbol,sector CSV; empty when the file does not exist"""
+    path = path or get_settings().get("HOLDINGS_SECTOR_FILE", DEFAULT_SECTOR_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline="", encoding="utf-8") as f:
+        return {row["symbol"].strip().upper(): row["sector"].strip()
+                for row in csv.DictReader(f) if row.get("symbol") and row.get("sector")}
+
+
+# -------------------------------
+# Normalization and Hashing
+# -------------------------------
+
+def _number(value):
+    if value in (None, ""):
+        return None
+    return float(value)
+
+def normalize(user_id, item):
+    """
+    Broker holding -> (key, row_hash, values); values follow HOLDING_COLUMNS
+    without ROW_HASH. The hash covers the position, not last/close price, which
+    move all day.
+    """
+    exchange = str(item.get("exchange") or "NSE").upper()
+    symbol = str(item.get("tradingsymbol") or item.get("symbol") or "").upper()
+    values = (user_id, exchange, symbol, item.get("isin"), item.get("product"),
+              _number(item.get("quantity")) or 0.0, _number(item.get("average_price")),
+              _number(item.get("last_price")), _number(item.get("close_price")))
+    row_hash = hashlib.blake2b(repr(values[1:_PRICES]).encode(), digest_size=8).hexdigest()
+    return (exchange, symbol), row_hash, values
+
+def account_hash(rows):
+    """Order-independent hash of one account's rows ({key: (row_hash, values)})"""
+    digest = hashlib.blake2b(digest_size=16)
+    for row_hash in sorted(row_hash for row_hash, _ in rows.values()):
+        digest.update(row_hash.encode())
+    return digest.hexdigest()
+
+
+# -------------------------------
+# Columnar View
+# -------------------------------
+
+class PortfolioView:
+    """
+    Immutable snapshot of every position as parallel NumPy arrays. account,
+    symbol and sector are integer codes into the label lists, so grouping is
+    one np.bincount. A sync builds a new view and swaps it in; readers never
+    see a half-updated one.
+    """
+
+    KEYS = ("account", "symbol", "sector")
+
+    def __init__(self, accounts, symbols, sectors, account, symbol, symbol_sector,
+                 quantity, average_price, last_price):
+        self.labels = {"account": list(accounts), "symbol": list(symbols), "sector": list(sectors)}
+        self.codes = {"account": account, "symbol": symbol, "sector": symbol_sector[symbol]}
+        self.quantity = quantity
+        self.average_price = average_price
+        self.last_price = last_price
+        self.exposure = quantity * last_price
+        self.cost = quantity * average_price
+        self.pnl = self.exposure - self.cost
+        self.built_at = datetime.now()
+
+    @classmethod
+    def empty(cls):
+        ints, floats = np.zeros(0, dtype=np.int32), np.zeros(0)
+        return cls([], [], [], ints, ints, ints, floats, floats, floats)
+
+    def __len__(self):
+        return len(self.quantity)
+
+    def totals(self, key, value="exposure"):
+        """Array of value (exposure, cost, pnl or quantity) summed per label of key"""
+        return np.bincount(self.codes[key], weights=getattr(self, value), minlength=len(self.labels[key]))
+
+    def by(self, key, value="exposure"):
+        return dict(zip(self.labels[key], self.totals(key, value).tolist()))
+
+    def by_symbol(self, value="exposure"):
+        return self.by("symbol", value)
+
+    def by_sector(self, value="exposure"):
+        return self.by("sector", value)
+
+    def by_account(self, value="exposure"):
+        return self.by("account", value)
+
+    def top(self, key, n=10, value="exposure"):
+        """[(label, total)] for the n largest totals"""
+        totals = self.totals(key, value)
+        order = np.argsort(totals)[::-1][:n]
+        return [(self.labels[key][i], float(totals[i])) for i in order]
+
+    def total(self, value="exposure"):
+        return float(getattr(self, value).sum())
+
+    def summary(self):
+        return {"positions": len(self), "accounts": len(self.labels["account"]),
+                "symbols": len(self.labels["symbol"]), "exposure": round(self.total(), 2),
+                "cost": round(self.total("cost"), 2), "pnl": round(self.total("pnl"), 2),
+                "built_at": self.built_at.isoformat(sep=" ", timespec="seconds")}
+
+
+class _ViewBuilder:
+    """Per-account array blocks with append-only symbol/sector codes, concatenated into a PortfolioView"""
+
+    def __init__(self, sectors):
+        self._sector_of = sectors
+        self._symbols, self._symbol_codes = [], {}
+        self._sectors, self._sector_codes = [], {}
+        self._symbol_sector = []
+        self._blocks = {}       # user_id -> (symbol codes, quantity, average price, last price)
+
+    def _code(self, symbol):
+        code = self._symbol_codes.get(symbol)
+        if code is None:
+            sector = self._sector_of.get(symbol, UNCLASSIFIED)
+            if sector not in self._sector_codes:
+                self._sector_codes[sector] = len(self._sectors)
+                self._sectors.append(sector)
+            code = self._symbol_codes[symbol] = len(self._symbols)
+            self._symbols.append(symbol)
+            self._symbol_sector.append(self._sector_codes[sector])
+        return code
+
+    def set_account(self, user_id, rows):
+        """rows: {key: (row_hash, values)}; an empty dict removes the account"""
+        if not rows:
+            self._blocks.pop(user_id, None)
+            return
+        values = [v for _, v in rows.values()]
+        average = [v[6] if v[6] is not None else 0.0 for v in values]
+        self._blocks[user_id] = (
+            np.fromiter((self._code(v[2]) for v in values), dtype=np.int32, count=len(values)),
+            np.array([v[5] for v in values], dtype=np.float64),
+            np.array(average, dtype=np.float64),
+            # No quote yet: value the position at cost
+            np.array([v[7] if v[7] is not None else avg for v, avg in zip(values, average)], dtype=np.float64),
+        )
+
+    def build(self):
+        if not self._blocks:
+            return PortfolioView.empty()
+        accounts = list(self._blocks)
+        blocks = list(self._blocks.values())
+        account = np.repeat(np.arange(len(accounts), dtype=np.int32), [len(b[0]) for b in blocks])
+        return PortfolioView(accounts, self._symbols, self._sectors, account,
+                             np.concatenate([b[0] for b in blocks]),
+                             np.array(self._symbol_sector, dtype=np.int32),
+                             *(np.concatenate([b[i] for b in blocks]) for i in (1, 2, 3)))
+
+
+# -------------------------------
+# Sync
+# -------------------------------
+
+class HoldingsSync:
+    def __init__(self, manager=None, fetch=None, workers=8, batch_size=500, sectors=None):
+        self.manager = manager or sessions
+        self._fetch = fetch or auth.get_holdings
+        self.workers = workers
+        self.batch_size = batch_size
+        self._sync_lock = threading.Lock()
+        self._hashes = {}       # user_id -> account hash of the stored rows
+        self._rows = {}         # user_id -> {(exchange, symbol): (row_hash, values)}
+        self._builder = _ViewBuilder(load_sectors() if sectors is None else sectors)
+        self.view = PortfolioView.empty()
+
+    def load(self):
+        """Read stored holdings into memory and build the view; returns the number of positions"""
+        with self._sync_lock:
+            self._rows = {}
+            for row in db.fetch_all(f"SELECT {', '.join(HOLDING_COLUMNS)} FROM holdings"):
+                values = tuple(float(row[c]) if c in ("QUANTITY", "AVERAGE_PRICE", "LAST_PRICE", "CLOSE_PRICE")
+                               and row[c] is not None else row[c] for c in HOLDING_COLUMNS[:-1])
+                self._rows.setdefault(values[0], {})[(values[1], values[2])] = (row["ROW_HASH"], values)
+            self._hashes = {row["M_STOCK_USER_ID"]: row["HOLDINGS_HASH"]
+                            for row in db.fetch_all("SELECT M_STOCK_USER_ID, HOLDINGS_HASH FROM holdings_sync")}
+            for user_id, rows in self._rows.items():
+                self._builder.set_account(user_id, rows)
+            self.view = self._builder.build()
+            return len(self.view)
+
+    def accounts(self, user_ids=None):
+        """[(user_id, api_key, access_token)] for accounts with a valid stored session"""
+        rows = db.fetch_all("""
+            SELECT M_STOCK_USER_ID, M_STOCK_API_KEY, M_ACCESS_TOKEN, LAST_LOGIN_DATE, LAST_LOGOUT_DATE
+            FROM MS01_API_Authentication_Credential
+            WHERE M_ACCESS_TOKEN IS NOT NULL
+        """)
+        now = datetime.now()
+        wanted = set(user_ids) if user_ids else None
+        result = []
+        for row in rows:
+            if wanted is not None and row["M_STOCK_USER_ID"] not in wanted:
+                continue
+            login_time = _parse_time(row["LAST_LOGIN_DATE"])
+            logged_out = _parse_time(row["LAST_LOGOUT_DATE"])
+            if login_time is None or (logged_out and logged_out >= login_time):
+                continue
+            if now >= self.manager.expires_at(login_time):
+                continue
+            result.append((row["M_STOCK_USER_ID"], row["M_STOCK_API_KEY"], row["M_ACCESS_TOKEN"]))
+        return result
+
+    def _diff(self, user_id, items):
+        """(new rows, upserts, deletes, repriced) against what is stored for the account"""
+        rows = {}
+        for item in items:
+            key, row_hash, values = normalize(user_id, item)
+            if key[1] and values[5]:
+                rows[key] = (row_hash, values)
+        old = self._rows.get(user_id, {})
+        upserts = [values + (row_hash,) for key, (row_hash, values) in rows.items()
+                   if old.get(key, (None,))[0] != row_hash]
+        deletes = [(user_id,) + key for key in old if key not in rows]
+        repriced = any(key in old and old[key][1][_PRICES:] != values[_PRICES:] for key, (_, values) in rows.items())
+        return rows, upserts, deletes, repriced
+
+    def _write(self, batch, report):
+        """One transaction for a batch of changed accounts; memory is only updated once it commits"""
+        upserts = [row for _, _, _, rows, _ in batch for row in rows]
+        deletes = [key for _, _, _, _, keys in batch for key in keys]
+        try:
+            with db.transaction() as conn:
+                cursor = conn.cursor()
+                if upserts:
+                    cursor.executemany(_upsert_sql(), upserts)
+                if deletes:
+                    cursor.executemany(_DELETE_SQL, deletes)
+                cursor.executemany(_sync_state_sql(), [(user_id, digest, len(rows))
+                                                       for user_id, digest, rows, _, _ in batch])
+                cursor.close()
+        except Exception as e:
+            print(f"❌ Holdings batch failed: {e}")
+            report["failed"] += len(batch)
+            SYNC_ACCOUNTS.inc(len(batch), result="failed")
+            return
+        for user_id, digest, rows, _, _ in batch:
+            self._hashes[user_id] = digest
+            self._rows[user_id] = rows
+            self._builder.set_account(user_id, rows)
+        report["changed"] += len(batch)
+        report["rows_upserted"] += len(upserts)
+        report["rows_deleted"] += len(deletes)
+        report["batches"] += 1
+        SYNC_ACCOUNTS.inc(len(batch), result="changed")
+        SYNC_ROWS.inc(len(upserts), op="upsert")
+        SYNC_ROWS.inc(len(deletes), op="delete")
+
+    def sync(self, user_ids=None, force=False):
+        """
+        Fetch holdings for every account with a valid session and write what
+        changed. force=True rewrites accounts even when their hash matches.
+        Returns a report dict.
+        """
+        with self._sync_lock, tracing.span("holdings.sync") as span, SYNC_SECONDS.time():
+            started = time.perf_counter()
+            accounts = self.accounts(user_ids)
+            report = {"accounts": len(accounts), "changed": 0, "unchanged": 0, "repriced": 0, "failed": 0,
+                      "rows_upserted": 0, "rows_deleted": 0, "batches": 0}
+            if user_ids:
+                report["skipped"] = len(set(user_ids) - {user_id for user_id, _, _ in accounts})
+                SYNC_ACCOUNTS.inc(report["skipped"], result="skipped")
+
+            batch, batch_rows = [], 0
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="holdings") as executor:
+                futures = {executor.submit(self._fetch, api_key, access_token): user_id
+                           for user_id, api_key, access_token in accounts}
+                # Diff and write as results arrive; later fetches keep running meanwhile
+                for future in as_completed(futures):
+                    user_id = futures[future]
+                    try:
+                        items = (future.result() or {}).get("data") or []
+                    except Exception as e:
+                        report["failed"] += 1
+                        SYNC_ACCOUNTS.inc(result="failed")
+                        db.insert_request_response_log("WARN", "Holdings fetch failed", MODULE,
+                                                       {"user_id": user_id}, str(e), api_name="holdings",
+                                                       user_id=user_id, status="failure")
+                        continue
+                    rows, upserts, deletes, repriced = self._diff(user_id, items)
+                    digest = account_hash(rows)
+                    if digest == self._hashes.get(user_id) and not force:
+                        report["unchanged"] += 1
+                        SYNC_ACCOUNTS.inc(result="unchanged")
+                        if repriced:
+                            # Same positions, new quotes: memory only
+                            self._rows[user_id] = rows
+                            self._builder.set_account(user_id, rows)
+                            report["repriced"] += 1
+                        continue
+                    if force:
+                        upserts = [values + (row_hash,) for row_hash, values in rows.values()]
+                    batch.append((user_id, digest, rows, upserts, deletes))
+                    batch_rows += len(upserts) + len(deletes) + 1
+                    if batch_rows >= self.batch_size:
+                        self._write(batch, report)
+                        batch, batch_rows = [], 0
+            if batch:
+                self._write(batch, report)
+
+            if report["changed"] or report["repriced"]:
+                self.view = self._builder.build()
+            report["positions"] = len(self.view)
+            report["seconds"] = round(time.perf_counter() - started, 3)
+            span.set_attributes({"holdings.accounts": len(accounts), "holdings.changed": report["changed"]})
+            return report
+
+    def forget(self, user_id):
+        """Drop an account's holdings (e.g. the user was deleted)"""
+        with self._sync_lock:
+            with db.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM holdings WHERE M_STOCK_USER_ID = %s", (user_id,))
+                cursor.execute("DELETE FROM holdings_sync WHERE M_STOCK_USER_ID = %s", (user_id,))
+                cursor.close()
+            self._rows.pop(user_id, None)
+            self._hashes.pop(user_id, None)
+            self._builder.set_account(user_id, {})
+            self.view = self._builder.build()
+
+
+def from_settings(**overrides) -> HoldingsSync:
+    settings = get_settings()
+    options = dict(workers=settings.get("HOLDINGS_SYNC_WORKERS", 8, int),
+                   batch_size=settings.get("HOLDINGS_SYNC_BATCH", 500, int))
+    options.update(overrides)
+    return HoldingsSync(**options)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sync holdings and show portfolio exposure")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync_parser = sub.add_parser("sync", help="fetch holdings for every logged-in account")
+    sync_parser.add_argument("--force", action="store_true", help="rewrite accounts whose hash did not change")
+    sync_parser.add_argument("--user", action="append", help="only this account (repeatable)")
+    exposure_parser = sub.add_parser("exposure", help="aggregate the stored holdings")
+    exposure_parser.add_argument("--by", choices=PortfolioView.KEYS, default="sector")
+    exposure_parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    holdings = from_settings()
+    holdings.load()
+    if args.command == "sync":
+        report = holdings.sync(args.user, force=args.force)
+        print(f"✅ Holdings synced: {report}")
+        db.flush_logs()
+    else:
+        view = holdings.view
+        print(f"📊 {view.summary()}")
+        for label, exposure in view.top(args.by, args.top):
+            print(f"   {label:<24} {exposure:>16,.2f}")
@@ -0,0 +1,206 @@
+"""
+Shared keep-alive HTTP client for the mStock API.
+One MStockClient per BASE_URL wraps a pooled requests.Session, so repeated
+calls reuse TCP/TLS connections instead of handshaking every time. requests
+is imported and the session built on the first call, not at import. Each
+endpoint has its own (connect, read) timeout, and the static X-Mirae-Version /
+Content-Type / Authorization headers are built once and reused.
+
+    client = http_client.get_client(BASE_URL)
+    client.post("/connect/login", data={...})
+    client.get("/user/fundsummary", auth=(api_key, access_token))
+    client.stats()   # requests, new_connections, reused_connections, per-endpoint latency
+"""
+
+import threading
+import time
+from functools import lru_cache
+
+from src import metrics, rate_limiter, tracing
+from src.settings import get_settings
+
+API_VERSION = "1"
+
+settings = get_settings()
+_CONNECT_TIMEOUT = settings.get("HTTP_CONNECT_TIMEOUT", 3.05, float)
+_READ_TIMEOUT = settings.get("HTTP_READ_TIMEOUT", 10.0, float)
+
+# endpoint -> (connect, read) seconds; anything not listed uses the defaults above
+ENDPOINT_TIMEOUTS = {
+    "/connect/login": (_CONNECT_TIMEOUT, 15.0),
+    "/session/token": (_CONNECT_TIMEOUT, 15.0),
+    "/session/refresh_token": (_CONNECT_TIMEOUT, 15.0),
+    "/session/verifytotp": (_CONNECT_TIMEOUT, 10.0),
+    "/user/fundsummary": (_CONNECT_TIMEOUT, 5.0),
+    "/logout": (_CONNECT_TIMEOUT, 5.0),
+    "/orders/regular": (_CONNECT_TIMEOUT, 5.0),
+}
+
+_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+HTTP_REQUEST_SECONDS = metrics.histogram("mstock_http_request_seconds", "mStock API call latency", ("endpoint",))
+HTTP_RESPONSES = metrics.counter("mstock_http_responses_total",
+                                 "mStock API calls by endpoint and HTTP status (error = no response)",
+                                 ("endpoint", "status"))
+
+
+def endpoint_label(endpoint):
+    """Metric/span label: order ids are folded so /orders/regular/<id> stays one series"""
+    parts = endpoint.split("/")
+    if len(parts) > 3 and parts[1] == "orders":
+        return "/".join(parts[:3]) + "/{order_id}"
+    return endpoint
+
+@lru_cache(maxsize=1024)
+def _auth_headers(api_key, access_token):
+    """Authorization header per (api_key, access_token), built once"""
+    return {"Authorization": f"token {api_key}:{access_token}"}
+
+
+class MStockClient:
+    """Pooled keep-alive session for one BASE_URL; safe to share between threads"""
+
+    def __init__(self, base_url: str, pool_size: int = 10, timeouts: dict = None, scheduler=None):
+        self.base_url = base_url.rstrip("/")
+        self.scheduler = scheduler       # rate_limiter.RequestScheduler, or None for no limiting
+        self.timeouts = dict(ENDPOINT_TIMEOUTS, **(timeouts or {}))
+        self.default_timeout = (_CONNECT_TIMEOUT, _READ_TIMEOUT)
+        self.pool_size = pool_size
+
+        self._adapter = None
+        self._session = None
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._errors = 0
+        self._throttled = 0
+        self._latency = {}     # endpoint -> [count, total_seconds, max_seconds]
+
+    # -------------------------------
+    # Requests
+    # -------------------------------
+
+    def _get_session(self):
+        """Build the pooled session on first use (importing requests costs ~100 ms)"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=0)
+                    session = requests.Session()
+                    session.mount("https://", self._adapter)
+                    session.mount("http://", self._adapter)
+                    session.headers.update({"X-Mirae-Version": API_VERSION, "Connection": "keep-alive"})
+                    self._session = session
+        return self._session
+
+    def timeout_for(self, endpoint):
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    def request(self, method, endpoint, auth=None, headers=None, **kwargs):
+        """
+        Send a request to base_url + endpoint.
+        auth=(api_key, access_token) adds the cached Authorization header.
+        Waits for the rate limiter first; a 429 pauses the endpoint group.
+        """
+        merged = dict(headers or {})
+        if auth:
+            merged.update(_auth_headers(*auth))
+        kwargs.setdefault("timeout", self.timeout_for(endpoint))
+        data = kwargs.get("data")
+        api_key = auth[0] if auth else (data.get("api_key") if isinstance(data, dict) else None)
+        label = endpoint_label(endpoint)
+        with tracing.span(f"http {method} {label}", **{"http.method": method, "endpoint": label}) as span:
+            if self.scheduler is not None:
+                span.set_attribute("rate_limit.wait_ms", self.scheduler.acquire(endpoint, api_key) * 1000)
+
+            session = self._get_session()
+            started = time.perf_counter()
+            try:
+                response = session.request(method, self.base_url + endpoint, headers=merged, **kwargs)
+                span.set_attribute("http.status_code", response.status_code)
+                HTTP_RESPONSES.inc(endpoint=label, status=response.status_code)
+                if response.status_code == 429:
+                    self._on_throttled(endpoint, api_key, response)
+                return response
+            except OSError:     # requests.RequestException and socket errors
+                with self._lock:
+                    self._errors += 1
+                HTTP_RESPONSES.inc(endpoint=label, status="error")
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                HTTP_REQUEST_SECONDS.observe(elapsed, endpoint=label)
+                self._record(label, elapsed)
+
+    def get(self, endpoint, auth=None, **kwargs):
+        return self.request("GET", endpoint, auth=auth, **kwargs)
+
+    def post(self, endpoint, data=None, auth=None, **kwargs):
+        """Form-encoded POST, as every mStock session endpoint expects (data may be pre-encoded bytes)"""
+        return self.request("POST", endpoint, auth=auth, headers=_FORM_HEADERS, data=data, **kwargs)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+    def _on_throttled(self, endpoint, api_key, response):
+        with self._lock:
+            self._throttled += 1
+        if self.scheduler is not None:
+            try:
+                retry_after = float(response.headers.get("Retry-After", 1))
+            except ValueError:
+                retry_after = 1.0
+            self.scheduler.throttled(endpoint, api_key, retry_after)
+
+    # -------------------------------
+    # Metrics
+    # -------------------------------
+
+    def _record(self, endpoint, elapsed):
+        with self._lock:
+            self._requests += 1
+            entry = self._latency.setdefault(endpoint, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            entry[2] = max(entry[2], elapsed)
+
+    def _new_connections(self):
+        """urllib3 counts the connections each host pool had to open"""
+        if self._adapter is None:
+            return 0
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in list(pools.keys()))
+
+    def stats(self) -> dict:
+        new_connections = self._new_connections()
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "errors": self._errors,
+                "throttled_429": self._throttled,
+                "new_connections": new_connections,
+                "reused_connections": max(self._requests - self._errors - new_connections, 0),
+                "endpoints": {
+                    endpoint: {"count": count, "avg_ms": round(total / count * 1000, 2),
+                               "max_ms": round(peak * 1000, 2)}
+                    for endpoint, (count, total, peak) in self._latency.items()
+                },
+            }
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(base_url: str) -> MStockClient:
+    """Process-wide client for base_url (created on first use)"""
+    client = _clients.get(base_url)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(base_url)
+            if client is None:
+                client = _clients[base_url] = MStockClient(
+                    base_url, pool_size=settings.get("HTTP_POOL_SIZE", 10, int), scheduler=rate_limiter.scheduler
+                )
+    return client
@@ -0,0 +1,302 @@
+"""
+Local stand-in for the mStock Type A API, for offline performance tests.
+Implements /connect/login, /session/token, /session/refresh_token,
+/session/verifytotp, /user/fundsummary, /portfolio/holdings, /orders/regular,
+/orders and /logout under /openapi/typea with configurable latency, random
+errors and throttling (429 + Retry-After).
+
+The login response carries the OTP (as an SMS would), and /session/token
+accepts it as the request token. Holdings are generated per user from a small
+symbol list unless a test sets state.holdings[user_id].
+
+Usage (from project root):
+    python -m src.loadtest.fake_server --port 8787 --latency-ms 40 --jitter-ms 20 --error-rate 0.01 --max-rps 200
+    MSTOCK_BASE_URL=http://127.0.0.1:8787/openapi/typea python -m src.auth ...
+"""
+
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+PREFIX = "/openapi/typea"
+
+# (symbol, isin, base price) used to generate holdings
+SAMPLE_SYMBOLS = [
+    ("RELIANCE", "INE002A01018", 2900.0), ("TCS", "INE467B01029", 3900.0), ("INFY", "INE009A01021", 1500.0),
+    ("HDFCBANK", "INE040A01034", 1600.0), ("ICICIBANK", "INE090A01021", 1100.0), ("SBIN", "INE062A01020", 800.0),
+    ("ITC", "INE154A01025", 430.0), ("LT", "INE018A01030", 3500.0), ("SUNPHARMA", "INE044A01036", 1550.0),
+    ("MARUTI", "INE585B01010", 12000.0), ("TATASTEEL", "INE081A01020", 150.0), ("BHARTIARTL", "INE397D01024", 1400.0),
+]
+
+
+class FakeMStockState:
+    """Behaviour knobs plus the issued request/access tokens"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, max_rps=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.max_rps = max_rps
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._request_tokens = {}    # request_token -> user_id
+        self._sessions = {}          # access_token -> user_id
+        self._refresh_tokens = {}    # refresh_token -> user_id
+        self.holdings = {}           # user_id -> holdings rows (generated on first request)
+        self.orders = []             # accepted orders, oldest first
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self.counters = {"requests": 0, "errors": 0, "throttled": 0}
+
+    # -------------------------------
+    # Behaviour
+    # -------------------------------
+
+    def delay(self):
+        jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        seconds = max(self.latency_ms + jitter, 0.0) / 1000
+        if seconds:
+            time.sleep(seconds)
+
+    def admit(self):
+        """Returns None, 'throttle' or 'error' for the next request"""
+        with self._lock:
+            self.counters["requests"] += 1
+            if self.max_rps:
+                now = time.monotonic()
+                if now - self._window_start >= 1.0:
+                    self._window_start, self._window_count = now, 0
+                self._window_count += 1
+                if self._window_count > self.max_rps:
+                    self.counters["throttled"] += 1
+                    return "throttle"
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.counters["errors"] += 1
+                return "error"
+        return None
+
+    # -------------------------------
+    # Tokens
+    # -------------------------------
+
+    def issue_request_token(self, user_id):
+        # Longer than the real 3-digit OTP so concurrent accounts never collide
+        otp = secrets.token_hex(4)
+        with self._lock:
+            self._request_tokens[otp] = user_id
+        return otp
+
+    def issue_session(self, request_token):
+        with self._lock:
+            user_id = self._request_tokens.pop(request_token, None)
+        if user_id is None:
+            return None
+        return self._new_session(user_id)
+
+    def renew_session(self, refresh_token):
+        with self._lock:
+            user_id = self._refresh_tokens.pop(refresh_token, None)
+        if user_id is None:
+            return None
+        return self._new_session(user_id)
+
+    def _new_session(self, user_id):
+        access_token, refresh_token = secrets.token_hex(16), secrets.token_hex(16)
+        with self._lock:
+            self._sessions[access_token] = user_id
+            self._refresh_tokens[refresh_token] = user_id
+        return {
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "public_token": secrets.token_hex(8),
+            "enctoken": secrets.token_hex(8),
+            "user_id": user_id,
+            "user_name": f"Load Test {user_id}",
+            "login_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "logout_time": None,
+        }
+
+    def holdings_for(self, user_id):
+        with self._lock:
+            if user_id not in self.holdings:
+                rng = random.Random(user_id)
+                self.holdings[user_id] = [{
+                    "tradingsymbol": symbol, "exchange": "NSE", "isin": isin, "product": "CNC",
+                    "quantity": rng.randint(1, 200), "average_price": round(price * rng.uniform(0.8, 1.1), 2),
+                    "last_price": price, "close_price": price,
+                } for symbol, isin, price in rng.sample(SAMPLE_SYMBOLS, rng.randint(3, 8))]
+            return [dict(row) for row in self.holdings[user_id]]
+
+    def place_order(self, user_id, form):
+        with self._lock:
+            order = dict(form, order_id=f"{len(self.orders) + 1:012d}", user_id=user_id, status="OPEN")
+            self.orders.append(order)
+            return order["order_id"]
+
+    def orders_for(self, user_id):
+        with self._lock:
+            return [dict(order) for order in self.orders if order["user_id"] == user_id]
+
+    def user_for(self, authorization):
+        """'token <api_key>:<access_token>' -> user_id or None"""
+        if not authorization or ":" not in authorization:
+            return None
+        access_token = authorization.rsplit(":", 1)[1]
+        with self._lock:
+            return self._sessions.get(access_token)
+
+    def end_session(self, authorization):
+        access_token = (authorization or "").rsplit(":", 1)[-1]
+        with self._lock:
+            return self._sessions.pop(access_token, None)
+
+
+class FakeMStockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+    state = None                    # set by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        head = [f"HTTP/1.1 {status} {self.responses.get(status, ('',))[0]}",
+                "Content-Type: application/json",
+                f"Content-Length: {len(body)}"]
+        head += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        # One write per response; separate header/body writes stall on delayed ACKs
+        self.wfile.write(("\r\n".join(head) + "\r\n\r\n").encode() + body)
+
+    def _form(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        fields = parse_qs(self.rfile.read(length).decode()) if length else {}
+        return {k: v[0] for k, v in fields.items()}
+
+    def _handle(self, method):
+        path = urlsplit(self.path).path
+        form = self._form() if method == "POST" else {}
+        if not path.startswith(PREFIX):
+            return self._send(404, {"status": "error", "message": "Not found"})
+        endpoint = path[len(PREFIX):]
+
+        verdict = self.state.admit()
+        if verdict == "throttle":
+            return self._send(429, {"status": "error", "message": "Too many requests"}, {"Retry-After": "1"})
+        self.state.delay()
+        if verdict == "error":
+            return self._send(500, {"status": "error", "message": "Injected failure"})
+
+        route = (method, endpoint)
+        if route == ("POST", "/connect/login"):
+            if not form.get("username") or not form.get("password"):
+                return self._send(400, {"status": "error", "message": "username and password required"})
+            otp = self.state.issue_request_token(form["username"])
+            data = {"cid": form["username"], "otp": otp, "request_token": otp}
+            return self._send(200, {"status": "success", "otp": otp, "request_token": otp, "data": data})
+
+        if route == ("POST", "/session/token"):
+            session = self.state.issue_session(form.get("request_token", ""))
+            if session is None:
+                return self._send(403, {"status": "error", "message": "Invalid request token"})
+            return self._send(200, {"status": "success", "access_token": session["access_token"], "data": session})
+
+        if route == ("POST", "/session/refresh_token"):
+            session = self.state.renew_session(form.get("refresh_token", ""))
+            if session is None:
+                return self._send(403, {"status": "error", "message": "Invalid refresh token"})
+            return self._send(200, {"status": "success", "data": session})
+
+        if route == ("POST", "/session/verifytotp"):
+            if self.state.user_for(f"x:{form.get('access_token', '')}") is None:
+                return self._send(403, {"status": "error", "message": "Invalid access token"})
+            return self._send(200, {"status": "success", "data": {"verified": True}})
+
+        if route == ("GET", "/user/fundsummary"):
+            user_id = self.state.user_for(self.headers.get("Authorization"))
+            if user_id is None:
+                return self._send(403, {"status": "error", "message": "Invalid session"})
+            return self._send(200, {"status": "success", "data": [{
+                "AVAILABLE_BALANCE": 100000.0, "SUM_OF_M2M": 0.0, "UTILIZED_AMOUNT": 0.0, "user_id": user_id,
+            }]})
+
+        if route == ("GET", "/portfolio/holdings"):
+            user_id = self.state.user_for(self.headers.get("Authorization"))
+            if user_id is None:
+                return self._send(403, {"status": "error", "message": "Invalid session"})
+            return self._send(200, {"status": "success", "data": self.state.holdings_for(user_id)})
+
+        if route == ("POST", "/orders/regular"):
+            user_id = self.state.user_for(self.headers.get("Authorization"))
+            if user_id is None:
+                return self._send(403, {"status": "error", "message": "Invalid session"})
+            missing = [f for f in ("tradingsymbol", "exchange", "transaction_type", "order_type", "quantity")
+                       if not form.get(f)]
+            if missing or not form["quantity"].isdigit() or int(form["quantity"]) <= 0:
+                return self._send(400, {"status": "error", "message": f"Invalid order: {missing or 'quantity'}"})
+            order_id = self.state.place_order(user_id, form)
+            return self._send(200, {"status": "success", "data": {"order_id": order_id}})
+
+        if route == ("GET", "/orders"):
+            user_id = self.state.user_for(self.headers.get("Authorization"))
+            if user_id is None:
+                return self._send(403, {"status": "error", "message": "Invalid session"})
+            return self._send(200, {"status": "success", "data": self.state.orders_for(user_id)})
+
+        if route == ("GET", "/logout"):
+            if self.state.end_session(self.headers.get("Authorization")) is None:
+                return self._send(403, {"status": "error", "message": "Invalid session"})
+            return self._send(200, {"status": "success", "data": True})
+
+        return self._send(404, {"status": "error", "message": f"Unknown endpoint {endpoint}"})
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+
+class FakeMStockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128        # the default backlog (5) resets bursts of new connections
+
+
+def make_server(host="127.0.0.1", port=0, **behaviour):
+    """Build (not start) a server; port=0 picks a free port. Returns (server, state)."""
+    state = FakeMStockState(**behaviour)
+    handler = type("BoundFakeMStockHandler", (FakeMStockHandler,), {"state": state})
+    return FakeMStockServer((host, port), handler), state
+
+def start_in_background(**kwargs):
+    """Start a server on a daemon thread; returns (server, state, base_url)"""
+    server, state = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True, name="fake-mstock").start()
+    host, port = server.server_address[:2]
+    return server, state, f"http://{host}:{port}{PREFIX}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the mStock Type A API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="mean added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="uniform +/- jitter on the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+    parser.add_argument("--max-rps", type=float, default=0.0, help="answer 429 above this many requests/second")
+    args = parser.parse_args()
+
+    server, state = make_server(args.host, args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                error_rate=args.error_rate, max_rps=args.max_rps)
+    print(f"🧪 Fake mStock API on http://{args.host}:{args.port}{PREFIX} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Counters: {state.counters}")
@@ -0,0 +1,220 @@
+"""
+End-to-end load test for the login → session → fund summary → logout pipeline.
+Drives src/auth.py (mode "auth") or mstock_auth_api_cli's login steps (mode
+"cli") for N accounts concurrently against the local fake server (or any
+--base-url) and reports throughput plus p50/p95/p99 per step.
+
+Usage (from project root):
+    python -m src.loadtest.run_load --accounts 50 --concurrency 10 --latency-ms 40
+    python -m src.loadtest.run_load --mode cli --accounts 100 --sqlite --error-rate 0.01
+    python -m src.loadtest.run_load --base-url http://127.0.0.1:8787/openapi/typea --accounts 20
+"""
+
+import argparse
+import math
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+USER_PREFIX = "loadtest_"
+
+
+# -------------------------------
+# Statistics
+# -------------------------------
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+def summarize(samples):
+    """samples: [(step, seconds, ok)] -> {step: {count, errors, p50_ms, p95_ms, p99_ms, max_ms}}"""
+    by_step = {}
+    for step, seconds, ok in samples:
+        entry = by_step.setdefault(step, {"times": [], "errors": 0})
+        entry["times"].append(seconds * 1000)
+        entry["errors"] += 0 if ok else 1
+    report = {}
+    for step, entry in by_step.items():
+        times = sorted(entry["times"])
+        report[step] = {
+            "count": len(times),
+            "errors": entry["errors"],
+            "p50_ms": percentile(times, 50),
+            "p95_ms": percentile(times, 95),
+            "p99_ms": percentile(times, 99),
+            "max_ms": times[-1],
+        }
+    return report
+
+def format_report(report, wall_seconds, accounts, ok_accounts):
+    header = f"{'STEP':<18} {'COUNT':>6} {'ERRORS':>6} {'P50 ms':>8} {'P95 ms':>8} {'P99 ms':>8} {'MAX ms':>8}"
+    lines = [header, "-" * len(header)]
+    for step, r in report.items():
+        lines.append(f"{step:<18} {r['count']:>6} {r['errors']:>6} {r['p50_ms']:>8.1f} "
+                     f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    calls = sum(r["count"] for r in report.values())
+    lines.append(f"{ok_accounts}/{accounts} accounts completed in {wall_seconds:.2f}s — "
+                 f"{accounts / wall_seconds:.1f} accounts/s, {calls / wall_seconds:.1f} calls/s")
+    return "\n".join(lines)
+
+
+# -------------------------------
+# Account Setup
+# -------------------------------
+
+def seed_accounts(count, password="loadtest-password"):
+    """Upsert loadtest_NNNN users with an encrypted password; returns [(user_id, password, api_key)]"""
+    import config
+    from src import db, user_bulk
+
+    key_id = config.keyring.active_key_id()
+    cipher = config.encrypt_str(password)
+    users = [(f"{USER_PREFIX}{i:04d}", password, f"api-{USER_PREFIX}{i:04d}") for i in range(count)]
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(user_bulk.upsert_sql(),
+                           [(user_id, cipher, api_key, "A", key_id) for user_id, _, api_key in users])
+        cursor.close()
+    return users
+
+def remove_accounts():
+    from src import db
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID LIKE %s",
+                       (f"{USER_PREFIX}%",))
+        cursor.close()
+
+
+# -------------------------------
+# Account Flows
+# -------------------------------
+
+class _Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = []
+
+    def timed(self, step, fn, *args, check=None, **kwargs):
+        """Time fn(*args); check(result) -> False also counts the call as an error"""
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = check(result) if check else True
+            return result
+        finally:
+            with self._lock:
+                self.samples.append((step, time.perf_counter() - started, ok))
+
+
+def auth_flow(recorder, user_id, password, api_key, fund_calls):
+    from src import auth
+    otp, request_token = recorder.timed("login", auth.login, user_id, password)
+    access_token = recorder.timed("generate_session", auth.generate_session, user_id, api_key, request_token, "")
+    recorder.timed("verify_totp", auth.verify_totp, api_key, otp, access_token)
+    for _ in range(fund_calls):
+        recorder.timed("fund_summary", auth.get_fund_summary, api_key, access_token)
+    recorder.timed("logout", auth.logout, api_key, access_token)
+
+def cli_flow(recorder, user_id, password, api_key, fund_calls):
+    from src import auth, mstock_auth_api_cli as cli
+    context, failure = recorder.timed("login", cli.start_login, user_id, check=lambda r: r[1] is None)
+    if failure:
+        raise RuntimeError(failure["reason"])
+    otp = context["login_json"]["data"]["otp"]    # the fake server returns the "SMS" OTP
+    result = recorder.timed("generate_session", cli.complete_login, context, otp,
+                            check=lambda r: r["status"] == "success")
+    if result["status"] != "success":
+        raise RuntimeError(result["reason"])
+    access_token = result["tokens"]["access_token"]
+    for _ in range(fund_calls):
+        recorder.timed("fund_summary", auth.get_fund_summary, api_key, access_token)
+    recorder.timed("logout", auth.logout, api_key, access_token)
+
+FLOWS = {"auth": auth_flow, "cli": cli_flow}
+
+
+def run(accounts, concurrency, mode="auth", fund_calls=3):
+    """Seed accounts, run the flow for each concurrently; returns (report, wall_seconds, ok_accounts)"""
+    users = seed_accounts(accounts)
+    recorder = _Recorder()
+    flow = FLOWS[mode]
+    failures = []
+
+    def one(user):
+        try:
+            recorder.timed("account_total", flow, recorder, *user, fund_calls)
+        except Exception as e:
+            failures.append((user[0], str(e)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="load") as pool:
+        list(pool.map(one, users))
+    wall = time.perf_counter() - started
+    for user_id, reason in failures[:5]:
+        print(f"   ❌ {user_id}: {reason}")
+    return summarize(recorder.samples), wall, accounts - len(failures)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline load test for the mStock auth pipeline")
+    parser.add_argument("--mode", choices=sorted(FLOWS), default="auth", help="drive src/auth.py or the CLI steps")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--fund-calls", type=int, default=3, help="fund summary calls per account")
+    parser.add_argument("--base-url", help="use an already running server instead of starting the fake one")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-rps", type=float, default=0.0)
+    parser.add_argument("--sqlite", action="store_true", help="run against a throw-away SQLite database")
+    parser.add_argument("--no-rate-limit", action="store_true", help="disable the client-side rate limiter")
+    parser.add_argument("--no-cache", action="store_true", help="disable the fund summary cache")
+    parser.add_argument("--keep", action="store_true", help="keep the loadtest_ users afterwards")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so set them before importing src modules
+    server = None
+    if args.base_url:
+        os.environ["MSTOCK_BASE_URL"] = args.base_url
+    else:
+        from src.loadtest.fake_server import start_in_background
+        server, state, base_url = start_in_background(latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                                                      error_rate=args.error_rate, max_rps=args.max_rps)
+        os.environ["MSTOCK_BASE_URL"] = base_url
+    os.environ["MSTOCK_CONNECT"] = "http"
+    if args.sqlite:
+        os.environ["DB_BACKEND"] = "sqlite"
+        scratch = tempfile.mkdtemp()
+        os.environ["DB_SQLITE_PATH"] = os.path.join(scratch, "mstock_load.db")
+        os.environ["SESSION_STORE_PATH"] = os.path.join(scratch, "session_store.db")
+        if not os.getenv("ENCRYPTION_KEY"):
+            from cryptography.fernet import Fernet
+            os.environ["ENCRYPTION_KEY"] = Fernet.generate_key().decode()
+    if args.no_rate_limit:
+        os.environ["RATE_LIMIT_ENABLED"] = "0"
+    if args.no_cache:
+        os.environ["CACHE_TTL_FUNDSUMMARY"] = "0"
+
+    print(f"🚀 {args.accounts} accounts, concurrency {args.concurrency}, mode {args.mode} → {os.environ['MSTOCK_BASE_URL']}")
+    try:
+        report, wall, ok_accounts = run(args.accounts, args.concurrency, args.mode, args.fund_calls)
+        print(format_report(report, wall, args.accounts, ok_accounts))
+
+        from src import auth, db
+        print(f"HTTP client: { {k: v for k, v in auth.api_client().stats().items() if k != 'endpoints'} }")
+        if server is not None:
+            print(f"Fake server: {state.counters}")
+        db.flush_logs()
+    finally:
+        if not args.keep:
+            remove_accounts()
+        if server is not None:
+            server.shutdown()
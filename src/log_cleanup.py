@@ -1,27 +1,196 @@
+"""
+Retention for the log tables (logs, MS01_REQUEST_RESPONSE_LOG).
+Old rows are deleted in bounded primary-key chunks, each in its own short
+transaction with optional throttling, so cleanup can run on a live system
+without long locks or replication lag spikes. Tables range-partitioned by
+SYS_CREATE_DATE_TIME have whole expired partitions dropped instead.
+
+Usage (from project root):
+    python -m src.log_cleanup                         # interactive
+    python -m src.log_cleanup --days 30 --dry-run     # report row counts only
+    python -m src.log_cleanup --days 30 --yes --chunk-size 5000 --sleep 0.2 --drop-partitions
+"""
+
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
 from src import db
 
-def cleanup_logs(days=30):
-    """Delete logs older than N days (default: 30)"""
-    conn = db.get_connection()
-    cursor = conn.cursor()
-    cursor.execute("""
-        DELETE FROM logs
-        WHERE TIMESTAMP < NOW() - INTERVAL %s DAY
-    """, (days,))
-    conn.commit()
-    cursor.close()
-    conn.close()
-    print(f"[INFO] Logs older than {days} days have been deleted.")
+# table -> (primary key, creation timestamp column)
+RETENTION_TABLES = {
+    "logs": ("LOG_ID", "SYS_CREATE_DATE_TIME"),
+    "MS01_REQUEST_RESPONSE_LOG": ("id", "SYS_CREATE_DATE_TIME"),
+}
+
+
+# -------------------------------
+# Partition Support
+# -------------------------------
+
+def _partition_upper_bound(expression, description):
+    """Convert a RANGE partition's LESS THAN value into a datetime (None for MAXVALUE)"""
+    if description is None or description.upper() == "MAXVALUE":
+        return None
+    value = description.strip("'\"")
+    expression = (expression or "").lower()
+    if value.lstrip("-").isdigit():
+        number = int(value)
+        if "to_days" in expression:
+            # MySQL TO_DAYS counts from year 0; Python ordinals from year 1
+            return datetime.combine(date.fromordinal(number - 365), datetime.min.time())
+        return datetime.fromtimestamp(number)   # UNIX_TIMESTAMP(...)
+    return datetime.fromisoformat(value)        # RANGE COLUMNS(SYS_CREATE_DATE_TIME)
+
+def expired_partitions(table, cutoff):
+    """
+    RANGE partitions whose upper bound is at or before the cutoff, i.e. every
+    row inside is older than the retention window. Returns [(name, approx_rows)].
+    SQLite has no partitioning, so there is nothing to drop.
+    """
+    if db.get_backend().name == "sqlite":
+        return []
+    try:
+        rows = db.fetch_all("""
+            SELECT PARTITION_NAME, PARTITION_METHOD, PARTITION_EXPRESSION,
+                   PARTITION_DESCRIPTION, TABLE_ROWS
+            FROM information_schema.PARTITIONS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+            ORDER BY PARTITION_ORDINAL_POSITION
+        """, (table,))
+    except Exception as e:
+        # Fall back to the chunked delete, but do not hide why partitions were skipped
+        print(f"⚠️ Partitions of {table} not checked, deleting row by row: {e}")
+        db.insert_log("WARN", f"Partition lookup for {table} failed: {e}", "log_cleanup")
+        return []
+
+    expired = []
+    for row in rows:
+        if not (row.get("PARTITION_METHOD") or "").startswith("RANGE"):
+            continue
+        bound = _partition_upper_bound(row.get("PARTITION_EXPRESSION"), row.get("PARTITION_DESCRIPTION"))
+        if bound is not None and bound <= cutoff:
+            expired.append((row["PARTITION_NAME"], row.get("TABLE_ROWS") or 0))
+    return expired
+
+def drop_partitions(table, names):
+    """Dropping a partition is a metadata operation: no row-by-row delete, no long lock"""
+    if not names:
+        return
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"ALTER TABLE {table} DROP PARTITION {', '.join(names)}")
+        cursor.close()
+
+
+# -------------------------------
+# Chunked Delete
+# -------------------------------
+
+def count_expired(table, cutoff):
+    _, created_col = RETENTION_TABLES[table]
+    row = db.fetch_one(f"SELECT COUNT(*) AS CNT FROM {table} WHERE {created_col} < %s", (cutoff,))
+    return row["CNT"] if row else 0
+
+def delete_in_chunks(table, cutoff, chunk_size=5000, sleep=0.0):
+    """
+    Delete rows older than cutoff walking the primary key in ranges of chunk_size.
+    Each range is one short transaction; returns (rows_deleted, chunks).
+    """
+    pk, created_col = RETENTION_TABLES[table]
+    bounds = db.fetch_one(
+        f"SELECT MIN({pk}) AS LO, (SELECT MAX({pk}) FROM {table} WHERE {created_col} < %s) AS HI FROM {table}",
+        (cutoff,)
+    )
+    if not bounds or bounds["HI"] is None:
+        return 0, 0
+
+    deleted = chunks = 0
+    low, high = bounds["LO"], bounds["HI"]
+    while low <= high:
+        upper = min(low + chunk_size - 1, high)
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {pk} BETWEEN %s AND %s AND {created_col} < %s",
+                (low, upper, cutoff)
+            )
+            deleted += cursor.rowcount
+            cursor.close()
+        chunks += 1
+        low = upper + 1
+        if sleep and low <= high:
+            time.sleep(sleep)
+    return deleted, chunks
+
+
+# -------------------------------
+# Retention Entry Points
+# -------------------------------
+
+def run_retention(days=30, tables=None, chunk_size=5000, sleep=0.0, dry_run=False, use_partitions=False):
+    """Apply retention to each table; returns {table: report}"""
+    cutoff = datetime.now() - timedelta(days=days)
+    report = {}
+    for table in tables or RETENTION_TABLES:
+        if table not in RETENTION_TABLES:
+            raise ValueError(f"No retention rule for table {table}")
+        partitions = expired_partitions(table, cutoff) if use_partitions else []
+        entry = {"cutoff": cutoff.isoformat(sep=" ", timespec="seconds"),
+                 "partitions": [name for name, _ in partitions]}
+
+        if dry_run:
+            entry["would_delete"] = count_expired(table, cutoff)
+        else:
+            drop_partitions(table, entry["partitions"])
+            entry["deleted"], entry["chunks"] = delete_in_chunks(table, cutoff, chunk_size, sleep)
+        report[table] = entry
+    return report
+
+def cleanup_logs(days=30, **kwargs):
+    """Delete log rows older than N days (default: 30) from both log tables"""
+    report = run_retention(days, **kwargs)
+    for table, entry in report.items():
+        if "would_delete" in entry:
+            print(f"[DRY-RUN] {table}: {entry['would_delete']} rows older than {entry['cutoff']}"
+                  + (f", partitions to drop: {entry['partitions']}" if entry["partitions"] else ""))
+        else:
+            print(f"[INFO] {table}: deleted {entry['deleted']} rows in {entry['chunks']} chunk(s)"
+                  + (f", dropped partitions {entry['partitions']}" if entry["partitions"] else ""))
+    if not kwargs.get("dry_run"):
+        db.insert_log("INFO", f"Log retention ({days} days): {report}", "log_cleanup")
+        print(f"[INFO] Logs older than {days} days have been deleted.")
+    return report
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log retention for logs and MS01_REQUEST_RESPONSE_LOG")
+    parser.add_argument("--days", type=int, help="retention window in days (prompted if omitted)")
+    parser.add_argument("--table", action="append", choices=list(RETENTION_TABLES), help="limit to table(s)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="primary-key range per delete transaction")
+    parser.add_argument("--sleep", type=float, default=0.0, help="seconds to pause between chunks")
+    parser.add_argument("--drop-partitions", action="store_true", help="drop expired RANGE partitions first")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be deleted")
+    parser.add_argument("--yes", action="store_true", help="skip the confirmation prompt")
+    args = parser.parse_args()
+
     print("=== Log Cleanup Utility ===")
-    days = input("Enter number of days to retain logs (default 30): ").strip()
-    days = int(days) if days else 30
+    days = args.days
+    if days is None:
+        days = input("Enter number of days to retain logs (default 30): ").strip()
+        days = int(days) if days else 30
 
-    print(f"\n[WARNING] This will permanently delete logs older than {days} days.")
-    confirm = input("Type 'YES' to confirm cleanup, or anything else to cancel: ").strip().upper()
+    options = dict(tables=args.table, chunk_size=args.chunk_size, sleep=args.sleep,
+                   use_partitions=args.drop_partitions)
 
-    if confirm == "YES":
-        cleanup_logs(days)
+    if args.dry_run:
+        cleanup_logs(days, dry_run=True, **options)
     else:
-        print("[INFO] Cleanup cancelled. No logs were deleted.")
\ No newline at end of file
+        confirm = "YES"
+        if not args.yes:
+            print(f"\n[WARNING] This will permanently delete logs older than {days} days.")
+            confirm = input("Type 'YES' to confirm cleanup, or anything else to cancel: ").strip().upper()
+
+        if confirm == "YES":
+            cleanup_logs(days, **options)
+        else:
+            print("[INFO] Cleanup cancelled. No logs were deleted.")
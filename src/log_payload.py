@@ -0,0 +1,181 @@
+"""
+Encoding for MS01_REQUEST_RESPONSE_LOG payloads.
+Requests and responses are stored as JSON (not Python reprs). When the two
+together exceed LOG_COMPRESS_THRESHOLD bytes they are written as one
+compressed document into PAYLOAD (zstd if the zstandard package is installed,
+else zlib) and the request/response text columns stay NULL. Hot fields
+(STATUS, USER_ID, HTTP_STATUS) are extracted so they can be indexed, and
+token/password values are masked before anything is stored.
+
+    columns = encode(request, response, log_level="INFO")   # -> dict of column values
+    request, response = decode(row)                         # transparent for both layouts
+
+Settings (.env): LOG_COMPRESS_THRESHOLD (bytes, default 1024, 0 = always),
+LOG_COMPRESSION (auto | zstd | zlib | none).
+"""
+
+import ast
+import json
+import zlib
+
+from src.settings import get_settings
+
+settings = get_settings()
+
+COMPRESS_THRESHOLD = settings.get("LOG_COMPRESS_THRESHOLD", 1024, int)
+
+# Values under these keys never reach the log table
+SECRET_KEYS = {"access_token", "refresh_token", "public_token", "enctoken", "enc_token",
+               "password", "checksum", "secret_key", "otp", "request_token"}
+MASK = "***"
+
+
+# -------------------------------
+# Codecs
+# -------------------------------
+
+_zstd = None
+
+def _zstd_module():
+    """zstandard is optional; None when it is not installed"""
+    global _zstd
+    if _zstd is None:
+        try:
+            import zstandard
+            _zstd = zstandard
+        except ImportError:
+            _zstd = False
+    return _zstd or None
+
+def codec_name():
+    wanted = settings.get("LOG_COMPRESSION", "auto").lower()
+    if wanted in ("none", "zlib"):
+        return wanted
+    if _zstd_module() is not None:
+        return "zstd"
+    return "zlib"
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return _zstd_module().ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        module = _zstd_module()
+        if module is None:
+            raise RuntimeError("Row is zstd-compressed; install the zstandard package to read it")
+        return module.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+# -------------------------------
+# Normalizing
+# -------------------------------
+
+def to_jsonable(value):
+    """
+    dict/list -> as is; a str(dict) repr or JSON string -> parsed; anything
+    else (exception text, plain strings) -> the string itself.
+    """
+    if value is None or isinstance(value, (dict, list, int, float, bool)):
+        return value
+    if isinstance(value, BaseException):
+        return str(value)
+    text = str(value)
+    if text[:1] in ("{", "["):
+        try:
+            return json.loads(text)
+        except ValueError:
+            try:
+                return ast.literal_eval(text)   # callers used to pass str(dict)
+            except (ValueError, SyntaxError, MemoryError, RecursionError):
+                pass
+    return text
+
+def mask_secrets(value):
+    if isinstance(value, dict):
+        return {k: (MASK if k in SECRET_KEYS and v not in (None, "") else mask_secrets(v))
+                for k, v in value.items()}
+    if isinstance(value, list):
+        return [mask_secrets(v) for v in value]
+    return value
+
+def _dumps(value):
+    return json.dumps(value, default=str, separators=(",", ":"), ensure_ascii=False)
+
+
+# -------------------------------
+# Hot Fields
+# -------------------------------
+
+def _find(value, key):
+    """value[key] or value["data"][key] for dict payloads"""
+    if not isinstance(value, dict):
+        return None
+    if value.get(key) not in (None, ""):
+        return value[key]
+    data = value.get("data")
+    return data.get(key) if isinstance(data, dict) else None
+
+def hot_fields(request, response, log_level):
+    status = _find(response, "status")
+    if status not in ("success", "failure", "error"):
+        status = "failure" if str(log_level).upper() in ("ERROR", "CRITICAL") else "success"
+    user_id = _find(request, "user_id") or _find(request, "username") or _find(response, "user_id")
+    http_status = _find(response, "http_status")
+    return {
+        "status": "failure" if status == "error" else status,
+        "user_id": str(user_id)[:100] if user_id else None,
+        "http_status": int(http_status) if str(http_status or "").isdigit() else None,
+    }
+
+
+# -------------------------------
+# Public API
+# -------------------------------
+
+def encode(request, response, log_level="INFO", user_id=None, http_status=None, status=None):
+    """
+    Column values for one row: request, response, status, user_id,
+    http_status, payload_codec, payload. Explicit user_id / http_status /
+    status win over values found in the payload.
+    """
+    request = mask_secrets(to_jsonable(request))
+    response = mask_secrets(to_jsonable(response))
+    columns = hot_fields(request, response, log_level)
+    if user_id:
+        columns["user_id"] = str(user_id)
+    if http_status is not None:
+        columns["http_status"] = int(http_status)
+    if status:
+        columns["status"] = status
+
+    request_json = None if request is None else _dumps(request)
+    response_json = None if response is None else _dumps(response)
+    size = len(request_json or "") + len(response_json or "")
+    codec = codec_name()
+    if codec != "none" and size and size >= COMPRESS_THRESHOLD:
+        document = _dumps({"request": request, "response": response}).encode()
+        columns.update(request=None, response=None, payload_codec=codec,
+                       payload=compress(document, codec))
+    else:
+        columns.update(request=request_json, response=response_json, payload_codec=None, payload=None)
+    return columns
+
+def decode(row):
+    """(request, response) from a row dict; handles compressed, JSON and legacy repr rows"""
+    codec = row.get("PAYLOAD_CODEC")
+    if codec and row.get("PAYLOAD") is not None:
+        document = json.loads(decompress(bytes(row["PAYLOAD"]), codec))
+        return document.get("request"), document.get("response")
+    return _load_column(row.get("request")), _load_column(row.get("response"))
+
+def _load_column(text):
+    """JSON written by encode(); older rows hold str(dict) reprs or plain text"""
+    if text is None:
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return to_jsonable(text)
@@ -0,0 +1,216 @@
+"""
+Background log sink for db.insert_log / db.insert_request_response_log.
+Rows are queued and a worker thread writes them with executemany in batches,
+so logging no longer costs a DB round trip on the caller's thread.
+"""
+
+import atexit
+import queue
+import threading
+import time
+
+from src import metrics
+
+_FLUSH = object()
+_STOP = object()
+
+LOG_WRITE_SECONDS = metrics.histogram("mstock_log_write_seconds", "Time to write one batch of log rows")
+LOG_ROWS = metrics.counter("mstock_log_rows_total", "Log rows by outcome (written, dropped, failed)", ("result",))
+
+
+class LogWriter:
+    """
+    Bounded queue drained by one daemon thread.
+
+    - get_connection: callable returning a DB connection (pooled in practice)
+    - batch_size:     rows per executemany before an early flush
+    - flush_interval: max seconds a queued row waits before being written
+    - max_queue:      queue bound; beyond it rows are dropped or the caller blocks
+    - full_policy:    "drop" (count and discard) or "block" (wait up to block_timeout)
+    - async_mode:     False writes inline on the caller's thread (scripts/debugging)
+    """
+
+    def __init__(
+        self,
+        get_connection,
+        batch_size=100,
+        flush_interval=0.5,
+        max_queue=10000,
+        full_policy="drop",
+        block_timeout=1.0,
+        async_mode=True,
+    ):
+        if full_policy not in ("drop", "block"):
+            raise ValueError("full_policy must be 'drop' or 'block'")
+        self._get_connection = get_connection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.block_timeout = block_timeout
+        self.async_mode = async_mode
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "failed": 0, "batches": 0}
+
+    # -------------------------------
+    # Producer side
+    # -------------------------------
+
+    def write(self, sql, params):
+        """Queue one row for `sql`; returns False if it was dropped."""
+        if not self.async_mode:
+            self._write_batch([(sql, params)])
+            return True
+
+        self._ensure_worker()
+        try:
+            if self.full_policy == "block":
+                self._queue.put((sql, params), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((sql, params))
+        except queue.Full:
+            self._bump("dropped")
+            LOG_ROWS.inc(result="dropped")
+            return False
+        self._bump("enqueued")
+        return True
+
+    def flush(self, timeout=5.0):
+        """Write everything queued so far; returns False if the timeout expired first."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        deadline = time.monotonic() + timeout
+        try:
+            # A full queue (e.g. the DB is down) must not block past the timeout
+            self._queue.put(_FLUSH, timeout=timeout)
+        except queue.Full:
+            return False
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=5.0):
+        """Flush pending rows and stop the worker (registered with atexit)."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        deadline = time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return      # daemon thread: queued rows are lost rather than hanging exit
+        self._thread.join(max(deadline - time.monotonic(), 0))
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["queued"] = self._queue.qsize()
+        return snapshot
+
+    # -------------------------------
+    # Worker side
+    # -------------------------------
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="db-log-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while True:
+            batch, pulled, stop = self._collect()
+            try:
+                if stop:
+                    # Drain whatever is left so nothing queued is lost at exit
+                    while True:
+                        try:
+                            item = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        pulled += 1
+                        if item is not _FLUSH and item is not _STOP:
+                            batch.append(item)
+                if batch:
+                    self._write_batch(batch)
+            finally:
+                for _ in range(pulled):
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _collect(self):
+        """Gather rows until batch_size, flush_interval or a flush/stop marker."""
+        batch = []
+        item = self._queue.get()
+        pulled = 1
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if item is _STOP:
+                return batch, pulled, True
+            if item is _FLUSH:
+                return batch, pulled, False
+            batch.append(item)
+            remaining = deadline - time.monotonic()
+            if len(batch) >= self.batch_size or remaining <= 0:
+                return batch, pulled, False
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                return batch, pulled, False
+            pulled += 1
+
+    def _write_batch(self, batch):
+        grouped = {}
+        for sql, params in batch:
+            grouped.setdefault(sql, []).append(params)
+
+        for sql, rows in grouped.items():
+            try:
+                started = time.perf_counter()
+                conn = self._get_connection()
+                try:
+                    cursor = conn.cursor()
+                    cursor.executemany(sql, rows)
+                    conn.commit()
+                    cursor.close()
+                finally:
+                    conn.close()
+                LOG_WRITE_SECONDS.observe(time.perf_counter() - started)
+                LOG_ROWS.inc(len(rows), result="written")
+                self._bump("written", len(rows))
+                self._bump("batches")
+            except Exception as e:
+                print("Critical DB Logging Error (batch):", e)
+                self._write_rows_individually(sql, rows)
+
+    def _write_rows_individually(self, sql, rows):
+        # Isolate the bad row(s) so one failure doesn't lose the whole batch
+        for params in rows:
+            try:
+                conn = self._get_connection()
+                try:
+                    cursor = conn.cursor()
+                    cursor.execute(sql, params)
+                    conn.commit()
+                    cursor.close()
+                finally:
+                    conn.close()
+                self._bump("written")
+                LOG_ROWS.inc(result="written")
+            except Exception as e:
+                self._bump("failed")
+                LOG_ROWS.inc(result="failed")
+                print("Critical DB Logging Error:", e)
+
+    def _bump(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
@@ -0,0 +1,270 @@
+"""
+Concurrent multi-account login.
+Runs reuse → login → OTP → session for many users at once with asyncio.
+Broker/DB steps run in a bounded thread pool (at most `concurrency` accounts
+talk to mStock at the same time). Waiting for an OTP does not hold a slot,
+so one slow OTP never blocks the other accounts. OTPs come from an async
+source: stdin, a file that is polled, or a callback.
+
+Usage (from project root):
+    python -m src.login_orchestrator user1 user2 user3 --concurrency 8
+    python -m src.login_orchestrator --users-file users.txt --otp-file otps.txt
+    # stdin / OTP file lines: "<user_id> <otp>" (or "<user_id>,<otp>")
+"""
+
+import argparse
+import asyncio
+import inspect
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# -------------------------------
+# OTP Sources
+# -------------------------------
+
+class QueueOtpSource:
+    """OTPs delivered with put(user_id, otp); get() waits for that user's OTP only"""
+
+    def __init__(self):
+        self._waiters = {}    # user_id -> Future
+        self._early = {}      # OTPs that arrived before anyone asked
+
+    def _future(self, user_id):
+        future = self._waiters.get(user_id)
+        if future is None or future.done():
+            future = self._waiters[user_id] = asyncio.get_running_loop().create_future()
+        return future
+
+    def put(self, user_id, otp):
+        future = self._waiters.get(user_id)
+        if future is not None and not future.done():
+            future.set_result(otp)
+        else:
+            self._early[user_id] = otp
+
+    async def get(self, user_id, timeout=None):
+        if user_id in self._early:
+            return self._early.pop(user_id)
+        future = self._future(user_id)
+        self.requested(user_id)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._waiters.pop(user_id, None)
+
+    def requested(self, user_id):
+        """Hook called when an account starts waiting for its OTP"""
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    @staticmethod
+    def parse_line(line):
+        """'user otp' or 'user,otp' -> (user, otp); None for blank/invalid lines"""
+        parts = line.replace(",", " ").split()
+        return (parts[0], parts[1]) if len(parts) >= 2 else None
+
+
+class StdinOtpSource(QueueOtpSource):
+    """Reads '<user_id> <otp>' lines from stdin in any order"""
+
+    def __init__(self, stream=None):
+        super().__init__()
+        self.stream = stream or sys.stdin
+
+    def requested(self, user_id):
+        print(f"🔐 OTP needed for {user_id} — type: {user_id} <otp>")
+
+    async def start(self):
+        # Daemon thread: a pending readline() must not keep the process alive at exit
+        loop = asyncio.get_running_loop()
+        threading.Thread(target=self._read, args=(loop,), daemon=True, name="otp-stdin").start()
+
+    def _read(self, loop):
+        for line in iter(self.stream.readline, ""):
+            parsed = self.parse_line(line)
+            if parsed:
+                loop.call_soon_threadsafe(self.put, *parsed)
+
+
+class FileOtpSource(QueueOtpSource):
+    """Polls a file (e.g. written by an SMS/e-mail forwarder) for '<user_id> <otp>' lines"""
+
+    def __init__(self, path, poll_interval=0.5):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self._offset = 0
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._poll())
+
+    async def _poll(self):
+        while True:
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    f.seek(self._offset)
+                    for line in f:
+                        if not line.endswith("\n"):
+                            break     # partial line; re-read it on the next poll
+                        self._offset += len(line.encode())
+                        parsed = self.parse_line(line)
+                        if parsed:
+                            self.put(*parsed)
+            await asyncio.sleep(self.poll_interval)
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+
+class CallbackOtpSource:
+    """Calls callback(user_id) (sync or async) to obtain each OTP"""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    async def get(self, user_id, timeout=None):
+        if inspect.iscoroutinefunction(self.callback):
+            return await asyncio.wait_for(self.callback(user_id), timeout)
+        loop = asyncio.get_running_loop()
+        return await asyncio.wait_for(loop.run_in_executor(None, self.callback, user_id), timeout)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+# -------------------------------
+# Orchestrator
+# -------------------------------
+
+class LoginOrchestrator:
+    """
+    steps provides reuse_session(user_id), start_login(user_id),
+    complete_login(context, otp) and abandon_login(context, reason);
+    defaults to mstock_auth_api_cli.
+    """
+
+    def __init__(self, otp_source, concurrency=8, otp_timeout=300.0, force=False, steps=None):
+        if steps is None:
+            from src import mstock_auth_api_cli as steps
+        self.steps = steps
+        self.otp_source = otp_source
+        self.concurrency = concurrency
+        self.otp_timeout = otp_timeout
+        self.force = force
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def _login_one(self, user_id):
+        row = {"user_id": user_id, "status": "failure", "source": "-", "reason": "",
+               "login_ms": 0.0, "otp_wait_ms": 0.0, "session_ms": 0.0}
+        started = time.perf_counter()
+        context = None
+        try:
+            async with self._slots:
+                if not self.force:
+                    reused = await self._call(self.steps.reuse_session, user_id)
+                    if reused:
+                        row.update(status="success", source="reused", reason=reused["message"])
+                        return row
+                t0 = time.perf_counter()
+                context, failure = await self._call(self.steps.start_login, user_id)
+                row["login_ms"] = (time.perf_counter() - t0) * 1000
+                if failure:
+                    row["reason"] = failure["reason"]
+                    return row
+
+            # No slot held while waiting for a human / forwarder
+            t0 = time.perf_counter()
+            otp = await self.otp_source.get(user_id, self.otp_timeout)
+            row["otp_wait_ms"] = (time.perf_counter() - t0) * 1000
+
+            async with self._slots:
+                t0 = time.perf_counter()
+                result = await self._call(self.steps.complete_login, context, otp.strip())
+                row["session_ms"] = (time.perf_counter() - t0) * 1000
+            row.update(status=result["status"], source="login",
+                       reason=result.get("message") or result.get("reason", ""))
+        except asyncio.TimeoutError:
+            row["reason"] = f"No OTP within {self.otp_timeout:.0f}s"
+        except Exception as e:
+            row["reason"] = str(e)
+        finally:
+            if context is not None and row["source"] != "login":
+                # Login started but never completed: record its outcome
+                await self._call(self.steps.abandon_login, context, row["reason"])
+            row["total_ms"] = (time.perf_counter() - started) * 1000
+        return row
+
+    async def run(self, user_ids):
+        """Log in every user concurrently; returns the per-account result rows in input order"""
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="login")
+        await self.otp_source.start()
+        try:
+            return await asyncio.gather(*(self._login_one(u) for u in dict.fromkeys(user_ids)))
+        finally:
+            await self.otp_source.stop()
+            self._executor.shutdown(wait=False)
+
+
+def login_many(user_ids, otp_source=None, concurrency=8, otp_timeout=300.0, force=False, steps=None):
+    """Synchronous entry point; returns (rows, wall_seconds)"""
+    orchestrator = LoginOrchestrator(otp_source or StdinOtpSource(), concurrency, otp_timeout, force, steps)
+    started = time.perf_counter()
+    rows = asyncio.run(orchestrator.run(user_ids))
+    return rows, time.perf_counter() - started
+
+
+def format_results(rows, wall_seconds=None):
+    """Render the per-account result table"""
+    header = f"{'USER_ID':<20} {'STATUS':<8} {'SOURCE':<7} {'LOGIN ms':>9} {'OTP ms':>9} {'SESSION ms':>10} {'TOTAL ms':>9}  REASON"
+    lines = [header, "-" * len(header)]
+    for r in rows:
+        lines.append(
+            f"{r['user_id']:<20} {r['status']:<8} {r['source']:<7} {r['login_ms']:>9.0f} "
+            f"{r['otp_wait_ms']:>9.0f} {r['session_ms']:>10.0f} {r['total_ms']:>9.0f}  {r['reason']}"
+        )
+    ok = sum(r["status"] == "success" for r in rows)
+    summary = f"{ok}/{len(rows)} accounts logged in"
+    if wall_seconds is not None and rows:
+        slowest = max(r["total_ms"] for r in rows) / 1000
+        summary += f" in {wall_seconds:.1f}s (slowest account {slowest:.1f}s)"
+    lines.append(summary)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Log in many mStock accounts concurrently")
+    parser.add_argument("users", nargs="*", help="M_STOCK_USER_IDs to log in")
+    parser.add_argument("--users-file", help="file with one user ID per line")
+    parser.add_argument("--concurrency", type=int, default=8, help="accounts talking to mStock at once")
+    parser.add_argument("--otp-file", help="poll this file for '<user_id> <otp>' lines instead of stdin")
+    parser.add_argument("--otp-timeout", type=float, default=300.0, help="seconds to wait for each OTP")
+    parser.add_argument("--force", action="store_true", help="full login even if a valid session exists")
+    args = parser.parse_args()
+
+    user_ids = list(args.users)
+    if args.users_file:
+        with open(args.users_file) as f:
+            user_ids += [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    if not user_ids:
+        parser.error("no users given")
+
+    source = FileOtpSource(args.otp_file) if args.otp_file else StdinOtpSource()
+    rows, wall = login_many(user_ids, source, args.concurrency, args.otp_timeout, args.force)
+    print(format_results(rows, wall))
+    sys.exit(0 if all(r["status"] == "success" for r in rows) else 1)
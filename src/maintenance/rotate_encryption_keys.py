@@ -0,0 +1,210 @@
+"""
+Online encryption key rotation for MS01_API_Authentication_Credential.
+Streams credential rows in keyset-paginated chunks, re-encrypts passwords
+with MultiFernet.rotate in a worker pool and writes each chunk back in one
+short transaction. Progress is checkpointed so an interrupted run resumes
+where it stopped. Rows that fail are retried once at the end of the run; a
+finished run marks its checkpoint completed, so the next one scans again.
+
+Usage (from project root):
+    python -m src.maintenance.rotate_encryption_keys --new-key
+    python -m src.maintenance.rotate_encryption_keys --chunk-size 1000 --workers 8
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.fernet import InvalidToken
+
+import config
+from src import db
+from requirements import gen_encryption_key
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_CHECKPOINT = os.path.join(ROOT_DIR, "config", "key_rotation_checkpoint.json")
+
+
+# -------------------------------
+# Checkpoint Helpers
+# -------------------------------
+
+def load_checkpoint(path, target_key_id):
+    """Return the saved checkpoint of an unfinished run for this target key, or a fresh one"""
+    fresh = {"target_key_id": target_key_id, "last_id": 0, "rotated": 0, "skipped": 0, "failed": 0,
+             "failed_ids": [], "completed": False}
+    if not os.path.exists(path):
+        return fresh
+    with open(path) as f:
+        checkpoint = json.load(f)
+    # A checkpoint for a different key belongs to an older rotation; a completed one
+    # must not hide rows added (or left behind) since, so the next run starts over
+    if checkpoint.get("target_key_id") != target_key_id or checkpoint.get("completed"):
+        return fresh
+    checkpoint.setdefault("failed_ids", [])
+    return checkpoint
+
+def save_checkpoint(path, checkpoint):
+    """Write the checkpoint atomically (temp file + rename)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+# -------------------------------
+# Rotation
+# -------------------------------
+
+def fetch_chunk(last_id, target_key_id, chunk_size):
+    """Next chunk of rows not yet on the target key, by primary key (keyset pagination)"""
+    return db.fetch_all("""
+        SELECT CUST_SEQ_ID, M_STOCK_PASSWORD
+        FROM MS01_API_Authentication_Credential
+        WHERE CUST_SEQ_ID > %s
+          AND (ENCRYPTION_KEY_ID IS NULL OR ENCRYPTION_KEY_ID <> %s)
+        ORDER BY CUST_SEQ_ID
+        LIMIT %s
+    """, (last_id, str(target_key_id), chunk_size))
+
+def fetch_rows(ids, target_key_id):
+    """Rows by CUST_SEQ_ID that are still not on the target key (retry of failed rows)"""
+    placeholders = ", ".join(["%s"] * len(ids))
+    return db.fetch_all(f"""
+        SELECT CUST_SEQ_ID, M_STOCK_PASSWORD
+        FROM MS01_API_Authentication_Credential
+        WHERE CUST_SEQ_ID IN ({placeholders})
+          AND (ENCRYPTION_KEY_ID IS NULL OR ENCRYPTION_KEY_ID <> %s)
+    """, (*ids, str(target_key_id)))
+
+def write_chunk(updates):
+    """
+    Write re-encrypted passwords in one transaction.
+    The old ciphertext is part of the WHERE clause, so a password changed
+    concurrently by user_update is left alone instead of being overwritten.
+    Returns the number of rows actually updated.
+    """
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            UPDATE MS01_API_Authentication_Credential
+            SET M_STOCK_PASSWORD = %s,
+                ENCRYPTION_KEY_ID = %s,
+                SYS_UPDATE_DATE_TIME = SYS_UPDATE_DATE_TIME
+            WHERE CUST_SEQ_ID = %s AND M_STOCK_PASSWORD = %s
+        """, updates)
+        updated = cursor.rowcount
+        cursor.close()
+    return updated
+
+def rotate(target_key_id=None, chunk_size=500, workers=4, checkpoint_path=DEFAULT_CHECKPOINT, sleep=0.0):
+    """
+    Re-encrypt every credential with the active key (or target_key_id).
+    Returns the final checkpoint dict with rotated/skipped/failed counts.
+    """
+    config.keyring.invalidate()
+    target_key_id = target_key_id or config.keyring.active_key_id()
+    if target_key_id is None:
+        raise RuntimeError("No encryption key found in SEC01_ENCRYPTION_KEY")
+    if config.keyring.active_key_id() != int(target_key_id):
+        raise RuntimeError(
+            f"KEY_ID {target_key_id} is not the active key; set ENCRYPTION_KEY_ID={target_key_id} first"
+        )
+    multi = config.keyring.multi_fernet()
+
+    def reencrypt(row):
+        try:
+            token = multi.rotate(row["M_STOCK_PASSWORD"].encode()).decode()
+            return (token, str(target_key_id), row["CUST_SEQ_ID"], row["M_STOCK_PASSWORD"])
+        except (InvalidToken, AttributeError):
+            return None
+
+    checkpoint = load_checkpoint(checkpoint_path, target_key_id)
+    started = time.monotonic()
+    done_this_run = 0
+    print(f"🔄 Rotating credentials to KEY_ID={target_key_id} (resuming after CUST_SEQ_ID={checkpoint['last_id']})")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            rows = fetch_chunk(checkpoint["last_id"], target_key_id, chunk_size)
+            if not rows:
+                break
+
+            results = list(pool.map(reencrypt, rows))
+            updates = [r for r in results if r is not None]
+            updated = write_chunk(updates) if updates else 0
+
+            checkpoint["last_id"] = rows[-1]["CUST_SEQ_ID"]
+            checkpoint["rotated"] += updated
+            checkpoint["skipped"] += len(updates) - updated
+            checkpoint["failed_ids"] += [row["CUST_SEQ_ID"] for row, r in zip(rows, results) if r is None]
+            checkpoint["failed"] = len(checkpoint["failed_ids"])
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            done_this_run += len(rows)
+            elapsed = time.monotonic() - started
+            print(
+                f"   … up to CUST_SEQ_ID={checkpoint['last_id']}: "
+                f"rotated={checkpoint['rotated']} skipped={checkpoint['skipped']} failed={checkpoint['failed']} "
+                f"({done_this_run / elapsed:.0f} rows/s)"
+            )
+            if sleep:
+                time.sleep(sleep)
+
+        if checkpoint["failed_ids"]:
+            # One more pass over the rows that failed, with keys added since the run started
+            config.keyring.invalidate()
+            multi = config.keyring.multi_fernet()
+            still_failed = []
+            for i in range(0, len(checkpoint["failed_ids"]), chunk_size):
+                ids = checkpoint["failed_ids"][i:i + chunk_size]
+                rows = fetch_rows(ids, target_key_id)
+                results = list(pool.map(reencrypt, rows))
+                updates = [r for r in results if r is not None]
+                updated = write_chunk(updates) if updates else 0
+                checkpoint["rotated"] += updated
+                checkpoint["skipped"] += len(updates) - updated
+                still_failed += [row["CUST_SEQ_ID"] for row, r in zip(rows, results) if r is None]
+            print(f"   … retried {len(checkpoint['failed_ids'])} failed rows, {len(still_failed)} still failing")
+            checkpoint["failed_ids"] = still_failed
+            checkpoint["failed"] = len(still_failed)
+
+    checkpoint["completed"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    db.insert_log(
+        "WARN" if checkpoint["failed"] else "INFO",
+        f"Key rotation to KEY_ID={target_key_id}: rotated={checkpoint['rotated']} "
+        f"skipped={checkpoint['skipped']} failed={checkpoint['failed']}",
+        "rotate_encryption_keys"
+    )
+    return checkpoint
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encrypt stored credentials with the active encryption key")
+    parser.add_argument("--new-key", action="store_true", help="generate a new key first and make it active")
+    parser.add_argument("--chunk-size", type=int, default=500, help="rows per chunk/transaction")
+    parser.add_argument("--workers", type=int, default=4, help="re-encryption worker threads")
+    parser.add_argument("--sleep", type=float, default=0.0, help="seconds to pause between chunks")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="checkpoint file path")
+    parser.add_argument("--reset", action="store_true", help="ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    if args.reset and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    target = None
+    if args.new_key:
+        target, key = gen_encryption_key.create_key()
+        gen_encryption_key.write_env(key, target)
+        print(f"🔑 New key created with KEY_ID={target} and set as active")
+
+    try:
+        result = rotate(target, args.chunk_size, args.workers, args.checkpoint, args.sleep)
+        print(f"✅ Rotation complete: {result}")
+        if result["failed"]:
+            print("⚠️ Some rows could not be decrypted with any known key; they were left unchanged.")
+    except Exception as e:
+        print(f"❌ Rotation failed: {e}")
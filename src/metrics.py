@@ -0,0 +1,449 @@
+"""
+In-process metrics: counters, gauges and histograms with Prometheus labels.
+Updates do not take a lock: every thread adds into its own cell, and cells are
+only summed when the registry is collected (a scrape or a dump). The only
+locked paths are the first use of a label set, a thread's first update and
+gauge set(). Cells of exited threads are folded into one per series.
+
+    DB_QUERY_SECONDS = metrics.histogram("mstock_db_query_seconds", "DB statement latency", ("statement",))
+    with DB_QUERY_SECONDS.time(statement="SELECT MS01_API_Authentication_Credential"):
+        ...
+    HTTP_RESPONSES.inc(endpoint="/session/token", status="200")
+
+    metrics.render()                 # Prometheus text format (GET /metrics on src/api/service.py)
+    python -m src.metrics            # dump from the running service, else this process
+    python -m src.metrics --json
+
+Settings (.env): METRICS_ENABLED (default on), METRICS_PORT (stand-alone
+scrape endpoint for processes without the service, see start_http_server).
+"""
+
+import bisect
+import itertools
+import threading
+import time
+
+from src.settings import get_settings
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Cells:
+    """
+    One mutable cell per thread; only the owning thread writes it. Cells of
+    threads that have exited are folded into one retired cell with merge(),
+    so short-lived threads (per-request workers) do not pile up cells.
+    """
+    __slots__ = ("_local", "_cells", "_retired", "_lock", "_factory", "_merge")
+
+    def __init__(self, factory, merge):
+        self._local = threading.local()
+        self._cells = {}        # thread -> cell
+        self._retired = factory()
+        self._lock = threading.Lock()
+        self._factory = factory
+        self._merge = merge
+
+    def mine(self):
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = self._local.cell = self._factory()
+            with self._lock:
+                self._fold()
+                self._cells[threading.current_thread()] = cell
+            return cell
+
+    def _fold(self):
+        for thread in [thread for thread in self._cells if not thread.is_alive()]:
+            self._merge(self._retired, self._cells.pop(thread))
+
+    def all(self):
+        with self._lock:
+            self._fold()
+            return [self._retired, *self._cells.values()]
+
+
+class _Timer:
+    __slots__ = ("_observe", "_started")
+
+    def __init__(self, observe):
+        self._observe = observe
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._observe(time.perf_counter() - self._started)
+        return False
+
+
+# -------------------------------
+# Series (one label set)
+# -------------------------------
+
+class _CounterSeries:
+    __slots__ = ("_cells",)
+
+    def __init__(self):
+        self._cells = _Cells(lambda: [0], _merge_counter)
+
+    def inc(self, amount=1):
+        self._cells.mine()[0] += amount
+
+    def value(self):
+        return sum(cell[0] for cell in self._cells.all())
+
+
+def _merge_counter(retired, cell):
+    retired[0] += cell[0]
+
+
+class _GaugeSeries:
+    """
+    set() replaces the value; inc()/dec() add per-thread deltas on top of it.
+    set() does not touch the threads' cells: it starts a new generation, and
+    deltas recorded under an older one no longer count.
+    """
+    __slots__ = ("_base", "_generation", "_lock", "_cells", "_function")
+
+    def __init__(self):
+        self._base = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._cells = _Cells(lambda: [0, 0], _merge_gauge)     # [delta, generation]
+        self._function = None
+
+    def set(self, value):
+        with self._lock:
+            self._base = value
+            self._generation += 1
+
+    def _add(self, amount):
+        cell = self._cells.mine()
+        generation = self._generation
+        if cell[1] != generation:
+            cell[0], cell[1] = 0, generation
+        cell[0] += amount
+
+    def inc(self, amount=1):
+        self._add(amount)
+
+    def dec(self, amount=1):
+        self._add(-amount)
+
+    def set_function(self, function):
+        """Read the value from function() at collect time (pool sizes, queue depth)"""
+        self._function = function
+
+    def value(self):
+        if self._function is not None:
+            return self._function()
+        with self._lock:
+            base, generation = self._base, self._generation
+        return base + sum(delta for delta, seen in self._cells.all() if seen == generation)
+
+
+def _merge_gauge(retired, cell):
+    if cell[1] > retired[1]:
+        retired[0], retired[1] = cell[0], cell[1]
+    elif cell[1] == retired[1]:
+        retired[0] += cell[0]
+
+
+class _HistogramSeries:
+    __slots__ = ("_bounds", "_cells")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        size = len(bounds) + 1      # last slot is +Inf
+        self._cells = _Cells(lambda: [[0] * size, 0, 0.0], _merge_histogram)
+
+    def observe(self, value):
+        cell = self._cells.mine()
+        cell[0][bisect.bisect_left(self._bounds, value)] += 1
+        cell[1] += 1
+        cell[2] += value
+
+    def time(self):
+        return _Timer(self.observe)
+
+    def value(self):
+        """(cumulative counts per bound incl. +Inf, count, sum)"""
+        counts = [0] * (len(self._bounds) + 1)
+        count, total = 0, 0.0
+        for cell in self._cells.all():
+            for i, n in enumerate(cell[0]):
+                counts[i] += n
+            count += cell[1]
+            total += cell[2]
+        return list(itertools.accumulate(counts)), count, total
+
+
+def _merge_histogram(retired, cell):
+    for i, n in enumerate(cell[0]):
+        retired[0][i] += n
+    retired[1] += cell[1]
+    retired[2] += cell[2]
+
+
+class _NoopSeries:
+    __slots__ = ()
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def set_function(self, function):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def time(self):
+        return _Timer(self.observe)
+
+
+_NOOP = _NoopSeries()
+
+
+# -------------------------------
+# Metrics (a family of series)
+# -------------------------------
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), enabled=True):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.enabled = enabled
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """The series for this label set (created on first use)"""
+        if not self.enabled:
+            return _NOOP
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = self._new_series()
+        return series
+
+    def collect(self):
+        """[(label dict, value)] in first-use order"""
+        with self._lock:
+            items = list(self._series.items())
+        return [(dict(zip(self.labelnames, key)), series.value()) for key, series in items]
+
+    def clear(self):
+        with self._lock:
+            self._series = {}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_series(self):
+        return _GaugeSeries()
+
+    def set(self, value, **labels):
+        self.labels(**labels).set(value)
+
+    def inc(self, amount=1, **labels):
+        self.labels(**labels).inc(amount)
+
+    def dec(self, amount=1, **labels):
+        self.labels(**labels).dec(amount)
+
+    def set_function(self, function, **labels):
+        self.labels(**labels).set_function(function)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, enabled=True):
+        super().__init__(name, documentation, labelnames, enabled)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        """Context manager observing the block's duration in seconds"""
+        return self.labels(**labels).time()
+
+
+# -------------------------------
+# Registry
+# -------------------------------
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels.items()) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames,
+                                                   enabled=self.enabled, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def clear(self):
+        """Drop every recorded value (metrics stay registered)"""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+    def snapshot(self) -> dict:
+        """{name: [{"labels": {...}, "value": ...}]}; histograms give count, sum and buckets"""
+        result = {}
+        for metric in list(self._metrics.values()):
+            rows = []
+            for labels, value in metric.collect():
+                if metric.kind == "histogram":
+                    cumulative, count, total = value
+                    bounds = [*metric.buckets, "+Inf"]
+                    value = {"count": count, "sum": round(total, 6),
+                             "buckets": dict(zip(map(str, bounds), cumulative))}
+                rows.append({"labels": labels, "value": value})
+            result[metric.name] = rows
+        return result
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for labels, value in metric.collect():
+                if metric.kind != "histogram":
+                    lines.append(f"{metric.name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                cumulative, count, total = value
+                for bound, n in zip([*metric.buckets, float("inf")], cumulative):
+                    lines.append(f"{metric.name}_bucket{_format_labels(labels, {'le': _format_value(bound)})} {n}")
+                lines.append(f"{metric.name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{metric.name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(enabled=get_settings().flag("METRICS_ENABLED", True))
+
+counter = registry.counter
+gauge = registry.gauge
+histogram = registry.histogram
+render = registry.render
+snapshot = registry.snapshot
+
+
+# -------------------------------
+# Stand-alone Scrape Endpoint
+# -------------------------------
+
+def start_http_server(port=None, host="127.0.0.1"):
+    """Serve GET /metrics from a daemon thread (for processes that do not run src/api/service.py)"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    port = get_settings().get("METRICS_PORT", 9108, int) if port is None else port
+    server = ThreadingHTTPServer((host, port), _Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Dump metrics from the running service (or this process)")
+    parser.add_argument("--json", action="store_true", help="JSON snapshot instead of Prometheus text")
+    parser.add_argument("--local", action="store_true", help="this process only (mostly empty)")
+    args = parser.parse_args()
+
+    service = None
+    if not args.local:
+        from src.api.client import connect
+        service = connect()
+    if service is not None:
+        print(json.dumps(service.metrics_snapshot(), indent=2) if args.json else service.metrics(), end="")
+    else:
+        print(json.dumps(snapshot(), indent=2) if args.json else render(), end="")
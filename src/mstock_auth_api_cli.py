@@ -5,121 +5,186 @@ and consistent logging with unique login_seq_id.
 """
 
 import argparse
-import os
 
-from src import db
+from src import db, tracing
 import config
-from tradingapi_a.mconnect import MConnect
+from src.rate_limiter import scheduler
+from src.session_manager import sessions
+from src.session_store import store as session_store
+from src.settings import get_settings
+
+
+def _new_connect():
+    """tradingapi_a's MConnect by default; MSTOCK_CONNECT=http uses src/auth.py's HTTP client"""
+    if get_settings().get("MSTOCK_CONNECT", "sdk").lower() == "http":
+        from src.auth import AuthApiConnect
+        return AuthApiConnect()
+    from tradingapi_a.mconnect import MConnect
+    return MConnect()
+
+
+def reuse_session(user_id: str):
+    """Step 0: a still-valid session (memory, DB, or refresh-token renewal), or None"""
+    session = sessions.get_session(user_id)
+    if not session:
+        return None
+    login_seq_id = db.generate_login_seq_id()
+    db.insert_request_response_log(
+        "INFO", f"Reused existing session ({session['source']})", "mstock_auth_api_cli",
+        {"user_id": user_id}, {"expires_at": session["expires_at"]},
+        api_name="login", login_seq_id=login_seq_id
+    )
+    print(f"✅ Reusing session from {session['source']} (valid until {session['expires_at']})")
+    return {
+        "status": "success",
+        "message": f"Session reused ({session['source']})",
+        "tokens": {
+            "request_token": None,
+            "access_token": session["access_token"],
+            "login_seq_id": login_seq_id
+        }
+    }
+
 
+def start_login(user_id: str):
+    """
+    Steps 1-2: fetch + decrypt credentials and send the login request (triggers the OTP).
+    Returns (context, None) on success or (None, failure_result).
+    """
+    # Everything this login writes is collected here and committed once at the end
+    uow = db.LoginUnitOfWork(user_id, "mstock_auth_api_cli")
+    with tracing.bind(user_id=user_id, login_seq_id=uow.login_seq_id), tracing.span("login.start"):
+        return _start_login(user_id, uow)
 
-def login(user_id: str):
+
+def _start_login(user_id: str, uow):
     # Step 1: Fetch credentials
-    print("Step 1: Fetching credentials from DB...")
-    creds = db.get_user_credentials(user_id)
+    print(f"Step 1: Fetching credentials from DB for {user_id}...")
+    with tracing.span("login.fetch_credentials"):
+        creds = db.get_user_credentials(user_id)
     if not creds:
-        return {"status": "failure", "reason": "User not found in DB"}
+        return None, {"status": "failure", "reason": "User not found in DB"}
     print("✅ Credentials fetched successfully")
 
-    # Generate unique login_seq_id for this flow
-    login_seq_id = db.generate_unique_seq_id("MS01_REQUEST_RESPONSE_LOG", "login_seq_id")
-  #  print("DEBUG: Generated LOGIN_SEQ_ID:", login_seq_id)
-
     # Decrypt password before using
     try:
-        decrypted_password = config.decrypt_str(
-            creds["M_STOCK_PASSWORD_CIPHERTEXT"], creds["ENCRYPTION_KEY_ID"]
-        )
+        with tracing.span("login.decrypt_password"):
+            decrypted_password = config.decrypt_str(
+                creds["M_STOCK_PASSWORD_CIPHERTEXT"], creds["ENCRYPTION_KEY_ID"]
+            )
     except Exception as e:
-        return {"status": "failure", "reason": f"Password decryption failed: {e}"}
+        return None, {"status": "failure", "reason": f"Password decryption failed: {e}"}
 
-    mconnect_obj = MConnect()
+    mconnect_obj = _new_connect()
 
     # Step 2: Login request
-    print("Step 2: Sending login request to mStock...")
+    print(f"Step 2: Sending login request to mStock for {user_id}...")
     try:
-        login_response = mconnect_obj.login(user_id, decrypted_password)
-        try:
-            login_json = login_response.json() if hasattr(login_response, "json") else login_response
-        except Exception as parse_err:
-            login_json = {"error": f"JSON parse failed: {str(parse_err)}"}
-
-        db.insert_request_response_log(
-            "INFO", "Login call completed", "mstock_auth_api_cli",
-            str({"user_id": user_id}), str(login_json),
-            api_name="login", login_seq_id=login_seq_id
-        )
-    #    print("DEBUG: Full login JSON:", login_json)
+        with tracing.span("login.mconnect_login", endpoint="/connect/login") as span:
+            # The SDK does its own HTTP; share the broker rate limits with src/http_client.py
+            scheduler.acquire("/connect/login", creds["M_STOCK_API_KEY"])
+            login_response = mconnect_obj.login(user_id, decrypted_password)
+            try:
+                login_json = login_response.json() if hasattr(login_response, "json") else login_response
+            except Exception as parse_err:
+                login_json = {"error": f"JSON parse failed: {str(parse_err)}"}
+            if hasattr(login_response, "status_code"):
+                span.set_attribute("http.status_code", login_response.status_code)
+
+        uow.request_log("INFO", "Login call completed", {"user_id": user_id}, login_json,
+                        http_status=getattr(login_response, "status_code", None))
     except Exception as e:
-        db.insert_request_response_log(
-            "ERROR", "Login call failed", "mstock_auth_api_cli",
-            str({"user_id": user_id}), str(e),
-            api_name="login", login_seq_id=login_seq_id
-        )
-        return {"status": "failure", "reason": str(e)}
+        uow.request_log("ERROR", "Login call failed", {"user_id": user_id}, str(e))
+        uow.commit("failure", "Login flow failed")
+        return None, {"status": "failure", "reason": str(e), "login_seq_id": uow.login_seq_id}
+
+    context = {
+        "user_id": user_id,
+        "creds": creds,
+        "mconnect": mconnect_obj,
+        "login_json": login_json,
+        "login_seq_id": uow.login_seq_id,
+        "uow": uow,
+    }
+    return context, None
 
-    # Step 3: OTP prompt
-    request_token = input("Enter 3-digit OTP (request token): ").strip()
-   # print("DEBUG: Using request_token:", request_token)
+
+def complete_login(context: dict, request_token: str):
+    """Steps 4-6: generate the session with the OTP and persist tokens"""
+    with tracing.bind(user_id=context["user_id"], login_seq_id=context["login_seq_id"]), \
+            tracing.span("login.complete") as span:
+        result = _complete_login(context, request_token)
+        span.set_attribute("login.status", result["status"])
+        return result
+
+
+def _complete_login(context: dict, request_token: str):
+    user_id = context["user_id"]
+    creds = context["creds"]
+    login_json = context["login_json"]
+    login_seq_id = context["login_seq_id"]
+    uow = context["uow"]
+    session_request = {"api_key": creds["M_STOCK_API_KEY"], "request_token": request_token}
 
     # Step 4: Generate session
-    print("Step 4: Generating session...")
+    print(f"Step 4: Generating session for {user_id}...")
     try:
-        session_response = mconnect_obj.generate_session(
-            creds["M_STOCK_API_KEY"], request_token, ""
-        )
-        try:
-            session_json = session_response.json() if hasattr(session_response, "json") else session_response
-        except Exception as parse_err:
-            session_json = {"error": f"JSON parse failed: {str(parse_err)}"}
-
-        db.insert_request_response_log(
-            "INFO", "Generate session call completed", "mstock_auth_api_cli",
-            str({"api_key": creds["M_STOCK_API_KEY"], "request_token": request_token}),
-            str(session_json), api_name="generate_session", login_seq_id=login_seq_id
-        )
-    #   print("DEBUG: Full session JSON:", session_json)
+        with tracing.span("login.generate_session", endpoint="/session/token") as span:
+            scheduler.acquire("/session/token", creds["M_STOCK_API_KEY"])
+            session_response = context["mconnect"].generate_session(
+                creds["M_STOCK_API_KEY"], request_token, ""
+            )
+            try:
+                session_json = session_response.json() if hasattr(session_response, "json") else session_response
+            except Exception as parse_err:
+                session_json = {"error": f"JSON parse failed: {str(parse_err)}"}
+            if hasattr(session_response, "status_code"):
+                span.set_attribute("http.status_code", session_response.status_code)
+
+        uow.request_log("INFO", "Generate session call completed", session_request, session_json,
+                        api_name="generate_session",
+                        http_status=getattr(session_response, "status_code", None))
     except Exception as e:
-        db.insert_request_response_log(
-            "ERROR", "Generate session failed", "mstock_auth_api_cli",
-            str({"api_key": creds["M_STOCK_API_KEY"], "request_token": request_token}),
-            str(e), api_name="generate_session", login_seq_id=login_seq_id
-        )
-        return {"status": "failure", "reason": str(e)}
+        uow.request_log("ERROR", "Generate session failed", session_request, str(e),
+                        api_name="generate_session")
+        uow.commit("failure", "Login flow failed")
+        return {"status": "failure", "reason": str(e), "login_seq_id": login_seq_id}
 
     if not session_json or "error" in session_json:
-        return {"status": "failure", "reason": session_json.get("error", "Session generation failed")}
+        reason = (session_json or {}).get("error", "Session generation failed")
+        uow.commit("failure", "Login flow failed", reason)
+        return {"status": "failure", "reason": reason, "login_seq_id": login_seq_id}
     print("✅ Session generated successfully")
 
-    # Step 5: Update .env file
-    print("Step 5: Updating .env file with latest values...")
-    update_env({
-        "M_STOCK_USER_ID": user_id,
-        "M_STOCK_PASSWORD": creds["M_STOCK_PASSWORD_CIPHERTEXT"],  # store ciphertext only
-        "M_STOCK_API_KEY": creds["M_STOCK_API_KEY"],
-        "M_STOCK_API_KEY_TYPE": "A",
-        "M_STOCK_REQUEST_TOKEN_OTP": request_token,
-        "M_STOCK_ACCESS_TOKEN": session_json.get("data", {}).get("access_token"),
-        "M_STOCK_CLIENT_CODE": login_json.get("data", {}).get("cid"),
-        "M_STOCK_RESPONSE_USER_ID": session_json.get("data", {}).get("user_id"),
-        "M_STOCK_RESPONSE_USER_NAME": session_json.get("data", {}).get("user_name"),
-        "M_STOCK_PUBLIC_TOKEN": session_json.get("data", {}).get("public_token"),
-        "M_STOCK_REFRESH_TOKEN": session_json.get("data", {}).get("refresh_token"),
-        "M_STOCK_ENC_TOKEN": session_json.get("data", {}).get("enctoken"),
-        "M_STOCK_LAST_LOGIN_DATE": session_json.get("data", {}).get("login_time"),
-        "M_STOCK_LAST_LOGOUT_DATE": session_json.get("data", {}).get("logout_time")
-    })
-    print("✅ .env file updated")
-
-    # Step 6: Update DB
-    print("Step 6: Updating DB table with response values...")
-    db.update_auth_credentials(user_id, login_json, session_json)
+    # Step 5: Tokens + every log row of this login in one DB transaction
+    print("Step 5: Updating DB table with response values...")
+    with tracing.span("login.persist"):
+        uow.set_session(login_json, session_json)
+        outcome = uow.commit("success", "Login flow completed successfully", session_json)
+    if not outcome["committed"]:
+        return {"status": "failure", "reason": f"Saving login failed: {outcome['error']}",
+                "login_seq_id": login_seq_id}
+    sessions.remember(user_id, creds["M_STOCK_API_KEY"], session_json)
     print("✅ DB table updated")
 
-    db.insert_request_response_log(
-        "INFO", "Login flow completed successfully", "mstock_auth_api_cli",
-        str({"user_id": user_id}), str(session_json),
-        api_name="login", login_seq_id=login_seq_id
-    )
+    # Step 6: Record the session in the local store (one record per account)
+    print("Step 6: Updating local session store...")
+    data = session_json.get("data") or {}
+    with tracing.span("login.session_store"):
+        session_store.update(user_id, {
+            "api_key": creds["M_STOCK_API_KEY"],
+            "client_code": login_json.get("data", {}).get("cid"),
+            "response_user_id": data.get("user_id"),
+            "response_user_name": data.get("user_name"),
+            "request_token": request_token,
+            "access_token": data.get("access_token"),
+            "public_token": data.get("public_token"),
+            "refresh_token": data.get("refresh_token"),
+            "enc_token": data.get("enctoken"),
+            "login_seq_id": login_seq_id,
+            "last_login_date": data.get("login_time"),
+        })
+    print("✅ Session store updated")
 
     return {
         "status": "success",
@@ -132,78 +197,93 @@ def login(user_id: str):
     }
 
 
+def abandon_login(context: dict, reason: str):
+    """Record a login that was started but never completed (e.g. no OTP arrived)"""
+    return context["uow"].commit("failure", "Login flow abandoned", reason)
+
+
+def login(user_id: str, force: bool = False):
+    with tracing.span("login", user_id=user_id, force=force) as span:
+        if not force:
+            with tracing.span("login.reuse_session", user_id=user_id):
+                reused = reuse_session(user_id)
+            if reused:
+                span.set_attribute("login_seq_id", reused["tokens"]["login_seq_id"])
+                return reused
+
+        context, failure = start_login(user_id)
+        if failure:
+            return failure
+        span.set_attribute("login_seq_id", context["login_seq_id"])
+
+        # Step 3: OTP prompt
+        with tracing.span("login.otp_wait", user_id=user_id, login_seq_id=context["login_seq_id"]):
+            request_token = input("Enter 3-digit OTP (request token): ").strip()
+
+        return complete_login(context, request_token)
+
+
 def logout(user_id: str):
     print("Logging out...")
-    login_seq_id = db.generate_unique_seq_id("MS01_REQUEST_RESPONSE_LOG", "login_seq_id")
+    login_seq_id = db.generate_login_seq_id()
+    with tracing.bind(user_id=user_id, login_seq_id=login_seq_id), tracing.span("logout"):
+        return _logout(user_id, login_seq_id)
+
+
+def _logout(user_id: str, login_seq_id: str):
     try:
-        update_env({
-            "M_STOCK_REQUEST_TOKEN_OTP": "",
-            "M_STOCK_ACCESS_TOKEN": "",
-            "M_STOCK_CLIENT_CODE": "",
-            "M_STOCK_RESPONSE_USER_ID": "",
-            "M_STOCK_RESPONSE_USER_NAME": "",
-            "M_STOCK_PUBLIC_TOKEN": "",
-            "M_STOCK_REFRESH_TOKEN": "",
-            "M_STOCK_ENC_TOKEN": "",
-            "M_STOCK_LAST_LOGIN_DATE": "",
-            "M_STOCK_LAST_LOGOUT_DATE": ""
-        })
+        with tracing.span("logout.invalidate_session"):
+            sessions.invalidate(user_id)
+        with tracing.span("logout.session_store"):
+            session_store.clear(user_id)
 
         db.insert_request_response_log(
             "INFO", "Logout call completed", "mstock_auth_api_cli",
-            str({"user_id": user_id}), "{}", api_name="logout", login_seq_id=login_seq_id
+            {"user_id": user_id}, {}, api_name="logout", login_seq_id=login_seq_id
         )
         return {"status": "success", "message": "Logout successful", "login_seq_id": login_seq_id}
     except Exception as e:
         db.insert_request_response_log(
             "ERROR", "Logout failed", "mstock_auth_api_cli",
-            str({"user_id": user_id}), str(e), api_name="logout", login_seq_id=login_seq_id
+            {"user_id": user_id}, str(e), api_name="logout", login_seq_id=login_seq_id, status="failure"
         )
         return {"status": "failure", "reason": str(e), "login_seq_id": login_seq_id}
 
 
-def update_env(updates: dict):
-    """Update .env file with new values"""
-    env_path = ".env"
-    if not os.path.exists(env_path):
-        return
-
-    with open(env_path, "r") as f:
-        lines = f.readlines()
-
-    new_lines = []
-    for line in lines:
-        key = line.split("=")[0].strip()
-        if key in updates:
-            new_lines.append(f"{key}={updates[key]}\n")
-        else:
-            new_lines.append(line)
-
-    for key, value in updates.items():
-        if not any(l.startswith(f"{key}=") for l in new_lines):
-            new_lines.append(f"{key}={value}\n")
-
-    with open(env_path, "w") as f:
-        f.writelines(new_lines)
+def login_via_service(service, user_id: str, force: bool = False):
+    """Same flow as login(), run by the resident service (src/api/service.py)"""
+    result = service.login(user_id, force)
+    if result["status"] != "otp_required":
+        return result
+    request_token = input("Enter 3-digit OTP (request token): ").strip()
+    return service.submit_otp(result["login_seq_id"], request_token)
 
 
 if __name__ == "__main__":
+    from src.api.client import ServiceError, connect
+
     parser = argparse.ArgumentParser(description="mStock Auth CLI")
     parser.add_argument("action", choices=["login", "logout"], nargs="?", default="login")
+    parser.add_argument("--force", action="store_true", help="full login even if a valid session exists")
+    parser.add_argument("--local", action="store_true", help="run in this process even if the service is up")
     args = parser.parse_args()
 
     user_id = input("Enter your mStock User ID: ").strip()
+    service = None if args.local else connect()
 
     if args.action == "login":
-        result = login(user_id)
+        try:
+            result = login_via_service(service, user_id, args.force) if service else login(user_id, force=args.force)
+        except ServiceError as e:
+            result = {"status": "failure", "reason": e.detail}
     elif args.action == "logout":
         confirm = input("Are you sure you want to logout? (y/n): ").strip().lower()
         if confirm == "y":
-            result = logout(user_id)
+            result = service.logout(user_id) if service else logout(user_id)
         else:
             db.insert_request_response_log(
                 "INFO", "Logout cancelled by user", "mstock_auth_api_cli",
-                str({"user_id": user_id}), "{}", api_name="logout"
+                {"user_id": user_id}, {}, api_name="logout", status="failure"
             )
             result = {"status": "failure", "reason": "Logout cancelled by user"}
 
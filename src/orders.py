@@ -0,0 +1,697 @@
+"""
+Order entry: validate, journal, send.
+An order is validated and its form body encoded up front (prepare), so
+submit() only has to journal the intent and write pre-built bytes to the
+shared keep-alive connection. The intent goes to an append-only local journal
+before dispatch, not to MySQL: concurrent submitters share one fsync (group
+commit). A replicator thread tails the journal into the `orders` table.
+
+Every order has an idempotency key (the caller's, or a generated one). A retry
+with the same key returns the recorded outcome instead of placing the order
+again, including after a restart, because the journal is replayed on startup.
+An order whose outcome is unknown (connection lost mid-request, or a crash
+between journal and response) is never re-sent automatically; check the
+broker's order book. Keys are kept for the trading day they were submitted
+on: once a day, after the replicator has copied the journal to the orders
+table, the journal is rewritten with only the current day's orders.
+
+    router = orders.from_settings()
+    order = router.prepare("alice", "RELIANCE", "BUY", 10, order_type="LIMIT", price=2900.5,
+                           idempotency_key="strategy-42-leg-1")
+    result = router.submit(order)      # {"status": "accepted", "order_id": ..., "wire_ms": ...}
+    router.submit(order)               # same record, "duplicate": True; nothing is sent
+
+    python -m src.orders place alice RELIANCE BUY 10 [--type LIMIT --price 2900.5] [--key K]
+    python -m src.orders replicate     # copy the journal into the orders table and exit
+
+Settings (.env): ORDER_JOURNAL_PATH (default config/order_journal.jsonl),
+ORDER_JOURNAL_FSYNC (default on), ORDER_REPLICATION_INTERVAL (0.5 s),
+ORDER_REPLICATION_BATCH (500), ORDER_TICK_SIZE (0.05).
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlencode
+
+from src import auth, db, metrics, response_cache, tracing
+from src.session_manager import sessions
+from src.settings import get_settings
+
+MODULE = "orders"
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_JOURNAL_PATH = os.path.join(ROOT_DIR, "config", "order_journal.jsonl")
+ORDER_ENDPOINT = "/orders/regular"
+
+SIDES = ("BUY", "SELL")
+ORDER_TYPES = ("MARKET", "LIMIT", "SL", "SL-M")
+PRODUCTS = ("CNC", "MIS", "NRML", "MTF")
+VALIDITIES = ("DAY", "IOC")
+EXCHANGES = ("NSE", "BSE", "NFO", "BFO", "CDS", "MCX")
+_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_.:-]{1,64}$")
+
+# Columns written by the replicator, in row-tuple order
+ORDER_COLUMNS = ("IDEMPOTENCY_KEY", "M_STOCK_USER_ID", "EXCHANGE", "SYMBOL", "TRANSACTION_TYPE", "ORDER_TYPE",
+                 "PRODUCT", "VALIDITY", "QUANTITY", "PRICE", "TRIGGER_PRICE", "STATUS", "BROKER_ORDER_ID",
+                 "MESSAGE", "HTTP_STATUS", "SUBMITTED_AT", "RESPONDED_AT", "WIRE_MS", "LATENCY_MS")
+_RECORD_FIELDS = ("key", "user_id", "exchange", "symbol", "side", "order_type", "product", "validity", "quantity",
+                  "price", "trigger_price", "status", "order_id", "message", "http_status", "submitted_at",
+                  "responded_at", "wire_ms", "latency_ms")
+_RESULT_FIELDS = ("status", "order_id", "message", "http_status", "responded_at", "wire_ms", "latency_ms")
+
+_RESULT_UPDATE_SQL = """
+    UPDATE orders
+    SET STATUS = %s, BROKER_ORDER_ID = %s, MESSAGE = %s, HTTP_STATUS = %s,
+        RESPONDED_AT = %s, WIRE_MS = %s, LATENCY_MS = %s
+    WHERE IDEMPOTENCY_KEY = %s
+"""
+
+# Sub-millisecond resolution: the local stages are far below the default buckets
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+ORDER_STAGE_SECONDS = metrics.histogram(
+    "mstock_order_stage_seconds",
+    "Order path latency by stage (validate, serialize, journal, wire = submit() to send, dispatch, total)",
+    ("stage",), buckets=STAGE_BUCKETS)
+ORDERS = metrics.counter("mstock_orders_total", "Order submissions by outcome", ("result",))
+JOURNAL_FSYNCS = metrics.counter("mstock_order_journal_fsyncs_total", "Order journal group commits")
+REPLICATION_LAG = metrics.gauge("mstock_order_replication_lag_bytes", "Journal bytes not yet in the orders table")
+
+
+class OrderError(Exception):
+    """The order cannot be submitted; status is the HTTP status the service answers with"""
+    status = 400
+
+class OrderValidationError(OrderError):
+    status = 422
+
+class IdempotencyConflict(OrderError):
+    status = 409
+
+
+def _now():
+    return datetime.now().isoformat(sep=" ", timespec="milliseconds")
+
+
+# -------------------------------
+# Journal
+# -------------------------------
+
+class OrderJournal:
+    """
+    Append-only JSON-lines file. append() returns once its line is on disk;
+    a writer thread takes whatever has queued up while the previous fsync
+    ran and commits it with a single fsync, so concurrent orders share the cost.
+    """
+
+    def __init__(self, path, fsync=True, on_write=None):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.fsync = fsync
+        self._on_write = on_write
+        self._truncate_torn_tail(path)
+        self._file = open(path, "ab", buffering=0)
+        self._cond = threading.Condition()
+        self._buffer = []
+        self._appended = 0      # records handed to append()
+        self._durable = 0       # records written (and fsynced)
+        self._error = None
+        self._closing = False
+        self._paused = False    # rewrite() in progress: appends wait
+        self.commits = 0
+        self._thread = threading.Thread(target=self._run, name="order-journal", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _truncate_torn_tail(path):
+        """Drop a last line cut short by a crash, so the next append starts on a fresh line"""
+        if not os.path.exists(path):
+            return
+        with open(path, "rb+") as f:
+            size = f.seek(0, os.SEEK_END)
+            if not size:
+                return
+            f.seek(max(size - 65536, 0))
+            tail = f.read()
+            if tail.endswith(b"\n"):
+                return
+            newline = tail.rfind(b"\n")
+            f.truncate(size - len(tail) + newline + 1 if newline >= 0 else 0)
+
+    def append(self, record, wait=True):
+        """Queue one record; wait=True blocks until it is durable (raises if the write failed)"""
+        line = (json.dumps(record, separators=(",", ":"), default=str) + "\n").encode()
+        with self._cond:
+            while self._paused:
+                self._cond.wait()
+            if self._error is not None or self._closing:
+                raise OrderError(f"Order journal unavailable: {self._error or 'closed'}")
+            self._buffer.append(line)
+            self._appended += 1
+            seq = self._appended
+            self._cond.notify_all()
+            while wait and self._durable < seq:
+                if self._error is not None:
+                    raise OrderError(f"Order journal write failed: {self._error}")
+                self._cond.wait()
+        return seq
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closing:
+                    self._cond.wait()
+                if not self._buffer:
+                    return
+                batch, self._buffer = self._buffer, []
+                upto = self._appended
+            try:
+                self._file.write(b"".join(batch))
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+            except OSError as e:
+                with self._cond:
+                    self._error = e
+                    self._cond.notify_all()
+                return
+            JOURNAL_FSYNCS.inc()
+            with self._cond:
+                self._durable = upto
+                self.commits += 1
+                self._cond.notify_all()
+            if self._on_write is not None:
+                self._on_write()
+
+    def size(self):
+        return os.path.getsize(self.path)
+
+    def rewrite(self, records):
+        """
+        Replace the file with `records` (compaction). Appends wait meanwhile;
+        lines already queued are written to the old file first, so the caller's
+        records must include what those lines recorded. Returns the new size.
+        """
+        with self._cond:
+            self._paused = True
+            try:
+                while self._buffer or self._durable < self._appended:
+                    if self._error is not None:
+                        raise OrderError(f"Order journal write failed: {self._error}")
+                    self._cond.wait()
+                tmp = self.path + ".tmp"
+                with open(tmp, "wb") as f:
+                    f.writelines((json.dumps(r, separators=(",", ":"), default=str) + "\n").encode()
+                                 for r in records)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                self._file.close()
+                os.replace(tmp, self.path)
+                self._file = open(self.path, "ab", buffering=0)
+                return self.size()
+            finally:
+                self._paused = False
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(5.0)
+        self._file.close()
+
+    @staticmethod
+    def read(path, offset=0):
+        """([records], offset after the last complete line) from offset on; a torn last line is left for later"""
+        if not os.path.exists(path):
+            return [], offset
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        records = []
+        for line in data[:end].splitlines():
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue        # not JSON: skipped rather than stalling replication
+        return records, offset + end
+
+
+# -------------------------------
+# Replication to the orders table
+# -------------------------------
+
+def _upsert_sql():
+    return db.get_backend().upsert_sql("orders", ORDER_COLUMNS, ("IDEMPOTENCY_KEY",),
+                                       extra_assignments=("SYS_UPDATE_DATE_TIME = CURRENT_TIMESTAMP",))
+
+def _row(record):
+    return tuple(record.get(field) for field in _RECORD_FIELDS)
+
+class OrderReplicator:
+    """
+    Tails the journal from a saved byte offset and writes it to `orders` in
+    batches (one transaction each). The offset is saved after each commit, so
+    after a crash the uncommitted tail is simply replayed; upserts on
+    IDEMPOTENCY_KEY make that harmless.
+    """
+
+    def __init__(self, journal_path, interval=0.5, batch_size=500):
+        self.journal_path = journal_path
+        self.offset_path = journal_path + ".offset"
+        self.interval = interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.RLock()     # held by a pass, and by compaction while it rewrites the file
+        self.after_pass = None              # called by the thread after each successful pass
+        self.offset = self._load_offset()
+        self.stats = {"batches": 0, "rows": 0, "failures": 0}
+        REPLICATION_LAG.set_function(self.lag)
+
+    def _load_offset(self):
+        try:
+            with open(self.offset_path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _save_offset(self, offset):
+        tmp = self.offset_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp, self.offset_path)
+        self.offset = offset
+
+    def lag(self):
+        try:
+            return max(os.path.getsize(self.journal_path) - self.offset, 0)
+        except OSError:
+            return 0
+
+    def notify(self):
+        self._wake.set()
+
+    def replicate_once(self):
+        """Copy everything journaled since the saved offset; returns the number of records applied"""
+        with self._lock:
+            return self._replicate()
+
+    def _replicate(self):
+        records, end = OrderJournal.read(self.journal_path, self.offset)
+        if not records:
+            return 0
+        applied = 0
+        for start in range(0, len(records), self.batch_size):
+            chunk = records[start:start + self.batch_size]
+            intents, results = {}, {}
+            for record in chunk:
+                if record["event"] == "intent":
+                    intents[record["key"]] = dict(record)
+                    results.pop(record["key"], None)
+                elif record["key"] in intents:
+                    intents[record["key"]].update({f: record.get(f) for f in _RESULT_FIELDS})
+                else:
+                    results[record["key"]] = record      # its intent was replicated by an earlier batch
+            with db.transaction() as conn:
+                cursor = conn.cursor()
+                if intents:
+                    cursor.executemany(_upsert_sql(), [_row(r) for r in intents.values()])
+                if results:
+                    cursor.executemany(_RESULT_UPDATE_SQL, [tuple(r.get(f) for f in _RESULT_FIELDS) + (key,)
+                                                            for key, r in results.items()])
+                cursor.close()
+            applied += len(chunk)
+            self.stats["batches"] += 1
+            self.stats["rows"] += len(intents) + len(results)
+        self._save_offset(end)
+        return applied
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.replicate_once()
+                if self.after_pass is not None:
+                    self.after_pass()
+            except Exception as e:
+                self.stats["failures"] += 1
+                print(f"❌ Order replication failed (retrying): {e}")
+                self._stop.wait(self.interval)
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="order-replicator", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the thread after one last pass"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(10.0)
+        self.replicate_once()
+
+
+# -------------------------------
+# Order Router
+# -------------------------------
+
+class PreparedOrder:
+    """A validated order with its broker request already built"""
+    __slots__ = ("key", "user_id", "api_key", "access_token", "fields", "body")
+
+    def __init__(self, key, user_id, api_key, access_token, fields, body):
+        self.key = key
+        self.user_id = user_id
+        self.api_key = api_key
+        self.access_token = access_token
+        self.fields = fields
+        self.body = body
+
+
+class OrderRouter:
+    def __init__(self, journal_path=None, manager=None, client=None, fsync=True, tick_size=0.05,
+                 replicator=None):
+        self.journal_path = journal_path or DEFAULT_JOURNAL_PATH
+        self.manager = manager or sessions
+        self.client = client          # None: auth.api_client() at call time
+        self.tick_size = tick_size
+        self._lock = threading.Lock()
+        self._orders, orphans = self._replay()      # idempotency key -> record
+        self._in_flight = {}                        # idempotency key -> Event set when the outcome is known
+        self.replicator = replicator
+        self.journal = OrderJournal(self.journal_path, fsync=fsync,
+                                    on_write=replicator.notify if replicator else None)
+        for key in orphans:
+            record = self._orders[key]
+            self.journal.append(dict(event="result", key=key, **{f: record.get(f) for f in _RESULT_FIELDS}))
+        self._compacted_on = None
+        if replicator is not None:
+            replicator.after_pass = self._compact_daily
+            self._compact_daily()
+
+    def _replay(self):
+        """
+        Rebuild the idempotency map from the journal. An intent without a
+        result (the process stopped mid-order) ends as unknown; returns
+        (orders, keys of those orphans) so their outcome can be journaled.
+        """
+        orders, orphans = {}, set()
+        records, _ = OrderJournal.read(self.journal_path)
+        for record in records:
+            if record["event"] == "intent":
+                orders[record["key"]] = dict(record, status="unknown",
+                                             message="No response recorded (process stopped)")
+                orphans.add(record["key"])
+            elif record["key"] in orders:
+                orders[record["key"]].update({f: record.get(f) for f in _RESULT_FIELDS})
+                orphans.discard(record["key"])
+        for record in orders.values():
+            record.pop("event", None)
+        return orders, sorted(orphans)
+
+    # ---- Prepare ----
+
+    def _validate(self, symbol, side, quantity, order_type, product, exchange, validity, price, trigger_price):
+        problems = []
+        if not symbol:
+            problems.append("symbol is required")
+        if side not in SIDES:
+            problems.append(f"side must be one of {', '.join(SIDES)}")
+        if order_type not in ORDER_TYPES:
+            problems.append(f"order_type must be one of {', '.join(ORDER_TYPES)}")
+        if product not in PRODUCTS:
+            problems.append(f"product must be one of {', '.join(PRODUCTS)}")
+        if exchange not in EXCHANGES:
+            problems.append(f"exchange must be one of {', '.join(EXCHANGES)}")
+        if validity not in VALIDITIES:
+            problems.append(f"validity must be one of {', '.join(VALIDITIES)}")
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity <= 0:
+            problems.append("quantity must be a positive whole number")
+        for name, value, needed in (("price", price, order_type in ("LIMIT", "SL")),
+                                    ("trigger_price", trigger_price, order_type in ("SL", "SL-M"))):
+            if needed and not value:
+                problems.append(f"{name} is required for {order_type} orders")
+            elif value:
+                if value < 0:
+                    problems.append(f"{name} must be positive")
+                elif self.tick_size and abs(value / self.tick_size - round(value / self.tick_size)) > 1e-6:
+                    problems.append(f"{name} must be a multiple of the tick size {self.tick_size}")
+        if order_type == "MARKET" and price:
+            problems.append("MARKET orders take no price")
+        if problems:
+            raise OrderValidationError("; ".join(problems))
+
+    def prepare(self, user_id, symbol, side, quantity, order_type="MARKET", price=None, trigger_price=None,
+                product="CNC", exchange="NSE", validity="DAY", idempotency_key=None) -> PreparedOrder:
+        """Validate and encode the order; raises OrderValidationError or OrderError (no session)"""
+        with ORDER_STAGE_SECONDS.time(stage="validate"):
+            symbol, side, order_type = str(symbol or "").upper(), str(side or "").upper(), str(order_type).upper()
+            product, exchange, validity = str(product).upper(), str(exchange).upper(), str(validity).upper()
+            self._validate(symbol, side, quantity, order_type, product, exchange, validity, price, trigger_price)
+            key = idempotency_key or db.generate_login_seq_id()
+            if not _KEY_PATTERN.match(key):
+                raise OrderValidationError("idempotency_key must be 1-64 characters of A-Z a-z 0-9 _ . : -")
+            session = self.manager.get_session(user_id)
+            if not session:
+                error = OrderError(f"No valid session for {user_id}; log in first")
+                error.status = 401
+                raise error
+        with ORDER_STAGE_SECONDS.time(stage="serialize"):
+            fields = {"exchange": exchange, "symbol": symbol, "side": side, "order_type": order_type,
+                      "product": product, "validity": validity, "quantity": quantity,
+                      "price": price or 0, "trigger_price": trigger_price or 0}
+            body = urlencode({
+                "tradingsymbol": symbol, "exchange": exchange, "transaction_type": side, "order_type": order_type,
+                "quantity": quantity, "product": product, "validity": validity, "price": price or 0,
+                "trigger_price": trigger_price or 0, "disclosed_quantity": 0,
+            }).encode()
+        return PreparedOrder(key, user_id, session["api_key"], session["access_token"], fields, body)
+
+    def _client(self):
+        return self.client or auth.api_client()
+
+    def warm(self, user_id):
+        """Cache the user's session and open a pooled connection (order book GET) before the first order"""
+        session = self.manager.get_session(user_id)
+        if session:
+            self._client().get("/orders", auth=(session["api_key"], session["access_token"]))
+        return bool(session)
+
+    # ---- Submit ----
+
+    def _claim(self, order):
+        """(record, None) for a new key, or (existing record, Event to wait on) for a repeat"""
+        with self._lock:
+            existing = self._orders.get(order.key)
+            if existing is not None:
+                if existing["user_id"] != order.user_id or any(existing[f] != v for f, v in order.fields.items()):
+                    raise IdempotencyConflict(f"Idempotency key {order.key} was used for a different order")
+                return existing, self._in_flight.get(order.key)
+            record = dict(key=order.key, user_id=order.user_id, **order.fields, status="pending", order_id=None,
+                          message=None, http_status=None, submitted_at=_now(), responded_at=None,
+                          wire_ms=None, latency_ms=None)
+            self._orders[order.key] = record
+            self._in_flight[order.key] = threading.Event()
+            return record, None
+
+    def submit(self, order: PreparedOrder, timeout=30.0) -> dict:
+        """Journal the intent, send it and return the order record (repeats return the first outcome)"""
+        started = time.perf_counter()
+        record, waiter = self._claim(order)
+        if record["status"] != "pending" or waiter is not None:
+            if waiter is not None:
+                waiter.wait(timeout)
+            ORDERS.inc(result="duplicate")
+            return dict(record, duplicate=True)
+
+        with tracing.span("order.submit", user_id=order.user_id, **{"order.key": order.key}) as span:
+            try:
+                with ORDER_STAGE_SECONDS.time(stage="journal"):
+                    self.journal.append(dict(event="intent", **record))
+            except OrderError:
+                with self._lock:
+                    del self._orders[order.key]         # nothing was sent: the same key may be retried
+                    self._in_flight.pop(order.key).set()
+                raise
+
+            wire = time.perf_counter()
+            ORDER_STAGE_SECONDS.observe(wire - started, stage="wire")
+            result = {"wire_ms": round((wire - started) * 1000, 3)}
+            try:
+                with ORDER_STAGE_SECONDS.time(stage="dispatch"):
+                    response = self._client().post(ORDER_ENDPOINT, data=order.body,
+                                                   auth=(order.api_key, order.access_token))
+                result.update(self._outcome(response))
+            except Exception as e:
+                # The request may or may not have reached the broker: do not guess, do not resend
+                result.update(status="unknown", message=f"No response: {e}"[:255])
+            finally:
+                result.update(responded_at=_now(), latency_ms=round((time.perf_counter() - started) * 1000, 3))
+                self._finish(order, record, result)
+            span.set_attributes({"order.status": record["status"], "http.status_code": record["http_status"] or 0})
+        ORDER_STAGE_SECONDS.observe(time.perf_counter() - started, stage="total")
+        return dict(record)
+
+    @staticmethod
+    def _outcome(response):
+        try:
+            payload = response.json()
+        except ValueError:
+            payload = {}
+        data = payload.get("data") if isinstance(payload, dict) else None
+        if isinstance(data, list):
+            data = data[0] if data else None
+        order_id = (data or {}).get("order_id") if isinstance(data, dict) else None
+        if response.status_code == 200 and payload.get("status") == "success" and order_id:
+            return {"status": "accepted", "order_id": str(order_id), "http_status": 200}
+        message = (payload.get("message") if isinstance(payload, dict) else None) or response.text
+        # 5xx: the broker may have placed it before failing
+        status = "unknown" if response.status_code >= 500 else "rejected"
+        return {"status": status, "message": str(message)[:255], "http_status": response.status_code}
+
+    def _finish(self, order, record, result):
+        with self._lock:
+            record.update(result)
+            event = self._in_flight.pop(order.key)
+        try:
+            self.journal.append(dict(event="result", key=order.key, **result), wait=False)
+        except OrderError as e:
+            print(f"⚠️ Order result not journaled ({order.key}): {e}")
+        event.set()
+        response_cache.invalidate_for_order(order.api_key)
+        ORDERS.inc(result=record["status"])
+        db.insert_request_response_log(
+            "INFO" if record["status"] == "accepted" else "WARN", f"Order {record['status']}", MODULE,
+            dict(order.fields, idempotency_key=order.key), result, api_name="place_order",
+            user_id=order.user_id,
+            http_status=record["http_status"], status="success" if record["status"] == "accepted" else "failure")
+
+    def place(self, user_id, symbol, side, quantity, **options) -> dict:
+        """prepare() + submit()"""
+        return self.submit(self.prepare(user_id, symbol, side, quantity, **options))
+
+    # ---- Lookup ----
+
+    def get(self, key):
+        with self._lock:
+            record = self._orders.get(key)
+            return dict(record) if record else None
+
+    # ---- Retention ----
+
+    def compact(self, now=None):
+        """
+        Forget idempotency keys submitted before the trading day of `now` and
+        rewrite the journal without them. Only runs once the replicator has
+        copied the journal to the orders table (which keeps the history);
+        returns the number of keys dropped, or None when it did not run.
+        """
+        if self.replicator is None:
+            return None
+        day = (now or datetime.now()).strftime("%Y-%m-%d")
+        with self.replicator._lock:
+            try:
+                self.replicator.replicate_once()
+            except Exception as e:
+                print(f"⚠️ Order journal not compacted, replication failed: {e}")
+                return None
+            with self._lock:
+                keep = {key: record for key, record in self._orders.items()
+                        if (record.get("submitted_at") or day) >= day or key in self._in_flight}
+                dropped = len(self._orders) - len(keep)
+                if dropped:
+                    records = []
+                    for key, record in keep.items():
+                        records.append(dict(event="intent", **dict(record, status="pending")))
+                        if key not in self._in_flight:
+                            records.append(dict(event="result", key=key,
+                                                **{f: record.get(f) for f in _RESULT_FIELDS}))
+                    self.journal.rewrite(records)
+                    self._orders = keep
+            if dropped:
+                # The kept records are re-replicated from the start (upserts, so harmless)
+                self.replicator._save_offset(0)
+        self._compacted_on = day
+        return dropped
+
+    def _compact_daily(self):
+        if self._compacted_on != datetime.now().strftime("%Y-%m-%d"):
+            self.compact()
+
+    def stats(self) -> dict:
+        with self._lock:
+            by_status = {}
+            for record in self._orders.values():
+                by_status[record["status"]] = by_status.get(record["status"], 0) + 1
+        stats = {"orders": by_status, "in_flight": len(self._in_flight), "journal_commits": self.journal.commits}
+        if self.replicator is not None:
+            stats["replication"] = dict(self.replicator.stats, lag_bytes=self.replicator.lag())
+        return stats
+
+    def close(self):
+        self.journal.close()
+        if self.replicator is not None:
+            self.replicator.stop()
+
+
+def from_settings(replicate=True, **overrides) -> OrderRouter:
+    """Router (and a running replicator unless replicate=False) configured from .env"""
+    settings = get_settings()
+    path = overrides.pop("journal_path", None) or settings.get("ORDER_JOURNAL_PATH", DEFAULT_JOURNAL_PATH)
+    replicator = None
+    if replicate:
+        replicator = OrderReplicator(path, interval=settings.get("ORDER_REPLICATION_INTERVAL", 0.5, float),
+                                     batch_size=settings.get("ORDER_REPLICATION_BATCH", 500, int)).start()
+    options = dict(journal_path=path, fsync=settings.flag("ORDER_JOURNAL_FSYNC", True),
+                   tick_size=settings.get("ORDER_TICK_SIZE", 0.05, float), replicator=replicator)
+    options.update(overrides)
+    return OrderRouter(**options)
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Place orders through the local journal")
+    sub = parser.add_subparsers(dest="command", required=True)
+    place_parser = sub.add_parser("place", help="place one order")
+    place_parser.add_argument("user_id")
+    place_parser.add_argument("symbol")
+    place_parser.add_argument("side", choices=SIDES, type=str.upper)
+    place_parser.add_argument("quantity", type=int)
+    place_parser.add_argument("--type", dest="order_type", default="MARKET", choices=ORDER_TYPES, type=str.upper)
+    place_parser.add_argument("--price", type=float)
+    place_parser.add_argument("--trigger-price", type=float)
+    place_parser.add_argument("--product", default="CNC")
+    place_parser.add_argument("--exchange", default="NSE")
+    place_parser.add_argument("--validity", default="DAY")
+    place_parser.add_argument("--key", help="idempotency key (re-running with the same key does not re-place)")
+    sub.add_parser("replicate", help="copy journaled orders into the orders table, then exit")
+    args = parser.parse_args()
+
+    if args.command == "replicate":
+        replicator = OrderReplicator(get_settings().get("ORDER_JOURNAL_PATH", DEFAULT_JOURNAL_PATH))
+        print(f"✅ {replicator.replicate_once()} journal record(s) replicated")
+        sys.exit(0)
+
+    router = from_settings()
+    try:
+        result = router.place(args.user_id, args.symbol, args.side, args.quantity, order_type=args.order_type,
+                              price=args.price, trigger_price=args.trigger_price, product=args.product,
+                              exchange=args.exchange, validity=args.validity, idempotency_key=args.key)
+    except OrderError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    finally:
+        router.close()
+        db.flush_logs()
+    print(f"{'✅' if result['status'] == 'accepted' else '❌'} {result}")
@@ -0,0 +1,292 @@
+"""
+Client-side rate limiting for mStock API calls.
+Every request takes one token from its api_key bucket and one from its
+endpoint-group bucket (session / order / portfolio / default). When tokens run
+out, callers queue by priority: session and order calls are granted before
+fund-summary polling that shares the same buckets. Waiting is cooperative:
+threads block on an Event, asyncio callers await a Future, and whoever wakes
+up first hands tokens to the highest-priority waiters that fit.
+
+    scheduler.acquire("/user/fundsummary", api_key)            # threads
+    await scheduler.acquire_async("/session/token", api_key)   # asyncio
+    scheduler.stats()   # per-group queue-wait histograms, throttles, queue depth
+
+Limits (.env): RATE_LIMIT_PER_KEY, RATE_LIMIT_SESSION, RATE_LIMIT_ORDER,
+RATE_LIMIT_PORTFOLIO, RATE_LIMIT_DEFAULT as "<requests per second>[:<burst>]".
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+from src.settings import get_settings
+
+# endpoint -> group
+ENDPOINT_GROUPS = {
+    "/connect/login": "session",
+    "/session/token": "session",
+    "/session/refresh_token": "session",
+    "/session/verifytotp": "session",
+    "/logout": "session",
+    "/user/fundsummary": "portfolio",
+    "/portfolio/holdings": "portfolio",
+}
+
+# lower runs first
+GROUP_PRIORITY = {"session": 0, "order": 0, "default": 1, "portfolio": 2}
+
+DEFAULT_LIMITS = {"per_key": "10", "session": "5", "order": "10", "portfolio": "10", "default": "10"}
+
+# queue-wait histogram upper bounds in milliseconds
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+
+def group_for(endpoint):
+    if endpoint in ENDPOINT_GROUPS:
+        return ENDPOINT_GROUPS[endpoint]
+    return "order" if endpoint.startswith("/orders") else "default"
+
+def _parse_limit(value):
+    """'5' -> (5.0, 5.0); '5:10' -> (5.0, 10.0)"""
+    rate, _, burst = str(value).partition(":")
+    return float(rate), float(burst or rate)
+
+def limits_from_env():
+    settings = get_settings()
+    return {name: _parse_limit(settings.get(f"RATE_LIMIT_{name.upper()}", default))
+            for name, default in DEFAULT_LIMITS.items()}
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; not thread-safe (the scheduler locks)"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._updated = clock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, now):
+        """Seconds until one token is available (0 if available now)"""
+        self._refill(now)
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self):
+        self._tokens -= 1
+
+    def pause(self, seconds, now):
+        """Empty the bucket so nothing is granted for `seconds` (e.g. after a 429)"""
+        self._refill(now)
+        self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class _Waiter:
+    __slots__ = ("buckets", "granted", "event", "future", "loop")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.granted = False
+        self.event = None
+        self.future = None
+        self.loop = None
+
+    def wake(self):
+        self.granted = True
+        if self.event is not None:
+            self.event.set()
+        elif self.future is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class RequestScheduler:
+    """Token buckets per api_key and per endpoint group, plus a priority wait queue"""
+
+    def __init__(self, limits=None, clock=time.monotonic, enabled=True):
+        self.enabled = enabled
+        self.limits = limits or limits_from_env()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._key_buckets = {}
+        self._group_buckets = {}
+        self._queue = []               # heap of (priority, seq, waiter)
+        self._seq = itertools.count()
+        self._histograms = {}          # group -> [counts per WAIT_BUCKETS_MS], count, sum_ms
+        self._throttled = 0
+
+    # -------------------------------
+    # Buckets (called with the lock held)
+    # -------------------------------
+
+    def _bucket(self, buckets, name, limit_name):
+        bucket = buckets.get(name)
+        if bucket is None:
+            bucket = buckets[name] = TokenBucket(*self.limits[limit_name], clock=self._clock)
+        return bucket
+
+    def _buckets_for(self, endpoint, api_key):
+        group = group_for(endpoint)
+        buckets = [self._bucket(self._group_buckets, group, group if group in self.limits else "default")]
+        if api_key:
+            buckets.append(self._bucket(self._key_buckets, api_key, "per_key"))
+        return group, buckets
+
+    # -------------------------------
+    # Dispatch (called with the lock held)
+    # -------------------------------
+
+    def _dispatch(self):
+        """
+        Grant waiters in priority order. A waiter that cannot run reserves its
+        buckets, so lower-priority waiters may not take tokens from them.
+        Returns seconds until the next grant could become possible (None if idle).
+        """
+        now = self._clock()
+        reserved = set()
+        next_wake = None
+        remaining = []
+        while self._queue:
+            entry = heapq.heappop(self._queue)
+            waiter = entry[2]
+            if any(id(b) in reserved for b in waiter.buckets):
+                remaining.append(entry)
+                continue
+            wait = max(b.wait_time(now) for b in waiter.buckets)
+            if wait == 0:
+                for bucket in waiter.buckets:
+                    bucket.take()
+                waiter.wake()
+            else:
+                reserved.update(id(b) for b in waiter.buckets)
+                next_wake = wait if next_wake is None else min(next_wake, wait)
+                remaining.append(entry)
+        for entry in remaining:
+            heapq.heappush(self._queue, entry)
+        return next_wake
+
+    def _enqueue(self, endpoint, api_key, priority):
+        """Fast path when nothing is queued and tokens are free; else queue a waiter"""
+        with self._lock:
+            group, buckets = self._buckets_for(endpoint, api_key)
+            if priority is None:
+                priority = GROUP_PRIORITY.get(group, GROUP_PRIORITY["default"])
+            waiter = _Waiter(buckets)
+            if not self._queue and all(b.wait_time(self._clock()) == 0 for b in buckets):
+                for bucket in buckets:
+                    bucket.take()
+                waiter.granted = True
+            else:
+                self._throttled += 1
+                heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        return group, waiter
+
+    def _poll(self, waiter):
+        with self._lock:
+            if waiter.granted:
+                return None
+            return self._dispatch()
+
+    def _remove(self, waiter):
+        with self._lock:
+            self._queue = [e for e in self._queue if e[2] is not waiter]
+            heapq.heapify(self._queue)
+
+    # -------------------------------
+    # Public API
+    # -------------------------------
+
+    def acquire(self, endpoint, api_key=None, priority=None, timeout=None):
+        """Block the calling thread until the request may be sent; returns seconds waited"""
+        if not self.enabled:
+            return 0.0
+        started = self._clock()
+        group, waiter = self._enqueue(endpoint, api_key, priority)
+        if not waiter.granted:
+            waiter.event = threading.Event()
+            while True:
+                next_wake = self._poll(waiter)
+                if waiter.granted:
+                    break
+                if timeout is not None and self._clock() - started >= timeout:
+                    self._remove(waiter)
+                    raise TimeoutError(f"Rate limiter: no slot for {endpoint} within {timeout}s")
+                waiter.event.wait(next_wake if next_wake is not None else 0.05)
+        return self._record(group, self._clock() - started)
+
+    async def acquire_async(self, endpoint, api_key=None, priority=None, timeout=None):
+        """asyncio version of acquire(); waits without blocking the event loop"""
+        if not self.enabled:
+            return 0.0
+        import asyncio    # only async callers pay for the import
+        started = self._clock()
+        group, waiter = self._enqueue(endpoint, api_key, priority)
+        if not waiter.granted:
+            waiter.loop = asyncio.get_running_loop()
+            waiter.future = waiter.loop.create_future()
+            while True:
+                next_wake = self._poll(waiter)
+                if waiter.granted:
+                    break
+                if timeout is not None and self._clock() - started >= timeout:
+                    self._remove(waiter)
+                    raise TimeoutError(f"Rate limiter: no slot for {endpoint} within {timeout}s")
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future),
+                                           next_wake if next_wake is not None else 0.05)
+                except asyncio.TimeoutError:
+                    pass
+        return self._record(group, self._clock() - started)
+
+    def throttled(self, endpoint, api_key=None, retry_after=1.0):
+        """Broker answered 429: pause the endpoint group (and key) for retry_after seconds"""
+        if not self.enabled:
+            return
+        with self._lock:
+            _, buckets = self._buckets_for(endpoint, api_key)
+            now = self._clock()
+            for bucket in buckets:
+                bucket.pause(retry_after, now)
+
+    # -------------------------------
+    # Metrics
+    # -------------------------------
+
+    def _record(self, group, waited):
+        waited_ms = waited * 1000
+        with self._lock:
+            hist = self._histograms.get(group)
+            if hist is None:
+                hist = self._histograms[group] = [[0] * len(WAIT_BUCKETS_MS), 0, 0.0]
+            for i, bound in enumerate(WAIT_BUCKETS_MS):
+                if waited_ms <= bound:
+                    hist[0][i] += 1
+                    break
+            hist[1] += 1
+            hist[2] += waited_ms
+        return waited
+
+    def stats(self) -> dict:
+        """Queue-wait histograms per group (cumulative counts per upper bound in ms)"""
+        with self._lock:
+            groups = {}
+            for group, (counts, count, total) in self._histograms.items():
+                cumulative = list(itertools.accumulate(counts))
+                groups[group] = {
+                    "count": count,
+                    "avg_wait_ms": round(total / count, 2) if count else 0.0,
+                    "buckets": {("+Inf" if b == float("inf") else b): c
+                                for b, c in zip(WAIT_BUCKETS_MS, cumulative)},
+                }
+            return {"queued": len(self._queue), "throttled": self._throttled, "groups": groups}
+
+
+scheduler = RequestScheduler(enabled=get_settings().flag("RATE_LIMIT_ENABLED", True))
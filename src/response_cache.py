@@ -0,0 +1,151 @@
+"""
+Read-through cache for idempotent mStock GET endpoints.
+Entries are keyed by (endpoint, api_key, params), expire after a per-endpoint
+TTL and are evicted LRU beyond max_entries. Concurrent misses for the same key
+are coalesced: one caller (the leader) does the request, the others wait for
+its result instead of sending their own. Failures are never cached.
+
+    cache.get_or_load("/user/fundsummary", api_key, None, fetch)
+    cache.invalidate(api_key=api_key)        # logout
+    invalidate_for_order(api_key)            # order placed / modified / cancelled
+    cache.stats()                            # hits, misses, coalesced, evictions, ...
+
+TTLs (.env): CACHE_TTL_FUNDSUMMARY, CACHE_TTL_HOLDINGS (seconds, 0 disables),
+CACHE_MAX_ENTRIES.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from src.settings import get_settings
+
+settings = get_settings()
+
+# endpoint -> seconds a response stays fresh
+ENDPOINT_TTLS = {
+    "/user/fundsummary": settings.get("CACHE_TTL_FUNDSUMMARY", 2.0, float),
+    "/portfolio/holdings": settings.get("CACHE_TTL_HOLDINGS", 5.0, float),
+}
+
+# responses that change when an order is placed, modified or cancelled
+ORDER_SENSITIVE_ENDPOINTS = ("/user/fundsummary", "/portfolio/holdings")
+
+
+def _freeze(params):
+    """Hashable form of a params dict"""
+    if not params:
+        return ()
+    return tuple(sorted((k, _freeze(v) if isinstance(v, dict) else v) for k, v in params.items()))
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ReadThroughCache:
+    """TTL + LRU cache with single-flight loading; safe to share between threads"""
+
+    def __init__(self, ttls=None, default_ttl=0.0, max_entries=1024, clock=time.monotonic):
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._flights = {}              # key -> _Flight
+        self._generation = 0            # bumped by invalidate(); stale loads are not stored
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "errors": 0,
+                       "evictions": 0, "invalidations": 0}
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get_or_load(self, endpoint, api_key, params, loader):
+        """Return the cached value, or call loader() once for all concurrent callers"""
+        ttl = self.ttl_for(endpoint)
+        if ttl <= 0:
+            return loader()
+        key = (endpoint, api_key, _freeze(params))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self._clock():
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                flight = self._flights[key] = _Flight()
+                self._stats["misses"] += 1
+                generation = self._generation
+                leader = True
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self._stats["errors"] += 1
+            raise
+        else:
+            with self._lock:
+                if generation == self._generation:
+                    self._store(key, flight.value, ttl)
+            return flight.value
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _store(self, key, value, ttl):
+        self._entries[key] = (self._clock() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, api_key=None, endpoints=None):
+        """Drop entries for an api_key and/or endpoints (everything if both are None)"""
+        with self._lock:
+            self._generation += 1
+            doomed = [
+                key for key in self._entries
+                if (api_key is None or key[1] == api_key) and (endpoints is None or key[0] in endpoints)
+            ]
+            for key in doomed:
+                del self._entries[key]
+            self._stats["invalidations"] += 1
+        return len(doomed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["in_flight"] = len(self._flights)
+        lookups = snapshot["hits"] + snapshot["misses"] + snapshot["coalesced"]
+        snapshot["hit_ratio"] = round((snapshot["hits"] + snapshot["coalesced"]) / lookups, 3) if lookups else 0.0
+        return snapshot
+
+
+cache = ReadThroughCache(max_entries=settings.get("CACHE_MAX_ENTRIES", 1024, int))
+
+def invalidate_for_order(api_key):
+    """Call after an order event so balances/holdings are re-read"""
+    return cache.invalidate(api_key=api_key, endpoints=ORDER_SENSITIVE_ENDPOINTS)
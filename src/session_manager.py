@@ -0,0 +1,238 @@
+"""
+Session reuse for mStock logins.
+SessionManager.get_session(user_id) returns a still-valid access token without
+a broker round trip whenever possible, in this order:
+1. memory (per-process cache)
+2. DB (M_ACCESS_TOKEN / LAST_LOGIN_DATE in MS01_API_Authentication_Credential)
+3. renewal with M_REFRESH_TOKEN when the token is close to expiry
+It returns None only when a full login (password + OTP) is required.
+
+Broker sessions end with the trading day, so a token is treated as valid until
+the earlier of LAST_LOGIN_DATE + SESSION_TTL and midnight after the login.
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+from src import auth, db
+from src.response_cache import cache
+from src.settings import get_settings
+
+
+def _parse_time(value):
+    """LAST_LOGIN_DATE comes back as datetime (MySQL) or text (SQLite / broker JSON)"""
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+class SessionManager:
+    """
+    Per-process cache of broker sessions keyed by M_STOCK_USER_ID.
+    Lookups for the same user are serialized so concurrent callers share one
+    DB read or renewal instead of each doing their own.
+    """
+
+    def __init__(self, ttl: float = 86400.0, renew_before: float = 900.0, renew=auth.renew_session):
+        self.ttl = timedelta(seconds=ttl)
+        self.renew_before = timedelta(seconds=renew_before)
+        self._renew = renew
+        self._lock = threading.Lock()
+        self._user_locks = {}
+        self._sessions = {}    # user_id -> session dict
+        self._stats = {"memory_hits": 0, "db_hits": 0, "renewals": 0,
+                       "renewal_failures": 0, "misses": 0}
+
+    # -------------------------------
+    # Validity
+    # -------------------------------
+
+    def expires_at(self, login_time: datetime) -> datetime:
+        midnight = datetime.combine(login_time.date() + timedelta(days=1), datetime.min.time())
+        return min(login_time + self.ttl, midnight)
+
+    def _valid(self, session, now):
+        return bool(session) and now < session["expires_at"]
+
+    def _fresh(self, session, now):
+        """Valid and not yet inside the renewal window"""
+        return bool(session) and now < session["renew_at"]
+
+    def renew_at(self, login_time: datetime, expires_at: datetime) -> datetime:
+        renew_at = expires_at - self.renew_before
+        if renew_at <= login_time:
+            # Logged in (or renewed) inside the window, e.g. late in the trading day: renewing
+            # again would not move expiry past midnight, so use the token until it runs out
+            return expires_at
+        return renew_at
+
+    def _build(self, user_id, api_key, access_token, refresh_token, login_time):
+        login_time = _parse_time(login_time)
+        if not access_token or login_time is None:
+            return None
+        expires_at = self.expires_at(login_time)
+        return {
+            "user_id": user_id,
+            "api_key": api_key,
+            "access_token": access_token,
+            "refresh_token": refresh_token,
+            "login_time": login_time,
+            "expires_at": expires_at,
+            "renew_at": self.renew_at(login_time, expires_at),
+        }
+
+    # -------------------------------
+    # Sources
+    # -------------------------------
+
+    def _load(self, user_id):
+        """Session stored by the last login of any process, unless logged out since"""
+        row = db.fetch_one("""
+            SELECT M_STOCK_API_KEY, M_ACCESS_TOKEN, M_REFRESH_TOKEN, LAST_LOGIN_DATE, LAST_LOGOUT_DATE
+            FROM MS01_API_Authentication_Credential
+            WHERE M_STOCK_USER_ID = %s
+        """, (user_id,))
+        if not row:
+            return None
+        session = self._build(user_id, row["M_STOCK_API_KEY"], row["M_ACCESS_TOKEN"],
+                              row["M_REFRESH_TOKEN"], row["LAST_LOGIN_DATE"])
+        logged_out = _parse_time(row["LAST_LOGOUT_DATE"])
+        if session and logged_out and logged_out >= session["login_time"]:
+            return None
+        return session
+
+    def _try_renew(self, user_id, session, now):
+        """Renew with the refresh token; returns the new session or None"""
+        login_seq_id = db.generate_login_seq_id()
+        request = {"user_id": user_id, "api_key": session["api_key"]}
+        try:
+            session_json = self._renew(session["api_key"], session["refresh_token"])
+            data = session_json.get("data") or {}
+            if not data.get("access_token"):
+                raise ValueError(f"No access_token in renewal response: {session_json}")
+        except Exception as e:
+            self._count("renewal_failures")
+            db.insert_request_response_log(
+                "WARN", "Session renewal failed", "session_manager", request, str(e),
+                api_name="renew_session", login_seq_id=login_seq_id, status="failure"
+            )
+            return None
+
+        data.setdefault("login_time", now.strftime("%Y-%m-%d %H:%M:%S"))
+        data.setdefault("refresh_token", session["refresh_token"])
+        # New tokens and the log row land together (or not at all)
+        uow = db.LoginUnitOfWork(user_id, "session_manager", login_seq_id, api_name="renew_session")
+        uow.set_session({}, {"data": data})
+        uow.request_log("INFO", "Session renewed", request, {})
+        if not uow.commit()["committed"]:
+            # The new tokens are not stored (the failed commit logged why); other processes
+            # would still load the old ones, so do not hand these out either
+            self._count("renewal_failures")
+            return None
+        self._count("renewals")
+        return self._build(user_id, session["api_key"], data["access_token"],
+                           data["refresh_token"], data["login_time"])
+
+    # -------------------------------
+    # Public API
+    # -------------------------------
+
+    def get_session(self, user_id, now=None):
+        """
+        Valid session dict (access_token, refresh_token, api_key, expires_at, source)
+        or None when a full login is needed.
+        """
+        now = now or datetime.now()
+        with self._user_lock(user_id):
+            session, source = self._sessions.get(user_id), "memory"
+            if not self._fresh(session, now):
+                # Another process may have logged in or renewed since we cached it
+                stored = self._load(user_id)
+                if stored:
+                    session, source = stored, "db"
+
+            if self._fresh(session, now):
+                self._sessions[user_id] = session
+                self._count(f"{source}_hits")
+                return dict(session, source=source)
+
+            if session and session.get("refresh_token"):
+                renewed = self._try_renew(user_id, session, now)
+                if renewed:
+                    self._sessions[user_id] = renewed
+                    return dict(renewed, source="renewed")
+
+            if self._valid(session, now):
+                # Renewal failed but the token has not expired yet
+                self._sessions[user_id] = session
+                self._count(f"{source}_hits")
+                return dict(session, source=source)
+
+            self._sessions.pop(user_id, None)
+            self._count("misses")
+            return None
+
+    def remember(self, user_id, api_key, session_json):
+        """Cache the result of a full login (session JSON from generate_session)"""
+        data = (session_json or {}).get("data") or {}
+        session = self._build(user_id, api_key, data.get("access_token"), data.get("refresh_token"),
+                              data.get("login_time") or datetime.now())
+        with self._user_lock(user_id):
+            if session:
+                self._sessions[user_id] = session
+            else:
+                self._sessions.pop(user_id, None)
+        return session
+
+    def invalidate(self, user_id, persist=True):
+        """Forget a session (logout); persist=True also clears the stored tokens so other processes skip it"""
+        with self._user_lock(user_id):
+            session = self._sessions.pop(user_id, None)
+            api_key = session["api_key"] if session else (
+                db.fetch_one("SELECT M_STOCK_API_KEY FROM MS01_API_Authentication_Credential "
+                             "WHERE M_STOCK_USER_ID = %s", (user_id,)) or {}
+            ).get("M_STOCK_API_KEY")
+            if api_key:
+                cache.invalidate(api_key=api_key)
+            if persist:
+                with db.transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute("""
+                        UPDATE MS01_API_Authentication_Credential
+                        SET M_ACCESS_TOKEN   = NULL,
+                            M_REFRESH_TOKEN  = NULL,
+                            LAST_LOGOUT_DATE = NOW()
+                        WHERE M_STOCK_USER_ID = %s
+                    """, (user_id,))
+                    cursor.close()
+
+    def clear(self):
+        """Forget every cached session (memory only; the DB is left alone)"""
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["cached"] = len(self._sessions)
+        return snapshot
+
+    def _user_lock(self, user_id):
+        with self._lock:
+            return self._user_locks.setdefault(user_id, threading.Lock())
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+
+settings = get_settings()
+sessions = SessionManager(
+    ttl=settings.get("SESSION_TTL", 86400.0, float),
+    renew_before=settings.get("SESSION_RENEW_BEFORE", 900.0, float),
+)
@@ -0,0 +1,140 @@
+"""
+Local token/session store keyed by M_STOCK_USER_ID.
+Replaces the .env rewrites the login/logout CLIs used to do: every account has
+its own record, each update is one atomic SQLite transaction (a crash leaves
+the old or the new record, never half a file), concurrent processes are
+serialized by SQLite's file lock, and lookups are a primary-key read.
+
+    store.update(user_id, {"access_token": ..., "refresh_token": ...})   # merge
+    store.get(user_id)              # {"access_token": ..., "updated_at": ...} or None
+    store.clear(user_id, SESSION_FIELDS)                                   # logout
+    store.update_many({user_a: {...}, user_b: {...}})                     # one transaction
+    store.all()                     # {user_id: record}
+
+Path (.env): SESSION_STORE_PATH (default config/session_store.db).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.settings import get_settings
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(ROOT_DIR, "config", "session_store.db")
+
+# Fields dropped on logout; account fields (api_key, client_code, ...) are kept
+SESSION_FIELDS = ("request_token", "access_token", "public_token", "refresh_token",
+                  "enc_token", "login_seq_id", "last_login_date")
+
+
+class SessionStore:
+    """Embedded key-value file: one JSON record per user; safe across threads and processes"""
+
+    def __init__(self, path=None, timeout=10.0):
+        self.path = path or get_settings().get("SESSION_STORE_PATH", DEFAULT_PATH)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        """Opened on first use so importing the module never touches the disk"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS SESSION_STORE (
+                    USER_ID    TEXT PRIMARY KEY,
+                    RECORD     TEXT NOT NULL,
+                    UPDATED_AT REAL NOT NULL
+                )
+            """)
+            self._conn = conn
+        return self._conn
+
+    def _read(self, conn, user_id):
+        row = conn.execute("SELECT RECORD, UPDATED_AT FROM SESSION_STORE WHERE USER_ID = ?",
+                           (user_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(json.loads(row[0]), updated_at=row[1])
+
+    def _apply(self, conn, user_id, change):
+        current = self._read(conn, user_id) or {}
+        current.pop("updated_at", None)
+        record = change(current)
+        if record is None:
+            conn.execute("DELETE FROM SESSION_STORE WHERE USER_ID = ?", (user_id,))
+        else:
+            conn.execute(
+                "INSERT INTO SESSION_STORE (USER_ID, RECORD, UPDATED_AT) VALUES (?, ?, ?) "
+                "ON CONFLICT(USER_ID) DO UPDATE SET RECORD = excluded.RECORD, "
+                "UPDATED_AT = excluded.UPDATED_AT",
+                (user_id, json.dumps(record, default=str), time.time())
+            )
+        return record
+
+    def _modify_many(self, changes):
+        """Read-modify-write under BEGIN IMMEDIATE: other writers wait, readers see old or new"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                records = {user_id: self._apply(conn, user_id, change) for user_id, change in changes}
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return records
+
+    def _modify(self, user_id, change):
+        return self._modify_many([(user_id, change)])[user_id]
+
+    # -------------------------------
+    # Public API
+    # -------------------------------
+
+    def get(self, user_id):
+        with self._lock:
+            return self._read(self._connect(), user_id)
+
+    def update(self, user_id, fields: dict):
+        """Merge fields into the user's record (None values are stored as null)"""
+        return self._modify(user_id, lambda record: {**record, **fields})
+
+    def update_many(self, updates: dict):
+        """update() for several users in a single transaction: {user_id: fields}"""
+        return self._modify_many([(user_id, lambda record, fields=fields: {**record, **fields})
+                                  for user_id, fields in updates.items()])
+
+    def clear(self, user_id, fields=SESSION_FIELDS):
+        """Drop fields from the user's record (e.g. the tokens on logout)"""
+        return self._modify(user_id, lambda record: {k: v for k, v in record.items() if k not in fields})
+
+    def delete(self, user_id):
+        self._modify(user_id, lambda record: None)
+
+    def all(self) -> dict:
+        with self._lock:
+            rows = self._connect().execute("SELECT USER_ID, RECORD, UPDATED_AT FROM SESSION_STORE").fetchall()
+        return {user_id: dict(json.loads(record), updated_at=updated) for user_id, record, updated in rows}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def reopen(self, path=None):
+        """Close and switch to `path` (default: SESSION_STORE_PATH as currently set)"""
+        self.close()
+        with self._lock:
+            self.path = path or get_settings().get("SESSION_STORE_PATH", DEFAULT_PATH)
+
+
+store = SessionStore()
@@ -0,0 +1,50 @@
+"""
+Process-wide settings.
+The .env files are read once, on the first get_settings() call, instead of
+every module calling load_dotenv() at import time. Values already in the
+environment win over .env. Lookups go to os.environ, so keys written at
+runtime (e.g. by gen_encryption_key.py) are seen immediately.
+
+    settings = get_settings()
+    settings.get("DB_BACKEND", "mysql")
+    settings.get("DB_POOL_SIZE", 5, int)
+    settings.flag("LOG_ASYNC", True)
+
+Files, in order: <project root>/.env, then config/.env.
+"""
+
+import os
+from functools import lru_cache
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENV_FILES = (os.path.join(ROOT_DIR, ".env"), os.path.join(ROOT_DIR, "config", ".env"))
+
+
+class Settings:
+    """Typed view over os.environ after the .env files were loaded"""
+
+    def __init__(self, env_files=ENV_FILES):
+        self.loaded_files = [path for path in env_files if os.path.isfile(path)]
+        if self.loaded_files:
+            # python-dotenv is only imported when there is something to parse
+            from dotenv import load_dotenv
+            for path in self.loaded_files:
+                load_dotenv(path, override=False)
+
+    def get(self, name, default=None, cast=None):
+        value = os.environ.get(name)
+        if value is None or value == "":
+            return default
+        return cast(value) if cast else value
+
+    def flag(self, name, default=False):
+        """'1', 'true', 'yes', 'on' (any case) -> True"""
+        value = os.environ.get(name)
+        if value is None or value == "":
+            return default
+        return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
@@ -0,0 +1,34 @@
+"""
+Every test module gets its own scratch database (see scratch.py): the
+module's ENV dict is applied with monkeypatch for the module's duration and
+undone afterwards. Scripts that touch the DB at import time (test_db_ops,
+test_api_flow) run during collection, before any fixture, so the session
+starts on a scratch database too.
+"""
+
+import tempfile
+
+import pytest
+
+from src.tests import scratch
+
+_session = pytest.MonkeyPatch()
+
+
+def pytest_configure(config):
+    scratch.use(tempfile.mkdtemp(prefix="mstock_tests_"), None, _session.setenv,
+                lambda name: _session.delenv(name, raising=False))
+
+
+def pytest_unconfigure(config):
+    _session.undo()
+
+
+@pytest.fixture(autouse=True, scope="module")
+def scratch_env(request, tmp_path_factory):
+    directory = tmp_path_factory.mktemp(request.module.__name__.rsplit(".", 1)[-1])
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        scratch.use(directory, getattr(request.module, "ENV", None),
+                    monkeypatch.setenv, lambda name: monkeypatch.delenv(name, raising=False))
+        yield directory
+    scratch.reset()
@@ -0,0 +1,63 @@
+"""
+Throw-away environment for the test scripts: a fresh SQLite database and
+session store under `directory`, a generated ENCRYPTION_KEY and the rate
+limiter off, plus the script's own ENV overrides (None removes a variable).
+The process-wide singletons that captured the previous settings are reset,
+so every script (and every module in one pytest run) gets its own database.
+
+    scratch.use(tempfile.mkdtemp(), ENV)             # python -m src.tests.test_x
+    scratch.use(tmp_path, ENV, monkeypatch.setenv)   # conftest.py, undone after the module
+"""
+
+import os
+import sys
+
+from cryptography.fernet import Fernet
+
+
+def _setenv(name, value):
+    os.environ[name] = value
+
+
+def _delenv(name):
+    os.environ.pop(name, None)
+
+
+def use(directory, env=None, setenv=_setenv, delenv=_delenv):
+    directory = str(directory)
+    values = {
+        "DB_BACKEND": "sqlite",
+        "DB_SQLITE_PATH": os.path.join(directory, "mstock_test.db"),
+        "SESSION_STORE_PATH": os.path.join(directory, "session_store.db"),
+        "ENCRYPTION_KEY": Fernet.generate_key().decode(),
+        "RATE_LIMIT_ENABLED": "0",
+    }
+    values.update(env or {})
+    for name, value in values.items():
+        if value is None:
+            delenv(name)
+        else:
+            setenv(name, str(value))
+    reset()
+    return directory
+
+
+def reset():
+    """
+    Drop whatever cached the previous database, keys or settings. Only modules
+    already imported are touched, so nothing binds to the settings early.
+    """
+    loaded = sys.modules
+    if "src.db" in loaded:
+        loaded["src.db"].reset()
+    if "src.session_store" in loaded:
+        loaded["src.session_store"].store.reopen()
+    if "src.session_manager" in loaded:
+        loaded["src.session_manager"].sessions.clear()
+    if "src.response_cache" in loaded:
+        loaded["src.response_cache"].cache.invalidate()
+    if "config" in loaded:
+        loaded["config"].keyring.invalidate()
+    if "src.rate_limiter" in loaded:
+        from src.settings import get_settings
+        loaded["src.rate_limiter"].scheduler.enabled = get_settings().flag("RATE_LIMIT_ENABLED", True)
@@ -0,0 +1,213 @@
+"""
+Quick script to validate the resident service (src/api/service.py) through
+its thin client (src/api/client.py): user CRUD, two-step login against the
+fake mStock server, session lookup, fund summary, holdings, orders,
+logout and /metrics, all on a throw-away SQLite database. Skipped when fastapi/uvicorn are not installed.
+"""
+
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from src.loadtest.fake_server import start_in_background
+from src.tests import scratch
+
+fake, state, base_url = start_in_background(latency_ms=2)
+
+USER_ID = "service_user"
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+PORT = _free_port()
+ENV = {
+    "MSTOCK_BASE_URL": base_url,
+    "MSTOCK_CONNECT": "http",
+    "SERVICE_TOKEN": "test-token",
+    "SERVICE_URL": f"http://127.0.0.1:{PORT}",
+    "ORDER_JOURNAL_PATH": os.path.join(tempfile.mkdtemp(), "order_journal.jsonl"),
+}
+
+
+def _otp_for(user_id):
+    """The fake server's "SMS": the OTP it issued for user_id"""
+    return next(otp for otp, owner in state._request_tokens.items() if owner == user_id)
+
+
+def start_service():
+    import uvicorn
+    from src.api import service
+
+    server = uvicorn.Server(uvicorn.Config(service.create_app(), host="127.0.0.1", port=PORT,
+                                           log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        assert time.monotonic() < deadline, "service did not start"
+        time.sleep(0.02)
+    return server
+
+
+try:
+    import fastapi  # noqa: F401
+    import uvicorn  # noqa: F401
+except ImportError:
+    available = False
+else:
+    available = True
+
+
+def test_service_round_trip():
+    if not available:
+        print("⚠️ SKIPPED: fastapi/uvicorn are not installed (pip install -r requirements/requirements-extended.txt)")
+        return
+
+    from src.api.client import ServiceClient, ServiceError, connect
+
+    server = start_service()
+    try:
+        assert not ServiceClient(token="wrong").available(), "requests without the token are rejected"
+        service = connect()
+        assert service is not None
+
+        # Users
+        assert service.add_user(USER_ID, "pw", "api-service", "a")["status"] == "success"
+        try:
+            service.add_user(USER_ID, "pw", "api-service")
+            raise AssertionError("duplicate user accepted")
+        except ServiceError as e:
+            assert e.status == 409, e
+        assert USER_ID in service.users()
+        service.update_user(USER_ID, api_key_type="B")
+
+        # Two-step login: start, then hand over the OTP
+        started = service.login(USER_ID)
+        assert started["status"] == "otp_required", started
+        result = service.submit_otp(started["login_seq_id"], _otp_for(USER_ID))
+        assert result["status"] == "success", result
+        access_token = result["tokens"]["access_token"]
+        try:
+            service.submit_otp(started["login_seq_id"], "000")
+            raise AssertionError("a completed login accepted a second OTP")
+        except ServiceError as e:
+            assert e.status == 404, e
+
+        # Warm process: lookups are a local round trip
+        rounds = 50
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            session = service.session(USER_ID)
+        per_call_ms = (time.perf_counter() - t0) / rounds * 1000
+        assert session["access_token"] == access_token and "refresh_token" not in session
+        assert service.login(USER_ID)["message"].startswith("Session reused")
+        funds = service.fund_summary(USER_ID)
+        assert funds["status"] == "success", funds
+        assert service.sync_holdings([USER_ID])["changed"] == 1
+        portfolio = service.portfolio(by="symbol")
+        assert portfolio["summary"]["accounts"] == 1 and len(portfolio["exposure"]) == len(state.holdings[USER_ID])
+
+        # Orders: a retry with the same key is answered from the journal, not re-sent
+        order = service.place_order(USER_ID, "INFY", "BUY", 5, idempotency_key="service-order-1")
+        assert order["status"] == "accepted" and order["order_id"], order
+        again = service.place_order(USER_ID, "INFY", "BUY", 5, idempotency_key="service-order-1")
+        assert again["duplicate"] and again["order_id"] == order["order_id"] and len(state.orders_for(USER_ID)) == 1
+        assert service.order("service-order-1")["order_id"] == order["order_id"]
+        for bad, status in ((dict(quantity=0), 422), (dict(side="SELL"), 409)):
+            try:
+                service.place_order(USER_ID, "INFY", **dict(dict(side="BUY", quantity=5,
+                                                                 idempotency_key="service-order-1"), **bad))
+                raise AssertionError(f"order accepted: {bad}")
+            except ServiceError as e:
+                assert e.status == status, (bad, e)
+
+        # Logout
+        assert service.logout(USER_ID)["status"] == "success"
+        assert service.session(USER_ID) is None
+        try:
+            service.fund_summary(USER_ID)
+            raise AssertionError("fund summary without a session")
+        except ServiceError as e:
+            assert e.status == 401, e
+        try:
+            service.place_order(USER_ID, "INFY", "BUY", 5)
+            raise AssertionError("order without a session")
+        except ServiceError as e:
+            assert e.status == 401, e
+
+        assert 'mstock_http_responses_total{endpoint="/session/token",status="200"}' in service.metrics()
+        assert service.metrics_snapshot()["mstock_db_connections_opened_total"]
+
+        service.delete_user(USER_ID)
+        assert USER_ID not in service.users()
+        assert service.portfolio(by="symbol")["summary"]["accounts"] == 0, "deleted user still in the portfolio"
+        try:
+            service.delete_user(USER_ID)
+            raise AssertionError("deleting a missing user succeeded")
+        except ServiceError as e:
+            assert e.status == 404, e
+        print(f"✅ SUCCESS: service handled CRUD, login, lookup ({per_call_ms:.2f} ms/call), funds, "
+              f"holdings, orders and logout")
+    finally:
+        server.should_exit = True
+
+
+def test_pending_login_expires():
+    from src import db
+    from src.api.service import PendingLogins
+    from src import mstock_auth_api_cli as cli
+
+    db.insert_credential(USER_ID, "pw", "api-service")
+    pending = PendingLogins(timeout=60)
+    context, failure = cli.start_login(USER_ID)
+    assert failure is None, failure
+    pending.add(context)
+    assert pending.expire() == 0 and len(pending) == 1
+    assert pending.expire(now=time.monotonic() + 61) == 1 and len(pending) == 0
+    rows = db.fetch_request_response_logs(login_seq_id=context["login_seq_id"], status="failure")
+    assert any(row["message"] == "Login flow abandoned" for row in rows), rows
+    db.delete_credential(USER_ID)
+    print("✅ SUCCESS: a login without OTP is abandoned after the timeout")
+
+
+def test_order_routes_need_a_token():
+    if not available:
+        print("⚠️ SKIPPED: fastapi/uvicorn are not installed (pip install -r requirements/requirements-extended.txt)")
+        return
+    from src.api import service
+
+    def order_routes():
+        return {route.path for route in service.create_app().routes} & {"/orders", "/orders/{idempotency_key}"}
+
+    saved = {name: os.environ.pop(name, None) for name in ("SERVICE_TOKEN", "SERVICE_ORDERS_ENABLED")}
+    try:
+        assert not order_routes(), "order routes served without SERVICE_TOKEN"
+        os.environ["SERVICE_ORDERS_ENABLED"] = "1"
+        try:
+            service.create_app()
+            raise AssertionError("SERVICE_ORDERS_ENABLED accepted without SERVICE_TOKEN")
+        except RuntimeError:
+            pass
+        os.environ["SERVICE_TOKEN"] = "test-token"
+        assert len(order_routes()) == 2
+    finally:
+        for name, value in saved.items():
+            os.environ.pop(name, None)
+            if value is not None:
+                os.environ[name] = value
+    print("✅ SUCCESS: order routes are only served behind SERVICE_TOKEN")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp(), ENV)
+    try:
+        test_service_round_trip()
+        test_pending_login_expires()
+        test_order_routes_need_a_token()
+    finally:
+        fake.shutdown()
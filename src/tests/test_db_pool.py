@@ -0,0 +1,152 @@
+"""
+Quick script to validate src/db_pool.py (the pool behind db.get_connection()).
+The pool is given a fake `connect` callable, so no database server is needed.
+Runs a burst of concurrent lookups and prints the pool counters.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.db_pool import ConnectionClosedError, ConnectionPool, PoolExhaustedError
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def execute(self, sql, params=()):
+        self._conn.in_transaction = True
+        self._conn.statements.append(sql)
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    """Records what the pool and its callers did to it"""
+
+    def __init__(self):
+        self.statements = []
+        self.commits = self.rollbacks = 0
+        self.in_transaction = False
+        self.connected = True
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.in_transaction = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def is_connected(self):
+        return self.connected
+
+    def close(self):
+        self.closed = True
+
+
+def _pool(**kwargs):
+    opened = []
+    lock = threading.Lock()
+
+    def connect():
+        conn = FakeConnection()
+        with lock:
+            opened.append(conn)
+        return conn
+
+    return ConnectionPool(connect, **kwargs), opened
+
+
+def test_pool_reuses_connections(calls=50, workers=8):
+    pool, opened = _pool(size=3)
+
+    def ping(_):
+        conn = pool.checkout()
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        cursor.close()
+        time.sleep(0.001)
+        conn.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(ping, range(calls)))
+
+    stats = pool.stats()
+    print("\n==============================")
+    print(f"Pool stats after {calls} calls: {stats}")
+    assert stats["connects"] == len(opened) <= stats["size"], "Pool opened more connections than its size"
+    assert stats["checkouts"] == calls and stats["in_use"] == 0 and stats["waits"] > 0, stats
+    assert sum(len(conn.statements) for conn in opened) == calls
+    # every statement left a transaction open; release rolled it back before reuse
+    assert all(conn.rollbacks and not conn.in_transaction for conn in opened)
+    print("✅ SUCCESS: connections were reused from the pool")
+    print("==============================\n")
+
+
+def test_transaction_rolls_back():
+    pool, opened = _pool(size=1)
+    try:
+        with pool.transaction() as conn:
+            conn.cursor().execute("UPDATE t SET x = 1")
+            raise RuntimeError("force rollback")
+    except RuntimeError:
+        pass
+    with pool.transaction() as conn:
+        conn.cursor().execute("UPDATE t SET x = 2")
+    raw, = opened
+    assert raw.rollbacks == 1 and raw.commits == 1, (raw.rollbacks, raw.commits)
+    assert pool.stats()["idle"] == 1
+    print("✅ SUCCESS: transaction() rolled back and released its connection")
+
+
+def test_closed_connection_is_unusable():
+    pool, _ = _pool(size=1)
+    conn = pool.checkout()
+    conn.close()
+    conn.close()        # closing twice is harmless
+    try:
+        conn.cursor()
+        raise AssertionError("a connection was used after it went back to the pool")
+    except ConnectionClosedError:
+        pass
+    assert pool.stats()["idle"] == 1, "the double close released the connection twice"
+    print("✅ SUCCESS: a released connection refuses further use")
+
+
+def test_exhaustion_and_health_check():
+    pool, opened = _pool(size=1, timeout=0.05, ping_after=0)
+    conn = pool.checkout()
+    try:
+        pool.checkout()
+        raise AssertionError("checked out more connections than the pool size")
+    except PoolExhaustedError:
+        pass
+    conn.close()
+
+    opened[0].connected = False             # the server dropped the idle connection
+    conn = pool.checkout()
+    stats = pool.stats()
+    assert len(opened) == 2 and opened[0].closed, "a dead connection was handed out"
+    assert stats["timeouts"] == 1 and stats["health_check_failures"] == 1 and stats["discarded"] == 1, stats
+    conn.close()
+    pool.close_all()
+    assert opened[1].closed and pool.stats()["open"] == 0
+    print("✅ SUCCESS: checkout timed out when full; a dead idle connection was replaced")
+
+
+if __name__ == "__main__":
+    test_pool_reuses_connections()
+    test_transaction_rolls_back()
+    test_closed_connection_is_unusable()
+    test_exhaustion_and_health_check()
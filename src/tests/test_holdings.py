@@ -0,0 +1,166 @@
+"""
+Quick script to validate the holdings sync (src/holdings.py) against the fake
+mStock server on a throw-away SQLite database:
+- the first sync writes every account in batches; a second one touches nothing
+- a changed account only rewrites its changed rows and deletes sold-out ones
+- the NumPy view matches SQL GROUP BY totals and survives a reload from the DB
+- a failed fetch keeps the account's stored holdings
+- a price-only change updates the view without writing to the DB
+"""
+
+import csv
+import os
+import tempfile
+import time
+
+from src import auth, db, holdings
+from src.loadtest import run_load
+from src.loadtest.fake_server import start_in_background
+from src.response_cache import cache
+from src.tests import scratch
+
+server, state, base_url = start_in_background(latency_ms=5)
+ENV = {"MSTOCK_BASE_URL": base_url}
+
+ACCOUNTS = 24
+SECTORS = {"HDFCBANK": "Banking", "ICICIBANK": "Banking", "SBIN": "Banking", "TCS": "IT", "INFY": "IT"}
+
+
+def _login_all():
+    users = run_load.seed_accounts(ACCOUNTS)
+    sessions = {}
+    for user_id, password, api_key in users:
+        _, request_token = auth.login(user_id, password)
+        sessions[user_id] = (api_key, auth.generate_session(user_id, api_key, request_token, ""))
+    return sessions
+
+def _sector_file():
+    path = os.path.join(tempfile.mkdtemp(), "sectors.csv")
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["symbol", "sector"])
+        writer.writerows(SECTORS.items())
+    return path
+
+def _sql_totals(group_column):
+    """The whole table, like the view it is compared with"""
+    rows = db.fetch_all(f"SELECT {group_column} AS k, SUM(QUANTITY * LAST_PRICE) AS v FROM holdings "
+                        f"GROUP BY {group_column}")
+    return {row["k"]: row["v"] for row in rows}
+
+def _close(a, b):
+    return a.keys() == b.keys() and all(abs(a[k] - b[k]) < 1e-6 for k in a)
+
+_shared = {}
+
+def _synced():
+    """(sync, sessions, first sync report), built once by whichever test needs it first"""
+    if not _shared:
+        sessions = _login_all()
+        sync = holdings.HoldingsSync(workers=8, batch_size=40, sectors=holdings.load_sectors(_sector_file()))
+        sync.load()
+        _shared.update(sync=sync, sessions=sessions, first=sync.sync(sorted(sessions)))
+    return _shared["sync"], _shared["sessions"], _shared["first"]
+
+
+def test_incremental_sync():
+    sync, sessions, first = _synced()
+    stored = db.fetch_one("SELECT COUNT(*) AS n FROM holdings")["n"]
+    expected = sum(len(state.holdings[user_id]) for user_id in sessions)
+    assert first["changed"] == ACCOUNTS and first["rows_upserted"] == expected == stored, first
+    assert first["batches"] > 1, first
+
+    second = sync.sync(sorted(sessions))
+    assert second["unchanged"] == ACCOUNTS and second["rows_upserted"] == 0 and second["batches"] == 0, second
+
+    # One account sells a position, another buys more of one
+    seller, buyer = sorted(sessions)[:2]
+    del state.holdings[seller][0]
+    state.holdings[buyer][0]["quantity"] += 10
+    cache.invalidate(endpoints=("/portfolio/holdings",))
+    third = sync.sync(sorted(sessions))
+    assert third["changed"] == 2 and third["unchanged"] == ACCOUNTS - 2, third
+    assert third["rows_upserted"] == 1 and third["rows_deleted"] == 1, third
+    row = db.fetch_one("SELECT QUANTITY FROM holdings WHERE M_STOCK_USER_ID = %s AND SYMBOL = %s",
+                       (buyer, state.holdings[buyer][0]["tradingsymbol"]))
+    assert row["QUANTITY"] == state.holdings[buyer][0]["quantity"]
+    print(f"✅ SUCCESS: {ACCOUNTS} accounts / {expected} rows in {first['batches']} batches "
+          f"({first['seconds'] * 1000:.0f} ms); resync touched only the 2 changed accounts")
+
+
+def test_portfolio_view():
+    sync, sessions, _ = _synced()
+    view = sync.view
+    assert _close(view.by_symbol(), _sql_totals("SYMBOL"))
+    assert _close(view.by_account(), _sql_totals("M_STOCK_USER_ID"))
+    sectors = view.by_sector()
+    assert set(sectors) <= set(SECTORS.values()) | {holdings.UNCLASSIFIED}
+    assert abs(sum(sectors.values()) - view.total()) < 1e-6
+    banking = sum(v for k, v in _sql_totals("SYMBOL").items() if SECTORS.get(k) == "Banking")
+    assert abs(sectors.get("Banking", 0.0) - banking) < 1e-6
+
+    rounds = 1000
+    started = time.perf_counter()
+    for _ in range(rounds):
+        view.totals("symbol"), view.totals("sector"), view.totals("account")
+    view_us = (time.perf_counter() - started) / rounds * 1e6
+    started = time.perf_counter()
+    for user_id in sessions:
+        db.fetch_one("SELECT SUM(QUANTITY * LAST_PRICE) AS v FROM holdings WHERE M_STOCK_USER_ID = %s",
+                     (user_id,))
+    sql_us = (time.perf_counter() - started) * 1e6
+
+    reloaded = holdings.HoldingsSync(sectors=holdings.load_sectors(_sector_file()))
+    assert reloaded.load() == len(view)
+    assert _close(reloaded.view.by_symbol(), view.by_symbol())
+    report = reloaded.sync(sorted(sessions))
+    assert report["unchanged"] == ACCOUNTS and report["changed"] == 0, "hashes persisted across processes"
+    top = view.top("symbol", 3)
+    assert len(top) == 3 and top[0][1] >= top[1][1] >= top[2][1]
+    print(f"✅ SUCCESS: symbol+sector+account exposure in {view_us:.0f} µs vs {sql_us:.0f} µs for "
+          f"{ACCOUNTS} per-account SQL queries ({len(view)} positions)")
+
+
+def test_failed_fetch_keeps_holdings():
+    sync, sessions, _ = _synced()
+    user_id = sorted(sessions)[-1]
+    api_key, access_token = sessions[user_id]
+    before = dict(sync.view.by_account())[user_id]
+    state.end_session(f"token {api_key}:{access_token}")     # the broker no longer accepts the token
+    cache.invalidate(endpoints=("/portfolio/holdings",))
+    report = sync.sync(sorted(sessions))
+    assert report["failed"] == 1 and report["unchanged"] == ACCOUNTS - 1, report
+    assert sync.view.by_account()[user_id] == before
+    db.flush_logs()
+    rows = db.fetch_request_response_logs(user_id=user_id, api_name="holdings", status="failure")
+    assert rows and rows[0]["message"] == "Holdings fetch failed", rows
+    print("✅ SUCCESS: a failed fetch keeps the account's stored holdings")
+
+
+def test_price_change_is_not_a_write():
+    sync, sessions, _ = _synced()
+    user_id = sorted(sessions)[2]
+    holding = state.holdings[user_id][0]
+    holding["last_price"] = round(holding["last_price"] * 1.1, 2)
+    cache.invalidate(endpoints=("/portfolio/holdings",))
+    before = db.fetch_one("SELECT LAST_PRICE FROM holdings WHERE M_STOCK_USER_ID = %s AND SYMBOL = %s",
+                          (user_id, holding["tradingsymbol"]))["LAST_PRICE"]
+    report = sync.sync(sorted(sessions))
+    assert report["rows_upserted"] == 0 and report["batches"] == 0 and report["repriced"] == 1, report
+    expected = sum(h["quantity"] * h["last_price"] for h in state.holdings[user_id])
+    assert abs(sync.view.by_account()[user_id] - expected) < 1e-6
+    after = db.fetch_one("SELECT LAST_PRICE FROM holdings WHERE M_STOCK_USER_ID = %s AND SYMBOL = %s",
+                         (user_id, holding["tradingsymbol"]))["LAST_PRICE"]
+    assert after == before, "a quote change was written to the DB"
+    print("✅ SUCCESS: a price-only change updated the view and wrote nothing")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp(), ENV)
+    try:
+        test_incremental_sync()
+        test_portfolio_view()
+        test_failed_fetch_keeps_holdings()
+        test_price_change_is_not_a_write()
+    finally:
+        server.shutdown()
@@ -0,0 +1,57 @@
+"""
+Quick script to validate connection reuse in src/http_client.py.
+Starts a local keep-alive HTTP server and sends a burst of requests through
+one MStockClient; only the first request should open a connection.
+"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.http_client import MStockClient
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        self.rfile.read(length)
+        body = json.dumps({"status": "success", "headers": dict(self.headers)}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+def test_connections_are_reused(calls=20):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = MStockClient(f"http://127.0.0.1:{server.server_port}")
+    try:
+        for _ in range(calls):
+            response = client.get("/user/fundsummary", auth=("api-key", "access-token"))
+            assert response.status_code == 200
+        sent = response.json()["headers"]
+        client.post("/connect/login", data={"username": "u", "password": "p"})
+        stats = client.stats()
+    finally:
+        client.close()
+        server.shutdown()
+
+    print(f"Client stats: {stats}")
+    assert sent["Authorization"] == "token api-key:access-token"
+    assert sent["X-Mirae-Version"] == "1"
+    assert stats["new_connections"] == 1, "Keep-alive connection was not reused"
+    assert stats["reused_connections"] == calls
+    print("✅ SUCCESS: one connection served every request")
+
+
+if __name__ == "__main__":
+    test_connections_are_reused()
@@ -0,0 +1,73 @@
+"""
+Startup benchmark for the CLIs: imports each entry module in a fresh
+interpreter with `python -X importtime` and fails when
+- its cumulative import time exceeds the budget (IMPORT_BUDGET_MS, default 100), or
+- a heavy dependency (requests, cryptography, mysql, tradingapi_a, asyncio,
+  dotenv, opentelemetry) is imported before the command actually needs it.
+
+Usage (from project root):
+    python -m src.tests.test_import_time
+    IMPORT_BUDGET_MS=50 python -m src.tests.test_import_time
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# module -> heavy dependencies it legitimately needs at import
+CLI_MODULES = {
+    "src.mstock_auth_api_cli": (),
+    "src.login_orchestrator": ("asyncio",),
+    "src.user_add": (),
+    "src.user_update": (),
+    "src.user_delete": (),
+    "src.user_bulk": (),
+    "src.log_cleanup": (),
+    "src.db_migrate": (),
+}
+
+HEAVY_MODULES = ("requests", "cryptography", "mysql", "tradingapi_a", "asyncio", "dotenv", "opentelemetry")
+
+RUNS = 3   # best of, to ignore a cold disk cache
+
+
+def import_profile(module):
+    """(cumulative ms for `module`, set of top-level packages imported)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+    )
+    cumulative_us, imported = None, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        if not cumulative.isdigit():
+            continue    # header row
+        imported.add(name.split(".")[0])
+        if name == module:
+            cumulative_us = int(cumulative)
+    return cumulative_us / 1000, imported
+
+
+def test_cli_startup_budget():
+    budget_ms = float(os.getenv("IMPORT_BUDGET_MS", 100))
+    failures = []
+    print(f"{'MODULE':<26} {'IMPORT ms':>10}  HEAVY")
+    for module, allowed in CLI_MODULES.items():
+        profiles = [import_profile(module) for _ in range(RUNS)]
+        best_ms = min(ms for ms, _ in profiles)
+        heavy = sorted(set(HEAVY_MODULES) & profiles[0][1] - set(allowed))
+        print(f"{module:<26} {best_ms:>10.1f}  {', '.join(heavy) or '-'}")
+        if best_ms > budget_ms:
+            failures.append(f"{module} took {best_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+        if heavy:
+            failures.append(f"{module} eagerly imports {', '.join(heavy)}")
+    assert not failures, "\n".join(failures)
+    print(f"✅ SUCCESS: every CLI imports within {budget_ms:.0f} ms without heavy dependencies")
+
+
+if __name__ == "__main__":
+    test_cli_startup_budget()
@@ -0,0 +1,98 @@
+"""
+Quick script to validate the key rotation job (src/maintenance/rotate_encryption_keys.py)
+on a throw-away SQLite database:
+- every credential ends up on the new key and decrypts with it
+- a row no known key can decrypt is reported, and the checkpoint is completed
+- the next run to the same key revisits that row once its key is known
+"""
+
+import os
+import tempfile
+
+from cryptography.fernet import Fernet
+
+import config
+from src import db
+from src.maintenance import rotate_encryption_keys
+from src.tests import scratch
+
+USERS = {f"rotate_user_{i}": f"password-{i}" for i in range(5)}
+LOST = "rotate_user_lost"
+CHECKPOINT = os.path.join(tempfile.mkdtemp(), "key_rotation_checkpoint.json")
+
+
+def _add_key(key):
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO SEC01_ENCRYPTION_KEY (ENCRYPTION_KEY) VALUES (%s)", (key,))
+        key_id = cursor.lastrowid
+        cursor.close()
+    return key_id
+
+def _activate(key_id):
+    os.environ["ENCRYPTION_KEY_ID"] = str(key_id)
+    config.keyring.invalidate()
+
+def _rows():
+    rows = db.fetch_all("SELECT M_STOCK_USER_ID, M_STOCK_PASSWORD, ENCRYPTION_KEY_ID "
+                        "FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID LIKE %s",
+                        ("rotate_user_%",))
+    return {row["M_STOCK_USER_ID"]: row for row in rows}
+
+def _seed(old_key_id, unknown_key):
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID LIKE %s",
+                       ("rotate_user_%",))
+        cursor.close()
+    _activate(old_key_id)
+    for user_id, password in USERS.items():
+        db.insert_credential(user_id, password, f"api-{user_id}")
+    # Encrypted with a key that is not in SEC01_ENCRYPTION_KEY (yet)
+    db.insert_credential(LOST, "placeholder", "api-lost")
+    cipher = Fernet(unknown_key.encode()).encrypt(b"lost-password").decode()
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE MS01_API_Authentication_Credential SET M_STOCK_PASSWORD = %s "
+                       "WHERE M_STOCK_USER_ID = %s", (cipher, LOST))
+        cursor.close()
+
+
+def test_rotate_then_decrypt_with_new_key():
+    old_key_id = _add_key(Fernet.generate_key().decode())
+    unknown_key = Fernet.generate_key().decode()
+    _seed(old_key_id, unknown_key)
+    new_key = Fernet.generate_key().decode()
+    new_key_id = _add_key(new_key)
+    _activate(new_key_id)
+    try:
+        result = rotate_encryption_keys.rotate(chunk_size=2, checkpoint_path=CHECKPOINT)
+        rows = _rows()
+        lost_id = db.fetch_one("SELECT CUST_SEQ_ID FROM MS01_API_Authentication_Credential "
+                               "WHERE M_STOCK_USER_ID = %s", (LOST,))["CUST_SEQ_ID"]
+        assert result["completed"] and lost_id in result["failed_ids"], result
+        new_fernet = Fernet(new_key.encode())
+        for user_id, password in USERS.items():
+            assert int(rows[user_id]["ENCRYPTION_KEY_ID"]) == new_key_id, rows[user_id]
+            assert new_fernet.decrypt(rows[user_id]["M_STOCK_PASSWORD"].encode()).decode() == password
+            assert config.decrypt_str(rows[user_id]["M_STOCK_PASSWORD"], new_key_id) == password
+        assert int(rows[LOST]["ENCRYPTION_KEY_ID"]) == old_key_id
+
+        # The missing key turns up: the next run to the same key starts over and picks the row up
+        _add_key(unknown_key)
+        _activate(new_key_id)
+        again = rotate_encryption_keys.rotate(chunk_size=2, checkpoint_path=CHECKPOINT)
+        assert again["completed"] and lost_id not in again["failed_ids"], again
+        row = _rows()[LOST]
+        assert int(row["ENCRYPTION_KEY_ID"]) == new_key_id
+        assert new_fernet.decrypt(row["M_STOCK_PASSWORD"].encode()) == b"lost-password"
+    finally:
+        os.environ.pop("ENCRYPTION_KEY_ID", None)
+        config.keyring.invalidate()
+    print(f"✅ SUCCESS: {len(USERS)} credentials rotated to KEY_ID={new_key_id}; "
+          f"the undecryptable row was reported, then rotated by the next run")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp())
+    test_rotate_then_decrypt_with_new_key()
@@ -0,0 +1,125 @@
+"""
+Quick script to validate config.EncryptionKeyring against a stub key source
+(no SEC01_ENCRYPTION_KEY table needed):
+- keys are served from memory until the TTL expires
+- an unknown KEY_ID reloads at most once per reload_cooldown
+- multi_fernet() decrypts with any known key and reuses the cached Fernets
+- a failed reload keeps the cached keys and retries after the cooldown
+"""
+
+import os
+import tempfile
+import time
+
+from cryptography.fernet import Fernet
+
+from config import EncryptionKeyring
+from src.tests import scratch
+
+ENV = {"ENCRYPTION_KEY_ID": None}
+
+
+class KeySource:
+    """Stands in for SEC01_ENCRYPTION_KEY; counts the queries it answered"""
+
+    def __init__(self, *keys):
+        self.keys = {i + 1: key for i, key in enumerate(keys)}
+        self.fetches = 0
+        self.error = None
+
+    def add(self, key):
+        key_id = max(self.keys, default=0) + 1
+        self.keys[key_id] = key
+        return key_id
+
+    def __call__(self):
+        self.fetches += 1
+        if self.error:
+            raise self.error
+        return [{"KEY_ID": k, "ENCRYPTION_KEY": v} for k, v in sorted(self.keys.items(), reverse=True)]
+
+
+def test_ttl():
+    source = KeySource(Fernet.generate_key().decode())
+    keyring = EncryptionKeyring(ttl=0.2, reload_cooldown=0.05, fetch_keys=source)
+    for _ in range(5):
+        assert keyring.get_key() == source.keys[1]
+    assert source.fetches == 1, "keys were re-read before the TTL expired"
+
+    newer = source.add(Fernet.generate_key().decode())
+    time.sleep(0.25)
+    assert keyring.active_key_id() == newer and source.fetches == 2
+    stats = keyring.stats()
+    assert stats["loads"] == 2 and stats["hits"] == 4 and stats["misses"] == 2, stats
+    print(f"✅ SUCCESS: keys served from memory until the TTL expired {stats}")
+
+
+def test_reload_cooldown():
+    source = KeySource(Fernet.generate_key().decode())
+    keyring = EncryptionKeyring(ttl=60.0, reload_cooldown=0.2, fetch_keys=source)
+    keyring.get_key()
+    late = source.add(Fernet.generate_key().decode())    # another process adds a key
+
+    for _ in range(5):    # within the cooldown: fall back to the active key, no query per call
+        assert keyring.get_key(late) == source.keys[1]
+    assert source.fetches == 1
+
+    time.sleep(0.25)
+    assert keyring.get_key(late) == source.keys[late]
+    assert keyring.get_key(late) == source.keys[late] and source.fetches == 2
+    print("✅ SUCCESS: an unknown KEY_ID reloaded once, after the cooldown")
+
+
+def test_multi_fernet_fallback():
+    old, new = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+    source = KeySource(old, new)
+    keyring = EncryptionKeyring(fetch_keys=source)
+
+    legacy = Fernet(old.encode()).encrypt(b"old-password")
+    current = keyring.fernet().encrypt(b"new-password")
+    multi = keyring.multi_fernet()
+    assert multi.decrypt(legacy) == b"old-password" and multi.decrypt(current) == b"new-password"
+    # The active key encrypts first
+    assert Fernet(new.encode()).decrypt(multi.encrypt(b"x")) == b"x"
+    try:
+        multi.decrypt(Fernet(Fernet.generate_key()).encrypt(b"lost"))
+        raise AssertionError("decrypted a token no known key produced")
+    except Exception as e:
+        assert type(e).__name__ == "InvalidToken", e
+
+    # One Fernet per key, shared by fernet() and multi_fernet()
+    assert keyring.multi_fernet() is multi
+    assert keyring.fernet(1) is keyring.fernet(1) is keyring._fernets[old]
+    # ...plus the .env ENCRYPTION_KEY fallback, nothing built twice
+    assert set(keyring._fernets) == {old, new, os.environ["ENCRYPTION_KEY"]}
+    print("✅ SUCCESS: multi_fernet() decrypted with the old key and reused the cached Fernets")
+
+
+def test_failed_reload_keeps_keys():
+    source = KeySource(Fernet.generate_key().decode())
+    keyring = EncryptionKeyring(ttl=0.1, reload_cooldown=0.3, fetch_keys=source)
+    key = keyring.get_key()
+
+    source.error = RuntimeError("Lost connection to MySQL server")
+    time.sleep(0.15)
+    assert keyring.get_key() == key and keyring.get_key(1) == key
+    fetches = source.fetches
+    for _ in range(5):    # not retried on every call while the DB is down
+        assert keyring.get_key() == key
+    assert source.fetches == fetches == 2, source.fetches
+
+    source.error = None
+    newer = source.add(Fernet.generate_key().decode())
+    time.sleep(0.35)
+    assert keyring.active_key_id() == newer and source.fetches == 3
+    stats = keyring.stats()
+    assert stats["load_errors"] == 1 and stats["keys"] == 2, stats
+    print(f"✅ SUCCESS: a failed reload kept the cached key and retried after the cooldown {stats}")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp(), ENV)
+    test_ttl()
+    test_reload_cooldown()
+    test_multi_fernet_fallback()
+    test_failed_reload_keeps_keys()
@@ -0,0 +1,31 @@
+"""
+Quick script to validate the offline load-test harness end to end:
+fake mStock server + src/auth.py + a throw-away SQLite database.
+"""
+
+import tempfile
+
+from src.loadtest import run_load
+from src.loadtest.fake_server import start_in_background
+from src.tests import scratch
+
+server, state, base_url = start_in_background(latency_ms=5)
+ENV = {"MSTOCK_BASE_URL": base_url}
+
+
+def test_auth_pipeline_under_load(accounts=10):
+    report, wall, ok_accounts = run_load.run(accounts, concurrency=5, mode="auth", fund_calls=2)
+    print(run_load.format_report(report, wall, accounts, ok_accounts))
+    print(f"Fake server: {state.counters}")
+    assert ok_accounts == accounts
+    assert report["login"]["count"] == accounts and report["login"]["errors"] == 0
+    assert report["fund_summary"]["p99_ms"] >= report["fund_summary"]["p50_ms"]
+    print("✅ SUCCESS: every account ran login → session → fund summary → logout")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp(), ENV)
+    try:
+        test_auth_pipeline_under_load()
+    finally:
+        server.shutdown()
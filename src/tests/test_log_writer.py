@@ -0,0 +1,98 @@
+"""
+Quick script to validate src/log_writer.py with a fake DB connection:
+- a batch that fails is retried row by row; only the bad row is lost
+- flush(timeout) returns on time even when the queue is full and the DB hangs
+"""
+
+import threading
+import time
+
+from src.log_writer import LogWriter
+
+SQL = "INSERT INTO logs (LEVEL, MESSAGE) VALUES (%s, %s)"
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self._db = db
+
+    def executemany(self, sql, rows):
+        self._db.batches.append(len(rows))
+        if any(params[1] == "bad" for params in rows):
+            raise RuntimeError("Data too long for column 'MESSAGE'")
+        self._db.rows.extend(rows)
+
+    def execute(self, sql, params):
+        self._db.singles.append(params)
+        if params[1] == "bad":
+            raise RuntimeError("Data too long for column 'MESSAGE'")
+        self._db.rows.append(params)
+
+    def close(self):
+        pass
+
+
+class FakeDB:
+    """get_connection() for the writer; `gate` (if set) holds every connect until it opens"""
+
+    def __init__(self, gate=None):
+        self.rows, self.batches, self.singles = [], [], []
+        self.gate = gate
+
+    def connect(self):
+        if self.gate is not None:
+            self.gate.wait()
+        return self
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_failed_batch_is_retried_per_row(rows=20):
+    db = FakeDB()
+    writer = LogWriter(db.connect, batch_size=rows, flush_interval=5.0)
+    for i in range(rows):
+        writer.write(SQL, ("INFO", "bad" if i == 7 else f"row {i}"))
+    assert writer.flush(timeout=5.0)
+    writer.close()
+
+    stats = writer.stats()
+    assert db.batches == [rows], db.batches
+    assert len(db.singles) == rows, "every row of the failed batch is retried on its own"
+    assert sorted(db.rows) == sorted(("INFO", f"row {i}") for i in range(rows) if i != 7)
+    assert stats["written"] == rows - 1 and stats["failed"] == 1 and stats["batches"] == 0, stats
+    print(f"✅ SUCCESS: failed batch of {rows} retried per row, only the bad row lost {stats}")
+
+
+def test_flush_times_out_on_full_queue():
+    gate = threading.Event()
+    db = FakeDB(gate)
+    writer = LogWriter(db.connect, batch_size=1, flush_interval=0.01, max_queue=3)
+    try:
+        writer.write(SQL, ("INFO", "first"))            # the worker takes it and hangs in connect()
+        time.sleep(0.1)
+        while writer.write(SQL, ("INFO", "queued")):     # fill the queue behind it
+            pass
+        assert writer.stats()["dropped"] == 1
+
+        started = time.monotonic()
+        assert writer.flush(timeout=0.3) is False
+        waited = time.monotonic() - started
+        assert waited < 1.0, f"flush(timeout=0.3) blocked for {waited:.2f}s"
+    finally:
+        gate.set()
+    assert writer.flush(timeout=5.0), "flush completes once the DB answers again"
+    writer.close()
+    assert len(db.rows) == 4 and writer.stats()["queued"] == 0, db.rows
+    print(f"✅ SUCCESS: flush(timeout=0.3) returned after {waited:.2f}s with the queue full")
+
+
+if __name__ == "__main__":
+    test_failed_batch_is_retried_per_row()
+    test_flush_times_out_on_full_queue()
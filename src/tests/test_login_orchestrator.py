@@ -0,0 +1,72 @@
+"""
+Quick script to validate concurrent multi-account login.
+Uses stand-in login steps (no broker or DB calls) with simulated latency and
+checks that the fleet finishes in about the time of the slowest account.
+"""
+
+import asyncio
+import time
+
+from src.login_orchestrator import CallbackOtpSource, format_results, login_many
+
+STEP_SECONDS = 0.2
+
+
+class _FakeSteps:
+    abandoned = []
+
+    @staticmethod
+    def reuse_session(user_id):
+        return {"message": "Session reused (db)"} if user_id == "reused_user" else None
+
+    @staticmethod
+    def start_login(user_id):
+        time.sleep(STEP_SECONDS)
+        if user_id == "missing_user":
+            return None, {"status": "failure", "reason": "User not found in DB"}
+        return {"user_id": user_id}, None
+
+    @staticmethod
+    def complete_login(context, otp):
+        time.sleep(STEP_SECONDS)
+        return {"status": "success", "message": f"Login successful (otp {otp})"}
+
+    @staticmethod
+    def abandon_login(context, reason):
+        _FakeSteps.abandoned.append(context["user_id"])
+
+
+async def _otp(user_id):
+    # user_0 is the slow one; everyone else answers quickly
+    await asyncio.sleep(1.0 if user_id == "user_0" else 0.05)
+    return "123"
+
+
+def test_fleet_takes_about_the_slowest_login(accounts=20):
+    users = [f"user_{i}" for i in range(accounts)] + ["reused_user", "missing_user"]
+    rows, wall = login_many(users, CallbackOtpSource(_otp), concurrency=accounts, steps=_FakeSteps)
+    print(format_results(rows, wall))
+
+    by_user = {r["user_id"]: r for r in rows}
+    assert by_user["reused_user"]["source"] == "reused"
+    assert by_user["missing_user"]["status"] == "failure"
+    assert all(by_user[u]["status"] == "success" for u in users[:accounts])
+    slowest = max(r["total_ms"] for r in rows) / 1000
+    assert wall < slowest + 0.5, f"fleet took {wall:.2f}s, slowest account {slowest:.2f}s"
+    print("✅ SUCCESS: accounts logged in concurrently")
+
+
+def test_missing_otp_abandons_the_login():
+    async def never(user_id):
+        await asyncio.sleep(10)
+
+    _FakeSteps.abandoned.clear()
+    rows, _ = login_many(["user_slow"], CallbackOtpSource(never), otp_timeout=0.3, steps=_FakeSteps)
+    assert rows[0]["status"] == "failure" and "No OTP" in rows[0]["reason"]
+    assert _FakeSteps.abandoned == ["user_slow"]
+    print("✅ SUCCESS: a login without OTP is recorded as abandoned")
+
+
+if __name__ == "__main__":
+    test_fleet_takes_about_the_slowest_login()
+    test_missing_otp_abandons_the_login()
@@ -0,0 +1,74 @@
+"""
+Quick script to validate db.LoginUnitOfWork on a throw-away SQLite database:
+one commit writes the token update and every log row of a login, and a
+failing commit leaves none of them behind.
+"""
+
+import tempfile
+
+from src import db
+from src.tests import scratch
+
+USER_ID = "uow_user"
+
+
+def _setup(access_token=None):
+    """(Re)create the test user with the given stored access token"""
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID = %s", (USER_ID,))
+        cursor.execute("""
+            INSERT INTO MS01_API_Authentication_Credential
+                (M_STOCK_USER_ID, M_STOCK_PASSWORD, M_STOCK_API_KEY, M_STOCK_API_KEY_TYPE, M_ACCESS_TOKEN)
+            VALUES (%s, 'cipher', 'key', 'A', %s)
+        """, (USER_ID, access_token))
+        cursor.close()
+
+
+def _log_rows(login_seq_id):
+    return db.fetch_one("SELECT COUNT(*) AS CNT FROM MS01_REQUEST_RESPONSE_LOG WHERE login_seq_id = %s",
+                        (login_seq_id,))["CNT"]
+
+
+def test_commit_writes_everything_at_once():
+    _setup()
+    uow = db.LoginUnitOfWork(USER_ID, "test_login_persistence")
+    uow.set_login_request("otp-1", "req-1")
+    uow.request_log("INFO", "Login call completed", "{}", "{}")
+    uow.request_log("INFO", "Generate session call completed", "{}", "{}", api_name="generate_session")
+    uow.set_session({"data": {"cid": "C1"}}, {"data": {"access_token": "acc-1", "refresh_token": "ref-1",
+                                                        "login_time": "2026-01-02 09:15:00"}})
+    assert _log_rows(uow.login_seq_id) == 0, "nothing is written before commit"
+
+    outcome = uow.commit("success", "Login flow completed successfully")
+    assert outcome["committed"] and outcome["statements"] == 2 and outcome["log_rows"] == 3, outcome
+    row = db.fetch_one("SELECT M_STOCK_OTP, M_ACCESS_TOKEN, M_CLIENT_CODE FROM MS01_API_Authentication_Credential "
+                       "WHERE M_STOCK_USER_ID = %s", (USER_ID,))
+    assert row == {"M_STOCK_OTP": "otp-1", "M_ACCESS_TOKEN": "acc-1", "M_CLIENT_CODE": "C1"}, row
+    assert _log_rows(uow.login_seq_id) == 3
+    assert uow.commit() is outcome, "commit is idempotent"
+    print(f"✅ SUCCESS: 2 updates + 3 log rows in one transaction ({outcome['login_seq_id']})")
+
+
+def test_failed_commit_leaves_nothing_behind():
+    _setup(access_token="acc-1")
+    uow = db.LoginUnitOfWork(USER_ID, "test_login_persistence")
+    uow.set_session({}, {"data": {"access_token": "acc-2"}})
+    uow.request_log("INFO", "Generate session call completed", "{}", "{}")
+    uow._statements.append(("UPDATE NO_SUCH_TABLE SET X = 1", ()))   # fail mid-transaction
+
+    outcome = uow.commit("success", "Login flow completed successfully")
+    assert not outcome["committed"] and outcome["status"] == "failure" and outcome["error"]
+    row = db.fetch_one("SELECT M_ACCESS_TOKEN FROM MS01_API_Authentication_Credential "
+                       "WHERE M_STOCK_USER_ID = %s", (USER_ID,))
+    assert row["M_ACCESS_TOKEN"] == "acc-1", "token update was rolled back"
+    assert db.flush_logs()
+    # Only the single ERROR row from the log writer records the failed login
+    assert _log_rows(uow.login_seq_id) == 1
+    print(f"✅ SUCCESS: failed commit rolled back ({outcome['error']})")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp())
+    test_commit_writes_everything_at_once()
+    test_failed_commit_leaves_nothing_behind()
@@ -0,0 +1,62 @@
+"""
+Quick script to validate db.generate_login_seq_id (no DB round trip):
+- 20 base62 characters whose first 8 encode the current epoch milliseconds
+- no duplicates across threads generating at the same time
+- IDs from different milliseconds sort in the order they were generated
+"""
+
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src import db
+
+BASE62 = set(string.digits + string.ascii_letters)
+
+
+def _millis(seq_id):
+    value = 0
+    for char in seq_id[:8]:
+        value = value * 62 + db._SEQ_ALPHABET.index(char)
+    return value
+
+
+def test_format():
+    before = time.time_ns() // 1_000_000
+    seq_id = db.generate_login_seq_id()
+    after = time.time_ns() // 1_000_000
+    assert len(seq_id) == 20 and set(seq_id) <= BASE62, seq_id
+    assert before <= _millis(seq_id) <= after, (seq_id, before, after)
+    assert len(db.generate_login_seq_id(32)) == 32
+    try:
+        db.generate_login_seq_id(16)
+        raise AssertionError("accepted a length that leaves too few random characters")
+    except ValueError:
+        pass
+    print(f"✅ SUCCESS: {seq_id} is 20 base62 chars stamped with the current millisecond")
+
+
+def test_unique_across_threads(threads=8, per_thread=5000):
+    def batch(_):
+        return [db.generate_login_seq_id() for _ in range(per_thread)]
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        ids = [seq_id for chunk in executor.map(batch, range(threads)) for seq_id in chunk]
+    assert len(set(ids)) == threads * per_thread, "duplicate login sequence IDs"
+    print(f"✅ SUCCESS: {len(ids)} IDs from {threads} threads, no duplicates")
+
+
+def test_time_ordered(count=20):
+    ids = []
+    for _ in range(count):
+        ids.append(db.generate_login_seq_id())
+        time.sleep(0.002)
+    assert ids == sorted(ids), "IDs generated later sorted earlier"
+    assert [_millis(seq_id) for seq_id in ids] == sorted({_millis(seq_id) for seq_id in ids})
+    print(f"✅ SUCCESS: {count} IDs generated 2ms apart sort in generation order")
+
+
+if __name__ == "__main__":
+    test_format()
+    test_unique_across_threads()
+    test_time_ordered()
@@ -0,0 +1,154 @@
+"""
+Quick script to validate src/metrics.py:
+- counters/histograms stay exact under concurrent updates without a lock
+- the Prometheus text output is well formed
+- a load run against the fake mStock server fills the DB, HTTP, log-writer
+  and decrypt metrics (throw-away SQLite database)
+"""
+
+import tempfile
+import threading
+import time
+
+from cryptography.fernet import Fernet
+
+from src import metrics
+from src.loadtest import run_load
+from src.loadtest.fake_server import start_in_background
+from src.tests import scratch
+
+server, state, base_url = start_in_background(latency_ms=2)
+ENV = {"MSTOCK_BASE_URL": base_url, "METRICS_ENABLED": None}
+
+
+def _value(name, **labels):
+    for row in metrics.snapshot().get(name, []):
+        if all(row["labels"].get(k) == str(v) for k, v in labels.items()):
+            return row["value"]
+    return None
+
+def _count(name, **labels):
+    """Counter value or histogram count, 0 when the series does not exist yet"""
+    value = _value(name, **labels)
+    if isinstance(value, dict):
+        return value["count"]
+    return value or 0
+
+
+def test_concurrent_updates_are_exact(threads=8, per_thread=20000):
+    registry = metrics.MetricsRegistry()
+    hits = registry.counter("test_hits_total", "hits", ("kind",))
+    latency = registry.histogram("test_latency_seconds", "latency", buckets=(0.01, 0.1))
+
+    def work():
+        series = hits.labels(kind="a")
+        for i in range(per_thread):
+            series.inc()
+            latency.observe(0.05 if i % 2 else 0.005)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    started = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    per_update_ns = (time.perf_counter() - started) / (threads * per_thread * 2) * 1e9
+
+    total = threads * per_thread
+    assert registry.snapshot()["test_hits_total"] == [{"labels": {"kind": "a"}, "value": total}]
+    buckets, count, _ = latency.labels().value()
+    assert buckets == [total // 2, total, total] and count == total, buckets
+
+    text = registry.render()
+    assert '# TYPE test_latency_seconds histogram' in text
+    assert f'test_latency_seconds_bucket{{le="+Inf"}} {total}' in text
+    assert f'test_hits_total{{kind="a"}} {total}' in text
+    print(f"✅ SUCCESS: {threads} threads, exact totals, ~{per_update_ns:.0f} ns per update")
+
+
+def test_short_lived_threads(threads=2000):
+    registry = metrics.MetricsRegistry()
+    hits = registry.counter("test_short_hits_total", "hits").labels()
+    latency = registry.histogram("test_short_seconds", "latency", buckets=(0.01,)).labels()
+    depth = registry.gauge("test_short_depth", "depth").labels()
+    depth.set(10)
+
+    def work():
+        hits.inc()
+        latency.observe(0.005)
+        depth.inc()
+
+    for _ in range(threads // 50):
+        batch = [threading.Thread(target=work) for _ in range(50)]
+        for t in batch:
+            t.start()
+        for t in batch:
+            t.join()
+    assert hits.value() == threads and latency.value()[1] == threads and depth.value() == 10 + threads
+    # exited threads were folded: one retired cell plus at most the last few live ones
+    assert len(hits._cells.all()) <= 51 and len(latency._cells.all()) <= 51, len(hits._cells.all())
+
+    # set() wins over deltas recorded before it, without writing other threads' cells
+    depth.set(3)
+    t = threading.Thread(target=depth.dec)
+    t.start()
+    t.join()
+    assert depth.value() == 2, depth.value()
+    print(f"✅ SUCCESS: {threads} short-lived threads left {len(hits._cells.all())} cells per series")
+
+
+def test_pipeline_metrics(accounts=5):
+    import config
+    from src import db
+
+    # The registry is process-wide and other test modules may already have fed it: compare deltas
+    series = {
+        "logins": ("mstock_http_responses_total", dict(endpoint="/connect/login", status=200)),
+        "sessions": ("mstock_http_request_seconds", dict(endpoint="/session/token")),
+        "updates": ("mstock_db_query_seconds", dict(statement="UPDATE MS01_API_Authentication_Credential")),
+        "log_writes": ("mstock_log_write_seconds", {}),
+        "log_rows": ("mstock_log_rows_total", dict(result="written")),
+        "fallbacks": ("mstock_crypto_decrypts_total", dict(result="fallback")),
+    }
+    before = {key: _count(name, **labels) for key, (name, labels) in series.items()}
+
+    def delta(key):
+        name, labels = series[key]
+        return _count(name, **labels) - before[key]
+
+    report, wall, ok_accounts = run_load.run(accounts, concurrency=3, mode="auth", fund_calls=2)
+    assert ok_accounts == accounts
+    db.flush_logs()
+
+    assert delta("logins") == accounts
+    assert delta("sessions") == accounts
+    assert _value("mstock_db_connections_opened_total", backend="sqlite") >= 1
+    assert delta("updates") >= accounts, delta("updates")
+    assert delta("log_writes") >= 1
+    assert delta("log_rows") >= accounts
+
+    # Cipher made with the active key; a newer DB key becomes active, so decrypting needs the fallback
+    cipher = config.encrypt_str("secret")
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO SEC01_ENCRYPTION_KEY (ENCRYPTION_KEY) VALUES (%s)",
+                       (Fernet.generate_key().decode(),))
+        cursor.close()
+    config.keyring.invalidate()
+    assert config.decrypt_str(cipher) == "secret"
+    assert delta("fallbacks") == 1
+
+    text = metrics.render()
+    assert 'mstock_http_responses_total{endpoint="/user/fundsummary",status="200"}' in text
+    assert 'mstock_db_pool_connections{state="idle"}' in text
+    print(f"✅ SUCCESS: DB, HTTP, log-writer and decrypt metrics recorded ({len(text.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp(), ENV)
+    try:
+        test_concurrent_updates_are_exact()
+        test_short_lived_threads()
+        test_pipeline_metrics()
+    finally:
+        server.shutdown()
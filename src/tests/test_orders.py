@@ -0,0 +1,253 @@
+"""
+Quick script to validate the order entry path (src/orders.py) against the fake
+mStock server on a throw-away SQLite database:
+- submit() reaches the wire in low milliseconds (journal fsync included)
+- a retried idempotency key returns the first outcome and places nothing
+- concurrent submits share journal fsyncs (group commit)
+- bad orders are rejected before anything is journaled or sent
+- the journal is replicated to the orders table, and a restarted router
+  still knows every key (an intent without a result becomes "unknown")
+- keys from before the trading day are dropped and the journal compacted,
+  but only after replication succeeded
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from src import auth, db, metrics, orders
+from src.http_client import endpoint_label
+from src.loadtest import run_load
+from src.loadtest.fake_server import start_in_background
+from src.tests import scratch
+
+server, state, base_url = start_in_background(latency_ms=5)
+ENV = {"MSTOCK_BASE_URL": base_url}
+
+ACCOUNTS = 8
+JOURNAL = os.path.join(tempfile.mkdtemp(), "order_journal.jsonl")
+
+
+def _login_all():
+    users = run_load.seed_accounts(ACCOUNTS)
+    for user_id, password, api_key in users:
+        _, request_token = auth.login(user_id, password)
+        auth.generate_session(user_id, api_key, request_token, "")
+    return sorted(user_id for user_id, _, _ in users)
+
+def _router():
+    replicator = orders.OrderReplicator(JOURNAL, interval=0.1).start()
+    return orders.OrderRouter(journal_path=JOURNAL, replicator=replicator)
+
+_shared = {}
+
+def _routed():
+    """(logged-in users, router), built once by whichever test needs them first"""
+    if not _shared:
+        _shared.update(users=_login_all(), router=_router())
+    return _shared["users"], _shared["router"]
+
+
+def test_submit_latency():
+    users, router = _routed()
+    user_id = users[0]
+    assert router.warm(user_id)
+    wire_ms = []
+    for i in range(20):
+        result = router.place(user_id, "TCS", "BUY", 1, order_type="LIMIT", price=3500.05,
+                              idempotency_key=f"latency-{i}")
+        assert result["status"] == "accepted" and result["order_id"], result
+        wire_ms.append(result["wire_ms"])
+    wire_ms.sort()
+    median = wire_ms[len(wire_ms) // 2]
+    assert median < 20, wire_ms
+    placed = state.orders_for(user_id)
+    assert len(placed) == 20 and placed[0]["price"] == "3500.05" and placed[0]["order_type"] == "LIMIT"
+    assert endpoint_label("/orders/regular/000000000001") == "/orders/regular/{order_id}"
+    print(f"✅ SUCCESS: submit-to-wire median {median:.2f} ms, max {wire_ms[-1]:.2f} ms (journal fsync included)")
+
+
+def test_idempotent_retry():
+    users, router = _routed()
+    user_id = users[1]
+    order = router.prepare(user_id, "INFY", "SELL", 3, idempotency_key="retry-1")
+    first = router.submit(order)
+    second = router.submit(order)
+    again = router.place(user_id, "INFY", "SELL", 3, idempotency_key="retry-1")
+    assert second["duplicate"] and again["duplicate"], second
+    assert first["order_id"] == second["order_id"] == again["order_id"]
+    assert len(state.orders_for(user_id)) == 1, "a retried key placed the order twice"
+    try:
+        router.place(user_id, "INFY", "SELL", 4, idempotency_key="retry-1")
+        raise AssertionError("a reused key with different terms was accepted")
+    except orders.IdempotencyConflict:
+        pass
+
+    # Concurrent retries of one key while it is in flight: still one order
+    order = router.prepare(user_id, "SBIN", "BUY", 2, idempotency_key="retry-2")
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: router.submit(order), range(8)))
+    assert len({r["order_id"] for r in results}) == 1 and sum(not r.get("duplicate") for r in results) == 1
+    assert len(state.orders_for(user_id)) == 2
+    print("✅ SUCCESS: retries (sequential and concurrent) returned the first outcome and placed nothing new")
+
+
+def test_group_commit():
+    users, router = _routed()
+    commits = router.journal.commits
+    start = threading.Barrier(len(users) * 4)
+
+    def submit(i):
+        order = router.prepare(users[i % len(users)], "HDFCBANK", "BUY", 1, idempotency_key=f"burst-{i}")
+        start.wait()
+        return router.submit(order)
+
+    with ThreadPoolExecutor(len(users) * 4) as pool:
+        results = list(pool.map(submit, range(len(users) * 4)))
+    assert all(r["status"] == "accepted" for r in results), results
+    used = router.journal.commits - commits
+    # every order writes two records (intent, result)
+    assert used < len(results) * 2, (used, len(results))
+    print(f"✅ SUCCESS: {len(results)} concurrent orders ({len(results) * 2} journal records) in {used} fsyncs")
+
+
+def test_journal_group_commit():
+    # A slow disk: every record queued while one fsync runs must go out with the next
+    journal = orders.OrderJournal(os.path.join(tempfile.mkdtemp(), "group_commit.jsonl"))
+    real_fsync, writers = os.fsync, 64
+    start = threading.Barrier(writers)
+
+    def slow_fsync(fd):
+        time.sleep(0.02)
+        real_fsync(fd)
+
+    def append(i):
+        start.wait()
+        return journal.append({"event": "intent", "key": f"group-{i}"})
+
+    orders.os.fsync = slow_fsync
+    try:
+        with ThreadPoolExecutor(writers) as pool:
+            list(pool.map(append, range(writers)))
+    finally:
+        orders.os.fsync = real_fsync
+        journal.close()
+    assert len(orders.OrderJournal.read(journal.path)[0]) == writers
+    assert journal.commits <= writers // 8, journal.commits
+    print(f"✅ SUCCESS: {writers} concurrent journal appends in {journal.commits} fsyncs")
+
+
+def test_validation():
+    users, router = _routed()
+    size = os.path.getsize(JOURNAL)
+    bad = [dict(side="HOLD"), dict(quantity=0), dict(quantity=1.5), dict(order_type="LIMIT"),
+           dict(order_type="LIMIT", price=100.03), dict(order_type="SL", price=100.0),
+           dict(price=100.0), dict(idempotency_key="no spaces allowed")]
+    for options in bad:
+        arguments = dict(dict(side="BUY", quantity=1), **options)
+        try:
+            router.prepare(users[0], "TCS", arguments.pop("side"), arguments.pop("quantity"), **arguments)
+            raise AssertionError(f"accepted: {options}")
+        except orders.OrderValidationError:
+            pass
+    try:
+        router.prepare("nobody_logged_in", "TCS", "BUY", 1)
+        raise AssertionError("order without a session accepted")
+    except orders.OrderError as e:
+        assert e.status == 401
+    assert os.path.getsize(JOURNAL) == size, "a rejected order reached the journal"
+
+    # The broker rejects it: recorded as rejected, not retried
+    stale = router.prepare(users[-1], "TCS", "BUY", 1)
+    state.end_session(f"token {stale.api_key}:{stale.access_token}")
+    rejected = router.place(users[-1], "TCS", "BUY", 1, idempotency_key="broker-rejects")
+    assert rejected["status"] == "rejected" and rejected["http_status"] == 403, rejected
+    print(f"✅ SUCCESS: {len(bad) + 1} invalid orders stopped before the journal; broker rejection recorded")
+
+
+def test_replication_and_restart():
+    users, router = _routed()
+    router.close()          # stops the replicator after a final pass
+    rows = db.fetch_all("SELECT IDEMPOTENCY_KEY, STATUS, BROKER_ORDER_ID, WIRE_MS FROM orders")
+    by_key = {row["IDEMPOTENCY_KEY"]: row for row in rows}
+    for key in ("latency-0", "retry-1", "retry-2", "burst-0"):
+        assert by_key[key]["STATUS"] == "accepted" and by_key[key]["BROKER_ORDER_ID"], by_key.get(key)
+        assert by_key[key]["WIRE_MS"] is not None
+    assert by_key["broker-rejects"]["STATUS"] == "rejected"
+    assert len(rows) == len({r["IDEMPOTENCY_KEY"] for r in rows})
+
+    # A crash after the intent was journaled, mid-way through writing the next record: the restarted
+    # router reports the order as unknown (and never re-sends it) and drops the torn line
+    intent = dict(by_key["latency-0"])
+    with open(JOURNAL, "a") as f:
+        f.write('{"event":"intent","key":"crashed-1","user_id":"%s","exchange":"NSE","symbol":"TCS",'
+                '"side":"BUY","order_type":"MARKET","product":"CNC","validity":"DAY","quantity":1,'
+                '"price":0,"trigger_price":0,"status":"pending"}\n{"event":"res' % users[0])
+    placed = len(state.orders)
+    restarted = _router()
+    try:
+        assert restarted.get("latency-0")["status"] == intent["STATUS"]
+        assert restarted.get("crashed-1")["status"] == "unknown"
+        duplicate = restarted.place(users[1], "INFY", "SELL", 3, idempotency_key="retry-1")
+        assert duplicate["duplicate"] and len(state.orders) == placed
+    finally:
+        restarted.close()
+    assert db.fetch_one("SELECT STATUS FROM orders WHERE IDEMPOTENCY_KEY = %s", ("crashed-1",))["STATUS"] == "unknown"
+    assert restarted.replicator.lag() == 0 and len(orders.OrderJournal.read(JOURNAL)[0]) > len(rows)
+    assert "mstock_order_stage_seconds_bucket{stage=\"wire\"" in metrics.render()
+    print(f"✅ SUCCESS: {len(rows)} orders replicated; restart kept every idempotency key")
+
+
+def test_compaction():
+    users, _ = _routed()
+    journal = os.path.join(tempfile.mkdtemp(), "compact_journal.jsonl")
+    replicator = orders.OrderReplicator(journal, interval=0.1).start()
+    router = orders.OrderRouter(journal_path=journal, replicator=replicator)
+    tomorrow = datetime.now() + timedelta(days=1)
+    try:
+        for i in range(10):
+            router.place(users[2], "TCS", "BUY", 1, idempotency_key=f"compact-{i}")
+        size = os.path.getsize(journal)
+
+        # The orders table is unreachable: nothing is dropped from the journal
+        real_replicate = replicator.replicate_once
+        replicator.replicate_once = lambda: 1 / 0
+        try:
+            assert router.compact(now=tomorrow) is None and router.get("compact-0")
+        finally:
+            replicator.replicate_once = real_replicate
+        assert os.path.getsize(journal) >= size
+
+        assert router.compact(now=datetime.now()) == 0, "today's keys are kept"
+        assert router.compact(now=tomorrow) == 10
+        assert router.get("compact-0") is None and os.path.getsize(journal) == 0 and replicator.offset == 0
+        after = router.place(users[2], "TCS", "BUY", 1, idempotency_key="compact-after")
+        assert after["status"] == "accepted", after
+    finally:
+        router.close()
+    restarted = orders.OrderRouter(journal_path=journal)
+    try:
+        assert restarted.get("compact-after") and restarted.get("compact-1") is None
+    finally:
+        restarted.close()
+    row = db.fetch_one("SELECT COUNT(*) AS n FROM orders WHERE IDEMPOTENCY_KEY LIKE %s", ("compact-%",))
+    assert row["n"] == 11, "the orders table keeps the history"
+    print("✅ SUCCESS: keys from before the trading day dropped and the journal compacted after replication")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp(), ENV)
+    try:
+        test_submit_latency()
+        test_idempotent_retry()
+        test_group_commit()
+        test_journal_group_commit()
+        test_validation()
+        test_replication_and_restart()
+        test_compaction()
+    finally:
+        db.flush_logs()
+        server.shutdown()
@@ -0,0 +1,75 @@
+"""
+Quick script to validate src/rate_limiter.py.
+Checks that the sustained rate stays under the bucket limit, that session
+calls overtake queued fund-summary polling for the same api_key, and that
+asyncio callers wait without blocking the loop.
+"""
+
+import asyncio
+import threading
+import time
+
+from src.rate_limiter import RequestScheduler
+
+LIMITS = {"per_key": (20.0, 1.0), "session": (100.0, 100.0), "order": (100.0, 100.0),
+          "portfolio": (100.0, 100.0), "default": (100.0, 100.0)}
+
+
+def test_priority_and_rate():
+    scheduler = RequestScheduler(LIMITS)
+    granted = []
+    lock = threading.Lock()
+
+    def call(endpoint):
+        scheduler.acquire(endpoint, "api-key")
+        with lock:
+            granted.append(endpoint)
+
+    threads = [threading.Thread(target=call, args=("/user/fundsummary",)) for _ in range(10)]
+    for t in threads:
+        t.start()
+    time.sleep(0.05)   # fund-summary polls are queued first
+    session_threads = [threading.Thread(target=call, args=("/session/token",)) for _ in range(3)]
+    started = time.monotonic()
+    for t in session_threads:
+        t.start()
+    for t in threads + session_threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    last_session = max(i for i, e in enumerate(granted) if e == "/session/token")
+    print(f"Grant order: {granted}")
+    print(f"Stats: {scheduler.stats()}")
+    assert last_session <= 6, "session calls should overtake queued fund-summary polling"
+    assert elapsed >= (len(granted) - 3) / 20.0 - 0.05, "per-key rate exceeded"
+    print("✅ SUCCESS: priority respected under the per-key limit")
+
+
+def test_asyncio_waiting():
+    scheduler = RequestScheduler(LIMITS)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        tick_task = asyncio.create_task(ticker())
+        started = time.monotonic()
+        await asyncio.gather(*(scheduler.acquire_async("/user/fundsummary", "api-key") for _ in range(10)))
+        tick_task.cancel()
+        return time.monotonic() - started, ticks
+
+    elapsed, ticks = asyncio.run(main())
+    print(f"10 async acquires took {elapsed:.2f}s, event loop ticked {ticks} times")
+    assert elapsed >= 9 / 20.0 - 0.05
+    assert ticks > 10, "event loop was blocked while waiting"
+    print("✅ SUCCESS: asyncio callers wait cooperatively")
+
+
+if __name__ == "__main__":
+    test_priority_and_rate()
+    test_asyncio_waiting()
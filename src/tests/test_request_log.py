@@ -0,0 +1,71 @@
+"""
+Quick script to validate structured MS01_REQUEST_RESPONSE_LOG rows on a
+throw-away SQLite database: JSON payloads, compression above the threshold,
+masked tokens, indexed hot columns and transparent decoding on read.
+"""
+
+import tempfile
+from datetime import datetime, timedelta
+
+from src import db, log_payload
+from src.tests import scratch
+
+SESSION_JSON = {
+    "status": "success",
+    "data": {
+        "user_id": "log_user", "user_name": "Log User", "access_token": "a" * 400,
+        "refresh_token": "r" * 400, "enctoken": "e" * 200, "login_time": "2026-01-02 09:15:00",
+        "exchanges": ["NSE", "BSE", "NFO", "CDS", "MCX"] * 60,
+    },
+}
+
+
+def test_round_trip_and_compression():
+    seq_id = db.generate_login_seq_id()
+    db.insert_request_response_log("INFO", "small", "test_request_log", {"user_id": "log_user"},
+                                   {"status": "success", "http_status": 200},
+                                   api_name="login", login_seq_id=seq_id)
+    db.insert_request_response_log("INFO", "large", "test_request_log", {"user_id": "log_user"}, SESSION_JSON,
+                                   api_name="generate_session", login_seq_id=seq_id)
+    db.insert_request_response_log("ERROR", "legacy repr", "test_request_log", str({"user_id": "log_user"}),
+                                   "Connection reset by peer", api_name="login", login_seq_id=seq_id)
+    assert db.flush_logs()
+
+    raw = {r["message"]: r for r in db.fetch_all(
+        "SELECT message, request, response, PAYLOAD_CODEC, PAYLOAD, STATUS, USER_ID, HTTP_STATUS "
+        "FROM MS01_REQUEST_RESPONSE_LOG WHERE LOGIN_SEQ_ID = %s", (seq_id,))}
+    assert raw["small"]["request"] == '{"user_id":"log_user"}' and raw["small"]["HTTP_STATUS"] == 200
+    assert raw["large"]["request"] is None and raw["large"]["PAYLOAD_CODEC"] in ("zlib", "zstd")
+    assert raw["legacy repr"]["STATUS"] == "failure" and raw["legacy repr"]["USER_ID"] == "log_user"
+
+    rows = {r["message"]: r for r in db.fetch_request_response_logs(login_seq_id=seq_id)}
+    large = rows["large"]["response"]
+    assert large["data"]["user_name"] == "Log User"
+    assert large["data"]["access_token"] == log_payload.MASK, "tokens are masked"
+    assert rows["legacy repr"]["request"] == {"user_id": "log_user"}
+    assert rows["legacy repr"]["response"] == "Connection reset by peer"
+
+    repr_size = len(str({"user_id": "log_user"})) + len(str(SESSION_JSON))
+    stored = len(raw["large"]["PAYLOAD"])
+    print(f"✅ SUCCESS: large row stored in {stored} bytes ({raw['large']['PAYLOAD_CODEC']}) "
+          f"vs {repr_size} bytes as str(dict) — {repr_size / stored:.1f}x smaller")
+
+
+def test_failed_sessions_last_hour():
+    db.insert_request_response_log("ERROR", "Generate session failed", "test_request_log",
+                                   {"user_id": "log_user"}, "Invalid request token", api_name="generate_session")
+    assert db.flush_logs()
+    rows = db.fetch_request_response_logs(status="failure", api_name="generate_session",
+                                          since=datetime.now() - timedelta(hours=1))
+    assert rows and all(r["STATUS"] == "failure" for r in rows)
+
+    plan = db.fetch_all("EXPLAIN QUERY PLAN SELECT id FROM MS01_REQUEST_RESPONSE_LOG "
+                        "WHERE STATUS = %s AND SYS_CREATE_DATE_TIME >= %s", ("failure", datetime.now()))
+    assert any("IDX_MS01_RRL_STATUS_CREATED" in str(step) for step in plan), plan
+    print(f"✅ SUCCESS: {len(rows)} failed session(s) in the last hour via IDX_MS01_RRL_STATUS_CREATED")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp())
+    test_round_trip_and_compression()
+    test_failed_sessions_last_hour()
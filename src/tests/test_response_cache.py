@@ -0,0 +1,53 @@
+"""
+Quick script to validate src/response_cache.py.
+Checks TTL hits, single-flight coalescing of concurrent misses, LRU bounds
+and invalidation (logout / order events).
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.response_cache import ReadThroughCache
+
+ENDPOINT = "/user/fundsummary"
+
+
+def test_coalescing_and_ttl(callers=20):
+    cache = ReadThroughCache({ENDPOINT: 60})
+    calls = []
+    lock = threading.Lock()
+
+    def fetch():
+        with lock:
+            calls.append(1)
+        time.sleep(0.2)
+        return {"status": "success", "data": {"balance": 100}}
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(lambda _: cache.get_or_load(ENDPOINT, "key-1", None, fetch), range(callers)))
+    cache.get_or_load(ENDPOINT, "key-1", None, fetch)
+
+    stats = cache.stats()
+    print(f"Cache stats: {stats}")
+    assert len(calls) == 1, f"expected one upstream call, got {len(calls)}"
+    assert all(r == results[0] for r in results)
+    assert stats["coalesced"] == callers - 1 and stats["hits"] == 1
+    print("✅ SUCCESS: concurrent callers shared one request")
+
+
+def test_invalidation_and_lru():
+    cache = ReadThroughCache({ENDPOINT: 60}, max_entries=2)
+    for key in ("key-1", "key-2", "key-3"):
+        cache.get_or_load(ENDPOINT, key, None, lambda: key)
+    assert cache.stats()["evictions"] == 1
+
+    assert cache.invalidate(api_key="key-3") == 1
+    fresh = cache.get_or_load(ENDPOINT, "key-3", None, lambda: "reloaded")
+    assert fresh == "reloaded"
+    print("✅ SUCCESS: LRU bound and invalidation work")
+
+
+if __name__ == "__main__":
+    test_coalescing_and_ttl()
+    test_invalidation_and_lru()
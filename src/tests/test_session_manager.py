@@ -0,0 +1,107 @@
+"""
+Quick script to validate session reuse (memory -> DB -> refresh-token renewal),
+including the last minutes of the trading day and a renewal that cannot be stored.
+Runs against a throw-away SQLite database; the broker renewal call is replaced
+by a local function, so no network access is needed.
+"""
+
+import tempfile
+from datetime import datetime, timedelta
+
+from src import db
+from src.session_manager import SessionManager
+from src.tests import scratch
+
+USER_ID = "session_user"
+
+
+def _renew(api_key, refresh_token):
+    return {"data": {"access_token": "renewed-token", "refresh_token": "refresh-2"}}
+
+
+def _seed(login_time):
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID = %s", (USER_ID,))
+        cursor.execute("""
+            INSERT INTO MS01_API_Authentication_Credential
+                (M_STOCK_USER_ID, M_STOCK_PASSWORD, M_STOCK_API_KEY, M_STOCK_API_KEY_TYPE,
+                 M_ACCESS_TOKEN, M_REFRESH_TOKEN, LAST_LOGIN_DATE)
+            VALUES (%s, 'cipher', 'api-key', 'A', 'db-token', 'refresh-1', %s)
+        """, (USER_ID, login_time))
+        cursor.close()
+
+
+def test_reuse_from_db_then_memory():
+    now = datetime.now().replace(hour=10, minute=0)
+    _seed(now - timedelta(hours=1))
+    manager = SessionManager(renew=_renew)
+
+    first = manager.get_session(USER_ID, now=now)
+    second = manager.get_session(USER_ID, now=now)
+    assert first["source"] == "db" and first["access_token"] == "db-token"
+    assert second["source"] == "memory"
+    print(f"✅ SUCCESS: session reused without login {manager.stats()}")
+
+
+def test_renew_near_expiry_and_logout():
+    now = datetime.now().replace(hour=23, minute=55)   # inside the renewal window before midnight
+    _seed(now - timedelta(hours=2))
+    manager = SessionManager(renew=_renew)
+
+    session = manager.get_session(USER_ID, now=now)
+    assert session["source"] == "renewed" and session["access_token"] == "renewed-token"
+
+    manager.invalidate(USER_ID)
+    assert manager.get_session(USER_ID, now=now) is None, "logged-out session must not be reused"
+    print(f"✅ SUCCESS: token renewed near expiry and dropped on logout {manager.stats()}")
+
+
+def test_one_renewal_before_midnight():
+    # Tokens end at midnight, so a renewal inside the last window cannot move expiry;
+    # it must not be repeated on every lookup (or by another process reading the DB)
+    now = datetime.now().replace(hour=23, minute=50, second=0, microsecond=0)
+    _seed(now.replace(hour=9, minute=0))
+    calls = []
+
+    def renew(api_key, refresh_token):
+        calls.append(refresh_token)
+        return _renew(api_key, refresh_token)
+
+    manager = SessionManager(renew=renew)
+    sources = [manager.get_session(USER_ID, now=now + timedelta(minutes=m))["source"] for m in range(10)]
+    other_process = SessionManager(renew=renew).get_session(USER_ID, now=now + timedelta(minutes=5))
+    assert len(calls) == 1, calls
+    assert sources[0] == "renewed" and set(sources[1:]) == {"memory"}, sources
+    assert other_process["source"] == "db" and other_process["access_token"] == "renewed-token"
+    print(f"✅ SUCCESS: one renewal between 23:50 and midnight {manager.stats()}")
+
+
+def test_renewal_not_stored_is_not_used():
+    now = datetime.now().replace(hour=23, minute=55)
+    _seed(now - timedelta(hours=2))
+    manager = SessionManager(renew=_renew)
+    real_commit = db.LoginUnitOfWork.commit
+
+    def failing_commit(uow, *args, **kwargs):
+        uow._statements.append(("UPDATE NO_SUCH_TABLE SET X = 1", ()))     # fail mid-transaction
+        return real_commit(uow, *args, **kwargs)
+
+    db.LoginUnitOfWork.commit = failing_commit
+    try:
+        session = manager.get_session(USER_ID, now=now)
+    finally:
+        db.LoginUnitOfWork.commit = real_commit
+    stats = manager.stats()
+    assert session["source"] == "db" and session["access_token"] == "db-token", session
+    assert stats["renewals"] == 0 and stats["renewal_failures"] == 1, stats
+    print(f"✅ SUCCESS: a renewal whose commit failed was not handed out {stats}")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp())
+    test_reuse_from_db_then_memory()
+    test_renew_near_expiry_and_logout()
+    test_one_renewal_before_midnight()
+    test_renewal_not_stored_is_not_used()
+    db.flush_logs()
@@ -0,0 +1,59 @@
+"""
+Quick script to validate src/session_store.py:
+per-user records, merge/clear semantics, and concurrent writers in several
+processes without lost updates or a corrupted file.
+"""
+
+import os
+import tempfile
+from multiprocessing import Pool
+
+from src.session_store import SessionStore
+
+PATH = os.path.join(tempfile.mkdtemp(), "session_store.db")
+
+
+def _worker(args):
+    worker, rounds = args
+    store = SessionStore(PATH)
+    for i in range(rounds):
+        # Shared record: every worker merges its own key into the same user
+        store.update("shared_user", {f"worker_{worker}": i})
+        store.update(f"user_{worker}", {"access_token": f"token-{worker}-{i}"})
+    store.close()
+
+
+def test_merge_and_clear():
+    store = SessionStore(PATH)
+    store.update("alice", {"api_key": "k1", "access_token": "a1", "refresh_token": "r1"})
+    store.update("alice", {"access_token": "a2"})
+    record = store.get("alice")
+    assert record["api_key"] == "k1" and record["access_token"] == "a2" and record["refresh_token"] == "r1"
+
+    store.clear("alice")
+    record = store.get("alice")
+    assert record["api_key"] == "k1" and "access_token" not in record and "refresh_token" not in record
+    assert store.get("nobody") is None
+    store.delete("alice")
+    assert store.get("alice") is None
+    store.close()
+    print("✅ SUCCESS: records merge per user and logout clears only the tokens")
+
+
+def test_concurrent_processes(workers=6, rounds=50):
+    with Pool(workers) as pool:
+        pool.map(_worker, [(w, rounds) for w in range(workers)])
+
+    store = SessionStore(PATH)
+    shared = store.get("shared_user")
+    assert all(shared[f"worker_{w}"] == rounds - 1 for w in range(workers)), shared
+    for w in range(workers):
+        assert store.get(f"user_{w}")["access_token"] == f"token-{w}-{rounds - 1}"
+    print(f"✅ SUCCESS: {workers} processes x {rounds} rounds, no lost updates "
+          f"({len(store.all())} records)")
+    store.close()
+
+
+if __name__ == "__main__":
+    test_merge_and_clear()
+    test_concurrent_processes()
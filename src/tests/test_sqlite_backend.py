@@ -0,0 +1,46 @@
+"""
+Quick script to validate the embedded SQLite backend (DB_BACKEND=sqlite).
+Uses a throw-away database file, so it runs without a MySQL server.
+"""
+
+import tempfile
+
+from src import db, db_migrate
+from src.tests import scratch
+
+
+def test_schema_and_log_writes():
+    db.insert_log("INFO", "sqlite backend smoke test", "test_sqlite_backend")
+    db.insert_request_response_log("INFO", "smoke", "test_sqlite_backend",
+                                   request="{}", response="{}", api_name="none")
+    assert db.flush_logs(), "Log writer did not drain"
+    row = db.fetch_one("SELECT COUNT(*) AS CNT FROM logs WHERE SOURCE_MODULE = %s", ("test_sqlite_backend",))
+    assert row["CNT"] >= 1
+    print(f"✅ SUCCESS: {db.get_backend().path} created and logs written")
+
+
+def test_upsert_and_index_use():
+    sql = db.get_backend().upsert_sql(
+        "MS01_API_Authentication_Credential",
+        ("M_STOCK_USER_ID", "M_STOCK_PASSWORD", "M_STOCK_API_KEY", "M_STOCK_API_KEY_TYPE"),
+        ("M_STOCK_USER_ID",),
+    )
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql, ("sqlite_user", "cipher-1", "key", "A"))
+        cursor.execute(sql, ("sqlite_user", "cipher-2", "key", "B"))
+        cursor.close()
+    row = db.fetch_one("SELECT M_STOCK_PASSWORD, M_STOCK_API_KEY_TYPE FROM MS01_API_Authentication_Credential "
+                       "WHERE M_STOCK_USER_ID = %s", ("sqlite_user",))
+    assert row == {"M_STOCK_PASSWORD": "cipher-2", "M_STOCK_API_KEY_TYPE": "B"}
+
+    db_migrate.apply_pending()
+    for label, ok, plan in db_migrate.check_indexes():
+        assert ok, f"{label} does a full scan: {plan}"
+    print("✅ SUCCESS: upsert updated in place and hot queries use indexes")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp())
+    test_schema_and_log_writes()
+    test_upsert_and_index_use()
@@ -0,0 +1,186 @@
+"""
+Quick script to validate background token refresh (src/token_refresher.py):
+- every account is renewed before its token expires, and again after that
+- no more than `workers` renewals run at once; DB writes are batched
+- a failing account backs off and recovers without holding up the others
+- a renewal that races a logout is discarded instead of restoring the session
+Runs against a throw-away SQLite database; the broker renewal call is
+replaced by a local function, so no network access is needed.
+"""
+
+import secrets
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from src import db
+from src.session_manager import SessionManager
+from src.session_store import store
+from src.tests import scratch
+from src.token_refresher import TokenRefresher
+
+USERS = [f"refresh_user_{i}" for i in range(6)]
+FLAKY, LOGGED_OUT = USERS[0], USERS[1]
+TTL, LEAD, WORKERS = 4.0, 2.0, 3
+
+
+class FakeBroker:
+    """renew_session stand-in: records when each token was used and how many calls overlapped"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.expiry = {}          # refresh_token -> (user_id, expires_at)
+        self.latest = {}          # user_id -> newest refresh_token
+        self.renewals = []        # (user_id, used_at, expires_at of the token used)
+        self.failures = 0
+        self.running = self.max_running = 0
+
+    def issue(self, user_id, login_time):
+        token = secrets.token_hex(8)
+        self.expiry[token] = (user_id, login_time + timedelta(seconds=TTL))
+        self.latest[user_id] = token
+        return token
+
+    def renew(self, api_key, refresh_token):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(0.05)
+            user_id, expires_at = self.expiry[refresh_token]
+            with self.lock:
+                if user_id == FLAKY and self.failures < 2:
+                    self.failures += 1
+                    raise Exception("Session renewal failed: 503 broker busy")
+            if user_id == LOGGED_OUT:
+                _logout(user_id)      # the user logs out while this renewal is on its way
+            now = datetime.now()
+            self.renewals.append((user_id, now, expires_at))
+            return {"data": {"access_token": secrets.token_hex(8), "refresh_token": self.issue(user_id, now),
+                             "login_time": now.isoformat(sep=" ")}}
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def _logout(user_id):
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE MS01_API_Authentication_Credential SET M_ACCESS_TOKEN = NULL, "
+                       "M_REFRESH_TOKEN = NULL, LAST_LOGOUT_DATE = NOW() WHERE M_STOCK_USER_ID = %s",
+                       (user_id,))
+        cursor.close()
+
+
+def _seed(broker):
+    login_time = datetime.now() - timedelta(seconds=TTL - LEAD)     # due right away
+    with db.transaction() as conn:
+        cursor = conn.cursor()
+        for user_id in USERS:
+            cursor.execute("DELETE FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID = %s",
+                           (user_id,))
+            cursor.execute("""
+                INSERT INTO MS01_API_Authentication_Credential
+                    (M_STOCK_USER_ID, M_STOCK_PASSWORD, M_STOCK_API_KEY, M_STOCK_API_KEY_TYPE,
+                     M_ACCESS_TOKEN, M_REFRESH_TOKEN, LAST_LOGIN_DATE)
+                VALUES (%s, 'cipher', %s, 'A', 'db-token', %s, %s)
+            """, (user_id, f"api-{user_id}", broker.issue(user_id, login_time), login_time))
+        cursor.close()
+
+
+def _stored_tokens():
+    rows = db.fetch_all("SELECT M_STOCK_USER_ID, M_REFRESH_TOKEN FROM MS01_API_Authentication_Credential "
+                        "WHERE M_STOCK_USER_ID LIKE 'refresh_user_%'")
+    return {row["M_STOCK_USER_ID"]: row["M_REFRESH_TOKEN"] for row in rows}
+
+
+def test_refresh_before_expiry():
+    broker = FakeBroker()
+    _seed(broker)
+    manager = SessionManager(ttl=TTL, renew_before=LEAD)
+    refresher = TokenRefresher(manager=manager, renew=broker.renew, workers=WORKERS, lead=LEAD,
+                               flush_interval=0.2, backoff_base=0.2, backoff_max=1.0)
+    assert refresher.start().stats()["accounts"] == len(USERS)
+
+    active = [user_id for user_id in USERS if user_id != LOGGED_OUT]
+    deadline = time.monotonic() + 15
+    while any(sum(1 for r in broker.renewals if r[0] == user_id) < 2 for user_id in active):
+        assert time.monotonic() < deadline, f"renewals stalled: {refresher.stats()}"
+        time.sleep(0.1)
+    refresher.stop()
+    stats = refresher.stats()
+
+    late = [(user_id, used, expires) for user_id, used, expires in broker.renewals if used >= expires]
+    assert not late, late
+    assert broker.max_running <= WORKERS, broker.max_running
+    assert broker.failures == 2 and stats["failures"] == 2, stats
+    assert stats["batches"] < stats["refreshed"], stats
+
+    stored = _stored_tokens()
+    for user_id in active:
+        latest = broker.latest[user_id]
+        assert stored[user_id] == latest, user_id
+        assert manager.get_session(user_id)["source"] == "memory"
+        assert store.get(user_id)["refresh_token"] == latest
+    assert stored[LOGGED_OUT] is None, "a renewal that raced the logout was written back"
+    assert stats["discarded"] == 1 and LOGGED_OUT not in [row[0] for row in refresher.schedule()]
+
+    db.flush_logs()
+    discarded = db.fetch_request_response_logs(user_id=LOGGED_OUT, status="failure")
+    assert any(row["message"] == "Renewed session discarded (token changed)" for row in discarded)
+    failed = db.fetch_request_response_logs(user_id=FLAKY, status="failure")
+    assert sum(row["message"] == "Background session renewal failed" for row in failed) == 2, failed
+    print(f"✅ SUCCESS: {stats['refreshed']} renewals ahead of expiry in {stats['batches']} DB batches, "
+          f"≤{broker.max_running} at once, flaky account recovered after backoff")
+
+
+def test_run_once():
+    broker = FakeBroker()
+    broker.failures = 2       # no failures this time
+    _seed(broker)
+    refresher = TokenRefresher(manager=SessionManager(ttl=TTL, renew_before=LEAD), renew=broker.renew,
+                               workers=WORKERS, lead=LEAD)
+    assert refresher.run_once() == len(USERS)
+    stats = refresher.stats()
+    assert stats["batches"] == 1 and stats["refreshed"] == len(USERS) and stats["discarded"] == 1, stats
+    assert refresher.run_once() == 0, "nothing is due right after a refresh"
+    print("✅ SUCCESS: --once refreshed every due account in one batch")
+
+
+def test_survives_db_errors():
+    broker = FakeBroker()
+    broker.failures = 2
+    _seed(broker)
+    refresher = TokenRefresher(manager=SessionManager(ttl=TTL, renew_before=LEAD), renew=broker.renew,
+                               workers=WORKERS, lead=LEAD, flush_interval=0.1, reload_interval=0.2)
+    refresher.start()
+    failing = TokenRefresher(manager=SessionManager(ttl=TTL, renew_before=LEAD), renew=broker.renew,
+                             workers=WORKERS, lead=LEAD)
+    failing.load()
+    real_fetch_all, real_log = db.fetch_all, db.insert_request_response_log
+
+    def lost_connection(*args, **kwargs):
+        raise ConnectionError("Lost connection to MySQL server during query")
+
+    db.fetch_all = db.insert_request_response_log = failing._renew = lost_connection
+    try:
+        time.sleep(0.6)                     # several reloads fail
+        with failing._cond:
+            account = failing._pop_due(datetime.now())[0]
+        failing._slots.acquire()
+        failing._refresh(account)           # renewal fails, and so does logging the failure
+    finally:
+        db.fetch_all, db.insert_request_response_log = real_fetch_all, real_log
+    stats = refresher.stats()
+    refresher.stop()
+    assert stats["running"] and stats["errors"] >= 1, stats
+    assert account.user_id not in failing._in_flight and account.failures == 1, failing.stats()
+    assert account.due > datetime.now(), "failed account was not rescheduled"
+    print(f"✅ SUCCESS: scheduler kept running through {stats['errors']} failed reload(s)")
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp())
+    test_refresh_before_expiry()
+    test_run_once()
+    test_survives_db_errors()
@@ -0,0 +1,122 @@
+"""
+Quick script to validate src/tracing.py:
+- disabled (the default): span() is a shared no-op and costs a few hundred nanoseconds
+- enabled with the file exporter: a CLI login against the fake mStock server
+  writes one span per step plus the HTTP and DB spans, all carrying its login_seq_id
+- configure() leaves os.environ alone, registers one atexit hook however often
+  tracing is rebuilt, and shutdown() closes the trace file
+The enabled parts are skipped when opentelemetry-sdk is not installed.
+"""
+
+import atexit
+import os
+import tempfile
+import time
+
+from src import tracing
+from src.loadtest import run_load
+from src.loadtest.fake_server import start_in_background
+from src.tests import scratch
+
+server, state, base_url = start_in_background(latency_ms=5)
+ENV = {"MSTOCK_BASE_URL": base_url, "MSTOCK_CONNECT": "http", "TRACING_ENABLED": None}
+TRACE_FILE = os.path.join(tempfile.mkdtemp(), "traces.jsonl")
+
+LOGIN_STEPS = {"login.start", "login.fetch_credentials", "login.decrypt_password", "login.mconnect_login",
+               "login.complete", "login.generate_session", "login.persist", "login.session_store"}
+
+
+def test_disabled_tracing_is_free(iterations=200_000):
+    assert not tracing.enabled()
+    assert tracing.span("x", user_id="u") is tracing.NOOP_SPAN
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with tracing.span("db.fetch_one", rows=1) as span:
+            span.set_attribute("db.rows", 1)
+    per_span_ns = (time.perf_counter() - started) / iterations * 1e9
+    assert per_span_ns < 5000, f"{per_span_ns:.0f} ns per disabled span"
+    print(f"✅ SUCCESS: disabled span costs {per_span_ns:.0f} ns")
+
+
+def test_login_spans_share_login_seq_id():
+    try:
+        import opentelemetry.sdk  # noqa: F401
+    except ImportError:
+        print("⚠️ SKIPPED: opentelemetry-sdk is not installed (pip install -r requirements/requirements-extended.txt)")
+        return
+
+    from src import mstock_auth_api_cli as cli
+
+    tracing.configure(enabled=True, exporter="file", path=TRACE_FILE)
+    try:
+        (user_id, _, _), = run_load.seed_accounts(1)
+        context, failure = cli.start_login(user_id)
+        assert failure is None, failure
+        result = cli.complete_login(context, context["login_json"]["data"]["otp"])
+        assert result["status"] == "success", result
+        tracing.force_flush()
+    finally:
+        tracing.configure(enabled=False)
+
+    login_seq_id = context["login_seq_id"]
+    spans = [s for s in tracing.read_spans(TRACE_FILE) if s["attributes"].get("login_seq_id") == login_seq_id]
+    names = {s["name"] for s in spans}
+    assert LOGIN_STEPS <= names, LOGIN_STEPS - names
+    assert {"http POST /connect/login", "http POST /session/token"} <= names, names
+    assert {"db.get_user_credentials", "db.login_commit"} <= names, names
+
+    by_name = {s["name"]: s for s in spans}
+    assert by_name["http POST /session/token"]["attributes"]["http.status_code"] == 200
+    assert by_name["db.get_user_credentials"]["attributes"]["db.rows"] == 1
+    assert by_name["db.login_commit"]["attributes"]["db.rows"] == 1     # the session/token update
+    assert all(s["attributes"]["user_id"] == user_id for s in spans)
+
+    # the HTTP span is a child of the step that made the call
+    step = by_name["login.generate_session"]
+    assert by_name["http POST /session/token"]["parent_id"] == step["context"]["span_id"]
+
+    timings = tracing.summarize(tracing.read_spans(TRACE_FILE), login_seq_id)[login_seq_id]
+    for name, ms, status in timings:
+        print(f"   {name:<32} {ms:>8.2f} ms  {status}")
+    print(f"✅ SUCCESS: {len(spans)} spans for login {login_seq_id}")
+
+
+def test_configure_is_process_local():
+    before = {name: os.environ.get(name) for name in ("TRACING_EXPORTER", "TRACING_FILE")}
+    tracing.configure(enabled=False, exporter="console", path=TRACE_FILE)
+    tracing.configure(enabled=False)
+    assert {name: os.environ.get(name) for name in before} == before, "configure() wrote to os.environ"
+    try:
+        import opentelemetry.sdk  # noqa: F401
+    except ImportError:
+        print("⚠️ SKIPPED: opentelemetry-sdk is not installed (pip install -r requirements/requirements-extended.txt)")
+        return
+
+    path = os.path.join(tempfile.mkdtemp(), "rebuilt.jsonl")
+    hooks, register = [], atexit.register
+    atexit.register = hooks.append
+    tracing._atexit_registered = False
+    files = []
+    try:
+        for _ in range(3):     # every configure() builds a fresh provider on the next span
+            tracing.configure(enabled=True, exporter="file", path=path)
+            with tracing.span("rebuilt"):
+                pass
+            files.append(tracing._out)
+            tracing.configure(enabled=False)
+    finally:
+        atexit.register = register
+    assert hooks == [tracing.shutdown], hooks
+    assert len(files) == 3 and all(f is not None and f.closed for f in files)
+    assert [s["name"] for s in tracing.read_spans(path)] == ["rebuilt"] * 3
+    print("✅ SUCCESS: tracing rebuilt 3 times with one atexit hook; every trace file was closed")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp(), ENV)
+    try:
+        test_disabled_tracing_is_free()
+        test_login_spans_share_login_seq_id()
+        test_configure_is_process_local()
+    finally:
+        server.shutdown()
@@ -0,0 +1,105 @@
+"""
+Quick script to validate src/user_bulk.py on a throw-away SQLite database:
+- a JSONL and a CSV file with valid and invalid rows import the valid ones
+  and report every bad row with its line number and reason
+- `export --with-passwords` writes the decrypted passwords, and importing
+  that export again changes nothing
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from src import db, user_bulk
+from src.tests import scratch
+
+PASSWORDS = {f"bulk_user_{i}": f"bulk-password-{i}" for i in range(6)}
+
+JSONL = [
+    {"M_STOCK_USER_ID": "bulk_user_0", "M_STOCK_PASSWORD": "bulk-password-0", "M_STOCK_API_KEY": "api-0"},
+    {"m_stock_user_id": " bulk_user_1 ", "m_stock_password": "bulk-password-1", "m_stock_api_key": "api-1",
+     "m_stock_api_key_type": "b"},
+    {"M_STOCK_USER_ID": "bulk_bad_type", "M_STOCK_PASSWORD": "x", "M_STOCK_API_KEY": "k",
+     "M_STOCK_API_KEY_TYPE": "Z"},
+    {"M_STOCK_USER_ID": "bulk_no_password", "M_STOCK_API_KEY": "k"},
+    {"M_STOCK_USER_ID": "bulk_number", "M_STOCK_PASSWORD": 1234, "M_STOCK_API_KEY": "k"},
+    {"M_STOCK_USER_ID": "bulk_user_2", "M_STOCK_PASSWORD": "bulk-password-2", "M_STOCK_API_KEY": "api-2"},
+]
+
+CSV = (
+    "M_STOCK_USER_ID,M_STOCK_PASSWORD,M_STOCK_API_KEY,M_STOCK_API_KEY_TYPE\n"
+    "bulk_user_3,bulk-password-3,api-3,A\n"
+    "bulk_no_key,secret,,A\n"
+    "bulk_user_4,bulk-password-4,api-4,\n"
+    "bulk_user_5,bulk-password-5,api-5,B\n"
+)
+
+
+def _write(directory, name, text):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def _stored():
+    rows = db.fetch_all("SELECT M_STOCK_USER_ID, M_STOCK_API_KEY, M_STOCK_API_KEY_TYPE "
+                        "FROM MS01_API_Authentication_Credential WHERE M_STOCK_USER_ID LIKE %s",
+                        ("bulk_%",))
+    return {row["M_STOCK_USER_ID"]: (row["M_STOCK_API_KEY"], row["M_STOCK_API_KEY_TYPE"]) for row in rows}
+
+
+def test_import_reports_bad_rows():
+    directory = tempfile.mkdtemp()
+    lines = [json.dumps(record) for record in JSONL]
+    lines.insert(3, "{not json")
+    jsonl = _write(directory, "users.jsonl", "\n".join(lines) + "\n")
+    csv_path = _write(directory, "users.csv", CSV)
+
+    result = user_bulk.import_users(jsonl, batch_size=2, workers=2)
+    assert result["written"] == 3, result
+    errors = {line_no: (user_id, reason) for line_no, user_id, reason in result["errors"]}
+    assert sorted(errors) == [3, 4, 5, 6], errors
+    assert errors[3] == ("bulk_bad_type", "M_STOCK_API_KEY_TYPE must be A or B, got Z")
+    assert errors[4][0] is None and errors[4][1].startswith("Invalid JSON")
+    assert errors[5] == ("bulk_no_password", "M_STOCK_PASSWORD is required")
+    assert errors[6] == ("bulk_number", "M_STOCK_PASSWORD must be a string, got int")
+
+    result = user_bulk.import_users(csv_path, batch_size=10, workers=2)
+    assert result["written"] == 3, result
+    assert result["errors"] == [(3, "bulk_no_key", "M_STOCK_API_KEY is required")], result["errors"]
+
+    assert _stored() == {
+        "bulk_user_0": ("api-0", "A"), "bulk_user_1": ("api-1", "B"), "bulk_user_2": ("api-2", "A"),
+        "bulk_user_3": ("api-3", "A"), "bulk_user_4": ("api-4", "A"), "bulk_user_5": ("api-5", "B"),
+    }
+    print("✅ SUCCESS: 6 users imported from JSONL and CSV; 5 bad rows reported by line")
+
+
+def test_export_with_passwords_round_trip():
+    directory = tempfile.mkdtemp()
+    export = os.path.join(directory, "export.jsonl")
+    db.flush_logs()
+    subprocess.run([sys.executable, "-m", "src.user_bulk", "export", export, "--with-passwords"],
+                   check=True, capture_output=True, text=True, env=os.environ.copy())
+    with open(export, encoding="utf-8") as f:
+        exported = [json.loads(line) for line in f if line.strip()]
+    exported = [row for row in exported if row["M_STOCK_USER_ID"].startswith("bulk_")]
+    assert {row["M_STOCK_USER_ID"]: row["M_STOCK_PASSWORD"] for row in exported} == PASSWORDS
+    assert not any("M_STOCK_PASSWORD_CIPHERTEXT" in row for row in exported)
+
+    before = _stored()
+    result = user_bulk.import_users(export, workers=2)
+    assert result["errors"] == [] and result["written"] >= len(PASSWORDS), result
+    assert _stored() == before
+    for user_id, password in PASSWORDS.items():
+        assert db.get_user_credentials(user_id)["M_STOCK_PASSWORD_DECRYPTED"] == password
+    print(f"✅ SUCCESS: export --with-passwords round-tripped {len(exported)} users")
+
+
+if __name__ == "__main__":
+    scratch.use(tempfile.mkdtemp())
+    test_import_reports_bad_rows()
+    test_export_with_passwords_round_trip()
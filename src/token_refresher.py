@@ -0,0 +1,420 @@
+"""
+Background refresh of stored mStock sessions.
+Every account with a refresh token sits in a min-heap ordered by when its
+access token should be renewed (TOKEN_REFRESH_LEAD seconds before it
+expires). A scheduler thread pops due accounts and hands them to a bounded
+worker pool; renewed tokens are written in batches (one transaction per
+batch) and cached in the SessionManager, so the next call finds a warm token
+instead of doing a login inline. A failing account backs off exponentially
+on its own without holding up the others.
+
+    refresher = TokenRefresher()
+    refresher.start()          # load accounts from the DB, refresh until stop()
+    refresher.stats()
+
+    python -m src.token_refresher            # run in the foreground
+    python -m src.token_refresher --once     # refresh what is due now, then exit (cron)
+
+The resident service (src/api/service.py) runs one unless TOKEN_REFRESH_ENABLED=0.
+Settings (.env): TOKEN_REFRESH_WORKERS (4), TOKEN_REFRESH_LEAD (seconds, default
+SESSION_RENEW_BEFORE), TOKEN_REFRESH_BATCH (50), TOKEN_REFRESH_FLUSH_INTERVAL (1.0),
+TOKEN_REFRESH_BACKOFF (30), TOKEN_REFRESH_BACKOFF_MAX (900),
+TOKEN_REFRESH_MAX_FAILURES (8), TOKEN_REFRESH_RELOAD_INTERVAL (300).
+"""
+
+import heapq
+import itertools
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from src import auth, db, metrics, tracing
+from src.session_manager import _parse_time, sessions
+from src.session_store import store as session_store
+from src.settings import get_settings
+
+MODULE = "token_refresher"
+
+REFRESHES = metrics.counter("mstock_token_refreshes_total",
+                            "Background token refreshes by outcome (success, failure, discarded, dropped)",
+                            ("result",))
+REFRESH_SECONDS = metrics.histogram("mstock_token_refresh_seconds", "Refresh-token call latency")
+SCHEDULED = metrics.gauge("mstock_token_refresh_accounts", "Accounts scheduled for background refresh")
+
+
+class _Account:
+    __slots__ = ("user_id", "api_key", "refresh_token", "login_time", "expires_at",
+                 "failures", "generation", "due")
+
+    def __init__(self, user_id, api_key, refresh_token, login_time, expires_at):
+        self.user_id = user_id
+        self.api_key = api_key
+        self.refresh_token = refresh_token
+        self.login_time = login_time
+        self.expires_at = expires_at
+        self.failures = 0
+        self.generation = 0
+        self.due = None
+
+
+class TokenRefresher:
+    """
+    Min-heap of (due, seq, user_id, generation). Rescheduling an account bumps
+    its generation, so superseded heap entries are skipped when popped
+    instead of being searched for and removed.
+    """
+
+    def __init__(self, manager=None, renew=None, workers=4, lead=None, batch_size=50, flush_interval=1.0,
+                 backoff_base=30.0, backoff_max=900.0, max_failures=8, reload_interval=300.0,
+                 now=datetime.now):
+        self.manager = manager or sessions
+        self._renew = renew or auth.renew_session
+        self.workers = workers
+        self.lead = timedelta(seconds=self.manager.renew_before.total_seconds() if lead is None else lead)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_failures = max_failures
+        self.reload_interval = reload_interval
+        self._now = now
+
+        self._cond = threading.Condition()
+        self._heap = []
+        self._seq = itertools.count()
+        self._accounts = {}        # user_id -> _Account
+        self._in_flight = set()
+        self._pending = []         # renewals waiting for the next batch write
+        self._slots = threading.Semaphore(workers)
+        self._executor = None
+        self._thread = None
+        self._stopping = False
+        self._stats = {"refreshed": 0, "failures": 0, "discarded": 0, "dropped": 0,
+                       "batches": 0, "flush_failures": 0, "loads": 0, "errors": 0}
+        SCHEDULED.set_function(lambda: len(self._accounts))
+
+    # -------------------------------
+    # Scheduling (called with self._cond held)
+    # -------------------------------
+
+    def _schedule(self, account, due):
+        account.generation += 1
+        account.due = due
+        heapq.heappush(self._heap, (due.timestamp(), next(self._seq), account.user_id, account.generation))
+        self._cond.notify()
+
+    def _pop_due(self, now):
+        """Accounts whose time has come (stale heap entries are dropped on the way)"""
+        due = []
+        while self._heap and self._heap[0][0] <= now.timestamp():
+            _, _, user_id, generation = heapq.heappop(self._heap)
+            account = self._accounts.get(user_id)
+            if account is None or account.generation != generation or user_id in self._in_flight:
+                continue
+            self._in_flight.add(user_id)
+            due.append(account)
+        return due
+
+    def _next_wake(self, now):
+        """Seconds until the next due account (None if the heap is empty)"""
+        while self._heap:
+            due_ts, _, user_id, generation = self._heap[0]
+            account = self._accounts.get(user_id)
+            if account is not None and account.generation == generation:
+                return max(due_ts - now.timestamp(), 0.0)
+            heapq.heappop(self._heap)
+        return None
+
+    # -------------------------------
+    # Accounts
+    # -------------------------------
+
+    def load(self):
+        """(Re)read every account with a refresh token; returns how many are scheduled"""
+        rows = db.fetch_all("""
+            SELECT M_STOCK_USER_ID, M_STOCK_API_KEY, M_REFRESH_TOKEN, LAST_LOGIN_DATE, LAST_LOGOUT_DATE
+            FROM MS01_API_Authentication_Credential
+            WHERE M_REFRESH_TOKEN IS NOT NULL
+        """)
+        now = self._now()
+        with self._cond:
+            # Renewed but not yet written: the DB still has the old token, keep ours
+            busy = self._in_flight | {renewal["user_id"] for renewal in self._pending}
+            seen = set()
+            for row in rows:
+                user_id = row["M_STOCK_USER_ID"]
+                login_time = _parse_time(row["LAST_LOGIN_DATE"])
+                logged_out = _parse_time(row["LAST_LOGOUT_DATE"])
+                if login_time is None or (logged_out and logged_out >= login_time):
+                    continue
+                seen.add(user_id)
+                if user_id in busy:
+                    continue
+                current = self._accounts.get(user_id)
+                if (current and current.refresh_token == row["M_REFRESH_TOKEN"]
+                        and current.login_time == login_time):
+                    continue
+                account = _Account(user_id, row["M_STOCK_API_KEY"], row["M_REFRESH_TOKEN"], login_time,
+                                   self.manager.expires_at(login_time))
+                if current:
+                    account.generation = current.generation
+                self._accounts[user_id] = account
+                self._schedule(account, max(account.expires_at - self.lead, now))
+            for user_id in set(self._accounts) - seen - busy:
+                del self._accounts[user_id]     # logged out or token cleared elsewhere
+            self._stats["loads"] += 1
+            return len(self._accounts)
+
+    def _backoff(self, failures):
+        delay = min(self.backoff_base * 2 ** (failures - 1), self.backoff_max)
+        return delay * random.uniform(0.8, 1.2)
+
+    # -------------------------------
+    # Workers
+    # -------------------------------
+
+    def _refresh(self, account):
+        login_seq_id = None
+        try:
+            login_seq_id = db.generate_login_seq_id()
+            with tracing.span("token_refresh", user_id=account.user_id, login_seq_id=login_seq_id), \
+                    REFRESH_SECONDS.time():
+                session_json = self._renew(account.api_key, account.refresh_token)
+            data = dict((session_json or {}).get("data") or {})
+            if not data.get("access_token"):
+                raise ValueError(f"No access_token in renewal response: {session_json}")
+        except Exception as e:
+            self._on_failure(account, login_seq_id, e)
+        else:
+            self._on_success(account, login_seq_id, data)
+        finally:
+            self._slots.release()
+
+    def _on_success(self, account, login_seq_id, data):
+        now = self._now()
+        data.setdefault("login_time", now.strftime("%Y-%m-%d %H:%M:%S"))
+        data.setdefault("refresh_token", account.refresh_token)
+        login_time = _parse_time(data["login_time"]) or now
+        with self._cond:
+            self._pending.append({"user_id": account.user_id, "api_key": account.api_key,
+                                  "refresh_token": account.refresh_token, "data": data,
+                                  "login_seq_id": login_seq_id})
+            account.refresh_token = data["refresh_token"]
+            account.login_time = login_time
+            account.expires_at = self.manager.expires_at(login_time)
+            account.failures = 0
+            due = account.expires_at - self.lead
+            if due <= now:
+                # The renewal did not move expiry past the lead (e.g. the trading day ends
+                # at midnight): try again when the current token runs out
+                due = max(account.expires_at, now + timedelta(seconds=1))
+            self._in_flight.discard(account.user_id)
+            self._schedule(account, due)
+            self._stats["refreshed"] += 1
+
+    def _on_failure(self, account, login_seq_id, error):
+        # Reschedule before logging: a failing log write must not leave the account in flight
+        with self._cond:
+            self._in_flight.discard(account.user_id)
+            account.failures += 1
+            self._stats["failures"] += 1
+            REFRESHES.inc(result="failure")
+            if account.failures >= self.max_failures:
+                # Needs a full login now; the next load() picks it up again after one
+                self._accounts.pop(account.user_id, None)
+                self._stats["dropped"] += 1
+                REFRESHES.inc(result="dropped")
+            else:
+                self._schedule(account, self._now() + timedelta(seconds=self._backoff(account.failures)))
+        try:
+            db.insert_request_response_log(
+                "WARN", "Background session renewal failed", MODULE, {"user_id": account.user_id}, str(error),
+                api_name="renew_session", login_seq_id=login_seq_id, user_id=account.user_id, status="failure"
+            )
+        except Exception as e:
+            print(f"❌ Token refresh failure not logged ({account.user_id}): {e}")
+
+    # -------------------------------
+    # Batched Writes
+    # -------------------------------
+
+    def flush(self):
+        """Write pending renewals in one transaction; returns how many were applied"""
+        with self._cond:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+        try:
+            applied = set(db.save_renewed_sessions(batch, MODULE))
+        except Exception as e:
+            print(f"❌ Token refresh batch failed: {e}")
+            with self._cond:
+                self._pending[:0] = batch       # retried with the next flush
+                self._stats["flush_failures"] += 1
+            return 0
+
+        store_updates = {}
+        for renewal in batch:
+            user_id, data = renewal["user_id"], renewal["data"]
+            if user_id in applied:
+                self.manager.remember(user_id, renewal["api_key"], {"data": data})
+                store_updates[user_id] = {"access_token": data["access_token"],
+                                          "refresh_token": data.get("refresh_token"),
+                                          "login_seq_id": renewal["login_seq_id"],
+                                          "last_login_date": data.get("login_time")}
+                for field, key in (("public_token", "public_token"), ("enc_token", "enctoken")):
+                    if data.get(key):
+                        store_updates[user_id][field] = data[key]
+            else:
+                # Logged out or logged in again since we loaded it: stop refreshing this token
+                with self._cond:
+                    account = self._accounts.get(user_id)
+                    if account is not None and account.refresh_token == data.get("refresh_token"):
+                        del self._accounts[user_id]
+        if store_updates:
+            session_store.update_many(store_updates)
+        REFRESHES.inc(len(applied), result="success")
+        REFRESHES.inc(len(batch) - len(applied), result="discarded")
+        with self._cond:
+            self._stats["batches"] += 1
+            self._stats["discarded"] += len(batch) - len(applied)
+        return len(applied)
+
+    # -------------------------------
+    # Scheduler Thread
+    # -------------------------------
+
+    def _run(self):
+        last_flush = last_load = self._now()
+        while True:
+            try:
+                with self._cond:
+                    if self._stopping:
+                        break
+                    now = self._now()
+                    due = self._pop_due(now)
+                    if not due:
+                        waits = [self.flush_interval if self._pending else None,
+                                 self._next_wake(now),
+                                 self.reload_interval - (now - last_load).total_seconds()]
+                        self._cond.wait(max(min(w for w in waits if w is not None), 0.01))
+                        now = self._now()
+                    flush_now = self._pending and (len(self._pending) >= self.batch_size or
+                                                   (now - last_flush).total_seconds() >= self.flush_interval)
+                for account in due:
+                    self._slots.acquire()       # bounded: never more than `workers` refreshes in flight
+                    try:
+                        self._executor.submit(self._refresh, account)
+                    except Exception:
+                        self._slots.release()
+                        with self._cond:
+                            self._in_flight.discard(account.user_id)
+                            self._schedule(account, now)
+                        raise
+                if flush_now:
+                    self.flush()
+                    last_flush = now
+                if (now - last_load).total_seconds() >= self.reload_interval:
+                    last_load = now             # a failed reload is retried next interval
+                    self.flush()
+                    self.load()
+            except Exception as e:
+                # Keep refreshing the accounts we already have; one bad DB call must not end the thread
+                print(f"❌ Token refresher error: {e}")
+                with self._cond:
+                    self._stats["errors"] += 1
+                    if self._stopping:
+                        break
+                    self._cond.wait(min(self.flush_interval, 1.0))
+
+    def start(self):
+        self.load()
+        self._stopping = False
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="token-refresh")
+        self._thread = threading.Thread(target=self._run, name="token-refresher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Stop scheduling, let running refreshes finish and write what they renewed"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        self.flush()
+
+    def run_once(self, timeout=60.0):
+        """Refresh everything due now, write it and return (for cron / --once)"""
+        self.load()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="token-refresh") as executor:
+            with self._cond:
+                due = self._pop_due(self._now())
+            for account in due:
+                self._slots.acquire()
+                executor.submit(self._refresh, account)
+        self.flush()
+        return len(due)
+
+    # -------------------------------
+    # Introspection
+    # -------------------------------
+
+    def schedule(self):
+        """[(user_id, due, expires_at, failures)] soonest first"""
+        with self._cond:
+            accounts = sorted(self._accounts.values(), key=lambda a: a.due or datetime.max)
+            return [(a.user_id, a.due, a.expires_at, a.failures) for a in accounts]
+
+    def stats(self) -> dict:
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update(accounts=len(self._accounts), in_flight=len(self._in_flight),
+                            pending=len(self._pending),
+                            running=self._thread is not None and self._thread.is_alive())
+        return snapshot
+
+
+def from_settings(**overrides) -> TokenRefresher:
+    settings = get_settings()
+    options = dict(
+        workers=settings.get("TOKEN_REFRESH_WORKERS", 4, int),
+        lead=settings.get("TOKEN_REFRESH_LEAD", None, float),
+        batch_size=settings.get("TOKEN_REFRESH_BATCH", 50, int),
+        flush_interval=settings.get("TOKEN_REFRESH_FLUSH_INTERVAL", 1.0, float),
+        backoff_base=settings.get("TOKEN_REFRESH_BACKOFF", 30.0, float),
+        backoff_max=settings.get("TOKEN_REFRESH_BACKOFF_MAX", 900.0, float),
+        max_failures=settings.get("TOKEN_REFRESH_MAX_FAILURES", 8, int),
+        reload_interval=settings.get("TOKEN_REFRESH_RELOAD_INTERVAL", 300.0, float),
+    )
+    options.update(overrides)
+    return TokenRefresher(**options)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Keep stored mStock sessions warm")
+    parser.add_argument("--once", action="store_true", help="refresh what is due now, then exit")
+    args = parser.parse_args()
+
+    refresher = from_settings()
+    if args.once:
+        count = refresher.run_once()
+        print(f"✅ {count} account(s) refreshed: {refresher.stats()}")
+    else:
+        refresher.start()
+        print(f"🔄 Refreshing {refresher.stats()['accounts']} account(s); Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(60)
+                print(f"   {refresher.stats()}")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            refresher.stop()
+        db.flush_logs()
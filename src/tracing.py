@@ -0,0 +1,246 @@
+"""
+Optional OpenTelemetry tracing for the login/logout flows, mStock HTTP calls
+and DB queries. Off by default: span() then returns a shared no-op object and
+opentelemetry is never imported, so instrumented code pays one flag check.
+When TRACING_ENABLED is on, spans go to a JSON-lines file (one span per line,
+readable offline), the console, or an OTLP collector.
+
+    with tracing.span("db.fetch_one", **{"db.statement": query}) as span:
+        ...
+        span.set_attribute("db.rows", 1)
+
+    with tracing.bind(login_seq_id=uow.login_seq_id, user_id=user_id):
+        ...   # every span started in here carries both attributes
+
+    python -m src.tracing [--file logs/traces.jsonl] [--login-seq-id ID]   # per-login timings
+
+Settings (.env): TRACING_ENABLED (default off), TRACING_EXPORTER
+(file | console | otlp, default file), TRACING_FILE (default logs/traces.jsonl),
+TRACING_SERVICE_NAME (default agentic-mstock).
+"""
+
+import contextvars
+import json
+import os
+import threading
+
+from src.settings import get_settings
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_FILE = os.path.join(ROOT_DIR, "logs", "traces.jsonl")
+EXPORTERS = ("file", "console", "otlp")
+
+settings = get_settings()
+
+_enabled = settings.flag("TRACING_ENABLED", False)
+_tracer = None
+_provider = None
+_out = None            # trace file opened by the file exporter, closed by shutdown()
+_exporter = None       # configure() overrides of TRACING_EXPORTER / TRACING_FILE
+_path = None
+_atexit_registered = False
+_lock = threading.Lock()
+
+# attributes added to every span started in the current context (see bind())
+_bound = contextvars.ContextVar("tracing_bound", default=None)
+
+
+class _NoopSpan:
+    """Stands in for both the span and its context manager while tracing is off"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, attributes):
+        pass
+
+    def record_exception(self, exception, attributes=None):
+        pass
+
+    def is_recording(self):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Binding:
+    __slots__ = ("attributes", "_token")
+
+    def __init__(self, attributes):
+        self.attributes = attributes
+        self._token = None
+
+    def __enter__(self):
+        self._token = _bound.set({**(_bound.get() or {}), **self.attributes})
+        return self
+
+    def __exit__(self, *exc):
+        _bound.reset(self._token)
+        return False
+
+
+def _clean(attributes):
+    """OTel accepts str/bool/int/float; None is dropped, anything else becomes str"""
+    return {key: value if isinstance(value, (str, bool, int, float)) else str(value)
+            for key, value in attributes.items() if value is not None}
+
+
+# -------------------------------
+# Setup
+# -------------------------------
+
+def _trace_file():
+    return _path or settings.get("TRACING_FILE", DEFAULT_FILE)
+
+def _build_exporter(kind, path):
+    """Returns (exporter, file it writes to or None)"""
+    from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(), None
+    if kind == "console":
+        return ConsoleSpanExporter(), None
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    out = open(path, "a", encoding="utf-8")
+    return ConsoleSpanExporter(out=out, formatter=lambda s: s.to_json(indent=None) + "\n"), out
+
+def _setup():
+    """Build the tracer on the first span; returns None (and turns tracing off) if OTel is missing"""
+    global _tracer, _provider, _out, _enabled, _atexit_registered
+    with _lock:
+        if _tracer is not None or not _enabled:
+            return _tracer
+        kind = (_exporter or settings.get("TRACING_EXPORTER", "file")).lower()
+        if kind not in EXPORTERS:
+            raise ValueError(f"Unknown TRACING_EXPORTER '{kind}' (expected one of {list(EXPORTERS)})")
+        try:
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+            exporter, out = _build_exporter(kind, _trace_file())
+        except ImportError as e:
+            print(f"⚠️ TRACING_ENABLED is set but OpenTelemetry is not installed ({e}); tracing disabled")
+            _enabled = False
+            return None
+
+        provider = TracerProvider(resource=Resource.create(
+            {"service.name": settings.get("TRACING_SERVICE_NAME", "agentic-mstock")}))
+        provider.add_span_processor(BatchSpanProcessor(exporter))
+        if not _atexit_registered:
+            import atexit
+            atexit.register(shutdown)
+            _atexit_registered = True
+        _provider, _out = provider, out
+        # a private provider: no global state for other libraries to trip over
+        _tracer = provider.get_tracer("src.tracing")
+        return _tracer
+
+
+def configure(enabled=True, exporter=None, path=None):
+    """
+    Switch tracing on/off at runtime (tests, long-running services).
+    exporter/path override TRACING_EXPORTER/TRACING_FILE until the next configure().
+    """
+    global _enabled, _exporter, _path
+    shutdown()
+    with _lock:
+        _exporter, _path = exporter, path
+        _enabled = enabled
+
+def force_flush(timeout_millis=5000):
+    if _provider is not None:
+        _provider.force_flush(timeout_millis)
+
+def shutdown():
+    """Flush pending spans, close the trace file and drop the tracer (the next span() builds a new one)"""
+    global _tracer, _provider, _out
+    with _lock:
+        provider, _provider, _tracer = _provider, None, None
+        out, _out = _out, None
+    if provider is not None:
+        provider.shutdown()
+    if out is not None:
+        out.close()
+
+
+# -------------------------------
+# Public API
+# -------------------------------
+
+def enabled():
+    return _enabled
+
+def span(name, **attributes):
+    """
+    Context manager for one span named `name`. The span is current while
+    the block runs, so nested span() calls become its children; exceptions
+    are recorded on it and re-raised.
+    """
+    if not _enabled:
+        return NOOP_SPAN
+    tracer = _tracer or _setup()
+    if tracer is None:
+        return NOOP_SPAN
+    bound = _bound.get()
+    if bound:
+        attributes = {**bound, **attributes}
+    return tracer.start_as_current_span(name, attributes=_clean(attributes))
+
+def bind(**attributes):
+    """Attach attributes (e.g. login_seq_id) to every span started inside the block"""
+    if not _enabled:
+        return NOOP_SPAN
+    return _Binding(_clean(attributes))
+
+
+# -------------------------------
+# Offline Inspection
+# -------------------------------
+
+def read_spans(path=None):
+    """Spans written by the file exporter, as dicts (one JSON object per line)"""
+    spans = []
+    with open(path or _trace_file(), encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                spans.append(json.loads(line))
+    return spans
+
+def _duration_ms(record):
+    from datetime import datetime
+    start = datetime.fromisoformat(record["start_time"].replace("Z", "+00:00"))
+    end = datetime.fromisoformat(record["end_time"].replace("Z", "+00:00"))
+    return (end - start).total_seconds() * 1000
+
+def summarize(spans, login_seq_id=None):
+    """{login_seq_id: [(span name, duration ms, status)]} in start order"""
+    logins = {}
+    for record in sorted(spans, key=lambda r: r["start_time"]):
+        seq_id = (record.get("attributes") or {}).get("login_seq_id")
+        if seq_id is None or (login_seq_id and seq_id != login_seq_id):
+            continue
+        logins.setdefault(seq_id, []).append(
+            (record["name"], round(_duration_ms(record), 2), record.get("status", {}).get("status_code")))
+    return logins
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Per-login span timings from the trace file")
+    parser.add_argument("--file", help=f"trace file (default TRACING_FILE or {DEFAULT_FILE})")
+    parser.add_argument("--login-seq-id", help="only this login")
+    args = parser.parse_args()
+
+    for seq_id, rows in summarize(read_spans(args.file), args.login_seq_id).items():
+        print(f"login_seq_id {seq_id}")
+        for name, ms, status in rows:
+            print(f"   {name:<32} {ms:>9.2f} ms  {status}")
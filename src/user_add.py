@@ -23,4 +23,13 @@ if __name__ == "__main__":
     m_stock_api_key = input("Enter M_STOCK_API_KEY: ").strip()
     m_stock_api_key_type = input("Enter M_STOCK_API_KEY_TYPE (A/B): ").strip().upper() or "A"
 
-    add_user(m_stock_user_id, m_stock_password, m_stock_api_key, m_stock_api_key_type)
\ No newline at end of file
+    from src.api.client import ServiceError, connect
+    service = connect()    # resident service if it is running, else work in this process
+    if service:
+        try:
+            service.add_user(m_stock_user_id, m_stock_password, m_stock_api_key, m_stock_api_key_type)
+            print(f"✅ User {m_stock_user_id} added successfully.")
+        except ServiceError as e:
+            print(f"❌ Failed to add user {m_stock_user_id}: {e.detail}")
+    else:
+        add_user(m_stock_user_id, m_stock_password, m_stock_api_key, m_stock_api_key_type)
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""
+Bulk user import/export for MS01_API_Authentication_Credential.
+
+Import streams a CSV or JSONL file, encrypts passwords in a thread (or process)
+pool and upserts each batch with one executemany in a single transaction.
+Bad rows are reported with their line number without aborting the batch.
+Export pages through the table with an unbuffered (server-side) cursor.
+
+Usage (from project root):
+    python -m src.user_bulk import users.csv --batch-size 500 --workers 8
+    python -m src.user_bulk import users.jsonl --processes --errors failed_rows.csv
+    python -m src.user_bulk export users_export.jsonl [--with-passwords]
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+
+import config
+from src import db
+
+FIELDS = ("M_STOCK_USER_ID", "M_STOCK_PASSWORD", "M_STOCK_API_KEY", "M_STOCK_API_KEY_TYPE")
+EXPORT_FIELDS = ("M_STOCK_USER_ID", "M_STOCK_API_KEY", "M_STOCK_API_KEY_TYPE", "ENCRYPTION_KEY_ID")
+
+CREDENTIAL_COLUMNS = FIELDS + ("ENCRYPTION_KEY_ID",)
+
+
+def upsert_sql():
+    """Backend-specific upsert; needs the unique index on M_STOCK_USER_ID (migration 0001)"""
+    return db.get_backend().upsert_sql(
+        "MS01_API_Authentication_Credential",
+        CREDENTIAL_COLUMNS,
+        ("M_STOCK_USER_ID",),
+        extra_assignments=("SYS_UPDATE_DATE_TIME = CURRENT_TIMESTAMP",),
+    )
+
+
+# -------------------------------
+# Input Parsing
+# -------------------------------
+
+def _detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def read_records(path, fmt=None):
+    """Yield (line_no, record_dict) from a CSV (with header) or JSONL file, streaming"""
+    fmt = _detect_format(path, fmt)
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield line_no, row
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield line_no, json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield line_no, {"__error__": f"Invalid JSON: {e}"}
+
+def validate(record):
+    """Normalize one input record; raises ValueError with a readable reason"""
+    if not isinstance(record, dict):
+        raise ValueError(f"Expected an object, got {type(record).__name__}")
+    if "__error__" in record:
+        raise ValueError(record["__error__"])
+    normalized = {key.strip().upper(): (value.strip() if isinstance(value, str) else value)
+                  for key, value in record.items() if isinstance(key, str) and key}
+    for field in FIELDS:
+        value = normalized.get(field)
+        if value is not None and not isinstance(value, str):
+            raise ValueError(f"{field} must be a string, got {type(value).__name__}")
+    for field in FIELDS[:3]:
+        if not normalized.get(field):
+            raise ValueError(f"{field} is required")
+    api_key_type = (normalized.get("M_STOCK_API_KEY_TYPE") or "A").upper()
+    if api_key_type not in ("A", "B"):
+        raise ValueError(f"M_STOCK_API_KEY_TYPE must be A or B, got {api_key_type}")
+    normalized["M_STOCK_API_KEY_TYPE"] = api_key_type
+    return normalized
+
+
+# -------------------------------
+# Encryption Workers
+# -------------------------------
+
+@lru_cache(maxsize=4)
+def _fernet(key):
+    from cryptography.fernet import Fernet
+    return Fernet(key.encode())
+
+def _encrypt_with(key, plain):
+    """Module-level so it can run in a ProcessPoolExecutor"""
+    return _fernet(key).encrypt(plain.encode()).decode()
+
+
+# -------------------------------
+# Import
+# -------------------------------
+
+def _write_batch(rows):
+    """Upsert prepared rows in one transaction; on failure isolate bad rows one by one"""
+    sql = upsert_sql()
+    try:
+        with db.transaction() as conn:
+            cursor = conn.cursor()
+            cursor.executemany(sql, [params for _, params in rows])
+            cursor.close()
+        return len(rows), []
+    except Exception:
+        written, errors = 0, []
+        for line_no, params in rows:
+            try:
+                with db.transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(sql, params)
+                    cursor.close()
+                written += 1
+            except Exception as e:
+                errors.append((line_no, params[0], str(e)))
+        return written, errors
+
+def import_users(path, fmt=None, batch_size=500, workers=4, use_processes=False):
+    """
+    Stream users from `path` and upsert them in batches.
+    Returns {"written": n, "errors": [(line_no, user_id, reason)], "seconds": t}.
+    """
+    key_id = config.keyring.active_key_id()
+    key = config.get_encryption_key(key_id)
+    encrypt = partial(_encrypt_with, key)
+
+    if use_processes:
+        from concurrent.futures import ProcessPoolExecutor   # pulls in multiprocessing
+        executor_cls = ProcessPoolExecutor
+    else:
+        executor_cls = ThreadPoolExecutor
+    records = read_records(path, fmt)
+    written, errors = 0, []
+    started = time.monotonic()
+
+    with executor_cls(max_workers=workers) as pool:
+        while True:
+            chunk = list(itertools.islice(records, batch_size))
+            if not chunk:
+                break
+
+            valid = []
+            for line_no, record in chunk:
+                try:
+                    valid.append((line_no, validate(record)))
+                except ValueError as e:
+                    user_id = record.get("M_STOCK_USER_ID") if isinstance(record, dict) else None
+                    errors.append((line_no, user_id, str(e)))
+
+            ciphertexts = pool.map(encrypt, [r["M_STOCK_PASSWORD"] for _, r in valid],
+                                   chunksize=max(1, len(valid) // (workers * 4)))
+            rows = [
+                (line_no, (r["M_STOCK_USER_ID"], cipher, r["M_STOCK_API_KEY"], r["M_STOCK_API_KEY_TYPE"], key_id))
+                for (line_no, r), cipher in zip(valid, ciphertexts)
+            ]
+
+            batch_written, batch_errors = _write_batch(rows) if rows else (0, [])
+            written += batch_written
+            errors.extend(batch_errors)
+            elapsed = time.monotonic() - started
+            print(f"   … {written} users upserted, {len(errors)} errors ({written / elapsed:.0f} rows/s)")
+
+    result = {"written": written, "errors": errors, "seconds": time.monotonic() - started}
+    db.insert_log(
+        "WARN" if errors else "INFO",
+        f"Bulk import from {path}: {written} users upserted, {len(errors)} errors",
+        "user_bulk"
+    )
+    return result
+
+
+# -------------------------------
+# Export
+# -------------------------------
+
+def iter_users(fetch_size=1000, with_passwords=False):
+    """
+    Yield credential rows through an unbuffered cursor, fetch_size rows at a time,
+    so memory stays flat regardless of table size.
+    """
+    columns = EXPORT_FIELDS + ("M_STOCK_PASSWORD",)
+    conn = db.get_connection()
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(f"""
+            SELECT {', '.join(columns)}
+            FROM MS01_API_Authentication_Credential
+            ORDER BY CUST_SEQ_ID
+        """)
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            for row in rows:
+                cipher = row.pop("M_STOCK_PASSWORD")
+                if with_passwords:
+                    row["M_STOCK_PASSWORD"] = config.decrypt_str(cipher, row.get("ENCRYPTION_KEY_ID"))
+                else:
+                    row["M_STOCK_PASSWORD_CIPHERTEXT"] = cipher
+                yield row
+    finally:
+        cursor.close()
+        conn.close()
+
+def export_users(out, fmt="jsonl", fetch_size=1000, with_passwords=False):
+    """Write all users to a file object as CSV or JSONL; returns the row count"""
+    fields = list(EXPORT_FIELDS) + ["M_STOCK_PASSWORD" if with_passwords else "M_STOCK_PASSWORD_CIPHERTEXT"]
+    writer = csv.DictWriter(out, fieldnames=fields) if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    count = 0
+    for row in iter_users(fetch_size, with_passwords):
+        if writer:
+            writer.writerow(row)
+        else:
+            out.write(json.dumps(row, default=str) + "\n")
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk user import/export")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_import = sub.add_parser("import", help="upsert users from a CSV/JSONL file")
+    p_import.add_argument("path")
+    p_import.add_argument("--format", choices=["csv", "jsonl"])
+    p_import.add_argument("--batch-size", type=int, default=500)
+    p_import.add_argument("--workers", type=int, default=4)
+    p_import.add_argument("--processes", action="store_true", help="encrypt in a process pool")
+    p_import.add_argument("--errors", help="write failed rows to this CSV file")
+
+    p_export = sub.add_parser("export", help="stream users to a CSV/JSONL file (or - for stdout)")
+    p_export.add_argument("path")
+    p_export.add_argument("--format", choices=["csv", "jsonl"])
+    p_export.add_argument("--fetch-size", type=int, default=1000)
+    p_export.add_argument("--with-passwords", action="store_true", help="export decrypted passwords")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        result = import_users(args.path, args.format, args.batch_size, args.workers, args.processes)
+        print(f"✅ {result['written']} users upserted in {result['seconds']:.1f}s")
+        if result["errors"]:
+            print(f"❌ {len(result['errors'])} rows failed")
+            for line_no, user_id, reason in result["errors"][:20]:
+                print(f"   line {line_no} ({user_id}): {reason}")
+            if args.errors:
+                with open(args.errors, "w", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(["line", "M_STOCK_USER_ID", "error"])
+                    writer.writerows(result["errors"])
+                print(f"   full list written to {args.errors}")
+    else:
+        fmt = args.format or _detect_format(args.path)
+        if args.path == "-":
+            count = export_users(sys.stdout, fmt, args.fetch_size, args.with_passwords)
+        else:
+            with open(args.path, "w", newline="", encoding="utf-8") as f:
+                count = export_users(f, fmt, args.fetch_size, args.with_passwords)
+        print(f"✅ {count} users exported", file=sys.stderr)
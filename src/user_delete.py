@@ -6,6 +6,15 @@ def delete_user(m_stock_user_id):
     db.insert_log("INFO", f"User {m_stock_user_id} deleted", "user_delete")
 
 if __name__ == "__main__":
+    from src.api.client import ServiceError, connect
     m_stock_user_id = input("Enter M_STOCK_USER_ID to delete: ")
-    delete_user(m_stock_user_id)
-    print(f"User {m_stock_user_id} deleted successfully.")
\ No newline at end of file
+    service = connect()    # resident service if it is running, else work in this process
+    if service:
+        try:
+            service.delete_user(m_stock_user_id)
+            print(f"User {m_stock_user_id} deleted successfully.")
+        except ServiceError as e:
+            print(f"❌ Failed to delete user {m_stock_user_id}: {e.detail}")
+    else:
+        delete_user(m_stock_user_id)
+        print(f"User {m_stock_user_id} deleted successfully.")
\ No newline at end of file
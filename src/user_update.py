@@ -30,9 +30,18 @@ if __name__ == "__main__":
     m_stock_api_key = input("Enter new M_STOCK_API_KEY (or press Enter to skip): ").strip() or None
     m_stock_api_key_type = input("Enter new M_STOCK_API_KEY_TYPE (A/B or press Enter to skip): ").strip().upper() or None
 
-    update_user(
-        m_stock_user_id,
-        m_stock_password,
-        m_stock_api_key,
-        m_stock_api_key_type
-    )
\ No newline at end of file
+    from src.api.client import ServiceError, connect
+    service = connect()    # resident service if it is running, else work in this process
+    if service:
+        try:
+            service.update_user(m_stock_user_id, m_stock_password, m_stock_api_key, m_stock_api_key_type)
+            print(f"✅ User {m_stock_user_id} updated successfully.")
+        except ServiceError as e:
+            print(f"❌ Failed to update user {m_stock_user_id}: {e.detail}")
+    else:
+        update_user(
+            m_stock_user_id,
+            m_stock_password,
+            m_stock_api_key,
+            m_stock_api_key_type
+        )
\ No newline at end of file